@@ -30,7 +30,7 @@ if __name__ == "__main__":
     argparser = argparse.ArgumentParser()
     argparser.add_argument(
         'action',
-        help='dark frame algorithm, sigmaclip is recommended. Note: you must use AVERAGE mode when generating darks from RGB/JPEG data',
+        help='dark frame algorithm, sigmaclip is recommended',
         choices=(
             'flush',
             'average',
@@ -82,6 +82,13 @@ if __name__ == "__main__":
         type=int,
         default=0,
     )
+    argparser.add_argument(
+        '--mem_limit',
+        '-m',
+        help='memory limit (MB) for sigma clip combining [default: 350]',
+        type=int,
+        default=350,
+    )
     argparser.add_argument(
         '--flush_id',
         '-f',
@@ -131,6 +138,7 @@ if __name__ == "__main__":
     iad.temp_delta = args.temp_delta
     iad.time_delta = args.Time_delta
     iad.bitmax = args.bitmax
+    iad.mem_limit = args.mem_limit * 1000000
     iad.daytime = args.daytime
     iad.reverse = args.reverse
     iad.flush_camera_id = args.flush_id
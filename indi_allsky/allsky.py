@@ -6,8 +6,9 @@ import fcntl
 import os
 import time
 import io
-import re
+import json
 import psutil
+import copy
 from pathlib import Path
 from datetime import datetime
 from datetime import timedelta
@@ -24,6 +25,9 @@ from .version import __version__
 from .version import __config_level__
 
 from .config import IndiAllSkyConfig
+from .configReload import IndiAllSkyConfigReload
+from .imageCommit import IndiAllSkyImageCommit
+from .dbImport import IndiAllSkyDbImport
 
 from . import constants
 
@@ -39,18 +43,10 @@ from .flask.models import TaskQueueState
 from .flask.models import NotificationCategory
 
 from .flask.models import IndiAllSkyDbCameraTable
-from .flask.models import IndiAllSkyDbImageTable
-from .flask.models import IndiAllSkyDbVideoTable
-from .flask.models import IndiAllSkyDbKeogramTable
-from .flask.models import IndiAllSkyDbStarTrailsTable
-from .flask.models import IndiAllSkyDbStarTrailsVideoTable
-from .flask.models import IndiAllSkyDbPanoramaImageTable
-from .flask.models import IndiAllSkyDbPanoramaVideoTable
 from .flask.models import IndiAllSkyDbTaskQueueTable
 
 from sqlalchemy import or_
 from sqlalchemy.orm.exc import NoResultFound
-from sqlalchemy.exc import IntegrityError
 from sqlalchemy.sql.expression import false as sa_false
 
 
@@ -85,6 +81,9 @@ class IndiAllSky(object):
             self.config = self._config_obj.config
 
 
+        # config the workers are running with, changes made by this process are detected on reload
+        self._applied_config = copy.deepcopy(self.config)
+
         self._miscDb = miscDb(self.config)
 
 
@@ -200,10 +199,12 @@ class IndiAllSky(object):
         self.capture_worker_idx = 0
 
         self.image_q = Queue()
-        self.image_error_q = Queue()
-        self.image_worker = None
+        self.image_worker_list = []
         self.image_worker_idx = 0
 
+        # frames are processed concurrently and saved in exposure order
+        self.image_commit = IndiAllSkyImageCommit()
+
         self.video_q = Queue()
         self.video_error_q = Queue()
         self.video_worker = None
@@ -451,15 +452,59 @@ class IndiAllSky(object):
         self.capture_worker.join()
 
 
-    def _startImageWorker(self):
+    def _startImageWorkers(self):
+        image_workers = self._imageWorkerCount()
+
+        if len(self.image_worker_list) != image_workers:
+            for image_worker_dict in self.image_worker_list:
+                if image_worker_dict['worker'] and image_worker_dict['worker'].is_alive():
+                    # pool is only resized when all workers are stopped
+                    image_workers = len(self.image_worker_list)
+                    break
+            else:
+                self.image_worker_list = list()
+                for x in range(image_workers):
+                    self.image_worker_list.append({
+                        'worker'  : None,
+                        'slot'    : x,
+                        'error_q' : Queue(),
+                    })
+
+
+        for image_worker_dict in self.image_worker_list:
+            if image_worker_dict['worker'] and image_worker_dict['worker'].is_alive():
+                break
+        else:
+            # frame numbering restarts with the pool
+            self.image_commit.reset(image_workers)
+
+
+        self.image_commit.workers = image_workers
+
+        for image_worker_dict in self.image_worker_list:
+            self._imageWorkerStart(image_worker_dict)
+
+
+    def _imageWorkerCount(self):
+        image_workers = int(self.config.get('IMAGE_WORKERS', 1))
+
+        if image_workers > 1 and self.config.get('IMAGE_STACK_COUNT', 1) > 1:
+            # the stacker keeps a history of the previous frames
+            logger.warning('Image stacking requires a single image worker')
+            return 1
+
+        return image_workers
+
+
+    def _imageWorkerStart(self, iw_dict):
         from .image import ImageWorker
 
-        if self.image_worker:
-            if self.image_worker.is_alive():
+        if iw_dict['worker']:
+            if iw_dict['worker'].is_alive():
                 return
 
             try:
-                image_error, image_traceback = self.image_error_q.get_nowait()
+                image_error, image_traceback = iw_dict['error_q'].get_nowait()
                 for line in image_traceback.split('\n'):
                     logger.error('Image worker exception: %s', line)
             except queue.Empty:
@@ -469,12 +514,14 @@ class IndiAllSky(object):
         self.image_worker_idx += 1
 
         logger.info('Starting Image-%d worker', self.image_worker_idx)
-        self.image_worker = ImageWorker(
+        iw_dict['worker'] = ImageWorker(
             self.image_worker_idx,
+            iw_dict['slot'],
             self.config,
-            self.image_error_q,
+            iw_dict['error_q'],
             self.image_q,
             self.upload_q,
+            self.image_commit,
             self.position_av,
             self.exposure_av,
             self.gain_av,
@@ -484,7 +531,7 @@ class IndiAllSky(object):
             self.night_av,
             self.astro_av,
         )
-        self.image_worker.start()
+        iw_dict['worker'].start()
 
 
         if self.image_worker_idx % 10 == 0:
@@ -498,21 +545,35 @@ class IndiAllSky(object):
                 )
 
 
-    def _stopImageWorker(self):
-        if not self.image_worker:
-            return
+    def _stopImageWorkers(self):
+        active_worker_list = list()
+        for image_worker_dict in self.image_worker_list:
+            if not image_worker_dict['worker']:
+                continue
 
-        if not self.image_worker.is_alive():
-            return
+            if not image_worker_dict['worker'].is_alive():
+                continue
+
+            if self._terminate:
+                logger.info('Terminating Image worker')
+                image_worker_dict['worker'].terminate()
+
+            active_worker_list.append(image_worker_dict)
+
+
+        # need to put the stops in the queue before waiting on workers to join
+        for image_worker_dict in active_worker_list:
+            self.image_q.put({'stop' : True})
 
-        if self._terminate:
-            logger.info('Terminating Image worker')
-            self.image_worker.terminate()
 
+        for image_worker_dict in active_worker_list:
+            self._imageWorkerStop(image_worker_dict)
+
+
+    def _imageWorkerStop(self, iw_dict):
         logger.info('Stopping Image worker')
 
-        self.image_q.put({'stop' : True})
-        self.image_worker.join()
+        iw_dict['worker'].join()
 
 
     def _startVideoWorker(self):
@@ -711,6 +772,8 @@ class IndiAllSky(object):
 
             self._expireOrphanedTasks()
 
+            self._resumeThumbnailTasks()
+
             self._startup()
 
 
@@ -722,7 +785,7 @@ class IndiAllSky(object):
 
                 logger.warning('Shutting down')
                 self._stopCaptureWorker()  # stop this first so image queue is cleared out
-                self._stopImageWorker()
+                self._stopImageWorkers()
                 self._stopVideoWorker()
                 self._stopSensorWorker()
                 self._stopFileUploadWorkers()
@@ -739,17 +802,13 @@ class IndiAllSky(object):
 
 
             if self._reload:
-                logger.warning('Restarting processes')
                 self._reload = False
-                self._stopCaptureWorker()  # stop this first so image queue is cleared out
-                self._stopImageWorker()
-                self._stopVideoWorker()
-                self._stopSensorWorker()
-                self._stopFileUploadWorkers()
-                # processes will start at the next loop
 
                 with app.app_context():
-                    self.reload_handler()
+                    config_reload = self.reload_handler()
+
+                self._reloadWorkers(config_reload)
+                # stopped processes will start at the next loop
 
 
             # do *NOT* start workers inside of a flask context
@@ -757,7 +816,7 @@ class IndiAllSky(object):
 
             # restart worker if it has failed
             self._startCaptureWorker()
-            self._startImageWorker()
+            self._startImageWorkers()
             self._startVideoWorker()
             self._startSensorWorker()
             self._startFileUploadWorkers()
@@ -777,8 +836,11 @@ class IndiAllSky(object):
 
         self._config_obj = IndiAllSkyConfig()
 
+        config_reload = IndiAllSkyConfigReload(self._applied_config, self._config_obj.config)
+
         # overwrite config
         self.config = self._config_obj.config
+        self._applied_config = copy.deepcopy(self.config)
 
 
         if __config_level__ != self._config_obj.config_level:
@@ -791,479 +853,162 @@ class IndiAllSky(object):
                 expire=timedelta(hours=2),
             )
 
-            return
+            return None
 
 
         # indicate newer config is loaded
         self._miscDb.setState('CONFIG_ID', self._config_obj.config_id)
 
-
-    def _systemHealthCheck(self, task_state=TaskQueueState.QUEUED):
-        # This will delete old images from the filesystem and DB
-        jobdata = {
-            'action' : 'systemHealthCheck',
-            'kwargs' : {},
-        }
-
-        task = IndiAllSkyDbTaskQueueTable(
-            queue=TaskQueueQueue.VIDEO,
-            state=task_state,
-            data=jobdata,
-        )
-        db.session.add(task)
-        db.session.commit()
-
-        self.video_q.put({'task_id' : task.id})
-
-
-    def dbImportImages(self):
-        with app.app_context():
-            self._dbImportImages()
-
-
-    def _dbImportImages(self):
-        try:
-            IndiAllSkyDbCameraTable.query\
-                .limit(1)\
-                .one()
-
-            logger.error('Imports may only be performed before the first camera is connected')
-            sys.exit(1)
-
-        except NoResultFound:
-            # need to get camera info before adding to DB
-            print('')
-            print('')
-            camera_name = input('Please enter the camera name: ')
-            camera_metadata = {
-                'type'        : constants.CAMERA,
-                'name'        : camera_name.rstrip(),
-                'driver'      : 'import',
-                'latitude'    : 0.0,
-                'longitude'   : 0.0,
-                'elevation'   : 0,
-                'alt'         : 0,
-                'az'          : 0,
-            }
-            camera = self._miscDb.addCamera(camera_metadata)
-            camera_id = camera.id
-
-
-        file_list_videos = list()
-        self._getFolderFilesByExt(self.image_dir, file_list_videos, extension_list=['mp4', 'webm'])
-
-
-        ### Timelapse
-        timelapse_videos_tl = filter(lambda p: 'timelapse' in p.name, file_list_videos)
-        timelapse_videos = filter(lambda p: 'startrail' not in p.name, timelapse_videos_tl)  # exclude star trail timelapses
-
-        # timelapse/20210915/allsky-timelapse_ccd1_20210915_night_1747415591.mp4
-        re_video = re.compile(r'(?P<dayDate_str>\d{8})\/.+timelapse_ccd(?P<ccd_id_str>\d+)_\d{8}_(?P<timeofday_str>[a-z]+)_?(?P<timestamp_str>\d+)?\.[a-z0-9]+$')
-
-        video_entries = list()
-        for f in timelapse_videos:
-            #logger.info('Timelapse: %s', f)
-
-            m = re.search(re_video, str(f))
-            if not m:
-                logger.error('Regex did not match file: %s', f)
-                continue
-
-            #logger.info('dayDate string: %s', m.group('dayDate_str'))
-            #logger.info('Time of day string: %s', m.group('timeofday_str'))
-
-            d_dayDate = datetime.strptime(m.group('dayDate_str'), '%Y%m%d').date()
-            #logger.info('dayDate: %s', str(d_dayDate))
-
-            if m.group('timeofday_str') == 'night':
-                night = True
-            else:
-                night = False
-
-            d_createDate = datetime.fromtimestamp(f.stat().st_mtime)
-
-            video_dict = {
-                'filename'   : str(f.relative_to(self.image_dir)),
-                'success'    : True,
-                'createDate' : d_createDate,
-                'dayDate'    : d_dayDate,
-                'dayDate_year'  : d_dayDate.year,
-                'dayDate_month' : d_dayDate.month,
-                'dayDate_day'   : d_dayDate.day,
-                'night'      : night,
-                'uploaded'   : False,
-                'camera_id'  : camera_id,
-            }
-
-            video_entries.append(video_dict)
+        return config_reload
 
 
-        try:
-            db.session.bulk_insert_mappings(IndiAllSkyDbVideoTable, video_entries)
-            db.session.commit()
-
-            logger.warning('*** Timelapse videos inserted: %d ***', len(video_entries))
-        except IntegrityError as e:
-            logger.warning('Integrity error: %s', str(e))
-            db.session.rollback()
-
-
-
-        ### find all images
-        file_list_images = list()
-        self._getFolderFilesByExt(self.image_dir, file_list_images, extension_list=['jpg', 'jpeg', 'png', 'tif', 'tiff', 'webp'])
-
-
-        ### Keograms
-        file_list_keograms = filter(lambda p: 'keogram' in p.name, file_list_images)
-
-        # timelapse/20210915/allsky-keogram_ccd1_20210915_night_1747415591.jpg
-        re_keogram = re.compile(r'(?P<dayDate_str>\d{8})\/.+keogram_ccd(?P<ccd_id_str>\d+)_\d{8}_(?P<timeofday_str>[a-z]+)_?(?P<timestamp_str>\d+)?\.[a-z]+$')
-
-        keogram_entries = list()
-        for f in file_list_keograms:
-            #logger.info('Keogram: %s', f)
-
-            m = re.search(re_keogram, str(f))
-            if not m:
-                logger.error('Regex did not match file: %s', f)
-                continue
-
-            #logger.info('dayDate string: %s', m.group('dayDate_str'))
-            #logger.info('Time of day string: %s', m.group('timeofday_str'))
-
-            d_dayDate = datetime.strptime(m.group('dayDate_str'), '%Y%m%d').date()
-            #logger.info('dayDate: %s', str(d_dayDate))
-
-            if m.group('timeofday_str') == 'night':
-                night = True
-            else:
-                night = False
-
-            d_createDate = datetime.fromtimestamp(f.stat().st_mtime)
-
-            keogram_dict = {
-                'filename'   : str(f.relative_to(self.image_dir)),
-                'success'    : True,
-                'createDate' : d_createDate,
-                'dayDate'    : d_dayDate,
-                'night'      : night,
-                'uploaded'   : False,
-                'camera_id'  : camera_id,
-            }
-
-            keogram_entries.append(keogram_dict)
-
-
-        try:
-            db.session.bulk_insert_mappings(IndiAllSkyDbKeogramTable, keogram_entries)
-            db.session.commit()
+    def _reloadWorkers(self, config_reload):
+        if isinstance(config_reload, type(None)):
+            reload_level = constants.RELOAD_CAMERA
+        else:
+            logger.info('Changed config keys: %s', ', '.join(config_reload.changed_keys))
+            reload_level = config_reload.level
 
-            logger.warning('*** Keograms inserted: %d ***', len(keogram_entries))
-        except IntegrityError as e:
-            logger.warning('Integrity error: %s', str(e))
-            db.session.rollback()
 
+        if reload_level == constants.RELOAD_CAMERA:
+            logger.warning('Restarting processes')
+            self._stopCaptureWorker()  # stop this first so image queue is cleared out
+            self._stopImageWorkers()
+            self._stopVideoWorker()
+            self._stopSensorWorker()
+            self._stopFileUploadWorkers()
+            return
 
-        ### Star trails
-        file_list_startrail = filter(lambda p: 'startrail' in p.name, file_list_images)
 
-        # timelapse/20210915/allsky-startrail_ccd1_20210915_night_1747415591.jpg
-        re_startrail = re.compile(r'(?P<dayDate_str>\d{8})\/.+startrail_ccd(?P<ccd_id_str>\d+)_\d{8}_(?P<timeofday_str>[a-z]+)_?(?P<timestamp_str>\d+)?\.[a-z]+$')
+        config_dict = {
+            'config' : self.config,
+        }
 
-        startrail_entries = list()
-        for f in file_list_startrail:
-            #logger.info('Star trail: %s', f)
 
-            m = re.search(re_startrail, str(f))
-            if not m:
-                logger.error('Regex did not match file: %s', f)
-                continue
+        # the camera stays connected
+        self.capture_q.put(config_dict)
 
-            #logger.info('dayDate string: %s', m.group('dayDate_str'))
-            #logger.info('Time of day string: %s', m.group('timeofday_str'))
 
-            d_dayDate = datetime.strptime(m.group('dayDate_str'), '%Y%m%d').date()
-            #logger.info('dayDate: %s', str(d_dayDate))
+        if reload_level == constants.RELOAD_WORKER:
+            logger.warning('Restarting processing workers')
+            self._stopImageWorkers()
+            self._stopVideoWorker()
+            self._stopSensorWorker()
+        else:
+            logger.warning('Applying config to running workers')
 
-            if m.group('timeofday_str') == 'night':
-                night = True
+            if len(self.image_worker_list) > 1:
+                # only one worker in the pool would receive the message
+                self._stopImageWorkers()
             else:
-                night = False
-
-            d_createDate = datetime.fromtimestamp(f.stat().st_mtime)
-
-            startrail_dict = {
-                'filename'   : str(f.relative_to(self.image_dir)),
-                'success'    : True,
-                'createDate' : d_createDate,
-                'dayDate'    : d_dayDate,
-                'night'      : night,
-                'uploaded'   : False,
-                'camera_id'  : camera_id,
-            }
-
-            startrail_entries.append(startrail_dict)
-
-
-        try:
-            db.session.bulk_insert_mappings(IndiAllSkyDbStarTrailsTable, startrail_entries)
-            db.session.commit()
-
-            logger.warning('*** Star trails inserted: %d ***', len(startrail_entries))
-        except IntegrityError as e:
-            logger.warning('Integrity error: %s', str(e))
-            db.session.rollback()
-
-
-        ### Star trail Videos
-        file_list_startrail_video_tl = filter(lambda p: 'timelapse' in p.name, file_list_videos)
-        file_list_startrail_video = filter(lambda p: 'startrail' in p.name, file_list_startrail_video_tl)
-
-        # timelapse/20210915/allsky-startrail_timelapse_ccd1_20210915_night_1747415591.mp4
-        re_startrail_video = re.compile(r'(?P<dayDate_str>\d{8})\/.+startrail_timelapse_ccd(?P<ccd_id_str>\d+)_\d{8}_(?P<timeofday_str>[a-z]+)_?(?P<timestamp_str>\d+)?\.[a-z0-9]+$')
-
-        startrail_video_entries = list()
-        for f in file_list_startrail_video:
-            #logger.info('Star trail timelapse: %s', f)
-
-            m = re.search(re_startrail_video, str(f))
-            if not m:
-                logger.error('Regex did not match file: %s', f)
-                continue
+                # queued behind the images already captured
+                self.image_q.put(config_dict)
 
-            #logger.info('dayDate string: %s', m.group('dayDate_str'))
-            #logger.info('Time of day string: %s', m.group('timeofday_str'))
+            self.video_q.put(config_dict)
 
-            d_dayDate = datetime.strptime(m.group('dayDate_str'), '%Y%m%d').date()
-            #logger.info('dayDate: %s', str(d_dayDate))
-
-            if m.group('timeofday_str') == 'night':
-                night = True
+            if config_reload.changed(config_reload.sensor_keys):
+                self._stopSensorWorker()
             else:
-                night = False
-
-            d_createDate = datetime.fromtimestamp(f.stat().st_mtime)
-
-            startrail_video_dict = {
-                'filename'   : str(f.relative_to(self.image_dir)),
-                'success'    : True,
-                'createDate' : d_createDate,
-                'dayDate'    : d_dayDate,
-                'night'      : night,
-                'uploaded'   : False,
-                'camera_id'  : camera_id,
-            }
-
-            startrail_video_entries.append(startrail_video_dict)
+                self.sensor_q.put(config_dict)
 
 
-        try:
-            db.session.bulk_insert_mappings(IndiAllSkyDbStarTrailsVideoTable, startrail_video_entries)
-            db.session.commit()
-
-            logger.warning('*** Star trail timelapses inserted: %d ***', len(startrail_video_entries))
-        except IntegrityError as e:
-            logger.warning('Integrity error: %s', str(e))
-            db.session.rollback()
-
-
-        ### Panorama Videos
-        file_list_panorama_video_tl = filter(lambda p: 'timelapse' in p.name, file_list_videos)
-        file_list_panorama_video = filter(lambda p: 'panorama' in p.name, file_list_panorama_video_tl)
-
-        # timelapse/20210915/allsky-panorama_timelapse_ccd1_20210915_night_1747415591.mp4
-        re_panorama_video = re.compile(r'(?P<dayDate_str>\d{8})\/.+panorama_timelapse_ccd(?P<ccd_id_str>\d+)_\d{8}_(?P<timeofday_str>[a-z]+)_?(?P<timestamp_str>\d+)?\.[a-z0-9]+$')
-
-        panorama_video_entries = list()
-        for f in file_list_panorama_video:
-            #logger.info('Panorama timelapse: %s', f)
-
-            m = re.search(re_panorama_video, str(f))
-            if not m:
-                logger.error('Regex did not match file: %s', f)
-                continue
+        # upload threads have no state, they receive the new config when restarted
+        self._stopFileUploadWorkers()
 
-            #logger.info('dayDate string: %s', m.group('dayDate_str'))
-            #logger.info('Time of day string: %s', m.group('timeofday_str'))
 
-            d_dayDate = datetime.strptime(m.group('dayDate_str'), '%Y%m%d').date()
-            #logger.info('dayDate: %s', str(d_dayDate))
-
-            if m.group('timeofday_str') == 'night':
-                night = True
-            else:
-                night = False
-
-            d_createDate = datetime.fromtimestamp(f.stat().st_mtime)
-
-            panorama_video_dict = {
-                'filename'   : str(f.relative_to(self.image_dir)),
-                'success'    : True,
-                'createDate' : d_createDate,
-                'dayDate'    : d_dayDate,
-                'night'      : night,
-                'uploaded'   : False,
-                'camera_id'  : camera_id,
-            }
-
-            panorama_video_entries.append(panorama_video_dict)
+    def _systemHealthCheck(self, task_state=TaskQueueState.QUEUED):
+        # This will delete old images from the filesystem and DB
+        jobdata = {
+            'action' : 'systemHealthCheck',
+            'kwargs' : {},
+        }
 
+        task = IndiAllSkyDbTaskQueueTable(
+            queue=TaskQueueQueue.VIDEO,
+            state=task_state,
+            data=jobdata,
+        )
+        db.session.add(task)
+        db.session.commit()
 
-        try:
-            db.session.bulk_insert_mappings(IndiAllSkyDbPanoramaVideoTable, panorama_video_entries)
-            db.session.commit()
+        self.video_q.put({'task_id' : task.id})
 
-            logger.warning('*** Panorama timelapses inserted: %d ***', len(panorama_video_entries))
-        except IntegrityError as e:
-            logger.warning('Integrity error: %s', str(e))
-            db.session.rollback()
 
+    def dbImportImages(self, camera_id=None):
+        with app.app_context():
+            self._dbImportImages(camera_id=camera_id)
 
-        ### Images
-        # Exclude keograms and star trails
-        file_list_images_nok = filter(lambda p: 'keogram' not in p.name, file_list_images)
-        file_list_images_nok_nost = filter(lambda p: 'startrail' not in p.name, file_list_images_nok)
-        file_list_images_nok_nost_noraw = filter(lambda p: 'raw' not in p.name, file_list_images_nok_nost)
-        file_list_images_nok_nost_noraw_nopan = filter(lambda p: 'panorama' not in p.name, file_list_images_nok_nost_noraw)
-        file_list_images_nok_nost_noraw_nopan_nothumb = filter(lambda p: 'thumbnail' not in p.name, file_list_images_nok_nost_noraw_nopan)
 
-        # exposures/20210825/night/26_02/ccd1_20210826_020202.jpg
-        re_image = re.compile(r'(?P<dayDate_str>\d{8})\/(?P<timeofday_str>[a-z]+)\/\d{2}_\d{2}\/ccd(?P<ccd_id_str>\d+)_(?P<createDate_str>[0-9_]+)\.[a-z]+$')
+    def _dbImportImages(self, camera_id=None):
+        if camera_id:
+            # import into an existing camera, indi-allsky may be running
+            try:
+                camera = IndiAllSkyDbCameraTable.query\
+                    .filter(IndiAllSkyDbCameraTable.id == camera_id)\
+                    .one()
+            except NoResultFound:
+                logger.error('Camera ID %d not found', camera_id)
+                sys.exit(1)
 
-        image_entries = list()
-        for f in file_list_images_nok_nost_noraw_nopan_nothumb:
-            #logger.info('Image: %s', f)
+        else:
+            try:
+                IndiAllSkyDbCameraTable.query\
+                    .limit(1)\
+                    .one()
 
-            m = re.search(re_image, str(f))
-            if not m:
-                logger.error('Regex did not match file: %s', f)
-                continue
+                logger.error('Cameras already exist, select the camera for the import with --cameraId')
+                sys.exit(1)
 
-            #logger.info('dayDate string: %s', m.group('dayDate_str'))
-            #logger.info('Time of day string: %s', m.group('timeofday_str'))
-            #logger.info('createDate string: %s', m.group('createDate_str'))
+            except NoResultFound:
+                # need to get camera info before adding to DB
+                print('')
+                print('')
+                camera_name = input('Please enter the camera name: ')
+                camera_metadata = {
+                    'type'        : constants.CAMERA,
+                    'name'        : camera_name.rstrip(),
+                    'driver'      : 'import',
+                    'latitude'    : 0.0,
+                    'longitude'   : 0.0,
+                    'elevation'   : 0,
+                    'alt'         : 0,
+                    'az'          : 0,
+                }
+                camera = self._miscDb.addCamera(camera_metadata)
+
+
+        db_import = IndiAllSkyDbImport(
+            self.image_dir,
+            camera.id,
+            self.varlib_folder_p.joinpath('db_import_checkpoint.txt'),
+        )
+        db_import.main()
 
-            d_dayDate = datetime.strptime(m.group('dayDate_str'), '%Y%m%d').date()
-            #logger.info('dayDate: %s', str(d_dayDate))
 
-            if m.group('timeofday_str') == 'night':
-                night = True
-            else:
-                night = False
-
-            #d_createDate = datetime.strptime(m.group('createDate_str'), '%Y%m%d_%H%M%S')
-            d_createDate = datetime.fromtimestamp(f.stat().st_mtime)
-            #logger.info('createDate: %s', str(d_createDate))
-
-
-            image_dict = {
-                'filename'   : str(f.relative_to(self.image_dir)),
-                'camera_id'  : camera_id,
-                'createDate' : d_createDate,
-                'createDate_year'   : d_createDate.year,
-                'createDate_month'  : d_createDate.month,
-                'createDate_day'    : d_createDate.day,
-                'createDate_hour'   : d_createDate.hour,
-                'dayDate'    : d_dayDate,
-                'exposure'   : 0.0,
-                'gain'       : -1.0,
-                'binmode'    : 1,
-                'night'      : night,
-                'adu'        : 0.0,
-                'stable'     : True,
-                'moonmode'   : False,
-                'adu_roi'    : False,
-                'uploaded'   : False,
+        if db_import.inserted['image'] or db_import.inserted['panorama_image']:
+            thumbnail_kwargs = {
+                'camera_id' : camera.id,
             }
 
+            # the video worker stores the position, generation is resumed when indi-allsky starts
+            self._miscDb.setState('THUMBNAIL_RESUME_CAMERA_{0:d}'.format(camera.id), json.dumps(thumbnail_kwargs))
 
-            image_entries.append(image_dict)
-
-        try:
-            db.session.bulk_insert_mappings(IndiAllSkyDbImageTable, image_entries)
-            db.session.commit()
-
-            logger.warning('*** Images inserted: %d ***', len(image_entries))
-        except IntegrityError as e:
-            logger.warning('Integrity error: %s', str(e))
-            db.session.rollback()
-
-
-        ### Panorama images
-        file_list_panorama_images = filter(lambda p: 'panoram' in p.name, file_list_images)
-
-        # panoramas/20210825/night/26_02/panorama_ccd1_20210826_020202.jpg
-        re_image = re.compile(r'(?P<dayDate_str>\d{8})\/(?P<timeofday_str>[a-z]+)\/\d{2}_\d{2}\/panorama_ccd(?P<ccd_id_str>\d+)_(?P<createDate_str>[0-9_]+)\.[a-z]+$')
-
-        panorama_image_entries = list()
-        for f in file_list_panorama_images:
-            #logger.info('Image: %s', f)
 
-            m = re.search(re_image, str(f))
-            if not m:
-                logger.error('Regex did not match file: %s', f)
-                continue
-
-            #logger.info('dayDate string: %s', m.group('dayDate_str'))
-            #logger.info('Time of day string: %s', m.group('timeofday_str'))
-            #logger.info('createDate string: %s', m.group('createDate_str'))
-
-            d_dayDate = datetime.strptime(m.group('dayDate_str'), '%Y%m%d').date()
-            #logger.info('dayDate: %s', str(d_dayDate))
-
-            if m.group('timeofday_str') == 'night':
-                night = True
-            else:
-                night = False
-
-            #d_createDate = datetime.strptime(m.group('createDate_str'), '%Y%m%d_%H%M%S')
-            d_createDate = datetime.fromtimestamp(f.stat().st_mtime)
-            #logger.info('createDate: %s', str(d_createDate))
-
-
-            panorama_image_dict = {
-                'filename'   : str(f.relative_to(self.image_dir)),
-                'camera_id'  : camera_id,
-                'createDate' : d_createDate,
-                'createDate_year'   : d_createDate.year,
-                'createDate_month'  : d_createDate.month,
-                'createDate_day'    : d_createDate.day,
-                'createDate_hour'   : d_createDate.hour,
-                'dayDate'    : d_dayDate,
-                'exposure'   : 0.0,
-                'gain'       : -1.0,
-                'binmode'    : 1,
-                'night'      : night,
-                'uploaded'   : False,
+            # thumbnails are generated in the background by the video worker
+            jobdata = {
+                'action' : 'addMissingThumbnails',
+                'kwargs' : thumbnail_kwargs,
             }
 
-
-            panorama_image_entries.append(panorama_image_dict)
-
-        try:
-            db.session.bulk_insert_mappings(IndiAllSkyDbPanoramaImageTable, panorama_image_entries)
+            task = IndiAllSkyDbTaskQueueTable(
+                queue=TaskQueueQueue.VIDEO,
+                state=TaskQueueState.MANUAL,
+                data=jobdata,
+            )
+            db.session.add(task)
             db.session.commit()
 
-            logger.warning('*** Panorama images inserted: %d ***', len(panorama_image_entries))
-        except IntegrityError as e:
-            logger.warning('Integrity error: %s', str(e))
-            db.session.rollback()
-
-
-    def _getFolderFilesByExt(self, folder, file_list, extension_list=None):
-        if not extension_list:
-            extension_list = [self.config['IMAGE_FILE_TYPE']]
-
-        #logger.info('Searching for image files in %s', folder)
-
-        dot_extension_list = ['.{0:s}'.format(e) for e in extension_list]
-
-        for item in Path(folder).iterdir():
-            if item.is_file() and item.suffix in dot_extension_list:
-                file_list.append(item)
-            elif item.is_dir():
-                self._getFolderFilesByExt(item, file_list, extension_list=extension_list)  # recursion
+            logger.warning('Thumbnails will be generated when indi-allsky is running')
 
 
     def _expireOrphanedTasks(self):
@@ -1283,6 +1028,36 @@ class IndiAllSky(object):
         db.session.commit()
 
 
+    def _resumeThumbnailTasks(self):
+        """Thumbnail tasks from an import are expired at startup, the generation continues from the stored position"""
+        camera_list = IndiAllSkyDbCameraTable.query\
+            .order_by(IndiAllSkyDbCameraTable.id.asc())
+
+        for camera in camera_list:
+            try:
+                thumbnail_kwargs = json.loads(self._miscDb.getState('THUMBNAIL_RESUME_CAMERA_{0:d}'.format(camera.id)))
+            except NoResultFound:
+                continue
+
+
+            logger.warning('Resuming thumbnail generation for camera %d', camera.id)
+
+            jobdata = {
+                'action' : 'addMissingThumbnails',
+                'kwargs' : thumbnail_kwargs,
+            }
+
+            task = IndiAllSkyDbTaskQueueTable(
+                queue=TaskQueueQueue.VIDEO,
+                state=TaskQueueState.QUEUED,
+                data=jobdata,
+            )
+            db.session.add(task)
+            db.session.commit()
+
+            self.video_q.put({'task_id' : task.id})
+
+
     def _flushOldTasks(self):
         now_minus_3d = datetime.now() - timedelta(days=3)
 
@@ -0,0 +1,125 @@
+### Sparse bad pixel maps
+### A bad pixel map only has a few thousand non-zero pixels, the coordinates and values are stored in a numpy
+### file next to the FITS file.  The map is applied to the dark frame by indexing just those pixels instead of
+### a full frame maximum.  FITS bad pixel maps without a sparse file are converted on first use.
+
+import io
+import os
+import tempfile
+from pathlib import Path
+import numpy
+import logging
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkyBadPixelMap(object):
+
+    def __init__(self, shape, y, x, values):
+        self.shape = tuple([int(v) for v in shape])
+        self.y = y
+        self.x = x
+        self.values = values  # 2 dimensions for RGB data, each index is R, G, B
+
+
+    @property
+    def count(self):
+        return self.y.shape[0]
+
+
+    @staticmethod
+    def sparse_path(fits_p):
+        return Path(fits_p).with_suffix('.npz')
+
+
+    @classmethod
+    def fromArray(cls, data):
+        if len(data.shape) == 3:
+            # RGB fits data
+            y, x = numpy.nonzero(numpy.maximum.reduce([data[0], data[1], data[2]]))
+            values = data[:, y, x]
+        else:
+            # Mono data
+            y, x = numpy.nonzero(data)
+            values = data[y, x]
+
+
+        # uint16 is enough for all sensor sizes
+        return cls(data.shape, y.astype(numpy.uint16), x.astype(numpy.uint16), values)
+
+
+    @classmethod
+    def load(cls, sparse_p):
+        with numpy.load(str(sparse_p)) as npz:
+            return cls(npz['shape'], npz['y'], npz['x'], npz['values'])
+
+
+    @classmethod
+    def open(cls, fits_p):
+        """Load the sparse map for a FITS bad pixel map, the sparse file is created if it does not exist"""
+        sparse_p = cls.sparse_path(fits_p)
+
+        if sparse_p.exists():
+            return cls.load(sparse_p)
+
+
+        from astropy.io import fits
+
+        logger.warning('Converting bad pixel map to sparse format: %s', fits_p)
+        with fits.open(fits_p) as bpm_f:
+            bpm = cls.fromArray(bpm_f[0].data)
+
+
+        try:
+            bpm.save(sparse_p)
+        except OSError as e:
+            logger.error('Unable to save sparse bad pixel map: %s', str(e))
+
+
+        return bpm
+
+
+    def save(self, sparse_p):
+        sparse_p = Path(sparse_p)
+
+        # other image workers may read the file while it is written
+        f_tmp = tempfile.NamedTemporaryFile(mode='wb', dir=str(sparse_p.parent), suffix='.npz', delete=False)
+        f_tmp.close()
+
+        tmp_p = Path(f_tmp.name)
+
+        try:
+            with io.open(str(tmp_p), 'wb') as f_npz:
+                numpy.savez(
+                    f_npz,
+                    shape=numpy.array(self.shape, dtype=numpy.uint32),
+                    y=self.y,
+                    x=self.x,
+                    values=self.values,
+                )
+
+            tmp_p.chmod(0o644)
+            os.replace(str(tmp_p), str(sparse_p))
+        finally:
+            try:
+                tmp_p.unlink()
+            except FileNotFoundError:
+                pass
+
+
+    def apply(self, dark):
+        """Merge the bad pixel map into the dark frame (maximum of each pixel), the dark is modified in place"""
+        if not dark.flags.writeable:
+            dark = dark.copy()
+
+
+        if len(self.shape) == 3:
+            dark_values = dark[:, self.y, self.x]
+            dark[:, self.y, self.x] = numpy.maximum(dark_values, self.values.astype(dark.dtype))
+        else:
+            dark_values = dark[self.y, self.x]
+            dark[self.y, self.x] = numpy.maximum(dark_values, self.values.astype(dark.dtype))
+
+
+        return dark
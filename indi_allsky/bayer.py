@@ -0,0 +1,151 @@
+### Bayer domain operations on raw CFA data before debayering
+### Binning, hole (hot pixel) interpolation and statistics only use pixels of the same color.
+### Mono data is handled as a single color.
+
+import numpy
+import cv2
+import logging
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkyBayer(object):
+
+    # cv2.COLOR_BGR2GRAY weights, the same are used by the BAYER2GRAY conversions
+    luminance_weights = {
+        'R' : 0.299,
+        'G' : 0.587,
+        'B' : 0.114,
+    }
+
+    # row and column offset of each CFA position
+    cfa_offsets = ((0, 0), (0, 1), (1, 0), (1, 1))
+
+
+    @staticmethod
+    def bin_factor(config):
+        """Software binning factor applied before debayer, 1 when disabled"""
+        if config.get('IMAGE_SOFTWARE_BIN'):
+            return 2
+
+        return 1
+
+
+    def bin2(self, data, bayerpat):
+        """2x2 binning of same color pixels, the result keeps the CFA pattern at half size"""
+        if bayerpat:
+            # planes must be an even size to preserve the pattern
+            block = 4
+        else:
+            block = 2
+
+
+        height, width = data.shape[:2]
+        height -= height % block
+        width -= width % block
+
+        data = data[0:height, 0:width]
+
+
+        if not bayerpat:
+            return self._bin2_plane(data)
+
+
+        binned = numpy.empty((height // 2, width // 2), dtype=data.dtype)
+
+        for y, x in self.cfa_offsets:
+            binned[y::2, x::2] = self._bin2_plane(data[y::2, x::2])
+
+        return binned
+
+
+    def _bin2_plane(self, plane):
+        # average of each 2x2 block, rounded, stays within the original bit depth
+        plane_32 = plane.astype(numpy.uint32)
+
+        binned = plane_32[0::2, 0::2] + plane_32[0::2, 1::2] + plane_32[1::2, 0::2] + plane_32[1::2, 1::2]
+        binned += 2
+        binned >>= 2
+
+        return binned.astype(plane.dtype)
+
+
+    def fix_holes(self, data, hole_mask):
+        """Replace holes with the median of the nearest same color pixels, data is modified in place"""
+        y, x = numpy.nonzero(hole_mask)
+
+        self.fix_pixels(data, y, x)
+
+
+    def fix_pixels(self, data, y, x):
+        """Replace the pixels at the coordinates with the median of the nearest same color pixels"""
+        if len(data.shape) == 2:
+            self._fix_pixels_plane(data, y, x)
+            return
+
+
+        # RGB (fits), each index is R, G, B
+        for c in range(data.shape[0]):
+            self._fix_pixels_plane(data[c], y, x)
+
+
+    def _fix_pixels_plane(self, data, y, x):
+        height, width = data.shape[:2]
+
+        # signed coordinates, the offsets below may be negative
+        y = y.astype(numpy.int32)
+        x = x.astype(numpy.int32)
+
+
+        ### using an offset of 2 because want the same color pixel for bayered data
+        y_up = numpy.where(y >= 2, y - 2, y + 2)
+        y_down = numpy.where(y + 2 < height, y + 2, y - 2)
+        x_left = numpy.where(x >= 2, x - 2, x + 2)
+        x_right = numpy.where(x + 2 < width, x + 2, x - 2)
+
+
+        neighbors = numpy.stack((
+            data[y_up, x],
+            data[y_down, x],
+            data[y, x_left],
+            data[y, x_right],
+        ), axis=-1)
+
+        neighbors.sort(axis=-1)
+
+
+        # median of 4 values, a single bad neighbor is ignored
+        median = (neighbors[:, 1].astype(numpy.float32) + neighbors[:, 2]) / 2
+
+        if numpy.issubdtype(data.dtype, numpy.integer):
+            # round instead of truncating
+            median = numpy.rint(median)
+
+        data[y, x] = median.astype(data.dtype)
+
+
+    def mean(self, data, bayerpat, mask=None):
+        """Luminance average of CFA data, matches the mean of the debayered image converted to grayscale"""
+        if not bayerpat:
+            return cv2.mean(src=data, mask=mask)[0]
+
+
+        color_dict = {'R' : list(), 'G' : list(), 'B' : list()}
+
+        for color, (y, x) in zip(bayerpat, self.cfa_offsets):
+            plane = numpy.ascontiguousarray(data[y::2, x::2])
+
+            if isinstance(mask, type(None)):
+                plane_mask = None
+            else:
+                plane_mask = numpy.ascontiguousarray(mask[y::2, x::2])
+
+            color_dict[color].append(cv2.mean(src=plane, mask=plane_mask)[0])
+
+
+        adu = 0.0
+        for color, weight in self.luminance_weights.items():
+            adu += weight * (sum(color_dict[color]) / len(color_dict[color]))
+
+        return adu
@@ -0,0 +1,163 @@
+### Per-frame processing budget
+### Tracks a moving average of the cost of each expensive stage and of the remaining (required) processing.
+### Optional stages are skipped or degraded when the projected frame time would exceed the exposure period.
+### With a pool of image workers, each frame has one exposure period per worker before it is due.
+### Falling behind the camera is worse than losing a panorama or star count for a frame.
+
+import time
+from contextlib import contextmanager
+import logging
+
+from . import constants
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkyProcessingBudget(object):
+
+    # weight of the newest sample in the moving averages
+    smoothing = 0.3
+
+    # leave headroom for saving, uploads and the next frame
+    budget_fraction = 0.85
+
+    # stage: action taken when the stage does not fit, None means required
+    stages = {
+        'denoise'      : 'skip',
+        'registration' : 'degrade',  # stack without alignment
+        'detectLines'  : 'skip',
+        'detectStars'  : 'degrade',  # detect on a decimated image
+        'fish2pano'    : 'skip',
+        'lightgraph'   : 'skip',
+        'orb'          : 'skip',
+        'label'        : None,
+    }
+
+
+    def __init__(self, config, night_av, workers=1):
+        self.config = config
+        self.night_av = night_av
+        self.workers = max(1, int(workers))  # image worker processes
+
+        self._cost_dict = dict()  # moving average of each stage
+        self._required_avg = None  # moving average of the frame time outside of optional stages
+
+        self._frame_start = None
+        self._optional_elapsed = 0.0
+        self._skipped_list = list()
+
+
+    @property
+    def enabled(self):
+        if self.config.get('FOCUS_MODE', False):
+            return False
+
+        return bool(self.config.get('IMAGE_PROCESSING_BUDGET', True))
+
+
+    @property
+    def period(self):
+        if self.night_av[constants.NIGHT_NIGHT]:
+            exposure_period = float(self.config.get('EXPOSURE_PERIOD', 15.0))
+        else:
+            exposure_period = float(self.config.get('EXPOSURE_PERIOD_DAY', 15.0))
+
+        return exposure_period * self.workers
+
+
+    @property
+    def skipped(self):
+        """Stages skipped or degraded in the current frame"""
+        return list(self._skipped_list)
+
+
+    def start_frame(self):
+        self._frame_start = time.time()
+        self._optional_elapsed = 0.0
+        self._skipped_list = list()
+
+
+    def finish_frame(self):
+        if isinstance(self._frame_start, type(None)):
+            return
+
+
+        required_elapsed = (time.time() - self._frame_start) - self._optional_elapsed
+        self._required_avg = self._average(self._required_avg, required_elapsed)
+
+        if self._skipped_list:
+            logger.warning('Processing budget exceeded, skipped: %s', ', '.join(self._skipped_list))
+
+        self._frame_start = None
+
+
+    def allow(self, stage):
+        """Returns True when the stage should run at full quality"""
+        if not self.enabled:
+            return True
+
+        if isinstance(self._frame_start, type(None)):
+            return True
+
+        if not self.stages.get(stage):
+            # required
+            return True
+
+
+        cost = self._cost_dict.get(stage)
+        if isinstance(cost, type(None)):
+            # always measure a stage once
+            return True
+
+
+        elapsed = time.time() - self._frame_start
+
+        # required work still ahead of this stage
+        required_done = elapsed - self._optional_elapsed
+        required_left = max((self._required_avg or 0.0) - required_done, 0.0)
+
+        projected = elapsed + cost + required_left
+        if projected <= self.period * self.budget_fraction:
+            return True
+
+
+        action = self.stages[stage]
+        if action == 'skip':
+            self._skipped_list.append(stage)
+        else:
+            self._skipped_list.append('{0:s}:{1:s}'.format(stage, action))
+
+        logger.warning(
+            'Projected processing time %0.1fs exceeds the exposure period (%0.1fs), %s %s',
+            projected,
+            self.period,
+            action,
+            stage,
+        )
+
+        return False
+
+
+    @contextmanager
+    def stage(self, stage, degraded=False):
+        """Measure the cost of a stage, degraded runs do not count towards the full cost"""
+        stage_start = time.time()
+
+        try:
+            yield
+        finally:
+            stage_elapsed = time.time() - stage_start
+
+            if self.stages.get(stage):
+                self._optional_elapsed += stage_elapsed
+
+            if not degraded:
+                self._cost_dict[stage] = self._average(self._cost_dict.get(stage), stage_elapsed)
+
+
+    def _average(self, average, value):
+        if isinstance(average, type(None)):
+            return value
+
+        return (self.smoothing * value) + ((1 - self.smoothing) * average)
@@ -1,12 +1,15 @@
 import logging
 
 from .. import constants
+from ..exposureEvents import IndiAllSkyExposureEvents
 
 logger = logging.getLogger('indi_allsky')
 
 
 class FakeIndiClient(object):
 
+    exposure_event_callbacks = True
+
     def __init__(
         self,
         config,
@@ -75,6 +78,8 @@ class FakeIndiClient(object):
 
         self.exposureStartTime = None
 
+        self.exposure_events = IndiAllSkyExposureEvents()
+
         logger.info('creating an instance of FakeIndiClient')
 
 
@@ -0,0 +1,147 @@
+"""Latest-frame broadcast channel for stream fan-out.
+
+Zero dependencies on indi_allsky — safe to import from any context
+(Flask, standalone test scripts, benchmarks).
+
+A single reader publishes frames; every subscriber owns a one-frame slot
+that always holds the newest frame it has not consumed yet.  Slow
+subscribers skip intermediate frames instead of queueing them, and the
+condition variable guarantees a wakeup is never lost between a subscriber
+checking its slot and going to sleep.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+
+class FrameSubscription:
+    """Per-subscriber latest-frame slot.  Create via :meth:`FrameBroadcast.subscribe`."""
+
+    def __init__(self, broadcast: "FrameBroadcast") -> None:
+        self._broadcast = broadcast
+        self._frame: Optional[bytes] = None
+        self._seq: int = -1
+        self._publish_time: float = 0.0
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _offer(self, frame: bytes, seq: int, publish_time: float) -> None:
+        # called with the broadcast condition held
+        self._frame = frame
+        self._seq = seq
+        self._publish_time = publish_time
+
+    def get(self, timeout: Optional[float] = None) -> Optional[tuple[bytes, int]]:
+        """Block until a frame newer than the last one returned is available.
+
+        Returns (frame_bytes, sequence) or None on timeout/close.
+        """
+        result = self.get_timed(timeout=timeout)
+        if result is None:
+            return None
+        return result[0], result[1]
+
+    def get_timed(self, timeout: Optional[float] = None) -> Optional[tuple[bytes, int, float]]:
+        """Like :meth:`get` but also returns the monotonic publish time."""
+        cond = self._broadcast._cond
+        with cond:
+            if not cond.wait_for(lambda: self._frame is not None or self._closed, timeout=timeout):
+                return None
+            if self._frame is None:
+                return None  # closed
+            frame, seq, publish_time = self._frame, self._seq, self._publish_time
+            self._frame = None
+            return frame, seq, publish_time
+
+    def close(self) -> None:
+        self._broadcast._unsubscribe(self)
+
+    def __enter__(self) -> "FrameSubscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class FrameBroadcast:
+    """Single-producer, multi-consumer latest-frame channel."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._subscribers: set[FrameSubscription] = set()
+        self._frame: Optional[bytes] = None
+        self._seq: int = -1
+        self._publish_time: float = 0.0
+        self._closed = False
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def latest(self) -> Optional[tuple[bytes, int]]:
+        """Most recent frame without consuming it, or None."""
+        with self._cond:
+            if self._frame is None:
+                return None
+            return self._frame, self._seq
+
+    def publish(self, frame: bytes, seq: int) -> None:
+        """Hand a new frame to every subscriber and wake them."""
+        publish_time = time.monotonic()
+        with self._cond:
+            self._frame = frame
+            self._seq = seq
+            self._publish_time = publish_time
+            for sub in self._subscribers:
+                sub._offer(frame, seq, publish_time)
+            self._cond.notify_all()
+
+    def subscribe(self, include_latest: bool = True) -> FrameSubscription:
+        """Register a subscriber.  The current frame is delivered first when ``include_latest``."""
+        sub = FrameSubscription(self)
+        with self._cond:
+            if self._closed:
+                sub._closed = True
+            elif include_latest and self._frame is not None:
+                sub._offer(self._frame, self._seq, self._publish_time)
+            self._subscribers.add(sub)
+        return sub
+
+    def wait_latest(self, after_seq: int = -1, timeout: Optional[float] = None) -> Optional[tuple[bytes, int]]:
+        """Block until a frame with a sequence other than ``after_seq`` exists."""
+        with self._cond:
+            ok = self._cond.wait_for(
+                lambda: (self._frame is not None and self._seq != after_seq) or self._closed,
+                timeout=timeout,
+            )
+            if not ok or self._frame is None:
+                return None
+            return self._frame, self._seq
+
+    def close(self) -> None:
+        """Wake all subscribers; they receive None from :meth:`FrameSubscription.get`."""
+        with self._cond:
+            self._closed = True
+            for sub in self._subscribers:
+                sub._closed = True
+            self._cond.notify_all()
+
+    def reset(self) -> None:
+        """Re-open a closed channel and drop the cached frame."""
+        with self._cond:
+            self._closed = False
+            self._frame = None
+            self._seq = -1
+
+    def _unsubscribe(self, sub: FrameSubscription) -> None:
+        with self._cond:
+            sub._closed = True
+            self._subscribers.discard(sub)
+            self._cond.notify_all()
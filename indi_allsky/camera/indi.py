@@ -3,6 +3,7 @@ import time
 import io
 import tempfile
 import ctypes
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dateutil import parser
 from pathlib import Path
@@ -21,6 +22,7 @@ from ..flask import create_app
 #from ..flask.models import IndiAllSkyDbTaskQueueTable
 
 from .. import constants
+from ..exposureEvents import IndiAllSkyExposureEvents
 
 from ..exceptions import TimeOutException
 from ..exceptions import CameraException
@@ -33,6 +35,9 @@ app = create_app()
 
 class IndiClient(PyIndi.BaseClient):
 
+    # INDI callbacks signal exposure state changes and image arrival
+    exposure_event_callbacks = True
+
     __state_to_str_p = {
         PyIndi.IPS_IDLE  : 'IDLE',
         PyIndi.IPS_OK    : 'OK',
@@ -134,6 +139,12 @@ class IndiClient(PyIndi.BaseClient):
 
         self.exposureStartTime = 0
 
+        self.exposure_events = IndiAllSkyExposureEvents()
+
+        # BLOB decoding and writing happens outside of the INDI callback thread
+        # a single worker keeps the frames in order
+        self._blob_executor = ThreadPoolExecutor(max_workers=1)
+
         self._disconnected = False
         self._ccd_removed = False
 
@@ -310,10 +321,14 @@ class IndiClient(PyIndi.BaseClient):
 
 
             self.processBlob(p_blob[0])
+
+            self.exposure_events.notify('blob')
         elif p.getType() == PyIndi.INDI_NUMBER:
             #p_number = PyIndi.PropertyNumber(p)
             #logger.info("new Number %s for %s", p_number.getName(), p_number.getDeviceName())
-            pass
+
+            if p.getName() == 'CCD_EXPOSURE':
+                self.exposure_events.notify('exposure_state')
         elif p.getType() == PyIndi.INDI_SWITCH:
             #p_switch = PyIndi.PropertySwitch(p)
             #logger.info("new Switch %s for %s", p_switch.getName(), p_switch.getDeviceName())
@@ -335,6 +350,8 @@ class IndiClient(PyIndi.BaseClient):
         #logger.info("new BLOB %s", bp.name)
         self.processBlob(bp)
 
+        self.exposure_events.notify('blob')
+
     def newSwitch(self, svp):
         # legacy INDI 1.x.x code path
         #logger.info("new Switch %s for %s", svp.name, svp.device)
@@ -343,7 +360,9 @@ class IndiClient(PyIndi.BaseClient):
     def newNumber(self, nvp):
         # legacy INDI 1.x.x code path
         #logger.info("new Number %s for %s", nvp.name, nvp.device)
-        pass
+
+        if nvp.name == 'CCD_EXPOSURE':
+            self.exposure_events.notify('exposure_state')
 
     def newText(self, tvp):
         # legacy INDI 1.x.x code path
@@ -357,34 +376,17 @@ class IndiClient(PyIndi.BaseClient):
 
 
     def processBlob(self, blob):
-        from astropy.io import fits
-
         exposure_elapsed_s = time.time() - self.exposureStartTime
 
-        #start = time.time()
-
-        ### get image data
-        imgdata = blob.getblobdata()
-        blobfile = io.BytesIO(imgdata)
-        hdulist = fits.open(blobfile)
-
-        try:
-            with tempfile.NamedTemporaryFile(mode='w+b', delete=False, suffix='.fit') as f_tmpfile:
-                hdulist.writeto(f_tmpfile)
-                f_tmpfile_p = Path(f_tmpfile.name)
-        except OSError as e:
-            logger.error('OSError: %s', str(e))
-            return
+        exp_date = datetime.now()
 
+        # the blob buffer is owned by the INDI client, copy it before returning
+        imgdata = bytes(blob.getblobdata())
 
-        #elapsed_s = time.time() - start
-        #logger.info('Blob downloaded in %0.4f s', elapsed_s)
-
-        exp_date = datetime.now()
 
         ### process data in worker
         jobdata = {
-            'filename'    : str(f_tmpfile_p),
+            'filename'    : None,  # set after the file is written
             'exposure'    : self.exposure,
             'gain'        : self.gain,
             'binning'     : self.binning,
@@ -398,6 +400,39 @@ class IndiClient(PyIndi.BaseClient):
         self.sqm_exposure = False  # reset
 
 
+        # return to the INDI client as quickly as possible, the next exposure can start while the data is written
+        self._blob_executor.submit(self._writeBlob, imgdata, jobdata)
+
+
+    def _writeBlob(self, imgdata, jobdata):
+        from astropy.io import fits
+
+        #start = time.time()
+
+        ### get image data
+        blobfile = io.BytesIO(imgdata)
+
+        try:
+            hdulist = fits.open(blobfile)
+
+            with tempfile.NamedTemporaryFile(mode='w+b', delete=False, suffix='.fit') as f_tmpfile:
+                hdulist.writeto(f_tmpfile)
+                f_tmpfile_p = Path(f_tmpfile.name)
+        except OSError as e:
+            logger.error('OSError: %s', str(e))
+            return
+        except Exception as e:
+            # exceptions are not raised from the executor
+            logger.exception('Unable to write blob: %s', str(e))
+            return
+
+
+        #elapsed_s = time.time() - start
+        #logger.info('Blob written in %0.4f s', elapsed_s)
+
+        jobdata['filename'] = str(f_tmpfile_p)
+
+
         ### Not using DB task queue to reduce DB I/O
         #with app.app_context():
         #    task = IndiAllSkyDbTaskQueueTable(
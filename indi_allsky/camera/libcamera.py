@@ -10,8 +10,6 @@ import psutil
 from pathlib import Path
 import logging
 
-import numpy as np
-
 try:
     import cv2
 except ImportError:
@@ -35,6 +33,9 @@ class IndiClientLibCameraGeneric(IndiClient):
 
     libcamera_exec = 'rpicam-still'
 
+    # exposure state is polled
+    exposure_event_callbacks = False
+
     _sensor_temp_metadata_key = 'SensorTemperature'
     _analogue_gain_metadata_key = 'AnalogueGain'
     _digital_gain_metadata_key = 'DigitalGain'
@@ -217,7 +218,7 @@ class IndiClientLibCameraGeneric(IndiClient):
             else:
                 # JPG/PNG: grab frame from daemon, encode locally
                 try:
-                    result = self._picam2_client.capture_still(
+                    frame, result = self._picam2_client.capture_still_array(
                         exposure=exposure,
                         gain=float(self.gain_av[constants.GAIN_CURRENT]),
                         timeout=capture_timeout,
@@ -227,22 +228,14 @@ class IndiClientLibCameraGeneric(IndiClient):
                     self.active_exposure = False
                     return
 
-                if not result.get('ok'):
+                if frame is None:
                     logger.error('Capture failed: %s', result.get('error'))
                     self.active_exposure = False
                     return
 
-                # Load numpy frame and encode to image file
-                frame_path = result.get('frame_path', '')
+                # Frame is read from daemon shared memory, encode to image file
                 self._last_daemon_metadata = result.get('metadata', {})
 
-                try:
-                    frame = np.load(frame_path)
-                except Exception as e:
-                    logger.error('Failed to load frame from %s: %s', frame_path, str(e))
-                    self.active_exposure = False
-                    return
-
                 # Save as JPG or PNG
                 image_tmp_f = tempfile.NamedTemporaryFile(
                     mode='w', suffix='.{0:s}'.format(image_type), delete=False,
@@ -279,19 +272,16 @@ class IndiClientLibCameraGeneric(IndiClient):
         """Background capture for async (non-sync) mode."""
         try:
             capture_timeout = max(exposure * 3, 30)
-            result = self._picam2_client.capture_still(
+            frame, result = self._picam2_client.capture_still_array(
                 exposure=exposure, gain=gain, timeout=capture_timeout,
             )
-            if not result.get('ok'):
+            if frame is None:
                 logger.error('Async capture failed: %s', result.get('error'))
                 self.active_exposure = False
                 return
 
-            frame_path = result.get('frame_path', '')
             self._last_daemon_metadata = result.get('metadata', {})
 
-            frame = np.load(frame_path)
-
             image_tmp_f = tempfile.NamedTemporaryFile(
                 mode='w', suffix='.{0:s}'.format(image_type), delete=False,
             )
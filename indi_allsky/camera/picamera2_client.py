@@ -2,21 +2,122 @@
 
 Zero dependencies on indi_allsky — safe to import from any context
 (daemon, capture worker, Flask, standalone test scripts).
+
+Shared memory layout (name = "indi_allsky_frame"), owned by the daemon:
+  [0:64]      global header (SHM_GLOBAL_FMT)
+                magic, state (0 live / 1 stale), slot_count, slot_size,
+                latest_seq, latest_slot, reserved, generation
+  [64:576]    raw frame path (UTF-8, null-terminated)
+  [576:...]   slot_count slots of SHM_SLOT_HEADER + slot_size bytes
+                slot header (SHM_SLOT_FMT): seqlock, frame_seq,
+                width, height, channels, jpeg_len
+
+Each slot is protected by a seqlock: the writer makes the counter odd,
+copies the frame, then makes it even again.  A reader that sees the same
+even counter before and after reading got a consistent frame.  The writer
+always fills the slot after the latest one, so a published frame stays
+intact until the writer laps the ring.
+
+When the stream resolution changes and frames no longer fit, the daemon
+marks the segment stale and re-creates it; clients re-attach on their
+next read.
+
+Raw frame channel (name = "indi_allsky_raw"):
+  [0:64]      global header (RAW_GLOBAL_FMT)
+                magic, state, slot_count, slot_size
+  [64:...]    slot_count slots of RAW_SLOT_HEADER + slot_size bytes
+                slot header (RAW_SLOT_FMT): seqlock, frame_seq,
+                dtype (numpy str), ndim, shape[4], strides[4]
+
+Full resolution stills are handed over here instead of through .npy
+files.  The daemon only writes a raw slot when a still is requested and
+alternates slots, using the same seqlock protocol as the stream ring.
 """
 
 from __future__ import annotations
 
 import json
+import select
 import socket
 import struct
+import time
 from multiprocessing import shared_memory
 from typing import Any, Optional
 
 SOCK_PATH = "/run/indi-allsky/picamera2.sock"
 SHM_NAME = "indi_allsky_frame"
-SHM_HEADER = 24
+SHM_MAGIC = b"IAS2"
+SHM_GLOBAL_FMT = "<4sIIIQIIQ"
+SHM_GLOBAL_SIZE = 64
+SHM_PATH_OFFSET = SHM_GLOBAL_SIZE
 SHM_PATH_SIZE = 512
-# JPEG max and path offset are derived from actual shm size at runtime
+SHM_SLOTS_OFFSET = SHM_PATH_OFFSET + SHM_PATH_SIZE
+SHM_SLOT_FMT = "<QQIIII"
+SHM_SLOT_HEADER = 32
+SHM_SLOT_COUNT = 3
+SHM_STATE_LIVE = 0
+SHM_STATE_STALE = 1
+SHM_READ_RETRIES = 5
+
+RAW_SHM_NAME = "indi_allsky_raw"
+RAW_MAGIC = b"IAR1"
+RAW_GLOBAL_FMT = "<4sIIQ"
+RAW_GLOBAL_SIZE = 64
+RAW_SLOT_FMT = "<QQ16sI4Q4q"
+RAW_SLOT_HEADER = 128
+RAW_SLOT_COUNT = 2
+RAW_MAX_DIMS = 4
+
+
+def raw_total_size(slot_count: int, slot_size: int) -> int:
+    return RAW_GLOBAL_SIZE + slot_count * (RAW_SLOT_HEADER + slot_size)
+
+
+def raw_slot_offset(slot: int, slot_size: int) -> int:
+    return RAW_GLOBAL_SIZE + slot * (RAW_SLOT_HEADER + slot_size)
+
+
+def shm_total_size(slot_count: int, slot_size: int) -> int:
+    return SHM_SLOTS_OFFSET + slot_count * (SHM_SLOT_HEADER + slot_size)
+
+
+def shm_slot_offset(slot: int, slot_size: int) -> int:
+    return SHM_SLOTS_OFFSET + slot * (SHM_SLOT_HEADER + slot_size)
+
+
+class StreamFrameView:
+    """Zero-copy view of one ring slot.
+
+    ``data`` points straight into shared memory.  It stays valid until the
+    daemon laps the ring; call :meth:`valid` after consuming the data to
+    confirm it was not overwritten, and :meth:`release` (or use as a
+    context manager) before the client is closed.
+    """
+
+    def __init__(self, buf: memoryview, slot_offset: int, lock: int,
+                 data: memoryview, seq: int, width: int, height: int) -> None:
+        self._buf = buf
+        self._slot_offset = slot_offset
+        self._lock = lock
+        self.data = data
+        self.seq = seq
+        self.width = width
+        self.height = height
+
+    def valid(self) -> bool:
+        """True if the slot has not been rewritten since the view was taken."""
+        return struct.unpack_from("<Q", self._buf, self._slot_offset)[0] == self._lock
+
+    def release(self) -> None:
+        if self.data is not None:
+            self.data.release()
+            self.data = None
+
+    def __enter__(self) -> "StreamFrameView":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
 
 
 class Picamera2Client:
@@ -26,6 +127,15 @@ class Picamera2Client:
         self._sock_path = sock_path
         self._sock: Optional[socket.socket] = None
         self._shm: Optional[shared_memory.SharedMemory] = None
+        self._sub_sock: Optional[socket.socket] = None
+        self._sub_buf = b""
+        self._sub_supported = True
+        self._sub_seq = -1
+        self._slot_count = 0
+        self._slot_size = 0
+        self._raw_shm: Optional[shared_memory.SharedMemory] = None
+        self._raw_slot_count = 0
+        self._raw_slot_size = 0
 
     def connect(self) -> None:
         if self._sock is not None:
@@ -41,12 +151,15 @@ class Picamera2Client:
             except Exception:
                 pass
             self._sock = None
-        if self._shm is not None:
+        if self._sub_sock is not None:
             try:
-                self._shm.close()
+                self._sub_sock.close()
             except Exception:
                 pass
-            self._shm = None
+            self._sub_sock = None
+            self._sub_buf = b""
+        self._close_shm()
+        self._close_raw_shm()
 
     def _send(self, cmd: dict) -> dict:
         self.connect()
@@ -88,6 +201,34 @@ class Picamera2Client:
             cmd["gain"] = gain
         return self._send(cmd)
 
+    def capture_still_array(self, exposure: float = None, gain: float = None,
+                            timeout: float = 120) -> tuple[Any, dict]:
+        """Capture a still and return (numpy_array, result).
+
+        The frame is copied out of the raw shared-memory channel; daemons
+        without it fall back to loading ``frame_path``.  The array is None
+        if the capture failed (see ``result["error"]``).
+        """
+        import numpy as np
+
+        result = self.capture_still(exposure=exposure, gain=gain, timeout=timeout)
+        if not result.get("ok"):
+            return None, result
+
+        raw = result.get("raw")
+        if raw:
+            frame = self.get_raw_frame(raw["slot"], raw["seq"])
+            if frame is not None:
+                return frame, result
+            result = dict(result, ok=False, error="Raw frame overwritten before it was read")
+            return None, result
+
+        frame_path = result.get("frame_path")
+        if frame_path:
+            return np.load(frame_path), result
+
+        return None, dict(result, ok=False, error="No frame returned")
+
     def capture_dng(self, path: str, timeout: float = 120) -> dict:
         return self._send({"cmd": "capture_dng", "path": path, "timeout": timeout})
 
@@ -108,51 +249,278 @@ class Picamera2Client:
             cmd["osd"] = osd
         return self._send(cmd)
 
+    # ------------------------------------------------------------------
+    # New-frame notifications
+    # ------------------------------------------------------------------
+
+    def _subscribe(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self._sock_path)
+        sock.settimeout(5.0)
+        sock.sendall(json.dumps({"cmd": "subscribe_frames"}).encode() + b"\n")
+
+        buf = b""
+        while b"\n" not in buf:
+            data = sock.recv(4096)
+            if not data:
+                sock.close()
+                raise ConnectionError("Daemon closed connection")
+            buf += data
+        line, self._sub_buf = buf.split(b"\n", 1)
+
+        resp = json.loads(line)
+        if not resp.get("ok"):
+            # daemon predates frame notifications
+            sock.close()
+            self._sub_supported = False
+            return
+
+        sock.setblocking(False)
+        self._sub_sock = sock
+        self._sub_seq = int(resp.get("seq", -1))
+
+    def wait_frame(self, last_seq: int = -1, timeout: float = 1.0) -> Optional[int]:
+        """Block until the daemon publishes a frame newer than ``last_seq``.
+
+        Returns the newest sequence number, or None on timeout.  Falls back
+        to polling the shared memory header for daemons without
+        notification support.
+        """
+        deadline = time.monotonic() + timeout
+
+        if self._sub_sock is None and self._sub_supported:
+            self._subscribe()
+
+        if not self._sub_supported:
+            while True:
+                seq = self.get_stream_seq()
+                if seq is not None and seq != last_seq:
+                    return seq
+                if time.monotonic() >= deadline:
+                    return None
+                time.sleep(0.02)
+
+        while self._sub_seq == last_seq or self._sub_seq < 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+
+            readable, _, _ = select.select([self._sub_sock], [], [], remaining)
+            if not readable:
+                return None
+
+            data = self._sub_sock.recv(4096)
+            if not data:
+                self._sub_sock.close()
+                self._sub_sock = None
+                raise ConnectionError("Daemon closed connection")
+            self._sub_buf += data
+
+            # only the newest notification matters
+            *lines, self._sub_buf = self._sub_buf.split(b"\n")
+            for line in lines:
+                if line:
+                    self._sub_seq = int(json.loads(line).get("seq", self._sub_seq))
+
+        return self._sub_seq
+
     # ------------------------------------------------------------------
     # Shared memory frame reader
     # ------------------------------------------------------------------
 
-    def _open_shm(self) -> None:
-        if self._shm is None:
+    def _open_shm(self) -> bool:
+        """Attach to the daemon's frame ring.  Returns False if unavailable."""
+        if self._shm is not None:
+            magic, state = struct.unpack_from("<4sI", self._shm.buf, 0)
+            if magic == SHM_MAGIC and state == SHM_STATE_LIVE:
+                return True
+            # daemon re-created the ring (resolution change)
+            self._close_shm()
+
+        try:
             self._shm = shared_memory.SharedMemory(name=SHM_NAME)
-            # Prevent Python's resource tracker from unlinking shm we don't own.
-            # The daemon creates and owns the shm; clients are read-only.
-            try:
-                from multiprocessing import resource_tracker
-                resource_tracker.unregister(
-                    "/" + SHM_NAME, "shared_memory",
-                )
-            except Exception:
-                pass
-            # Derive JPEG max and path offset from actual shm size
-            self._shm_jpeg_max = self._shm.size - SHM_HEADER - SHM_PATH_SIZE
-            self._shm_path_offset = SHM_HEADER + self._shm_jpeg_max
+        except FileNotFoundError:
+            return False
+
+        # Prevent Python's resource tracker from unlinking shm we don't own.
+        # The daemon creates and owns the shm; clients are read-only.
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(
+                "/" + SHM_NAME, "shared_memory",
+            )
+        except Exception:
+            pass
+
+        magic, state, slot_count, slot_size = struct.unpack_from("<4sIII", self._shm.buf, 0)
+        if magic != SHM_MAGIC or state != SHM_STATE_LIVE \
+                or self._shm.size < shm_total_size(slot_count, slot_size):
+            # incompatible daemon or ring being re-created
+            self._close_shm()
+            return False
+
+        self._slot_count = slot_count
+        self._slot_size = slot_size
+        return True
+
+    def _close_shm(self) -> None:
+        if self._shm is None:
+            return
+        try:
+            self._shm.close()
+        except BufferError:
+            # a StreamFrameView is still exported, let GC unmap it
+            pass
+        except Exception:
+            pass
+        self._shm = None
+
+    def get_stream_view(self) -> Optional[StreamFrameView]:
+        """Zero-copy view of the latest consistent JPEG frame, or None."""
+        if not self._open_shm():
+            return None
+
+        buf = self._shm.buf
+        for _ in range(SHM_READ_RETRIES):
+            latest_seq, latest_slot = struct.unpack_from("<QI", buf, 16)
+            if latest_slot >= self._slot_count:
+                return None
+
+            offset = shm_slot_offset(latest_slot, self._slot_size)
+            lock, seq, w, h, ch, jpeg_len = struct.unpack_from(SHM_SLOT_FMT, buf, offset)
+            if lock & 1:
+                continue  # writer active in this slot
+            if jpeg_len <= 0 or jpeg_len > self._slot_size:
+                return None
+
+            data_offset = offset + SHM_SLOT_HEADER
+            data = buf[data_offset:data_offset + jpeg_len]
+
+            view = StreamFrameView(buf, offset, lock, data, seq, w, h)
+            if view.valid():
+                return view
+            view.release()
+
+        return None
 
     def get_stream_jpeg(self) -> Optional[tuple[bytes, int]]:
         """Read the latest JPEG frame from shared memory.
 
-        Returns (jpeg_bytes, sequence_counter) or None.
+        Returns (jpeg_bytes, sequence_counter) or None.  The copy is
+        verified against the slot seqlock, so it is never torn.
         """
+        for _ in range(SHM_READ_RETRIES):
+            view = self.get_stream_view()
+            if view is None:
+                return None
+            with view:
+                jpeg = bytes(view.data)
+                if view.valid():
+                    return jpeg, view.seq
+        return None
+
+    def get_stream_seq(self) -> Optional[int]:
+        """Read only the sequence counter of the latest frame."""
+        if not self._open_shm():
+            return None
+
+        return struct.unpack_from("<Q", self._shm.buf, 16)[0]
+
+    # ------------------------------------------------------------------
+    # Raw frame reader
+    # ------------------------------------------------------------------
+
+    def _open_raw_shm(self) -> bool:
+        if self._raw_shm is not None:
+            magic, state = struct.unpack_from("<4sI", self._raw_shm.buf, 0)
+            if magic == RAW_MAGIC and state == SHM_STATE_LIVE:
+                return True
+            self._close_raw_shm()
+
         try:
-            self._open_shm()
+            self._raw_shm = shared_memory.SharedMemory(name=RAW_SHM_NAME)
         except FileNotFoundError:
+            return False
+
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(
+                "/" + RAW_SHM_NAME, "shared_memory",
+            )
+        except Exception:
+            pass
+
+        magic, state, slot_count, slot_size = struct.unpack_from(RAW_GLOBAL_FMT, self._raw_shm.buf, 0)
+        if magic != RAW_MAGIC or state != SHM_STATE_LIVE \
+                or self._raw_shm.size < raw_total_size(slot_count, slot_size):
+            self._close_raw_shm()
+            return False
+
+        self._raw_slot_count = slot_count
+        self._raw_slot_size = slot_size
+        return True
+
+    def _close_raw_shm(self) -> None:
+        if self._raw_shm is None:
+            return
+        try:
+            self._raw_shm.close()
+        except BufferError:
+            # an array view is still exported, let GC unmap it
+            pass
+        except Exception:
+            pass
+        self._raw_shm = None
+
+    def get_raw_frame(self, slot: int, seq: int, copy: bool = True) -> Any:
+        """Read the raw still published in ``slot`` for frame ``seq``.
+
+        With ``copy=False`` returns (array_view, valid) where ``valid()``
+        confirms the slot was not rewritten while the view was used.
+        Returns None if the slot no longer holds that frame.
+        """
+        import numpy as np
+
+        if not self._open_raw_shm() or slot >= self._raw_slot_count:
             return None
 
-        buf = self._shm.buf
-        seq, w, h, ch, jpeg_len = struct.unpack_from("<QIIiI", buf, 0)
-        if jpeg_len <= 0 or jpeg_len > self._shm_jpeg_max:
+        buf = self._raw_shm.buf
+        offset = raw_slot_offset(slot, self._raw_slot_size)
+
+        lock, frame_seq, dtype_str, ndim, *dims = struct.unpack_from(RAW_SLOT_FMT, buf, offset)
+        if lock & 1 or frame_seq != seq or not 0 < ndim <= RAW_MAX_DIMS:
             return None
-        jpeg = bytes(buf[SHM_HEADER:SHM_HEADER + jpeg_len])
-        return jpeg, seq
+
+        shape = tuple(dims[:ndim])
+        strides = tuple(dims[RAW_MAX_DIMS:RAW_MAX_DIMS + ndim])
+        dtype = np.dtype(dtype_str.rstrip(b"\x00").decode())
+
+        view = np.ndarray(
+            shape,
+            dtype=dtype,
+            buffer=buf,
+            offset=offset + RAW_SLOT_HEADER,
+            strides=strides,
+        )
+
+        def valid() -> bool:
+            return struct.unpack_from("<Q", buf, offset)[0] == lock
+
+        if not copy:
+            return view, valid
+
+        frame = view.copy()
+        del view
+        if not valid():
+            return None
+        return frame
 
     def get_frame_path(self) -> Optional[str]:
         """Read the latest full-res frame path from shared memory."""
-        try:
-            self._open_shm()
-        except FileNotFoundError:
+        if not self._open_shm():
             return None
 
         buf = self._shm.buf
-        raw = bytes(buf[self._shm_path_offset:self._shm_path_offset + SHM_PATH_SIZE])
+        raw = bytes(buf[SHM_PATH_OFFSET:SHM_PATH_OFFSET + SHM_PATH_SIZE])
         path = raw.split(b"\x00", 1)[0].decode("utf-8", errors="replace")
         return path if path else None
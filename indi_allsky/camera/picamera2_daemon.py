@@ -9,14 +9,15 @@ Wire protocol (Unix stream socket, JSON-line):
   Client sends: {"cmd": "...", ...}\n
   Daemon replies: {"ok": true, ...}\n   or  {"ok": false, "error": "..."}\n
 
-Shared memory layout (name = "indi_allsky_frame"):
-  [0:8]       uint64  sequence counter
-  [8:12]      uint32  width
-  [12:16]     uint32  height
-  [16:20]     uint32  channels
-  [20:24]     uint32  jpeg_len
-  [24:24+ML]  JPEG bytes for streaming (max 2MB)
-  After JPEG region: raw frame path (UTF-8, null-terminated, 512 bytes)
+Frame notifications:
+  A client that sends {"cmd": "subscribe_frames"}\n gets {"ok": true, "seq": N}\n
+  and then one {"seq": N}\n line every time a new frame is published, so
+  readers can block on the socket instead of polling shared memory.
+
+Shared memory (name = "indi_allsky_frame"):
+  An N-slot ring of stream JPEGs with a per-slot seqlock, see
+  picamera2_client.py for the layout.  The ring is re-created when a
+  stream resolution change or an oversize frame needs bigger slots.
 """
 
 from __future__ import annotations
@@ -36,12 +37,31 @@ from typing import Any, Optional
 
 import numpy as np
 
+try:
+    from . import picamera2_client as shm_layout
+except ImportError:
+    # Standalone mode — import from same directory
+    import importlib.util
+    _spec = importlib.util.spec_from_file_location(
+        "picamera2_client",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "picamera2_client.py"),
+    )
+    shm_layout = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(shm_layout)
+
 logger = logging.getLogger(__name__)
 
 SOCK_PATH = "/run/indi-allsky/picamera2.sock"
-SHM_NAME = "indi_allsky_frame"
-SHM_HEADER = 24          # seq(8) + w(4) + h(4) + ch(4) + jpeg_len(4)
-SHM_PATH_SIZE = 512
+SHM_NAME = shm_layout.SHM_NAME
+SHM_PATH_OFFSET = shm_layout.SHM_PATH_OFFSET
+SHM_PATH_SIZE = shm_layout.SHM_PATH_SIZE
+SHM_SLOT_HEADER = shm_layout.SHM_SLOT_HEADER
+SHM_SLOT_COUNT = shm_layout.SHM_SLOT_COUNT
+RAW_SHM_NAME = shm_layout.RAW_SHM_NAME
+RAW_SLOT_HEADER = shm_layout.RAW_SLOT_HEADER
+RAW_SLOT_COUNT = shm_layout.RAW_SLOT_COUNT
+RAW_MAX_DIMS = shm_layout.RAW_MAX_DIMS
+FALLBACK_FRAME_PATH = "/tmp/indi_allsky_frame.npy"
 
 
 def _calc_shm_jpeg_max(width: int, height: int) -> int:
@@ -53,12 +73,6 @@ def _calc_shm_jpeg_max(width: int, height: int) -> int:
     return max(4 * 1024 * 1024, width * height)
 
 
-# Module-level defaults (overridden per-instance in _init_shm)
-SHM_JPEG_MAX = 4 * 1024 * 1024
-SHM_PATH_OFFSET = SHM_HEADER + SHM_JPEG_MAX
-SHM_TOTAL = SHM_PATH_OFFSET + SHM_PATH_SIZE
-
-
 class Picamera2Daemon:
     """Camera daemon that owns the Picamera2 instance.
 
@@ -124,14 +138,31 @@ class Picamera2Daemon:
         self._pending_controls: dict[str, Any] = {}
         self._is_subprocess_backend = False
 
-        # Shared memory for frame distribution
+        # Shared memory frame ring for distribution
         self._shm: Optional[shared_memory.SharedMemory] = None
-
-        # Latest full-res frame path (written to temp file for capture worker)
+        self._shm_lock = threading.Lock()
+        self._slot_count = SHM_SLOT_COUNT
+        self._slot_size = 0
+        self._latest_slot = -1
+        self._shm_generation = 0
+
+        # Latest full-res frame, handed to capture_still via raw shared memory
+        self._latest_array: Optional[np.ndarray] = None
+        self._latest_array_seq = 0
         self._latest_frame_path: str = ""
         self._frame_lock = threading.Lock()
         self._frame_event = threading.Event()
 
+        # Raw still channel
+        self._raw_shm: Optional[shared_memory.SharedMemory] = None
+        self._raw_lock = threading.Lock()
+        self._raw_slot_size = 0
+        self._raw_latest_slot = -1
+
+        # Sockets subscribed to new-frame notifications
+        self._frame_subscribers: list[socket.socket] = []
+        self._subscribers_lock = threading.Lock()
+
         # For DNG capture requests
         self._dng_request: Optional[dict] = None
         self._dng_result: Optional[dict] = None
@@ -199,24 +230,54 @@ class Picamera2Daemon:
     # Shared memory
     # ------------------------------------------------------------------
 
-    def _init_shm(self) -> None:
-        global SHM_JPEG_MAX, SHM_PATH_OFFSET, SHM_TOTAL
+    def _init_shm(self, min_slot_size: int = 0) -> None:
+        """Create (or re-create) the frame ring.
 
-        # Size the JPEG buffer based on stream resolution
-        SHM_JPEG_MAX = _calc_shm_jpeg_max(self._stream_width, self._stream_height)
-        SHM_PATH_OFFSET = SHM_HEADER + SHM_JPEG_MAX
-        SHM_TOTAL = SHM_PATH_OFFSET + SHM_PATH_SIZE
+        Slots are sized for the stream resolution; ``min_slot_size`` grows
+        them when a frame did not fit.  Clients attached to a previous ring
+        see it marked stale and re-attach.
+        """
+        slot_size = max(
+            _calc_shm_jpeg_max(self._stream_width, self._stream_height),
+            int(min_slot_size * 1.25),
+        )
+
+        if self._shm is not None:
+            # tell attached clients to re-open
+            struct.pack_into("<I", self._shm.buf, 4, shm_layout.SHM_STATE_STALE)
+            try:
+                self._shm.close()
+                self._shm.unlink()
+            except Exception:
+                pass
+            self._shm = None
 
         try:
             old = shared_memory.SharedMemory(name=SHM_NAME)
+            struct.pack_into("<I", old.buf, 4, shm_layout.SHM_STATE_STALE)
             old.close()
             old.unlink()
         except FileNotFoundError:
             pass
+        except Exception:
+            logger.exception("Failed to remove old shared memory")
 
+        shm_total = shm_layout.shm_total_size(self._slot_count, slot_size)
         self._shm = shared_memory.SharedMemory(
-            name=SHM_NAME, create=True, size=SHM_TOTAL,
+            name=SHM_NAME, create=True, size=shm_total,
+        )
+        self._slot_size = slot_size
+        self._latest_slot = -1
+        self._shm_generation += 1
+
+        # Header last so clients only see a complete ring
+        struct.pack_into(
+            shm_layout.SHM_GLOBAL_FMT, self._shm.buf, 0,
+            shm_layout.SHM_MAGIC, shm_layout.SHM_STATE_LIVE,
+            self._slot_count, slot_size,
+            0, 0, 0, self._shm_generation,
         )
+
         # Make shm world-readable so gunicorn/Flask workers can read frames
         shm_path = f"/dev/shm/{SHM_NAME}"
         try:
@@ -224,34 +285,156 @@ class Picamera2Daemon:
         except OSError:
             pass
         logger.info(
-            "Shared memory created: %s (%d bytes, JPEG max %d for %dx%d stream)",
-            SHM_NAME, SHM_TOTAL, SHM_JPEG_MAX,
+            "Shared memory created: %s (%d bytes, %d slots of %d bytes for %dx%d stream)",
+            SHM_NAME, shm_total, self._slot_count, slot_size,
             self._stream_width, self._stream_height,
         )
 
-    def _publish_frame(self, jpeg_bytes: bytes, frame_path: str) -> None:
-        """Write a JPEG frame + metadata into shared memory."""
-        if self._shm is None:
+    def _init_raw_shm(self, nbytes: int) -> None:
+        """Create (or grow) the raw still channel for frames of ``nbytes``."""
+        self._close_raw_shm()
+
+        try:
+            old = shared_memory.SharedMemory(name=RAW_SHM_NAME)
+            struct.pack_into("<I", old.buf, 4, shm_layout.SHM_STATE_STALE)
+            old.close()
+            old.unlink()
+        except FileNotFoundError:
+            pass
+        except Exception:
+            logger.exception("Failed to remove old raw shared memory")
+
+        # page align the slots
+        slot_size = (nbytes + 4095) & ~4095
+        total = shm_layout.raw_total_size(RAW_SLOT_COUNT, slot_size)
+        self._raw_shm = shared_memory.SharedMemory(
+            name=RAW_SHM_NAME, create=True, size=total,
+        )
+        self._raw_slot_size = slot_size
+        self._raw_latest_slot = -1
+
+        struct.pack_into(
+            shm_layout.RAW_GLOBAL_FMT, self._raw_shm.buf, 0,
+            shm_layout.RAW_MAGIC, shm_layout.SHM_STATE_LIVE,
+            RAW_SLOT_COUNT, slot_size,
+        )
+
+        try:
+            os.chmod(f"/dev/shm/{RAW_SHM_NAME}", 0o666)
+        except OSError:
+            pass
+        logger.info(
+            "Raw shared memory created: %s (%d bytes, %d slots of %d bytes)",
+            RAW_SHM_NAME, total, RAW_SLOT_COUNT, slot_size,
+        )
+
+    def _close_raw_shm(self) -> None:
+        if self._raw_shm is None:
             return
-        buf = self._shm.buf
-        if len(jpeg_bytes) > SHM_JPEG_MAX:
-            logger.warning(
-                "JPEG frame (%d bytes) exceeds SHM buffer (%d bytes), truncating. "
-                "Increase stream resolution buffer or reduce stream quality.",
-                len(jpeg_bytes), SHM_JPEG_MAX,
+        try:
+            struct.pack_into("<I", self._raw_shm.buf, 4, shm_layout.SHM_STATE_STALE)
+            self._raw_shm.close()
+            self._raw_shm.unlink()
+        except Exception:
+            pass
+        self._raw_shm = None
+
+    def _publish_raw(self, array: np.ndarray, seq: int) -> int:
+        """Copy a full-res frame into the next raw slot.  Returns the slot."""
+        if array.ndim > RAW_MAX_DIMS:
+            raise ValueError(f"Cannot publish {array.ndim}-dimensional frame")
+
+        with self._raw_lock:
+            if self._raw_shm is None or array.nbytes > self._raw_slot_size:
+                self._init_raw_shm(array.nbytes)
+
+            buf = self._raw_shm.buf
+            slot = (self._raw_latest_slot + 1) % RAW_SLOT_COUNT
+            offset = shm_layout.raw_slot_offset(slot, self._raw_slot_size)
+
+            # C-contiguous destination, the copy doubles as the layout normalization
+            dest = np.ndarray(
+                array.shape, dtype=array.dtype,
+                buffer=buf, offset=offset + RAW_SLOT_HEADER,
+            )
+            pad = RAW_MAX_DIMS - array.ndim
+            shape = list(array.shape) + [0] * pad
+            strides = list(dest.strides) + [0] * pad
+
+            lock = struct.unpack_from("<Q", buf, offset)[0]
+            lock += lock & 1
+
+            struct.pack_into("<Q", buf, offset, lock + 1)
+            struct.pack_into(
+                shm_layout.RAW_SLOT_FMT, buf, offset,
+                lock + 1, seq, array.dtype.str.encode(), array.ndim,
+                *shape, *strides,
             )
-        jpeg_len = min(len(jpeg_bytes), SHM_JPEG_MAX)
-        w = self._sensor_info.get("width", 0)
-        h = self._sensor_info.get("height", 0)
-
-        # Header
-        struct.pack_into("<QIIiI", buf, 0,
-                         self._frame_count, w, h, 3, jpeg_len)
-        # JPEG data
-        buf[SHM_HEADER:SHM_HEADER + jpeg_len] = jpeg_bytes[:jpeg_len]
-        # Frame path
-        path_bytes = frame_path.encode("utf-8")[:SHM_PATH_SIZE - 1] + b"\x00"
-        buf[SHM_PATH_OFFSET:SHM_PATH_OFFSET + len(path_bytes)] = path_bytes
+            np.copyto(dest, array)
+            del dest
+            struct.pack_into("<Q", buf, offset, lock + 2)
+
+            self._raw_latest_slot = slot
+            return slot
+
+    def _publish_frame(self, jpeg_bytes: bytes, frame_path: str) -> None:
+        """Write a JPEG frame into the next ring slot under its seqlock."""
+        with self._shm_lock:
+            if self._shm is None:
+                return
+
+            if len(jpeg_bytes) > self._slot_size:
+                logger.warning(
+                    "JPEG frame (%d bytes) exceeds ring slot (%d bytes), resizing shared memory",
+                    len(jpeg_bytes), self._slot_size,
+                )
+                self._init_shm(min_slot_size=len(jpeg_bytes))
+
+            buf = self._shm.buf
+            jpeg_len = len(jpeg_bytes)
+            w = self._sensor_info.get("width", 0)
+            h = self._sensor_info.get("height", 0)
+
+            slot = (self._latest_slot + 1) % self._slot_count
+            offset = shm_layout.shm_slot_offset(slot, self._slot_size)
+            data_offset = offset + SHM_SLOT_HEADER
+
+            lock = struct.unpack_from("<Q", buf, offset)[0]
+            lock += lock & 1  # recover from an interrupted write
+
+            # odd: write in progress
+            struct.pack_into("<Q", buf, offset, lock + 1)
+            struct.pack_into("<QIIII", buf, offset + 8,
+                             self._frame_count, w, h, 3, jpeg_len)
+            buf[data_offset:data_offset + jpeg_len] = jpeg_bytes
+            # even: slot consistent
+            struct.pack_into("<Q", buf, offset, lock + 2)
+
+            # Frame path
+            path_bytes = frame_path.encode("utf-8")[:SHM_PATH_SIZE - 1] + b"\x00"
+            buf[SHM_PATH_OFFSET:SHM_PATH_OFFSET + len(path_bytes)] = path_bytes
+
+            # Publish the slot
+            struct.pack_into("<QI", buf, 16, self._frame_count, slot)
+            self._latest_slot = slot
+
+        self._notify_subscribers(self._frame_count)
+
+    def _notify_subscribers(self, seq: int) -> None:
+        """Tell subscribed clients a new frame is in shared memory.
+
+        Never blocks the grab loop: a subscriber whose socket buffer is full
+        already has unread notifications queued, so skipping one is harmless.
+        """
+        msg = json.dumps({"seq": seq}).encode() + b"\n"
+        with self._subscribers_lock:
+            for conn in list(self._frame_subscribers):
+                try:
+                    conn.send(msg, socket.MSG_DONTWAIT)
+                except BlockingIOError:
+                    pass
+                except OSError:
+                    self._frame_subscribers.remove(conn)
 
     # ------------------------------------------------------------------
     # Grab loop
@@ -305,13 +488,13 @@ class Picamera2Daemon:
                 self._metadata = metadata
                 self._frame_count += 1
 
-                # Save full-res frame to temp file for capture worker
-                frame_path = "/tmp/indi_allsky_frame.npy"
-                np.save(frame_path, array)
-
+                # Keep a reference for capture_still, it is only copied
+                # into raw shared memory when a still is requested
                 with self._frame_lock:
-                    self._latest_frame_path = frame_path
+                    self._latest_array = array
+                    self._latest_array_seq = self._frame_count
                     self._frame_event.set()
+                frame_path = self._latest_frame_path
 
                 # Encode stream JPEG with overlay
                 if cv2 is not None:
@@ -461,6 +644,12 @@ class Picamera2Daemon:
                     line, buf = buf.split(b"\n", 1)
                     try:
                         cmd = json.loads(line)
+                        if cmd.get("cmd") == "subscribe_frames":
+                            # reply before registering so the ack is the first line
+                            conn.sendall(json.dumps({"ok": True, "seq": self._frame_count}).encode() + b"\n")
+                            with self._subscribers_lock:
+                                self._frame_subscribers.append(conn)
+                            continue
                         resp = self._dispatch(cmd)
                     except Exception as e:
                         resp = {"ok": False, "error": str(e)}
@@ -468,6 +657,9 @@ class Picamera2Daemon:
         except Exception:
             pass
         finally:
+            with self._subscribers_lock:
+                if conn in self._frame_subscribers:
+                    self._frame_subscribers.remove(conn)
             conn.close()
 
     def _dispatch(self, cmd: dict) -> dict:
@@ -546,19 +738,37 @@ class Picamera2Daemon:
 
             self._frame_event.clear()
             if not self._frame_event.wait(timeout=cmd.get("timeout", 120)):
+                if self._latest_array is None:
+                    return {"ok": False, "error": "Capture timeout, the camera has not delivered a frame since it started"}
                 return {"ok": False, "error": "Capture timeout"}
 
             with self._frame_lock:
-                path = self._latest_frame_path
+                array = self._latest_array
+                array_seq = self._latest_array_seq
+
+            if array is None:
+                # neither the raw channel nor the fallback file can be written without a frame
+                return {"ok": False, "error": "No frame available yet"}
 
             meta = dict(self._metadata)
-            return {
+            result = {
                 "ok": True,
-                "frame_path": path,
                 "metadata": meta,
                 "frame_count": self._frame_count,
             }
 
+            try:
+                slot = self._publish_raw(array, array_seq)
+                result["raw"] = {"slot": slot, "seq": array_seq}
+            except Exception:
+                logger.exception("Raw shared memory publish failed, falling back to %s", FALLBACK_FRAME_PATH)
+                np.save(FALLBACK_FRAME_PATH, array)
+                with self._frame_lock:
+                    self._latest_frame_path = FALLBACK_FRAME_PATH
+                result["frame_path"] = FALLBACK_FRAME_PATH
+
+            return result
+
         elif action == "capture_dng":
             self._dng_event.clear()
             self._dng_request = cmd
@@ -590,10 +800,17 @@ class Picamera2Daemon:
             return {"ok": True}
 
         elif action == "set_stream":
+            old_size = (self._stream_width, self._stream_height)
             if "width" in cmd:
                 self._stream_width = int(cmd["width"])
             if "height" in cmd:
                 self._stream_height = int(cmd["height"])
+            if (self._stream_width, self._stream_height) != old_size:
+                # Negotiate slot size for the new resolution
+                with self._shm_lock:
+                    if self._shm is not None and \
+                            _calc_shm_jpeg_max(self._stream_width, self._stream_height) != self._slot_size:
+                        self._init_shm()
             if "quality" in cmd:
                 self._stream_quality = int(cmd["quality"])
             if "osd" in cmd:
@@ -734,10 +951,13 @@ class Picamera2Daemon:
                 pass
         if self._shm is not None:
             try:
+                struct.pack_into("<I", self._shm.buf, 4, shm_layout.SHM_STATE_STALE)
                 self._shm.close()
                 self._shm.unlink()
             except Exception:
                 pass
+        with self._raw_lock:
+            self._close_raw_shm()
         if os.path.exists(SOCK_PATH):
             try:
                 os.unlink(SOCK_PATH)
@@ -749,124 +969,8 @@ class Picamera2Daemon:
 # Client class (used by CaptureWorker and Flask)
 # ------------------------------------------------------------------
 
-class Picamera2Client:
-    """Connect to the picamera2 daemon via Unix socket + shared memory."""
-
-    def __init__(self, sock_path: str = SOCK_PATH) -> None:
-        self._sock_path = sock_path
-        self._sock: Optional[socket.socket] = None
-        self._shm: Optional[shared_memory.SharedMemory] = None
-
-    def connect(self) -> None:
-        if self._sock is not None:
-            return
-        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-        self._sock.connect(self._sock_path)
-        self._sock.settimeout(120.0)
-
-    def close(self) -> None:
-        if self._sock is not None:
-            try:
-                self._sock.close()
-            except Exception:
-                pass
-            self._sock = None
-        if self._shm is not None:
-            try:
-                self._shm.close()
-            except Exception:
-                pass
-            self._shm = None
-
-    def _send(self, cmd: dict) -> dict:
-        self.connect()
-        msg = json.dumps(cmd).encode() + b"\n"
-        self._sock.sendall(msg)
-        # Read response line
-        buf = b""
-        while b"\n" not in buf:
-            data = self._sock.recv(4096)
-            if not data:
-                raise ConnectionError("Daemon closed connection")
-            buf += data
-        line = buf.split(b"\n", 1)[0]
-        return json.loads(line)
-
-    def ping(self) -> dict:
-        return self._send({"cmd": "ping"})
-
-    def get_sensor_info(self) -> dict:
-        return self._send({"cmd": "get_sensor_info"})
-
-    def get_metadata(self) -> dict:
-        return self._send({"cmd": "get_metadata"})
-
-    def set_controls(self, **kwargs) -> dict:
-        return self._send({"cmd": "set_controls", **kwargs})
-
-    def capture_still(self, exposure: float = None, gain: float = None,
-                      timeout: float = 120) -> dict:
-        cmd: dict[str, Any] = {"cmd": "capture_still", "timeout": timeout}
-        if exposure is not None:
-            cmd["exposure"] = exposure
-        if gain is not None:
-            cmd["gain"] = gain
-        return self._send(cmd)
-
-    def capture_dng(self, path: str, timeout: float = 120) -> dict:
-        return self._send({"cmd": "capture_dng", "path": path, "timeout": timeout})
-
-    def set_binning(self, level: int, width: int, height: int) -> dict:
-        return self._send({"cmd": "set_binning", "level": level,
-                           "width": width, "height": height})
-
-    def set_stream(self, width: int = None, height: int = None,
-                   quality: int = None) -> dict:
-        cmd: dict[str, Any] = {"cmd": "set_stream"}
-        if width is not None:
-            cmd["width"] = width
-        if height is not None:
-            cmd["height"] = height
-        if quality is not None:
-            cmd["quality"] = quality
-        return self._send(cmd)
-
-    # ------------------------------------------------------------------
-    # Shared memory frame reader
-    # ------------------------------------------------------------------
-
-    def _open_shm(self) -> None:
-        if self._shm is None:
-            self._shm = shared_memory.SharedMemory(name=SHM_NAME)
-
-    def get_stream_jpeg(self) -> Optional[tuple[bytes, int]]:
-        """Read the latest JPEG frame from shared memory.
-
-        Returns (jpeg_bytes, sequence_counter) or None.
-        """
-        try:
-            self._open_shm()
-        except FileNotFoundError:
-            return None
-
-        buf = self._shm.buf
-        seq, w, h, ch, jpeg_len = struct.unpack_from("<QIIiI", buf, 0)
-        if jpeg_len <= 0 or jpeg_len > SHM_JPEG_MAX:
-            return None
-        jpeg = bytes(buf[SHM_HEADER:SHM_HEADER + jpeg_len])
-        return jpeg, seq
-
-    def get_frame_path(self) -> Optional[str]:
-        """Read the latest full-res frame path from shared memory."""
-        try:
-            self._open_shm()
-        except FileNotFoundError:
-            return None
-
-        buf = self._shm.buf
-        raw = bytes(buf[SHM_PATH_OFFSET:SHM_PATH_OFFSET + SHM_PATH_SIZE])
-        path = raw.split(b"\x00", 1)[0].decode("utf-8", errors="replace")
-        return path if path else None
+# The client lives in picamera2_client.py, re-exported for compatibility
+Picamera2Client = shm_layout.Picamera2Client
 
 
 # ------------------------------------------------------------------
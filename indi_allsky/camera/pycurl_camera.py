@@ -134,6 +134,10 @@ class PycurlCameraWorker(Thread):
 
 class IndiClientPycurl(IndiClient):
 
+    # exposure state is polled
+    exposure_event_callbacks = False
+
+
     def __init__(self, *args, **kwargs):
         super(IndiClientPycurl, self).__init__(*args, **kwargs)
 
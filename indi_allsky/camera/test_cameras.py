@@ -22,6 +22,9 @@ class IndiClientTestCameraBase(IndiClient):
 
     image_bit_depth = 16
 
+    # exposure state is polled
+    exposure_event_callbacks = False
+
 
     def __init__(self, *args, **kwargs):
         super(IndiClientTestCameraBase, self).__init__(*args, **kwargs)
@@ -14,8 +14,6 @@ import signal
 import logging
 import traceback
 
-import ephem
-
 from multiprocessing import Process
 #from threading import Thread
 import queue
@@ -24,6 +22,9 @@ from . import constants
 from . import camera as camera_module
 
 from .utils import IndiAllSkyDateCalcs
+from .ephemeris import IndiAllSkyEphemeris
+from .exposureEvents import IndiAllSkyExposureScheduler
+from .configReload import IndiAllSkyConfigReload
 
 from .flask.models import TaskQueueQueue
 from .flask.models import TaskQueueState
@@ -347,7 +348,16 @@ class CaptureWorker(Process):
             self._pre_run_tasks()
 
 
+        # the loop sleeps until an exposure event or the next frame time
+        exposure_scheduler = IndiAllSkyExposureScheduler(
+            self.indiclient.exposure_events,
+            event_callbacks=self.indiclient.exposure_event_callbacks,
+        )
+
+
         next_frame_time = time.time()  # start immediately
+        log_start_delay = True
+        continuous_capture = False
         frame_start_time = time.time()
         waiting_for_frame = False
         waiting_for_sqm_frame = False
@@ -399,6 +409,9 @@ class CaptureWorker(Process):
                     self._shutdown = True
                 elif c_dict.get('settime'):
                     self.update_time_offset = int(c_dict['settime'])
+                elif c_dict.get('config'):
+                    with app.app_context():
+                        self._updateConfig(c_dict['config'])
                 else:
                     logger.error('Unknown action: %s', str(c_dict))
 
@@ -437,6 +450,7 @@ class CaptureWorker(Process):
                         self._generateNightKeogram(timespec, self.camera_id)  # keogram/st first
                         self._generateNightTimelapse(timespec, self.camera_id)
                         self._uploadAllskyEndOfNight(self.camera_id)
+                        self._validateDbEntries()  # queued after the night tasks
 
                         # prevent duplicate generation until reconfigureCcd() is called
                         self.generate_timelapse_flag = False
@@ -502,6 +516,7 @@ class CaptureWorker(Process):
                         self._generateNightKeogram(timespec, self.camera_id)  # keogram/st first
                         self._generateNightTimelapse(timespec, self.camera_id)
                         self._uploadAllskyEndOfNight(self.camera_id)
+                        self._validateDbEntries()  # queued after the night tasks
 
                         # prevent duplicate generation until reconfigureCcd() is called
                         self.generate_timelapse_flag = False
@@ -582,7 +597,12 @@ class CaptureWorker(Process):
                 loop_end = time.time() + 11
 
                 while True:
-                    time.sleep(0.05)
+                    exposure_scheduler.wait(
+                        camera_ready,
+                        next_frame_time,
+                        loop_end,
+                        frame_start_time + self.exposure_av[constants.EXPOSURE_CURRENT],
+                    )
 
                     now_time = time.time()
                     if now_time >= loop_end:
@@ -706,6 +726,12 @@ class CaptureWorker(Process):
 
                         frame_start_time = now_time
 
+                        if log_start_delay:
+                            exposure_scheduler.exposure_started(now_time, next_frame_time)
+                        elif continuous_capture:
+                            # the previous exposure is still in the client
+                            exposure_scheduler.exposure_gap(total_elapsed - self.indiclient.exposure)
+
 
                         if not self.sqm_camera_enable or self.focus_mode:
                             # Normal exposure
@@ -798,6 +824,11 @@ class CaptureWorker(Process):
                             )
 
 
+                        continuous_capture = self.config.get('CONTINUOUS_CAPTURE', False) and not self.focus_mode
+
+                        # the next frame after an sqm frame starts when the sqm frame is received, not on schedule
+                        log_start_delay = not waiting_for_sqm_frame and not continuous_capture
+
                         if self.focus_mode:
                             # Start frame immediately in focus mode
                             logger.warning('*** FOCUS MODE ENABLED ***')
@@ -805,6 +836,9 @@ class CaptureWorker(Process):
                         elif waiting_for_sqm_frame:
                             # take next exposure as quickly as possible
                             next_frame_time = frame_start_time
+                        elif continuous_capture:
+                            # next exposure starts as soon as the camera is ready
+                            next_frame_time = frame_start_time + self.add_period_delay
                         elif self.night:
                             next_frame_time = frame_start_time + self.config['EXPOSURE_PERIOD'] + self.add_period_delay
                         else:
@@ -1525,6 +1559,35 @@ class CaptureWorker(Process):
         self.upload_q.put({'task_id' : upload_task.id})
 
 
+    def _updateConfig(self, new_config):
+        logger.warning('Applying new config')
+
+        config_reload = IndiAllSkyConfigReload(self.config, new_config)
+
+        # helper objects reference the same dict
+        IndiAllSkyConfigReload.update(self.config, new_config)
+
+
+        self.focus_mode = self.config.get('FOCUS_MODE', False)
+
+        self.night_sun_radians = math.radians(self.config['NIGHT_SUN_ALT_DEG'])
+        self.night_moonmode_radians = math.radians(self.config['NIGHT_MOONMODE_ALT_DEG'])
+
+        self.image_queue_max = self.config.get('IMAGE_QUEUE_MAX', 3)
+        self.image_queue_min = self.config.get('IMAGE_QUEUE_MIN', 1)
+        self.image_queue_backoff = self.config.get('IMAGE_QUEUE_BACKOFF', 0.5)
+
+        self.exposure_timeout = self.config.get('CCD_EXPOSURE_TIMEOUT', 330)
+
+
+        if config_reload.changed(config_reload.ccd_reconfigure_keys):
+            # applied when the camera is idle
+            self.reconfigure_camera = True
+
+
+        self._miscDb.setState('STATUS', constants.STATUS_RUNNING)
+
+
     def _pre_run_tasks(self):
         # Tasks that need to be run before the main program loop
 
@@ -2002,31 +2065,23 @@ class CaptureWorker(Process):
 
 
     def detectNight(self):
-        obs = ephem.Observer()
-        obs.lon = math.radians(self.position_av[constants.POSITION_LONGITUDE])
-        obs.lat = math.radians(self.position_av[constants.POSITION_LATITUDE])
-        obs.elevation = self.position_av[constants.POSITION_ELEVATION]
+        utcnow = datetime.now(tz=timezone.utc)  # ephem expects UTC dates
 
-        # disable atmospheric refraction calcs
-        obs.pressure = 0
+        # interpolated from the shared per-minute table
+        ephemeris = IndiAllSkyEphemeris.from_position_av(self.position_av)
 
-        obs.date = datetime.now(tz=timezone.utc)  # ephem expects UTC dates
-
-        sun = ephem.Sun()
-        moon = ephem.Moon()
-
-        sun.compute(obs)
-        moon.compute(obs)
+        sun_alt_deg = ephemeris.alt_az('sun', utcnow)[0]
+        moon_alt_deg = ephemeris.alt_az('moon', utcnow)[0]
 
 
         with self.astro_av.get_lock():
-            self.astro_av[constants.ASTRO_SUN_ALT] = float(math.degrees(sun.alt))
-            self.astro_av[constants.ASTRO_MOON_ALT] = float(math.degrees(moon.alt))
-            self.astro_av[constants.ASTRO_MOON_PHASE] = float(moon.moon_phase * 100.0)
+            self.astro_av[constants.ASTRO_SUN_ALT] = float(sun_alt_deg)
+            self.astro_av[constants.ASTRO_MOON_ALT] = float(moon_alt_deg)
+            self.astro_av[constants.ASTRO_MOON_PHASE] = float(ephemeris.moon_phase(utcnow))
 
 
         # Night
-        self.night = sun.alt < self.night_sun_radians  # boolean
+        self.night = math.radians(sun_alt_deg) < self.night_sun_radians  # boolean
 
 
         logger.info(
@@ -2037,7 +2092,7 @@ class CaptureWorker(Process):
         )
 
         if self.night:
-            if moon.alt >= self.night_moonmode_radians:
+            if math.radians(moon_alt_deg) >= self.night_moonmode_radians:
                 if self.astro_av[constants.ASTRO_MOON_PHASE] >= self.config['NIGHT_MOONMODE_PHASE']:
                     #logger.info('Moon Mode conditions detected')
                     self.moonmode = True
@@ -2280,6 +2335,24 @@ class CaptureWorker(Process):
         self.video_q.put({'task_id' : task.id})
 
 
+    def _validateDbEntries(self, task_state=TaskQueueState.QUEUED):
+        # Report database entries with missing files
+        jobdata = {
+            'action' : 'validateDbEntries',
+            'kwargs' : {},
+        }
+
+        task = IndiAllSkyDbTaskQueueTable(
+            queue=TaskQueueQueue.VIDEO,
+            state=task_state,
+            data=jobdata,
+        )
+        db.session.add(task)
+        db.session.commit()
+
+        self.video_q.put({'task_id' : task.id})
+
+
     def _expireData(self, camera_id, task_state=TaskQueueState.QUEUED):
 
         camera = IndiAllSkyDbCameraTable.query\
@@ -84,6 +84,7 @@ class IndiAllSkyConfigBase(object):
         "CCD_BIT_DEPTH"        : 0,  # 0 is auto
         "EXPOSURE_PERIOD"      : 15.00000,
         "EXPOSURE_PERIOD_DAY"  : 15.00000,
+        "CONTINUOUS_CAPTURE"   : False,
         "CAMERA_SQM" : {
             "ENABLE"            : False,
             "ENABLE_DAY"        : False,
@@ -258,6 +259,7 @@ class IndiAllSkyConfigBase(object):
         },
         "IMAGE_CALIBRATE_DARK"          : True,
         "IMAGE_CALIBRATE_BPM"           : False,
+        "IMAGE_CALIBRATE_BPM_MEDIAN"    : False,
         "IMAGE_CALIBRATE_FIX_HOLES"     : False,
         "IMAGE_CALIBRATE_HOLE_THOLD"    : 30,
         "IMAGE_CALIBRATE_MANUAL_OFFSET" : 0,
@@ -283,6 +285,9 @@ class IndiAllSkyConfigBase(object):
         "IMAGE_FLIP_V"     : True,
         "IMAGE_FLIP_H"     : True,
         "IMAGE_SCALE"      : 100,
+        "IMAGE_SCALE_EARLY": False,
+        "IMAGE_SOFTWARE_BIN" : False,
+        "IMAGE_PROCESSING_BUDGET" : True,
         "IMAGE_COLORMAP"   : "",
         "NIGHT_GRAYSCALE"  : False,
         "DAYTIME_GRAYSCALE": False,
@@ -387,6 +392,7 @@ class IndiAllSkyConfigBase(object):
         "CAPTURE_HOOK_PRE"      : "",
         "CAPTURE_HOOK_TIMEOUT"  : 5,
         "IMAGE_QUEUE_BACKOFF"   : 0.5,
+        "IMAGE_WORKERS"         : 1,
         "FFMPEG_FRAMERATE"      : 25,
         "FFMPEG_FRAMERATE_DAY"  : 25,
         "FFMPEG_BITRATE"        : "5000k",
@@ -572,6 +578,7 @@ class IndiAllSkyConfigBase(object):
             #"UPLOAD_VIDEO"           : True,  # this cannot be changed
             "CONNECT_TIMEOUT"        : 10.0,
             "TIMEOUT"                : 60.0,
+            "CHUNK_SIZE"             : 8,  # MB, 0 disables chunked uploads
         },
         "YOUTUBE" : {
             "ENABLE"                 : False,
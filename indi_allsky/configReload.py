@@ -0,0 +1,129 @@
+### Classification of configuration changes for reloads
+### Most settings are read from the config dict when they are used, the running workers apply these in place.
+### Settings that are only read when the camera is initialized, or that are cached by a worker when it
+### starts, require the affected workers to be restarted.
+
+import logging
+
+from . import constants
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkyConfigReload(object):
+
+    # only read when the camera is connected and initialized (includes the camera metadata in the DB)
+    camera_keys = (
+        'CAMERA_INTERFACE',
+        'INDI_SERVER',
+        'INDI_PORT',
+        'INDI_CAMERA_NAME',
+        'CCD_CONFIG',
+        'CCD_EXPOSURE_MAX',
+        'CCD_EXPOSURE_DEF',
+        'CCD_EXPOSURE_MIN',
+        'CCD_EXPOSURE_MIN_DAY',
+        'CCD_BIT_DEPTH',
+        'CAMERA_SQM',
+        'CFA_PATTERN',
+        'GPS_ENABLE',
+        'LIBCAMERA',
+        'PYCURL_CAMERA',
+        'ACCUM_CAMERA',
+        'TEST_CAMERA',
+        'OWNER',
+        'LENS_NAME',
+        'LENS_FOCAL_LENGTH',
+        'LENS_FOCAL_RATIO',
+        'LENS_IMAGE_CIRCLE',
+        'LENS_OFFSET_X',
+        'LENS_OFFSET_Y',
+        'LENS_ALTITUDE',
+        'LENS_AZIMUTH',
+        'LOCATION_NAME',
+        'LOCATION_LATITUDE',
+        'LOCATION_LONGITUDE',
+        'LOCATION_ELEVATION',
+        'NIGHT_SUN_ALT_DEG',
+        'CAPTURE_PAUSE',
+        'DAYTIME_CAPTURE',
+        'DAYTIME_CAPTURE_SAVE',
+        'DAYTIME_TIMELAPSE',
+        'S3UPLOAD',
+        'WEB_NONLOCAL_IMAGES',
+        'WEB_LOCAL_IMAGES_ADMIN',
+        'VIRTUALSKY',
+        'CHARTS',
+        'TEMP_SENSOR',
+        'IMAGE_FOLDER',
+        'VARLIB_FOLDER',
+        'UPLOAD_WORKERS',
+    )
+
+    # cached by the image worker when it starts
+    worker_keys = (
+        'KEOGRAM_ANGLE',
+        'KEOGRAM_H_SCALE',
+        'KEOGRAM_V_SCALE',
+        'KEOGRAM_CROP_TOP',
+        'KEOGRAM_CROP_BOTTOM',
+        'REALTIME_KEOGRAM',
+        'IMAGE_BORDER',
+        'IMAGE_WORKERS',
+        'IMAGE_STACK_COUNT',
+        'IMAGE_SOFTWARE_BIN',  # frame size changes, the stacked frames must be flushed
+        'IMAGE_SCALE_EARLY',
+        'IMAGE_SCALE',
+    )
+
+    # cached by the sensor worker when it starts
+    sensor_keys = (
+        'DEW_HEATER',
+        'FAN',
+        'GENERIC_GPIO',
+        'MANUAL_GPIO',
+        'DEVICE',
+    )
+
+    # applied to the connected camera by reconfigureCcd()
+    ccd_reconfigure_keys = (
+        'INDI_CONFIG_DEFAULTS',
+        'INDI_CONFIG_DAY',
+        'CCD_COOLING',
+        'CCD_COOLING_DAY',
+        'CCD_TEMP',
+        'CCD_TEMP_DAY',
+        'NIGHT_MOONMODE_PHASE',
+        'NIGHT_MOONMODE_ALT_DEG',
+    )
+
+
+    def __init__(self, old_config, new_config):
+        key_set = set(old_config.keys()) | set(new_config.keys())
+        self.changed_keys = sorted([k for k in key_set if old_config.get(k) != new_config.get(k)])
+
+
+    @property
+    def level(self):
+        if self.changed(self.camera_keys):
+            return constants.RELOAD_CAMERA
+
+        if self.changed(self.worker_keys):
+            return constants.RELOAD_WORKER
+
+        return constants.RELOAD_LIVE
+
+
+    def changed(self, key_list):
+        return bool(set(self.changed_keys) & set(key_list))
+
+
+    @staticmethod
+    def update(config, new_config):
+        """Replace the contents of a config dict in place, helper objects keep a reference to the same dict"""
+        for k in list(config.keys()):
+            if k not in new_config:
+                del config[k]
+
+        config.update(new_config)
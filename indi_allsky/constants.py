@@ -34,6 +34,9 @@ ENDPOINT_V1 = {
     THUMBNAIL       : 'sync/v1/thumbnail',
 }
 
+# resumable chunked uploads
+ENDPOINT_V1_UPLOAD = 'sync/v1/upload'
+
 
 # File transfers
 TRANSFER_UPLOAD  = 501
@@ -57,6 +60,12 @@ STATUS_PAUSED       = 709
 STATUS_CAMERAERROR  = 710
 
 
+# Config reload
+RELOAD_LIVE   = 0  # applied by the running workers
+RELOAD_WORKER = 1  # processing workers restarted, camera stays connected
+RELOAD_CAMERA = 2  # all workers restarted, camera reinitialized
+
+
 # CFA Types
 CFA_RGGB = 46  # cv2.COLOR_BAYER_BG2BGR
 CFA_GRBG = 47  # cv2.COLOR_BAYER_GB2BGR
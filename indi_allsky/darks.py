@@ -8,6 +8,7 @@ import tempfile
 import json
 import psutil
 import subprocess
+import concurrent.futures
 from datetime import datetime
 from collections import OrderedDict
 from pathlib import Path
@@ -27,6 +28,8 @@ from .exceptions import CameraException
 from .exceptions import BadImage
 
 from .config import IndiAllSkyConfig
+from .sigmaClip import IndiAllSkySigmaClipCombine
+from .badPixelMap import IndiAllSkyBadPixelMap
 
 from . import camera as camera_module
 
@@ -87,8 +90,16 @@ class IndiAllSkyDarks(object):
         # this is used to set a max value of data returned by the camera
         self._bitmax = 0
 
+        # memory budget for sigma clip combining
+        self._mem_limit = 350000000
+
         self._flush_camera_id = 1
 
+        # stacking runs in the background while the next configuration is exposing
+        self._stack_executor = None  # created for each run
+        self._stack_future = None
+        self._stack_elapsed_s = 0.0
+
         self.image_q = Queue()
         self.indiclient = None
 
@@ -284,6 +295,15 @@ class IndiAllSkyDarks(object):
         self._hotpixel_adu_percent = int(new_hotpixel_adu_percent)
 
 
+    @property
+    def mem_limit(self):
+        return self._mem_limit
+
+    @mem_limit.setter
+    def mem_limit(self, new_mem_limit):
+        self._mem_limit = int(new_mem_limit)
+
+
     @property
     def daytime(self):
         return self._daytime
@@ -1060,10 +1080,31 @@ class IndiAllSkyDarks(object):
         total_exposure_time = sum(remaining_exposures) * self.count + len(remaining_exposures) * overhead_per_exposure
         total_time += total_exposure_time * remaining_configs
 
+        # stacking overlaps the next exposures, only the last stack is not hidden
+        total_time += self._stack_elapsed_s
+
         return total_time
 
 
     def _run(self, stacking_class):
+        self._stack_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+        try:
+            self._run_exposures(stacking_class)
+        finally:
+            if not isinstance(self._stack_future, type(None)):
+                # the capture loop failed while a set was stacking, the stacking error would be lost
+                stack_e = self._stack_future.exception()
+                if stack_e:
+                    logger.error('Dark frame stacking failed: %s', str(stack_e))
+
+            # a failed run must not leave the stacking thread behind
+            self._stack_executor.shutdown(wait=True)
+            self._stack_executor = None
+            self._stack_future = None
+
+
+    def _run_exposures(self, stacking_class):
         dark_exposures_set = set()  # prevent duplicate exposures
         dark_exposures_set.add(1)  # 1s is the shortest exposure
 
@@ -1280,15 +1321,81 @@ class IndiAllSkyDarks(object):
             remaining_configs -= 1
 
 
+        self._wait_for_stacking()
+
+
     def _take_exposures(self, exposure, gain, binning, dark_filename_t, bpm_filename_t, stacking_class):
         exposure_f = float(exposure)
 
-        tmp_fit_dir = tempfile.TemporaryDirectory()    # context manager automatically deletes files when finished
-        tmp_fit_dir_p = Path(tmp_fit_dir.name)
+        # frames are accumulated as they arrive
+        s = stacking_class(self.gain_av, self.binning_av)
+        s.bitmax = self.bitmax
+        s.hotpixel_adu_percent = self.hotpixel_adu_percent
+        s.mem_limit = self.mem_limit
+
+        try:
+            image_bitpix, image_height, image_width = self._capture_frames(s, exposure_f, gain, binning)
+        except Exception:
+            s.cleanup()
+            raise
 
-        logger.info('Temp folder: %s', tmp_fit_dir_p)
 
+        # libcamera does not know the temperature until the first exposure is taken
+        exp_date = datetime.now()
+        date_str = exp_date.strftime('%Y%m%d_%H%M%S')
+        dark_filename = dark_filename_t.format(
+            self.camera_id,
+            image_bitpix,
+            int(exposure_f),
+            int(self.gain_av[constants.GAIN_CURRENT]),  # filename gain as int
+            int(self.binning_av[constants.BINNING_CURRENT]),
+            int(self.sensors_temp_av[constants.SENSOR_TEMP_CCD_TEMP]),
+            date_str,
+        )
+        bpm_filename = bpm_filename_t.format(
+            self.camera_id,
+            image_bitpix,
+            int(exposure_f),
+            int(self.gain_av[constants.GAIN_CURRENT]),  # filename gain as int
+            int(self.binning_av[constants.BINNING_CURRENT]),
+            int(self.sensors_temp_av[constants.SENSOR_TEMP_CCD_TEMP]),
+            date_str,
+        )
+
+
+        # the next configuration changes these values while stacking runs in the background
+        s.gain_av = list(self.gain_av)
+        s.binning_av = list(self.binning_av)
+
+
+        base_metadata = {
+            'createDate' : exp_date.timestamp(),
+            'bitdepth'   : image_bitpix,
+            'exposure'   : exposure_f,
+            'gain'       : float(self.gain_av[constants.GAIN_CURRENT]),
+            'binmode'    : int(self.binning_av[constants.BINNING_CURRENT]),
+            'temp'       : float(self.sensors_temp_av[constants.SENSOR_TEMP_CCD_TEMP]),
+            'height'     : image_height,
+            'width'      : image_width,
+        }
+
+
+        # only one configuration is stacked at a time, this waits for the previous one
+        self._wait_for_stacking()
+
+        self._stack_future = self._stack_executor.submit(
+            self._stack_worker,
+            s,
+            self.darks_dir.joinpath(dark_filename),
+            self.darks_dir.joinpath(bpm_filename),
+            base_metadata,
+        )
+
+
+    def _capture_frames(self, s, exposure_f, gain, binning):
         image_bitpix = None
+        image_height = None
+        image_width = None
 
         i = 1
         while i <= self.count:
@@ -1330,11 +1437,8 @@ class IndiAllSkyDarks(object):
             image_bitpix = hdulist[0].header['BITPIX']
 
 
-            with tempfile.NamedTemporaryFile(mode='w+b', dir=tmp_fit_dir_p, suffix='.fit', delete=False) as f_tmp_fit:
-                hdulist.writeto(f_tmp_fit)
-
+            s.add(hdulist)
 
-            #logger.info('FIT: %s', f_tmp_fit.name)
 
             m_avg = numpy.mean(hdulist[0].data)
             logger.info('Image average adu: %0.2f', m_avg)
@@ -1345,55 +1449,36 @@ class IndiAllSkyDarks(object):
             i += 1  # increment
 
 
-        # libcamera does not know the temperature until the first exposure is taken
-        exp_date = datetime.now()
-        date_str = exp_date.strftime('%Y%m%d_%H%M%S')
-        dark_filename = dark_filename_t.format(
-            self.camera_id,
-            image_bitpix,
-            int(exposure),
-            int(self.gain_av[constants.GAIN_CURRENT]),  # filename gain as int
-            int(self.binning_av[constants.BINNING_CURRENT]),
-            int(self.sensors_temp_av[constants.SENSOR_TEMP_CCD_TEMP]),
-            date_str,
-        )
-        bpm_filename = bpm_filename_t.format(
-            self.camera_id,
-            image_bitpix,
-            int(exposure),
-            int(self.gain_av[constants.GAIN_CURRENT]),  # filename gain as int
-            int(self.binning_av[constants.BINNING_CURRENT]),
-            int(self.sensors_temp_av[constants.SENSOR_TEMP_CCD_TEMP]),
-            date_str,
-        )
+        return image_bitpix, image_height, image_width
 
-        full_dark_filename_p = self.darks_dir.joinpath(dark_filename)
-        full_bpm_filename_p = self.darks_dir.joinpath(bpm_filename)
 
+    def _stack_worker(self, s, full_dark_filename_p, full_bpm_filename_p, base_metadata):
+        stack_start = time.time()
 
-        s = stacking_class(self.gain_av, self.binning_av)
-        s.bitmax = self.bitmax
-        s.hotpixel_adu_percent = self.hotpixel_adu_percent
+        try:
+            with app.app_context():
+                self._stack(s, full_dark_filename_p, full_bpm_filename_p, base_metadata)
+        finally:
+            s.cleanup()
+
+        self._stack_elapsed_s = time.time() - stack_start
+        logger.info('Dark frame stacking completed in %0.1fs', self._stack_elapsed_s)
+
+
+    def _stack(self, s, full_dark_filename_p, full_bpm_filename_p, base_metadata):
+        exposure_f = base_metadata['exposure']
+        image_bitpix = base_metadata['bitdepth']
 
 
         # build dark before BPM
-        dark_adu_avg, dark_hot_pixel_count = s.stack(tmp_fit_dir_p, full_dark_filename_p, exposure_f, image_bitpix)
-        bpm_adu_avg, bpm_hot_pixel_count = s.buildBadPixelMap(tmp_fit_dir_p, full_bpm_filename_p, exposure_f, image_bitpix)
+        dark_adu_avg, dark_hot_pixel_count = s.stack(full_dark_filename_p, exposure_f, image_bitpix)
+        bpm_adu_avg, bpm_hot_pixel_count = s.buildBadPixelMap(full_bpm_filename_p, exposure_f, image_bitpix)
 
 
-        bpm_metadata = {
-            'type'       : constants.BPM_FRAME,
-            'createDate' : exp_date.timestamp(),
-            'bitdepth'   : image_bitpix,
-            'exposure'   : exposure_f,
-            'gain'       : float(self.gain_av[constants.GAIN_CURRENT]),
-            'binmode'    : int(self.binning_av[constants.BINNING_CURRENT]),
-            'temp'       : float(self.sensors_temp_av[constants.SENSOR_TEMP_CCD_TEMP]),
-            'adu'        : bpm_adu_avg,
-            'fileSize'   : full_bpm_filename_p.stat().st_size,
-            'height'     : image_height,
-            'width'      : image_width,
-        }
+        bpm_metadata = base_metadata.copy()
+        bpm_metadata['type'] = constants.BPM_FRAME
+        bpm_metadata['adu'] = bpm_adu_avg
+        bpm_metadata['fileSize'] = full_bpm_filename_p.stat().st_size
 
         bpm_metadata['data'] = {
             'hot_pixels' : int(bpm_hot_pixel_count),
@@ -1401,19 +1486,10 @@ class IndiAllSkyDarks(object):
         }
 
 
-        dark_metadata = {
-            'type'       : constants.DARK_FRAME,
-            'createDate' : exp_date.timestamp(),
-            'bitdepth'   : image_bitpix,
-            'exposure'   : exposure_f,
-            'gain'       : float(self.gain_av[constants.GAIN_CURRENT]),
-            'binmode'    : int(self.binning_av[constants.BINNING_CURRENT]),
-            'temp'       : float(self.sensors_temp_av[constants.SENSOR_TEMP_CCD_TEMP]),
-            'adu'        : dark_adu_avg,
-            'fileSize'   : full_dark_filename_p.stat().st_size,
-            'height'     : image_height,
-            'width'      : image_width,
-        }
+        dark_metadata = base_metadata.copy()
+        dark_metadata['type'] = constants.DARK_FRAME
+        dark_metadata['adu'] = dark_adu_avg
+        dark_metadata['fileSize'] = full_dark_filename_p.stat().st_size
 
         dark_metadata['data'] = {
             'count'      : self.count,
@@ -1422,6 +1498,9 @@ class IndiAllSkyDarks(object):
             'method'     : str(s),
         }
 
+        if not isinstance(s.noise_avg, type(None)):
+            dark_metadata['data']['noise'] = round(s.noise_avg, 3)
+
 
         self._miscDb.addBadPixelMap(
             full_bpm_filename_p.relative_to(self.image_dir),
@@ -1435,7 +1514,16 @@ class IndiAllSkyDarks(object):
             dark_metadata,
         )
 
-        tmp_fit_dir.cleanup()
+
+    def _wait_for_stacking(self):
+        if isinstance(self._stack_future, type(None)):
+            return
+
+        stack_future = self._stack_future
+        self._stack_future = None
+
+        # exceptions from the worker are raised here
+        stack_future.result()
 
 
     def flush(self):
@@ -1480,7 +1568,8 @@ class IndiAllSkyDarks(object):
 
             if filename.exists():
                 logger.warning('Removing bad pixel map: %s', filename)
-                filename.unlink()
+
+            bpm_entry.deleteFile()
 
             db.session.delete(bpm_entry)
 
@@ -1703,6 +1792,14 @@ class IndiAllSkyDarksProcessor(object):
 
         self._bitmax = 0
 
+        self._mem_limit = 350000000
+
+        self.frame_count = 0
+        self.noise_avg = None  # average per pixel standard deviation, when available
+
+        self._hdulist = None  # last frame, reused to write the results
+        self._bpm_data = None  # running max of each pixel
+
 
     def __repr__(self):
         return NotImplementedError
@@ -1729,40 +1826,55 @@ class IndiAllSkyDarksProcessor(object):
         self._hotpixel_adu_percent = int(new_hotpixel_adu_percent)
 
 
+    @property
+    def mem_limit(self):
+        return self._mem_limit
+
+    @mem_limit.setter
+    def mem_limit(self, new_mem_limit):
+        self._mem_limit = int(new_mem_limit)
 
-    def buildBadPixelMap(self, tmp_fit_dir_p, filename_p, exposure, image_bitpix):
-        from astropy.io import fits
 
-        logger.info('Building bad pixel map for exposure %0.1fs, gain %0.2f, bin %d', exposure, self.gain_av[constants.GAIN_CURRENT], self.binning_av[constants.BINNING_CURRENT])
 
+    def _numpy_type(self, image_bitpix):
         if image_bitpix == 16:
-            numpy_type = numpy.uint16
+            return numpy.uint16
         elif image_bitpix == 8:
-            numpy_type = numpy.uint8
+            return numpy.uint8
         elif image_bitpix == -32:
-            numpy_type = numpy.float32
+            return numpy.float32
         elif image_bitpix == 32:
-            numpy_type = numpy.uint32
+            return numpy.uint32
+
+        raise Exception('Unknown bits per pixel')
+
+
+    def add(self, hdulist):
+        """Accumulate a frame as it arrives, only the running results are kept in memory"""
+        data = hdulist[0].data
+
+        if isinstance(self._bpm_data, type(None)):
+            self._bpm_data = data.astype(self._numpy_type(hdulist[0].header['BITPIX']))
         else:
-            raise Exception('Unknown bits per pixel')
+            # take the max values of each pixel from each image
+            numpy.maximum(self._bpm_data, data, out=self._bpm_data)
+
+
+        self._hdulist = hdulist
+        self.frame_count += 1
 
 
-        dark_data_list = list()
-        hdulist = None
-        for item in Path(tmp_fit_dir_p).iterdir():
-            #logger.info('Found item: %s', item)
-            if item.is_file() and item.suffix in ['.fit']:
-                #logger.info('Found fit: %s', item)
-                hdulist = fits.open(item)
-                dark_data_list.append(hdulist[0].data)
+    def cleanup(self):
+        pass
 
 
-        bpm = numpy.zeros(dark_data_list[0].shape, dtype=numpy_type)
+    def buildBadPixelMap(self, filename_p, exposure, image_bitpix):
+        logger.info('Building bad pixel map for exposure %0.1fs, gain %0.2f, bin %d', exposure, self.gain_av[constants.GAIN_CURRENT], self.binning_av[constants.BINNING_CURRENT])
 
+        numpy_type = self._numpy_type(image_bitpix)
 
-        # take the max values of each pixel from each image
-        for dark in dark_data_list:
-            bpm = numpy.maximum(bpm, dark)
+        bpm = self._bpm_data
+        hdulist = self._hdulist
 
 
         max_val = numpy.amax(bpm)
@@ -1806,13 +1918,18 @@ class IndiAllSkyDarksProcessor(object):
 
         hdulist[0].data = bpm
 
-        # reuse the last fits file for the stacked data
+        # reuse the last frame for the stacked data
         hdulist.writeto(filename_p)
 
+
+        # coordinates and values of the hot pixels, used for calibration
+        IndiAllSkyBadPixelMap.fromArray(bpm).save(IndiAllSkyBadPixelMap.sparse_path(filename_p))
+
+
         return bpm_adu_avg, hot_pixel_count
 
 
-    def stack(self, tmp_fit_dir_p, filename_p, exposure, image_bitpix):
+    def stack(self, filename_p, exposure, image_bitpix):
         raise Exception('Must be redefined in sub-class')
 
 
@@ -1824,45 +1941,77 @@ class IndiAllSkyDarksAverage(IndiAllSkyDarksProcessor):
         return 'Average Stacking'
 
 
-    def stack(self, tmp_fit_dir_p, filename_p, exposure, image_bitpix):
-        from astropy.io import fits
+    def __init__(self, *args, **kwargs):
+        super(IndiAllSkyDarksAverage, self).__init__(*args, **kwargs)
 
-        logger.info('Stacking dark frames for exposure %0.1fs, gain %0.2f, bin %d', exposure, self.gain_av[constants.GAIN_CURRENT], self.binning_av[constants.BINNING_CURRENT])
+        self._sum_data = None
 
+        # Welford running mean and sum of squared differences
+        self._mean_data = None
+        self._m2_data = None
+
+
+    def _cast_type(self, image_bitpix):
         if image_bitpix == 16:
-            numpy_type = numpy.uint16
-            cast_type = numpy.uint32
+            return numpy.uint32
         elif image_bitpix == 8:
-            numpy_type = numpy.uint8
-            cast_type = numpy.uint16
+            return numpy.uint16
         elif image_bitpix == -32:
-            numpy_type = numpy.float32
-            cast_type = numpy.float32
+            return numpy.float32
         elif image_bitpix == 32:
-            numpy_type = numpy.uint32
-            cast_type = numpy.float32
-        else:
-            raise Exception('Unknown bits per pixel')
+            return numpy.float32
+
+        raise Exception('Unknown bits per pixel')
+
+
+    def add(self, hdulist):
+        super(IndiAllSkyDarksAverage, self).add(hdulist)
+
+        data = hdulist[0].data
+
+        if isinstance(self._sum_data, type(None)):
+            self._sum_data = data.astype(self._cast_type(hdulist[0].header['BITPIX']))
+            self._mean_data = data.astype(numpy.float32)
+            self._m2_data = numpy.zeros(data.shape, dtype=numpy.float32)
+            return
+
+
+        numpy.add(self._sum_data, data, out=self._sum_data, casting='unsafe')
 
-        dark_data_list = list()
-        hdulist = None
-        for item in Path(tmp_fit_dir_p).iterdir():
-            #logger.info('Found item: %s', item)
-            if item.is_file() and item.suffix in ('.fit',):
-                #logger.info('Found fit: %s', item)
-                hdulist = fits.open(item)
-                dark_data_list.append(hdulist[0].data.astype(cast_type))
+        delta = data - self._mean_data
+        self._mean_data += delta / self.frame_count
+        delta *= data - self._mean_data
+        self._m2_data += delta
 
-        #logger.info('Dark images found: %d', len(dark_data_list))
+
+    def stack(self, filename_p, exposure, image_bitpix):
+        logger.info('Stacking dark frames for exposure %0.1fs, gain %0.2f, bin %d', exposure, self.gain_av[constants.GAIN_CURRENT], self.binning_av[constants.BINNING_CURRENT])
+
+        numpy_type = self._numpy_type(image_bitpix)
+
+        hdulist = self._hdulist
+
+        #logger.info('Dark images found: %d', self.frame_count)
 
         start = time.time()
 
-        avg_data = (numpy.sum(dark_data_list, axis=0) / len(dark_data_list)).astype(numpy_type)
+        avg_data = (self._sum_data / self.frame_count).astype(numpy_type)
         #logger.info('Avg dims: %s', str(avg_data.shape))
 
         elapsed_s = time.time() - start
         logger.info('Exposure average stacked in %0.4f s', elapsed_s)
 
+
+        if self.frame_count > 1:
+            self.noise_avg = float(numpy.mean(numpy.sqrt(self._m2_data / (self.frame_count - 1))))
+            logger.info('Master Dark average noise: %0.2f', self.noise_avg)
+
+        # running data is no longer needed
+        self._sum_data = None
+        self._mean_data = None
+        self._m2_data = None
+
+
         dark_adu_avg = numpy.mean(avg_data)
         logger.info('Master Dark average adu: %0.2f', dark_adu_avg)
 
@@ -1897,7 +2046,7 @@ class IndiAllSkyDarksAverage(IndiAllSkyDarksProcessor):
 
         hdulist[0].data = avg_data
 
-        # reuse the last fits file for the stacked data
+        # reuse the last frame for the stacked data
         hdulist.writeto(filename_p)
 
         return dark_adu_avg, hot_pixel_count
@@ -1911,70 +2060,67 @@ class IndiAllSkyDarksSigmaClip(IndiAllSkyDarksProcessor):
         return 'Sigma Clipping'
 
 
-    def stack(self, tmp_fit_dir_p, filename_p, exposure, image_bitpix):
-        from astropy.io import fits
-        from astropy.stats import mad_std
-        import ccdproc
+    def __init__(self, *args, **kwargs):
+        super(IndiAllSkyDarksSigmaClip, self).__init__(*args, **kwargs)
 
-        logger.info('Stacking dark frames for exposure %0.1fs, gain %0.2f, bin %d', exposure, self.gain_av[constants.GAIN_CURRENT], self.binning_av[constants.BINNING_CURRENT])
+        # sigma clipping needs every frame, they are stored in a temp folder and memory mapped to combine
+        self._tmp_frame_dir = None
+        self._frame_list = list()
 
-        if image_bitpix == 16:
-            numpy_type = numpy.uint16
-        elif image_bitpix == 8:
-            numpy_type = numpy.uint8
-        elif image_bitpix == -32:
-            numpy_type = numpy.float32
-        elif image_bitpix == 32:
-            numpy_type = numpy.uint32
-        else:
-            raise Exception('Unknown bits per pixel')
 
-        dark_images = ccdproc.ImageFileCollection(tmp_fit_dir_p)
-        #logger.info('Full dark count: %d', len(dark_images.files))
+    def add(self, hdulist):
+        super(IndiAllSkyDarksSigmaClip, self).add(hdulist)
 
-        # indi_pylibcamera reports slightly lower than the expected exposure values which cause the filter to exclude them
-        #dark_images_filtered = dark_images.files_filtered(exptime=exposure, include_path=True)
-        #logger.info('Filtered dark count: %d', len(dark_images_filtered))
+        if isinstance(self._tmp_frame_dir, type(None)):
+            self._tmp_frame_dir = tempfile.TemporaryDirectory()
+            logger.info('Temp folder: %s', self._tmp_frame_dir.name)
 
-        dark_images_files = [str(tmp_fit_dir_p.joinpath(x)) for x in dark_images.files]
 
+        frame_p = Path(self._tmp_frame_dir.name).joinpath('{0:04d}.npy'.format(self.frame_count))
 
-        start = time.time()
+        # raw numpy arrays can be memory mapped, scaled FITS data cannot
+        numpy.save(str(frame_p), hdulist[0].data)
 
-        try:
-            combined_dark = ccdproc.combine(
-                dark_images_files,
-                method='average',
-                sigma_clip=True,
-                sigma_clip_low_thresh=5,
-                sigma_clip_high_thresh=5,
-                sigma_clip_func=numpy.ma.median,
-                signma_clip_dev_func=mad_std,
-                dtype=numpy_type,
-                mem_limit=350000000,
-            )
-        except ValueError as e:
-            logger.error('ValueError: %s', str(e))
-            logger.error('Performing sigma clipping stacking on RGB data is the most common cause of this error, use "average" instead')
-            sys.exit(1)
+        self._frame_list.append(frame_p)
 
-        elapsed_s = time.time() - start
-        logger.info('Exposure sigma clip stacked in %0.4f s', elapsed_s)
 
+    def cleanup(self):
+        if isinstance(self._tmp_frame_dir, type(None)):
+            return
+
+        self._tmp_frame_dir.cleanup()
+        self._tmp_frame_dir = None
+        self._frame_list = list()
 
-        combined_dark.meta['combined'] = True
 
+    def stack(self, filename_p, exposure, image_bitpix):
+        logger.info('Stacking dark frames for exposure %0.1fs, gain %0.2f, bin %d', exposure, self.gain_av[constants.GAIN_CURRENT], self.binning_av[constants.BINNING_CURRENT])
 
-        dark_adu_avg = numpy.mean(combined_dark[0].data)
-        logger.info('Master Dark average adu: %0.2f', dark_adu_avg)
+        numpy_type = self._numpy_type(image_bitpix)
+
+        hdulist = self._hdulist
+
+
+        frame_list = [numpy.load(str(x), mmap_mode='r') for x in self._frame_list]
 
+        combiner = IndiAllSkySigmaClipCombine(
+            sigma_low=5,
+            sigma_high=5,
+            mem_limit=self.mem_limit,
+        )
+
+        start = time.time()
 
-        combined_dark.write(filename_p)
+        combined_data = combiner.combine(frame_list, numpy_type)
 
+        elapsed_s = time.time() - start
+        logger.info('Exposure sigma clip stacked in %0.4f s', elapsed_s)
 
-        # counting hot pixels does not work on the data before being written to the file, I have no idea why
-        # re-reading file to count hot pixels
-        dark_from_file = fits.open(filename_p)
+        del frame_list  # release memory maps
+
+
+        dark_adu_avg = numpy.mean(combined_data)
+        logger.info('Master Dark average adu: %0.2f', dark_adu_avg)
 
 
         if self.bitmax:
@@ -1989,9 +2135,14 @@ class IndiAllSkyDarksSigmaClip(IndiAllSkyDarksProcessor):
 
         hot_pixel_thold = int(max_value * (30 / 100))
 
-        # Mono data
-        hot_pixels = dark_from_file[0].data > hot_pixel_thold
-        hot_pixel_count = hot_pixels.sum()  # this is not working correctly for some reason
+        if len(combined_data.shape) == 3:
+            # RGB fits data
+            hot_pixels = numpy.maximum.reduce([combined_data[0], combined_data[1], combined_data[2]]) > hot_pixel_thold
+        else:
+            # Mono data
+            hot_pixels = combined_data > hot_pixel_thold
+
+        hot_pixel_count = hot_pixels.sum()
 
         if hot_pixel_count > 50000:
             logger.warning('DETECTED MORE THAN 50000 HOT PIXELS (>%d/%d%% ADU) - MAKE SURE YOUR SENSOR IS COVERED', hot_pixel_thold, 30)
@@ -2001,5 +2152,10 @@ class IndiAllSkyDarksSigmaClip(IndiAllSkyDarksProcessor):
             logger.info('Detected %d hot pixels (>%d/%d%% ADU)', hot_pixel_count, hot_pixel_thold, 30)
 
 
-        return dark_adu_avg, hot_pixel_count
+        hdulist[0].data = combined_data
+        hdulist[0].header['COMBINED'] = True
 
+        # reuse the last frame for the stacked data
+        hdulist.writeto(filename_p)
+
+        return dark_adu_avg, hot_pixel_count
@@ -0,0 +1,424 @@
+### Streaming import of an existing image folder into the database
+### Directories are scanned with os.scandir() by a pool of threads, one directory per task.  Entries are
+### inserted with executemany() in fixed size transactions and completed directories are appended to a
+### checkpoint file, an interrupted import resumes where it stopped.  Files that are already in the database
+### are skipped, so the import may run while indi-allsky is running.
+
+import os
+import io
+import re
+import time
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import wait
+import logging
+
+from .flask import db
+
+from .flask.models import IndiAllSkyDbImageTable
+from .flask.models import IndiAllSkyDbVideoTable
+from .flask.models import IndiAllSkyDbKeogramTable
+from .flask.models import IndiAllSkyDbStarTrailsTable
+from .flask.models import IndiAllSkyDbStarTrailsVideoTable
+from .flask.models import IndiAllSkyDbPanoramaImageTable
+from .flask.models import IndiAllSkyDbPanoramaVideoTable
+
+from sqlalchemy.exc import IntegrityError
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkyDbImport(object):
+
+    video_extensions = ('.mp4', '.webm')
+    image_extensions = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.webp')
+
+    # files modified recently may still be added by the running service
+    recent_seconds = 900
+
+    # SQLite limits the number of bound parameters
+    filename_query_size = 500
+
+    batch_retries = 3
+
+
+    # timelapse/20210915/allsky-timelapse_ccd1_20210915_night_1747415591.mp4
+    re_video = re.compile(r'(?P<dayDate_str>\d{8})\/.+timelapse_ccd(?P<ccd_id_str>\d+)_\d{8}_(?P<timeofday_str>[a-z]+)_?(?P<timestamp_str>\d+)?\.[a-z0-9]+$')
+
+    # timelapse/20210915/allsky-keogram_ccd1_20210915_night_1747415591.jpg
+    re_keogram = re.compile(r'(?P<dayDate_str>\d{8})\/.+keogram_ccd(?P<ccd_id_str>\d+)_\d{8}_(?P<timeofday_str>[a-z]+)_?(?P<timestamp_str>\d+)?\.[a-z]+$')
+
+    # timelapse/20210915/allsky-startrail_ccd1_20210915_night_1747415591.jpg
+    re_startrail = re.compile(r'(?P<dayDate_str>\d{8})\/.+startrail_ccd(?P<ccd_id_str>\d+)_\d{8}_(?P<timeofday_str>[a-z]+)_?(?P<timestamp_str>\d+)?\.[a-z]+$')
+
+    # timelapse/20210915/allsky-startrail_timelapse_ccd1_20210915_night_1747415591.mp4
+    re_startrail_video = re.compile(r'(?P<dayDate_str>\d{8})\/.+startrail_timelapse_ccd(?P<ccd_id_str>\d+)_\d{8}_(?P<timeofday_str>[a-z]+)_?(?P<timestamp_str>\d+)?\.[a-z0-9]+$')
+
+    # timelapse/20210915/allsky-panorama_timelapse_ccd1_20210915_night_1747415591.mp4
+    re_panorama_video = re.compile(r'(?P<dayDate_str>\d{8})\/.+panorama_timelapse_ccd(?P<ccd_id_str>\d+)_\d{8}_(?P<timeofday_str>[a-z]+)_?(?P<timestamp_str>\d+)?\.[a-z0-9]+$')
+
+    # exposures/20210825/night/26_02/ccd1_20210826_020202.jpg
+    re_image = re.compile(r'(?P<dayDate_str>\d{8})\/(?P<timeofday_str>[a-z]+)\/\d{2}_\d{2}\/ccd(?P<ccd_id_str>\d+)_(?P<createDate_str>[0-9_]+)\.[a-z]+$')
+
+    # panoramas/20210825/night/26_02/panorama_ccd1_20210826_020202.jpg
+    re_panorama_image = re.compile(r'(?P<dayDate_str>\d{8})\/(?P<timeofday_str>[a-z]+)\/\d{2}_\d{2}\/panorama_ccd(?P<ccd_id_str>\d+)_(?P<createDate_str>[0-9_]+)\.[a-z]+$')
+
+
+    asset_tables = {
+        'video'           : IndiAllSkyDbVideoTable,
+        'keogram'         : IndiAllSkyDbKeogramTable,
+        'startrail'       : IndiAllSkyDbStarTrailsTable,
+        'startrail_video' : IndiAllSkyDbStarTrailsVideoTable,
+        'panorama_video'  : IndiAllSkyDbPanoramaVideoTable,
+        'image'           : IndiAllSkyDbImageTable,
+        'panorama_image'  : IndiAllSkyDbPanoramaImageTable,
+    }
+
+
+    def __init__(self, image_dir, camera_id, checkpoint_p, batch_size=1000, threads=4):
+        self.image_dir = Path(image_dir)
+        self.camera_id = int(camera_id)
+        self.checkpoint_p = Path(checkpoint_p)
+        self.batch_size = int(batch_size)
+        self.threads = int(threads)
+
+        self._done_dir_set = set()  # read by the scanner threads, only populated before the scan
+
+        self._pending = {k: list() for k in self.asset_tables.keys()}
+        self._pending_count = 0
+        self._pending_dir_list = list()
+
+        self.inserted = {k: 0 for k in self.asset_tables.keys()}
+        self.existing = 0
+        self.recent = 0
+
+
+    @property
+    def inserted_total(self):
+        return sum(self.inserted.values())
+
+
+    def main(self):
+        self._loadCheckpoint()
+
+        import_start = time.time()
+        recent_cutoff = import_start - self.recent_seconds
+
+        dir_list = [self.image_dir]
+        future_set = set()
+
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            while dir_list or future_set:
+                # limit the directories in flight, results wait for the database inserts
+                while dir_list and len(future_set) < self.threads * 2:
+                    dir_p = dir_list.pop()  # depth first
+                    future_set.add(executor.submit(self._scanDir, dir_p, recent_cutoff))
+
+
+                done_set, future_set = wait(future_set, return_when=FIRST_COMPLETED)
+
+                for future in done_set:
+                    rel_dir, subdir_list, entry_list, recent_count = future.result()
+
+                    dir_list.extend(subdir_list)
+
+                    for asset, row in entry_list:
+                        self._pending[asset].append(row)
+
+                    self._pending_count += len(entry_list)
+
+                    if recent_count:
+                        # not recorded in the checkpoint, scanned again when resumed
+                        self.recent += recent_count
+                    elif not isinstance(rel_dir, type(None)):
+                        self._pending_dir_list.append(rel_dir)
+
+
+                if self._pending_count >= self.batch_size:
+                    self._flush(import_start)
+
+
+        self._flush(import_start)
+
+
+        import_elapsed_s = time.time() - import_start
+
+        for asset, count in self.inserted.items():
+            logger.warning('*** %s entries inserted: %d ***', asset, count)
+
+        logger.warning('Import completed in %0.1f s, %d entries inserted, %d already in database', import_elapsed_s, self.inserted_total, self.existing)
+
+        if self.recent:
+            logger.warning('%d recent files skipped, the running service may still add them', self.recent)
+        else:
+            # import is complete
+            try:
+                self.checkpoint_p.unlink()
+            except FileNotFoundError:
+                pass
+
+
+    def _loadCheckpoint(self):
+        header = self._checkpointHeader()
+
+        try:
+            with io.open(str(self.checkpoint_p), 'r') as f_checkpoint:
+                line_list = [x.rstrip('\n') for x in f_checkpoint]
+        except FileNotFoundError:
+            line_list = list()
+
+
+        if line_list and line_list[0] == header:
+            self._done_dir_set = set(line_list[1:])
+            logger.warning('Resuming import, %d directories already imported', len(self._done_dir_set))
+            return
+
+
+        if line_list:
+            logger.warning('Checkpoint is for a different folder or camera, starting a new import')
+
+
+        with io.open(str(self.checkpoint_p), 'w') as f_checkpoint:
+            f_checkpoint.write('{0:s}\n'.format(header))
+
+
+    def _checkpointHeader(self):
+        return '# camera {0:d} {1:s}'.format(self.camera_id, str(self.image_dir))
+
+
+    def _scanDir(self, dir_p, recent_cutoff):
+        rel_dir = str(dir_p.relative_to(self.image_dir))
+
+        # subdirectories of completed directories are still scanned
+        skip_files = rel_dir in self._done_dir_set
+
+        subdir_list = list()
+        entry_list = list()
+        recent_count = 0
+
+        try:
+            with os.scandir(str(dir_p)) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        if entry.name == 'thumbnails':
+                            continue
+
+                        subdir_list.append(Path(entry.path))
+                        continue
+
+
+                    if skip_files:
+                        continue
+
+                    if not entry.is_file():
+                        continue
+
+
+                    if rel_dir == '.':
+                        rel_filename = entry.name
+                    else:
+                        rel_filename = '{0:s}/{1:s}'.format(rel_dir, entry.name)
+
+
+                    asset, m = self._classify(entry.name, rel_filename)
+                    if not asset:
+                        continue
+
+
+                    st_mtime = entry.stat().st_mtime
+                    if st_mtime > recent_cutoff:
+                        recent_count += 1
+                        continue
+
+
+                    entry_list.append((asset, self._buildRow(asset, m, rel_filename, datetime.fromtimestamp(st_mtime))))
+        except PermissionError as e:
+            logger.error('Permission error: %s', str(e))
+            rel_dir = None  # not recorded in the checkpoint
+
+
+        return rel_dir, subdir_list, entry_list, recent_count
+
+
+    def _classify(self, name, rel_filename):
+        suffix = os.path.splitext(name)[1]
+
+        if suffix in self.video_extensions:
+            if 'timelapse' not in name:
+                return None, None
+
+            if 'startrail' in name:
+                asset, re_asset = 'startrail_video', self.re_startrail_video
+            elif 'panorama' in name:
+                asset, re_asset = 'panorama_video', self.re_panorama_video
+            else:
+                asset, re_asset = 'video', self.re_video
+
+        elif suffix in self.image_extensions:
+            if 'keogram' in name:
+                asset, re_asset = 'keogram', self.re_keogram
+            elif 'startrail' in name:
+                asset, re_asset = 'startrail', self.re_startrail
+            elif 'panoram' in name:
+                asset, re_asset = 'panorama_image', self.re_panorama_image
+            elif 'raw' in name or 'thumbnail' in name:
+                return None, None
+            else:
+                asset, re_asset = 'image', self.re_image
+
+        else:
+            return None, None
+
+
+        m = re.search(re_asset, rel_filename)
+        if not m:
+            logger.error('Regex did not match file: %s', rel_filename)
+            return None, None
+
+
+        return asset, m
+
+
+    def _buildRow(self, asset, m, rel_filename, d_createDate):
+        d_dayDate = datetime.strptime(m.group('dayDate_str'), '%Y%m%d').date()
+
+        if m.group('timeofday_str') == 'night':
+            night = True
+        else:
+            night = False
+
+
+        if asset in ('image', 'panorama_image'):
+            row = {
+                'filename'   : rel_filename,
+                'camera_id'  : self.camera_id,
+                'createDate' : d_createDate,
+                'createDate_year'   : d_createDate.year,
+                'createDate_month'  : d_createDate.month,
+                'createDate_day'    : d_createDate.day,
+                'createDate_hour'   : d_createDate.hour,
+                'dayDate'    : d_dayDate,
+                'exposure'   : 0.0,
+                'gain'       : -1.0,
+                'binmode'    : 1,
+                'night'      : night,
+                'uploaded'   : False,
+            }
+
+            if asset == 'image':
+                row['adu'] = 0.0
+                row['stable'] = True
+                row['moonmode'] = False
+                row['adu_roi'] = False
+
+            return row
+
+
+        row = {
+            'filename'   : rel_filename,
+            'success'    : True,
+            'createDate' : d_createDate,
+            'dayDate'    : d_dayDate,
+            'night'      : night,
+            'uploaded'   : False,
+            'camera_id'  : self.camera_id,
+        }
+
+        if asset == 'video':
+            row['dayDate_year'] = d_dayDate.year
+            row['dayDate_month'] = d_dayDate.month
+            row['dayDate_day'] = d_dayDate.day
+
+        return row
+
+
+    def _flush(self, import_start):
+        if not self._pending_count and not self._pending_dir_list:
+            return
+
+
+        for i in range(self.batch_retries):
+            try:
+                inserted, existing = self._insertBatch()
+                break
+            except IntegrityError as e:
+                # the running service added one of the files
+                logger.warning('Integrity error, retrying batch: %s', str(e))
+                db.session.rollback()
+        else:
+            # directories are not recorded, they are imported again when resumed
+            logger.error('Failed to insert batch of %d entries', self._pending_count)
+            inserted = dict()
+            existing = 0
+            self._pending_dir_list = list()
+
+
+        for asset, count in inserted.items():
+            self.inserted[asset] += count
+
+        self.existing += existing
+
+
+        if self._pending_dir_list:
+            with io.open(str(self.checkpoint_p), 'a') as f_checkpoint:
+                for rel_dir in self._pending_dir_list:
+                    f_checkpoint.write('{0:s}\n'.format(rel_dir))
+
+
+        self._pending = {k: list() for k in self.asset_tables.keys()}
+        self._pending_count = 0
+        self._pending_dir_list = list()
+
+
+        import_elapsed_s = max(time.time() - import_start, 0.001)
+        logger.info(
+            'Imported %d entries (%d existing) in %0.1f s, %0.1f/s',
+            self.inserted_total,
+            self.existing,
+            import_elapsed_s,
+            (self.inserted_total + self.existing) / import_elapsed_s,
+        )
+
+
+    def _insertBatch(self):
+        inserted = dict()
+        existing = 0
+
+        for asset, row_list in self._pending.items():
+            if not row_list:
+                continue
+
+            table = self.asset_tables[asset]
+
+            existing_set = self._existingFilenames(table, [r['filename'] for r in row_list])
+            new_row_list = [r for r in row_list if r['filename'] not in existing_set]
+
+            if new_row_list:
+                # a list of parameters is executed with executemany()
+                db.session.execute(table.__table__.insert(), new_row_list)
+
+            inserted[asset] = len(new_row_list)
+            existing += len(row_list) - len(new_row_list)
+
+
+        db.session.commit()
+
+        return inserted, existing
+
+
+    def _existingFilenames(self, table, filename_list):
+        existing_set = set()
+
+        for i in range(0, len(filename_list), self.filename_query_size):
+            filename_chunk = filename_list[i:i + self.filename_query_size]
+
+            existing_query = db.session.query(table.filename)\
+                .filter(table.filename.in_(filename_chunk))
+
+            existing_set.update([x.filename for x in existing_query])
+
+
+        return existing_set
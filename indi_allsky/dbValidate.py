@@ -0,0 +1,428 @@
+### Incremental validation of the database entries against the image folder
+### A high-water mark (the last id checked) is stored per table, rows newer than the mark are always checked and
+### a random sample of older rows is checked on each run.  The marks are only stored with saveMarks(), after
+### the missing entries were removed, a report only run uses its own marks.  File checks are spread over a small thread pool
+### and rate limited, the check can run in the background on an SD card.  Files that are not referenced in
+### the database are found by merging the sorted directory walk with the sorted database filenames.
+
+import os
+import time
+import math
+import random
+import heapq
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+from .flask import db
+from .flask.miscDb import miscDb
+
+from .flask.models import IndiAllSkyDbImageTable
+from .flask.models import IndiAllSkyDbRawImageTable
+from .flask.models import IndiAllSkyDbFitsImageTable
+from .flask.models import IndiAllSkyDbBadPixelMapTable
+from .flask.models import IndiAllSkyDbDarkFrameTable
+from .flask.models import IndiAllSkyDbVideoTable
+from .flask.models import IndiAllSkyDbMiniVideoTable
+from .flask.models import IndiAllSkyDbKeogramTable
+from .flask.models import IndiAllSkyDbStarTrailsTable
+from .flask.models import IndiAllSkyDbStarTrailsVideoTable
+from .flask.models import IndiAllSkyDbPanoramaImageTable
+from .flask.models import IndiAllSkyDbPanoramaVideoTable
+from .flask.models import IndiAllSkyDbThumbnailTable
+
+from sqlalchemy import func
+from sqlalchemy.sql.expression import true as sa_true
+from sqlalchemy.sql.expression import null as sa_null
+from sqlalchemy.orm.exc import NoResultFound
+
+from .exceptions import SortOrderException
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkyDbValidate(object):
+
+    # name, table, local files only (s3_key), successful entries only
+    asset_tables = (
+        ('image', IndiAllSkyDbImageTable, True, False),
+        ('raw_image', IndiAllSkyDbRawImageTable, True, False),
+        ('fits_image', IndiAllSkyDbFitsImageTable, True, False),
+        ('badpixelmap', IndiAllSkyDbBadPixelMapTable, False, False),
+        ('darkframe', IndiAllSkyDbDarkFrameTable, False, False),
+        ('video', IndiAllSkyDbVideoTable, True, True),
+        ('mini_video', IndiAllSkyDbMiniVideoTable, True, True),
+        ('keogram', IndiAllSkyDbKeogramTable, True, False),
+        ('startrail', IndiAllSkyDbStarTrailsTable, True, True),
+        ('startrail_video', IndiAllSkyDbStarTrailsVideoTable, True, True),
+        ('panorama_image', IndiAllSkyDbPanoramaImageTable, True, False),
+        ('panorama_video', IndiAllSkyDbPanoramaVideoTable, True, True),
+        ('thumbnail', IndiAllSkyDbThumbnailTable, True, False),
+    )
+
+
+    # only these files are expected to have database entries
+    asset_extensions = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.webp', '.fit', '.fits', '.mp4', '.webm')
+
+    # top level folders without database entries
+    ignore_dirs = ('scratch', 'export')
+
+    # files modified recently may not be in the database yet
+    recent_seconds = 900
+
+    # rows per query
+    page_size = 1000
+
+    # SQLite limits the number of bound parameters
+    id_query_size = 500
+
+    # paths checked per thread pool task
+    stat_chunk_size = 50
+
+    orphan_log_max = 100
+
+
+    def __init__(self, config, full=False, orphans=True, threads=4, max_rate=250, sample_rate=0.01, sample_max=5000, state_prefix='VALIDATE_DB_ID'):
+        self.config = config
+
+        self._miscDb = miscDb(self.config)
+
+        if self.config.get('IMAGE_FOLDER'):
+            self.image_dir = Path(self.config['IMAGE_FOLDER']).absolute()
+        else:
+            self.image_dir = Path(__file__).parent.parent.joinpath('html', 'images').absolute()
+
+        self.full = full
+        self.orphans = orphans
+        self.threads = int(threads)
+        self.max_rate = int(max_rate)  # filesystem operations per second, 0 is unlimited
+        self.sample_rate = float(sample_rate)
+        self.sample_max = int(sample_max)
+        self.state_prefix = state_prefix
+
+        self._ops = 0
+        self._ops_start = 0.0
+
+        self.checked = {x[0]: 0 for x in self.asset_tables}
+        self.missing = {x[0]: list() for x in self.asset_tables}
+        self.last_id = dict()  # new high-water marks, stored with saveMarks()
+
+        self.orphan_count = 0
+        self.orphan_list = list()
+
+
+    @property
+    def missing_total(self):
+        return sum([len(x) for x in self.missing.values()])
+
+
+    @property
+    def checked_total(self):
+        return sum(self.checked.values())
+
+
+    def main(self):
+        validate_start = time.time()
+
+        self._ops = 0
+        self._ops_start = validate_start
+
+
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            for name, table, local_only, success_only in self.asset_tables:
+                self._validateTable(executor, name, table, local_only, success_only)
+
+
+        if self.orphans:
+            try:
+                self._findOrphans(validate_start - self.recent_seconds)
+            except SortOrderException as e:
+                logger.error('Orphaned file search cancelled: %s', str(e))
+
+
+        validate_elapsed_s = time.time() - validate_start
+
+        for name, _, _, _ in self.asset_tables:
+            if self.missing[name]:
+                logger.warning('%s entries with missing files: %d', name, len(self.missing[name]))
+
+        logger.warning('Validation completed in %0.1f s, %d entries checked, %d missing files, %d files not in the database', validate_elapsed_s, self.checked_total, self.missing_total, self.orphan_count)
+
+
+    def saveMarks(self):
+        for name, last_id in self.last_id.items():
+            self._miscDb.setState('{0:s}_{1:s}'.format(self.state_prefix, name), last_id)
+
+
+    def deleteMissing(self):
+        delete_count = 0
+
+        for name, table, _, _ in self.asset_tables:
+            for entry_id in self.missing[name]:
+                try:
+                    entry = table.query\
+                        .filter(table.id == entry_id)\
+                        .one()
+                except NoResultFound:
+                    continue
+
+                logger.info('Removing %s entry: %s', entry.__class__.__name__, entry.filename)
+
+                try:
+                    entry.deleteAsset()
+                except OSError as e:
+                    logger.error('Cannot remove file: %s', str(e))
+                    continue
+
+                db.session.delete(entry)
+                db.session.commit()
+
+                delete_count += 1
+
+
+        return delete_count
+
+
+    def _validateTable(self, executor, name, table, local_only, success_only):
+        state_key = '{0:s}_{1:s}'.format(self.state_prefix, name)
+
+        if self.full:
+            last_id = 0
+        else:
+            try:
+                last_id = int(self._miscDb.getState(state_key))
+            except NoResultFound:
+                last_id = 0
+
+
+        # new entries
+        new_last_id = last_id
+        while True:
+            entry_list = self._baseQuery(table, local_only, success_only)\
+                .filter(table.id > new_last_id)\
+                .order_by(table.id.asc())\
+                .limit(self.page_size)\
+                .all()
+
+            if not entry_list:
+                break
+
+            self._checkEntries(executor, name, entry_list)
+
+            new_last_id = entry_list[-1][0]
+
+
+        # random sample of the entries checked by previous runs
+        sample_count = 0
+        if last_id:
+            # expired entries are deleted, the ids below the oldest entry do not exist
+            min_id = self._baseQuery(table, local_only, success_only)\
+                .filter(table.id <= last_id)\
+                .with_entities(func.min(table.id))\
+                .scalar()
+        else:
+            min_id = None
+
+        if min_id:
+            id_count = last_id - min_id + 1
+            sample_size = min(int(math.ceil(id_count * self.sample_rate)), self.sample_max, id_count)
+            sample_id_list = sorted(random.sample(range(min_id, last_id + 1), sample_size))
+
+            for i in range(0, len(sample_id_list), self.id_query_size):
+                entry_list = self._baseQuery(table, local_only, success_only)\
+                    .filter(table.id.in_(sample_id_list[i:i + self.id_query_size]))\
+                    .all()
+
+                self._checkEntries(executor, name, entry_list)
+
+                sample_count += len(entry_list)
+
+
+        if new_last_id != last_id:
+            self.last_id[name] = new_last_id
+
+
+        logger.info('Validated %s: %d new entries, %d sampled entries', name, self.checked[name] - sample_count, sample_count)
+
+
+    def _baseQuery(self, table, local_only, success_only):
+        query = db.session.query(table.id, table.filename)
+
+        if local_only:
+            query = query.filter(table.s3_key == sa_null())
+
+        if success_only:
+            query = query.filter(table.success == sa_true())
+
+        return query
+
+
+    def _checkEntries(self, executor, name, entry_list):
+        path_list = [self._fullPath(filename) for _, filename in entry_list]
+
+        future_list = list()
+        for i in range(0, len(path_list), self.stat_chunk_size):
+            chunk = path_list[i:i + self.stat_chunk_size]
+
+            self._throttle(len(chunk))
+            future_list.append(executor.submit(self._existsChunk, chunk))
+
+
+        exists_list = list()
+        for future in future_list:
+            exists_list.extend(future.result())
+
+
+        for (entry_id, filename), exists in zip(entry_list, exists_list):
+            if not exists:
+                logger.warning('Entry not found on filesystem: %s', filename)
+                self.missing[name].append(entry_id)
+
+
+        self.checked[name] += len(entry_list)
+
+
+    def _existsChunk(self, path_list):
+        return [os.path.exists(x) for x in path_list]
+
+
+    def _fullPath(self, filename):
+        if filename.startswith('/'):
+            # filename is already fully qualified
+            return filename
+
+        return os.path.join(str(self.image_dir), filename)
+
+
+    def _throttle(self, ops):
+        self._ops += ops
+
+        if not self.max_rate:
+            return
+
+        sleep_s = (self._ops / self.max_rate) - (time.time() - self._ops_start)
+        if sleep_s > 0:
+            time.sleep(sleep_s)
+
+
+    def _findOrphans(self, recent_cutoff):
+        logger.info('Searching for files not in the database')
+
+        image_dir_prefix = '{0:s}/'.format(str(self.image_dir))
+
+        db_stream_list = list()
+        for _, table, _, _ in self.asset_tables:
+            db_stream_list.append(self._dbFilenames(table, ''))  # relative filenames
+            db_stream_list.append(self._dbFilenames(table, image_dir_prefix))
+
+        db_iter = heapq.merge(*db_stream_list)
+
+
+        db_filename = next(db_iter, None)
+        for rel_filename, entry in self._walkFiles(str(self.image_dir), '', 0):
+            while not isinstance(db_filename, type(None)) and db_filename < rel_filename:
+                db_filename = next(db_iter, None)
+
+            if db_filename == rel_filename:
+                continue
+
+
+            try:
+                if entry.stat().st_mtime > recent_cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+
+
+            self.orphan_count += 1
+
+            if len(self.orphan_list) < self.orphan_log_max:
+                logger.warning('File not in database: %s', rel_filename)
+                self.orphan_list.append(rel_filename)
+
+
+    def _dbFilenames(self, table, prefix):
+        """Yield filenames relative to the image folder in sorted order, keyset pagination does not hold a cursor open"""
+        if prefix:
+            base_query = db.session.query(table.filename)\
+                .filter(table.filename.startswith(prefix, autoescape=True))
+        else:
+            base_query = db.session.query(table.filename)\
+                .filter(~table.filename.startswith('/'))
+
+
+        last_filename = None
+        while True:
+            query = base_query
+
+            if not isinstance(last_filename, type(None)):
+                query = query.filter(table.filename > last_filename)
+
+            filename_list = [x[0] for x in query.order_by(table.filename.asc()).limit(self.page_size)]
+
+            if not filename_list:
+                return
+
+
+            for filename in filename_list:
+                if not isinstance(last_filename, type(None)) and filename <= last_filename:
+                    # the merge requires the same order in python and the database
+                    raise SortOrderException('Database collation does not sort {0:s} filenames by code point'.format(table.__tablename__))
+
+                last_filename = filename
+
+                if not filename.startswith(prefix):
+                    # LIKE is not case sensitive in SQLite
+                    continue
+
+                yield filename[len(prefix):]
+
+
+    def _walkFiles(self, dir_path, rel_prefix, depth):
+        """Yield files relative to the image folder in sorted order, one directory is listed at a time"""
+        try:
+            with os.scandir(dir_path) as it:
+                entry_list = list(it)
+        except OSError as e:
+            logger.error('Cannot list folder: %s', str(e))
+            return
+
+        self._throttle(len(entry_list) + 1)
+
+
+        item_list = list()
+        for entry in entry_list:
+            if entry.is_dir(follow_symlinks=False):
+                if depth == 0 and entry.name in self.ignore_dirs:
+                    continue
+
+                # sorting a folder as "name/" gives the same order as sorting the full paths
+                item_list.append(('{0:s}/'.format(entry.name), entry))
+                continue
+
+
+            if not entry.is_file(follow_symlinks=False):
+                continue
+
+            if depth == 0:
+                # latest image, mask, focus images
+                continue
+
+            if depth == 1 and rel_prefix.startswith('ccd_'):
+                # long term keogram
+                continue
+
+            if os.path.splitext(entry.name)[1].lower() not in self.asset_extensions:
+                continue
+
+            item_list.append((entry.name, entry))
+
+
+        item_list.sort(key=lambda x: x[0])
+
+        for key, entry in item_list:
+            if key.endswith('/'):
+                yield from self._walkFiles(entry.path, '{0:s}{1:s}'.format(rel_prefix, key), depth + 1)
+            else:
+                yield '{0:s}{1:s}'.format(rel_prefix, entry.name), entry
@@ -10,21 +10,16 @@ import cv2
 import numpy
 import logging
 import time
-import concurrent.futures
 import datetime
 
 from . import constants
+from .tiled import IndiAllSkyTiledExecutor
 
 # caches to avoid rebuilding small objects repeatedly
 _db4_wavelet = None  # will hold a pywt.Wavelet('db4') instance
 _wavelet_level_cache: dict[int, int] = {}  # min_dim -> max_level
 _hotpixel_kernel_cache: dict[int, numpy.ndarray] = {}  # radius -> kernel
 
-# Shared thread pool to avoid creating executors on every call.  The
-# pool size is deliberately kept small (4 workers) to match the cores on a
-# typical Raspberry Pi.
-_thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
-
 # Hoisted constant maps to avoid reallocating them per-call
 _GAUSSIAN_SIGMA_MAP = {1: 1.0, 2: 1.8, 3: 3.0, 4: 4.2, 5: 5.8}
 _WAVELET_SCALE_MAP = {1: 1.8, 2: 3.0, 3: 4.6, 4: 7.0, 5: 9.2}
@@ -90,6 +85,9 @@ class IndiAllskyDenoise(object):
         self.config = config
         self.night_av = night_av
 
+        # filters run on overlapping horizontal stripes across all cores
+        self._tiled = IndiAllSkyTiledExecutor()
+
     def _get_dtype_max(self, img):
         """Return the maximum value for the image dtype."""
         if numpy.issubdtype(img.dtype, numpy.integer):
@@ -395,24 +393,17 @@ class IndiAllskyDenoise(object):
             b8 = cv2.medianBlur(ch8, ksize)
             return (b8.astype(numpy.float32) / 255.0).astype(ch.dtype)
 
-        # Fast path for small kernels on small images: skip thread overhead
-        if ksize <= 5 and img.shape[0] < 512 and img.shape[1] < 512:
-            if img.ndim == 2:
-                return _blur_channel(img)
-            channels = cv2.split(img)
+        def _blur_stripe(stripe):
+            if stripe.ndim == 2:
+                return _blur_channel(stripe)
+
+            # Multi-channel: process each channel independently and merge
+            channels = cv2.split(stripe)
             blurred = [_blur_channel(ch) for ch in channels]
             return cv2.merge(blurred)
 
-        # Single-channel image
-        if img.ndim == 2:
-            return _blur_channel(img)
-
-        # Multi-channel: process each channel independently and merge
-        channels = cv2.split(img)
-        # submit per-channel work to shared thread pool
-        futures = [_thread_pool.submit(_blur_channel, ch) for ch in channels]
-        blurred = [f.result() for f in futures]
-        return cv2.merge(blurred)
+        # Stripes overlap by the kernel radius; small images run as a single stripe
+        return self._tiled.run(_blur_stripe, img, overlap=ksize // 2)
 
     # ------------------------------------------------------------------
     # Algorithm: Median Blur (direct — effective general-purpose denoising)
@@ -485,16 +476,13 @@ class IndiAllskyDenoise(object):
     def _apply_gaussian_blur(self, img, sigma):
         """Apply Gaussian blur to single or multi-channel image.
 
-        Uses threading for multi-channel images to distribute work.
+        The image is split into stripes overlapping by the kernel radius
+        which are blurred in parallel.
         """
-        if img.ndim == 2 or img.shape[2] < 2:
-            return cv2.GaussianBlur(img, (0, 0), sigma)
+        def _blur_stripe(stripe):
+            return cv2.GaussianBlur(stripe, (0, 0), sigma)
 
-        # Multi-channel: blur each channel on thread pool
-        futures = [_thread_pool.submit(cv2.GaussianBlur, img[:, :, c], (0, 0), sigma)
-                   for c in range(img.shape[2])]
-        channels = [f.result() for f in futures]
-        return numpy.stack(channels, axis=2)
+        return self._tiled.run(_blur_stripe, img, overlap=self._tiled.gaussian_radius(sigma))
 
     def _apply_bilateral_filter(self, img, diameter, sigma_color, sigma_space, dtype_max):
         """Apply bilateral filter, handling dtype conversion if needed.
@@ -504,20 +492,24 @@ class IndiAllskyDenoise(object):
         """
         needs_conversion = img.dtype not in (numpy.uint8, numpy.float32)
 
-        if needs_conversion:
-            # bilateralFilter supports uint8 and float32.
-            # OpenCV float32 bilateral is optimized for 0.0-1.0 range.
-            # Normalize to 0-1, scale sigmaColor by 1/255 (user-facing sigma
-            # is calibrated for 0-255 range). sigmaSpace is in pixel units,
-            # no adjustment needed.
-            sigma_color_norm = float(sigma_color) / 255.0
-            img_f32 = img.astype(numpy.float32) / dtype_max
-            filtered_f32 = cv2.bilateralFilter(img_f32, diameter, sigma_color_norm,
-                                               float(sigma_space))
-            filtered = numpy.clip(numpy.rint(filtered_f32 * dtype_max),
-                                  0, float(dtype_max)).astype(img.dtype)
-        else:
-            filtered = cv2.bilateralFilter(img, diameter, sigma_color, sigma_space)
+        def _filter_stripe(stripe):
+            if needs_conversion:
+                # bilateralFilter supports uint8 and float32.
+                # OpenCV float32 bilateral is optimized for 0.0-1.0 range.
+                # Normalize to 0-1, scale sigmaColor by 1/255 (user-facing sigma
+                # is calibrated for 0-255 range). sigmaSpace is in pixel units,
+                # no adjustment needed.
+                sigma_color_norm = float(sigma_color) / 255.0
+                stripe_f32 = stripe.astype(numpy.float32) / dtype_max
+                filtered_f32 = cv2.bilateralFilter(stripe_f32, diameter, sigma_color_norm,
+                                                   float(sigma_space))
+                return numpy.clip(numpy.rint(filtered_f32 * dtype_max),
+                                  0, float(dtype_max)).astype(stripe.dtype)
+
+            return cv2.bilateralFilter(stripe, diameter, sigma_color, sigma_space)
+
+        # the filter only reaches diameter / 2 pixels, stripes overlap by that radius
+        filtered = self._tiled.run(_filter_stripe, img, overlap=diameter // 2)
 
         return filtered, needs_conversion
 
@@ -709,63 +701,121 @@ class IndiAllskyDenoise(object):
             _wavelet_level_cache[min_dim] = max_level
         levels = min(max(max_level, 1), 4)
 
-        def _denoise_channel(channel):
-            """Denoise a single 2D channel using BayesShrink."""
-            # Normalize to 0-1 float for wavelet precision (float32 is adequate
-            # and significantly faster than float64 on large arrays).
-            data = channel.astype(numpy.float32) / dtype_max
-
-            # Forward DWT
-            coeffs = pywt.wavedec2(data, 'db4', level=levels)
-
+        # Frames are decomposed in horizontal stripes on all cores.  Stripe
+        # boundaries are aligned to the coarsest decimation so every stripe
+        # shares the sampling grid of the full frame, and the overlap covers
+        # the db4 filter support at the coarsest level.  The BayesShrink
+        # statistics are gathered from the stripe interiors first so every
+        # stripe is thresholded identically and the result has no seams.
+        align = 2 ** levels
+        overlap = (_db4_wavelet.dec_len - 1) * (align - 1)
+
+        min_sigma = float(self.config.get('WAVELET_MIN_SIGMA', 0.005))
+
+        def _channels(stripe):
+            if stripe.ndim == 2:
+                return [stripe]
+            return [stripe[:, :, c] for c in range(stripe.shape[2])]
+
+        def _forward_stripe(stripe):
+            """Forward DWT of each channel, normalized to 0-1 float.
+
+            float32 is adequate for wavelet precision and significantly
+            faster than float64 on large arrays.
+            """
+            return [pywt.wavedec2(channel.astype(numpy.float32) / dtype_max, 'db4', level=levels)
+                    for channel in _channels(stripe)]
+
+        def _interior(band, stripe_t, level):
+            # coefficient rows belonging to the stripe (excluding the overlap)
+            y1, y2, sy1, _ = stripe_t
+            return band[(y1 - sy1) >> level:(y2 - sy1) >> level]
+
+        def _thresholds(stripe_coeffs_list, stripe_list, c):
+            """BayesShrink thresholds for channel ``c`` from all stripes."""
             # Estimate noise sigma from finest detail coefficients (HH band).
-            # Replace the heavier astropy call with a simple MAD estimator using
-            # pure numpy; this avoids importing and calling astropy for every
-            # channel (and saves about 10–15 % of the total runtime).
-            detail_hh = coeffs[-1][2]  # HH = diagonal detail at finest level
-            # median absolute deviation → Gaussian sigma
+            # median absolute deviation → Gaussian sigma (a simple numpy MAD
+            # estimator is much cheaper than astropy)
+            detail_hh = numpy.concatenate([
+                _interior(coeffs[c][-1][2], stripe_t, 1).ravel()
+                for stripe_t, coeffs in zip(stripe_list, stripe_coeffs_list)
+            ])
             med = numpy.median(detail_hh)
             mad = numpy.median(numpy.abs(detail_hh - med))
             sigma_noise = mad / 0.6745
 
             # Enforce a minimum noise floor so the filter always does
             # *something* even on high-SNR / well-lit images.
-            min_sigma = float(self.config.get('WAVELET_MIN_SIGMA', 0.005))
             sigma_noise = max(sigma_noise, min_sigma)
 
-            # Apply BayesShrink to each detail level.  The loops have been
-            # flattened/expressed as comprehensions wherever possible to reduce
-            # Python overhead; bands are small so the savings are modest but
-            # measurable.  We also compute the variance once per band.
-            denoised_coeffs = [coeffs[0]]  # keep approximation untouched
-            for detail_level in coeffs[1:]:
-                new_details = []
-                for detail_band in detail_level:
-                    # compute band variance once
-                    var_band = numpy.var(detail_band)
+            # BayesShrink threshold per detail band, the band variance and
+            # maximum are accumulated over the stripes
+            threshold_list = []
+            for i in range(1, levels + 1):
+                level = levels + 1 - i  # coeffs[1] is the coarsest level
+                band_thresholds = []
+                for b in range(3):
+                    band_sum = 0.0
+                    band_sum_sq = 0.0
+                    band_count = 0
+                    band_max = 0.0
+                    for stripe_t, coeffs in zip(stripe_list, stripe_coeffs_list):
+                        band = _interior(coeffs[c][i][b], stripe_t, level).astype(numpy.float64)
+                        if band.size == 0:
+                            continue
+                        band_sum += float(band.sum())
+                        band_sum_sq += float(numpy.square(band).sum())
+                        band_count += band.size
+                        band_max = max(band_max, float(numpy.max(numpy.abs(band))))
+
+                    if band_count:
+                        var_band = band_sum_sq / band_count - (band_sum / band_count) ** 2
+                    else:
+                        var_band = 0.0
+
                     sigma_band = numpy.sqrt(max(var_band - sigma_noise * sigma_noise, 0.0))
                     if sigma_band < 1e-10:
-                        threshold = numpy.max(numpy.abs(detail_band))
+                        threshold = band_max
                     else:
                         threshold = (sigma_noise * sigma_noise) / sigma_band
-                    threshold *= scale
-                    new_details.append(pywt.threshold(detail_band, threshold, mode='soft'))
-                denoised_coeffs.append(tuple(new_details))
+                    band_thresholds.append(threshold * scale)
+                threshold_list.append(band_thresholds)
 
-            # Inverse DWT
-            reconstructed = pywt.waverec2(denoised_coeffs, 'db4')
-            reconstructed = reconstructed[:channel.shape[0], :channel.shape[1]]
+            return threshold_list
 
-            return numpy.clip(reconstructed * dtype_max, 0, dtype_max).astype(orig_dtype)
+        def _inverse_stripe(stripe_coeffs, stripe_shape, threshold_lists):
+            """Soft threshold the detail bands and reconstruct the stripe."""
+            channels = []
+            for coeffs, threshold_list in zip(stripe_coeffs, threshold_lists):
+                denoised_coeffs = [coeffs[0]]  # keep approximation untouched
+                for detail_level, band_thresholds in zip(coeffs[1:], threshold_list):
+                    denoised_coeffs.append(tuple(
+                        pywt.threshold(detail_band, threshold, mode='soft')
+                        for detail_band, threshold in zip(detail_level, band_thresholds)
+                    ))
 
-        # Handle grayscale vs color on the *target* image (small or full).
-        if target.ndim == 2:
-            result_small = _denoise_channel(target)
-        else:
-            futures = [_thread_pool.submit(_denoise_channel, target[:, :, c])
-                       for c in range(target.shape[2])]
-            channels = [f.result() for f in futures]
-            result_small = numpy.stack(channels, axis=2)
+                # Inverse DWT
+                reconstructed = pywt.waverec2(denoised_coeffs, 'db4')
+                reconstructed = reconstructed[:stripe_shape[0], :stripe_shape[1]]
+
+                channels.append(numpy.clip(reconstructed * dtype_max, 0, dtype_max).astype(orig_dtype))
+
+            if len(stripe_shape) == 2:
+                return channels[0]
+            return numpy.stack(channels, axis=2)
+
+        stripe_results = self._tiled.map(_forward_stripe, target, overlap=overlap, align=align)
+        stripe_list = [stripe_t for stripe_t, _ in stripe_results]
+        stripe_coeffs_list = [coeffs for _, coeffs in stripe_results]
+
+        threshold_lists = [_thresholds(stripe_coeffs_list, stripe_list, c)
+                           for c in range(len(stripe_coeffs_list[0]))]
+
+        inverse_args = [(coeffs, target[sy1:sy2].shape, threshold_lists)
+                        for (_, _, sy1, sy2), coeffs in stripe_results]
+        reconstructed_list = self._tiled.starmap(_inverse_stripe, inverse_args)
+
+        result_small = self._tiled.stitch(list(zip(stripe_list, reconstructed_list)))
 
         # Use the denoised result directly
         result = result_small
@@ -3,6 +3,8 @@ import cv2
 import numpy
 import logging
 
+from .maskManager import IndiAllSkyMaskManager
+
 
 logger = logging.getLogger('indi_allsky')
 
@@ -23,15 +25,15 @@ class IndiAllskyDetectLines(object):
     mask_blur_kernel_size = 75
 
 
-    def __init__(self, config, mask=None):
+    def __init__(self, config, mask_manager=None):
         self.config = config
-        self._sqm_mask_dict = mask
 
-        self._line_mask_dict = dict()
-        self._gradient_mask_dict = dict()
-        for binning in self._sqm_mask_dict.keys():
-            self._line_mask_dict[binning] = None
-            self._gradient_mask_dict[binning] = None
+        if isinstance(mask_manager, type(None)):
+            mask_manager = IndiAllSkyMaskManager(self.config)
+
+        self._mask_manager = mask_manager
+
+        self._gradient_alpha_dict = dict()
 
 
         # minimum number of votes (intersections in Hough grid cell)
@@ -39,17 +41,10 @@ class IndiAllskyDetectLines(object):
 
 
     def detectLines(self, original_img, binning):
-        if isinstance(self._line_mask_dict[binning], type(None)):
-            # This only needs to be done once if a mask is not provided
-            self._generateLineMask(original_img, binning)
-
-        if isinstance(self._gradient_mask_dict[binning], type(None)):
-            # This only needs to be done once
-            self._generateGradientMask(original_img, binning)
-
+        gradient_alpha = self._getGradientAlpha(original_img, binning)
 
         # apply the gradient to the image
-        masked_img = (original_img * self._gradient_mask_dict[binning]).astype(numpy.uint8)
+        masked_img = (original_img * gradient_alpha).astype(numpy.uint8)
 
         #cv2.imwrite('/tmp/masked.jpg', masked_img, [cv2.IMWRITE_JPEG_QUALITY, 90])  # debugging
 
@@ -95,71 +90,30 @@ class IndiAllskyDetectLines(object):
         return lines
 
 
-    def _generateLineMask(self, img, binning):
-        logger.info('Generating mask based on SQM_ROI')
-
-        if not isinstance(self._sqm_mask_dict[binning], type(None)):
-            self._line_mask_dict[binning] = self._sqm_mask_dict[binning].copy()  # setup copy because it might be modified
-            return
-
-        image_height, image_width = img.shape[:2]
-
-        # create a black background
-        mask = numpy.zeros((image_height, image_width), dtype=numpy.uint8)
-
-        sqm_roi = self.config.get('SQM_ROI', [])
-
-        try:
-            x1 = int(sqm_roi[0] / binning)
-            y1 = int(sqm_roi[1] / binning)
-            x2 = int(sqm_roi[2] / binning)
-            y2 = int(sqm_roi[3] / binning)
-        except IndexError:
-            logger.warning('Using central ROI for blob calculations')
-            sqm_fov_div = self.config.get('SQM_FOV_DIV', 4)
-            x1 = int((image_width / 2) - (image_width / sqm_fov_div))
-            y1 = int((image_height / 2) - (image_height / sqm_fov_div))
-            x2 = int((image_width / 2) + (image_width / sqm_fov_div))
-            y2 = int((image_height / 2) + (image_height / sqm_fov_div))
-
-        # The white area is what we keep
-        cv2.rectangle(
-            img=mask,
-            pt1=(x1, y1),
-            pt2=(x2, y2),
-            color=255,  # mono
-            thickness=cv2.FILLED,
+    def _getGradientAlpha(self, img, binning):
+        # mask is blurred so that we do not detect its edges as lines
+        gradient_mask = self._mask_manager.gradient_mask(
+            binning,
+            img.shape,
+            self.mask_blur_kernel_size,
+            split_line=self.config.get('IMAGE_STACK_COUNT', 1) > 1 and self.config.get('IMAGE_STACK_SPLIT'),
         )
 
-        # mask needs to be blurred so that we do not detect it as an edge
-        self._line_mask_dict[binning] = mask
 
+        alpha_key = (binning, len(img.shape))
 
-    def _generateGradientMask(self, img, binning):
-        image_height, image_width = img.shape[:2]
+        gradient_alpha = self._gradient_alpha_dict.get(alpha_key)
+        if isinstance(gradient_alpha, type(None)) or gradient_alpha.shape[:2] != gradient_mask.shape[:2]:
+            gradient_alpha = (gradient_mask / 255).astype(numpy.float32)
 
-        if self.config.get('IMAGE_STACK_COUNT', 1) > 1 and self.config.get('IMAGE_STACK_SPLIT'):
-            # mask center line split between panes
-            half_width = int(image_width / 2)
-            cv2.line(
-                img=self._line_mask_dict[binning],
-                pt1=(half_width, 0),
-                pt2=(half_width, image_height),
-                color=0,  # mono
-                thickness=71,
-            )
+            if len(img.shape) != 2:
+                # color, single channel broadcasts across BGR
+                gradient_alpha = gradient_alpha[:, :, numpy.newaxis]
 
-        # blur the mask to prevent mask edges from being detected as lines
-        blur_mask = cv2.blur(self._line_mask_dict[binning], (self.mask_blur_kernel_size, self.mask_blur_kernel_size), cv2.BORDER_DEFAULT)
+            self._gradient_alpha_dict[alpha_key] = gradient_alpha
 
-        if len(img.shape) == 2:
-            # mono
-            mask = blur_mask
-        else:
-            # color
-            mask = cv2.cvtColor(blur_mask, cv2.COLOR_GRAY2BGR)
 
-        self._gradient_mask_dict[binning] = (mask / 255).astype(numpy.float32)
+        return gradient_alpha
 
 
     def _drawLines(self, img, lines):
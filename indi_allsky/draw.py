@@ -2,19 +2,20 @@
 import cv2
 import logging
 
+from .maskManager import IndiAllSkyMaskManager
+
 
 logger = logging.getLogger('indi_allsky')
 
 
 class IndiAllSkyDraw(object):
-    def __init__(self, config, mask=None):
+    def __init__(self, config, mask_manager=None):
         self.config = config
 
-        self._sqm_mask_dict = mask
+        if isinstance(mask_manager, type(None)):
+            mask_manager = IndiAllSkyMaskManager(self.config)
 
-        self._draw_mask_dict = dict()
-        for binning in self._sqm_mask_dict.keys():
-            self._draw_mask_dict[binning] = None
+        self._mask_manager = mask_manager
 
 
     def main(self, data, binning):
@@ -48,12 +49,11 @@ class IndiAllSkyDraw(object):
             data = cv2.flip(data, 1)
 
 
-        if not isinstance(self._sqm_mask_dict[binning], type(None)):
-            self._draw_mask_dict[binning] = self._sqm_mask_dict[binning]
+        draw_mask = self._mask_manager.detection_mask(binning)
 
 
         ### ADU & SQM ROI ###
-        if isinstance(self._draw_mask_dict, type(None)):
+        if isinstance(draw_mask, type(None)):
 
             ### Draw ADU ROI if detection mask is not defined
             ###  Make sure the box calculation matches image.py
@@ -109,7 +109,7 @@ class IndiAllSkyDraw(object):
 
         else:
             # apply mask to image
-            data = cv2.bitwise_and(data, data, mask=self._draw_mask_dict[binning])
+            data = cv2.bitwise_and(data, data, mask=draw_mask)
 
 
         ### Keogram meridian ###
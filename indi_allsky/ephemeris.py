@@ -0,0 +1,244 @@
+### Shared ephemeris service for the sun and moon
+### Rise, set and transit events are cached until they pass, the next event does not change before then.
+### Altitude, azimuth and moon phase are interpolated from a per-minute table that spans the current
+### night (12 hours back and 36 hours ahead) and is rebuilt when a date falls outside of it.
+### Instances are shared per observer location within a process.
+
+import math
+from datetime import datetime
+from datetime import timezone
+import logging
+
+import ephem
+import numpy
+
+from . import constants
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkyEphemeris(object):
+
+    _instance_dict = dict()  # index is (latitude, longitude, elevation)
+    instance_cache_size = 4
+
+    table_step = 60  # seconds
+    table_before = 12 * 3600
+    table_after = 36 * 3600
+
+    # a body that does not rise or set is checked again after this time
+    no_event_cache_seconds = 3600
+
+    _body_classes = {
+        'sun'  : ephem.Sun,
+        'moon' : ephem.Moon,
+    }
+
+
+    def __init__(self, latitude, longitude, elevation=0):
+        self.latitude = float(latitude)
+        self.longitude = float(longitude)
+        self.elevation = int(elevation)
+
+        self._event_dict = dict()
+
+        self._table = None  # (start timestamp, count, dict of arrays), replaced as a whole
+
+
+    @classmethod
+    def get(cls, latitude, longitude, elevation=0):
+        """Return the shared instance for a location"""
+        location_key = (round(float(latitude), 4), round(float(longitude), 4), int(elevation))
+
+        try:
+            return cls._instance_dict[location_key]
+        except KeyError:
+            pass
+
+
+        if len(cls._instance_dict) >= cls.instance_cache_size:
+            # location changed (GPS)
+            cls._instance_dict.clear()
+
+        ephemeris = cls(*location_key)
+        cls._instance_dict[location_key] = ephemeris
+
+        return ephemeris
+
+
+    @classmethod
+    def from_position_av(cls, position_av):
+        return cls.get(
+            position_av[constants.POSITION_LATITUDE],
+            position_av[constants.POSITION_LONGITUDE],
+            position_av[constants.POSITION_ELEVATION],
+        )
+
+
+    def observer(self, date=None):
+        obs = ephem.Observer()
+        obs.lon = math.radians(self.longitude)
+        obs.lat = math.radians(self.latitude)
+        obs.elevation = self.elevation
+
+        # disable atmospheric refraction calcs
+        obs.pressure = 0
+
+        if not isinstance(date, type(None)):
+            obs.date = date
+
+        return obs
+
+
+    def next_event(self, body_name, event, date, horizon=0.0, use_center=False):
+        """Next rising, setting or transit after date
+
+        Returns a dict with the ephem date of the event and the body alt, az and hour angle (degrees) at the
+        event, or None when the body never rises or sets
+        """
+        ts = self._timestamp(date)
+
+        event_key = (body_name, event, float(horizon), bool(use_center))
+
+        cached = self._event_dict.get(event_key)
+        if not isinstance(cached, type(None)):
+            computed_ts, expire_ts, event_data = cached
+
+            # the next event is the same until it passes
+            if computed_ts <= ts < expire_ts:
+                return event_data
+
+
+        obs = self.observer(date)
+        obs.horizon = math.radians(horizon)
+
+        body = self._body_classes[body_name]()
+        body.compute(obs)
+
+        try:
+            if event == 'rising':
+                event_date = obs.next_rising(body, use_center=use_center)
+            elif event == 'setting':
+                event_date = obs.next_setting(body, use_center=use_center)
+            elif event == 'transit':
+                event_date = obs.next_transit(body)
+            else:
+                raise ValueError('Unknown event: {0:s}'.format(str(event)))
+        except (ephem.NeverUpError, ephem.AlwaysUpError):
+            self._event_dict[event_key] = (ts, ts + self.no_event_cache_seconds, None)
+            return None
+
+
+        obs.date = event_date
+        body.compute(obs)
+
+        event_data = {
+            'date' : event_date,
+            'alt'  : math.degrees(body.alt),
+            'az'   : math.degrees(body.az),
+            'ha'   : math.degrees(obs.sidereal_time() - body.ra),
+        }
+
+        self._event_dict[event_key] = (ts, self._timestamp(event_date), event_data)
+
+        return event_data
+
+
+    def alt_az(self, body_name, date):
+        """Interpolated altitude and azimuth in degrees"""
+        table_dict, index, frac = self._table_index(self._timestamp(date))
+
+        alt = self._interp(table_dict['{0:s}_alt'.format(body_name)], index, frac)
+        az = self._interp(table_dict['{0:s}_az'.format(body_name)], index, frac) % 360
+
+        return alt, az
+
+
+    def moon_phase(self, date):
+        """Interpolated moon phase in percent"""
+        table_dict, index, frac = self._table_index(self._timestamp(date))
+
+        return self._interp(table_dict['moon_phase'], index, frac)
+
+
+    def _interp(self, table, index, frac):
+        return float(table[index] + (table[index + 1] - table[index]) * frac)
+
+
+    def _table_index(self, ts):
+        table = self._table
+
+        if isinstance(table, type(None)):
+            table = self._build_table(ts)
+        elif ts < table[0] or ts >= table[0] + (table[1] - 1) * self.table_step:
+            table = self._build_table(ts)
+
+
+        table_start, _, table_dict = table
+
+        x = (ts - table_start) / self.table_step
+        index = int(x)
+
+        return table_dict, index, x - index
+
+
+    def _build_table(self, ts):
+        table_start = (int(ts) // self.table_step) * self.table_step - self.table_before
+        table_count = int((self.table_before + self.table_after) / self.table_step) + 1
+
+        logger.info('Building ephemeris table for %s', datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y-%m-%d %H:%M'))
+
+
+        obs = self.observer()
+        sun = ephem.Sun()
+        moon = ephem.Moon()
+
+        start_date = ephem.Date(datetime.fromtimestamp(table_start, tz=timezone.utc).replace(tzinfo=None))
+        step_days = self.table_step / 86400
+
+
+        sun_alt = numpy.empty(table_count, dtype=numpy.float64)
+        sun_az = numpy.empty(table_count, dtype=numpy.float64)
+        moon_alt = numpy.empty(table_count, dtype=numpy.float64)
+        moon_az = numpy.empty(table_count, dtype=numpy.float64)
+        moon_phase = numpy.empty(table_count, dtype=numpy.float64)
+
+        for i in range(table_count):
+            obs.date = start_date + (i * step_days)
+
+            sun.compute(obs)
+            moon.compute(obs)
+
+            sun_alt[i] = sun.alt
+            sun_az[i] = sun.az
+            moon_alt[i] = moon.alt
+            moon_az[i] = moon.az
+            moon_phase[i] = moon.moon_phase
+
+
+        # azimuth is unwrapped so interpolation across north works
+        table_dict = {
+            'sun_alt'    : numpy.degrees(sun_alt),
+            'sun_az'     : numpy.degrees(numpy.unwrap(sun_az)),
+            'moon_alt'   : numpy.degrees(moon_alt),
+            'moon_az'    : numpy.degrees(numpy.unwrap(moon_az)),
+            'moon_phase' : moon_phase * 100.0,
+        }
+
+        self._table = (table_start, table_count, table_dict)
+
+        return self._table
+
+
+    def _timestamp(self, date):
+        if isinstance(date, datetime):
+            if isinstance(date.tzinfo, type(None)):
+                # naive dates are UTC for ephem
+                return date.replace(tzinfo=timezone.utc).timestamp()
+
+            return date.timestamp()
+
+
+        # ephem.Date
+        return ephem.Date(date).datetime().replace(tzinfo=timezone.utc).timestamp()
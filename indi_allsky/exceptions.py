@@ -49,3 +49,7 @@ class BackupFailure(Exception):
 
 class BinModeException(Exception):
     pass
+
+
+class SortOrderException(Exception):
+    pass
@@ -0,0 +1,123 @@
+### Exposure event signaling between the camera client and the capture loop
+### INDI callbacks (exposure state changes and BLOB arrival) run in the client thread and signal a
+### condition variable.  The capture loop sleeps until an event, the next scheduled frame, or a deadline.
+### Clients without callbacks are polled, but only after the expected end of the exposure.
+
+import time
+import threading
+import logging
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkyExposureEvents(object):
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._serial = 0
+
+        self.last_event = None
+        self.last_event_time = 0.0
+
+
+    @property
+    def serial(self):
+        return self._serial
+
+
+    def notify(self, event):
+        with self._condition:
+            self._serial += 1
+            self.last_event = event
+            self.last_event_time = time.time()
+
+            self._condition.notify_all()
+
+
+    def wait(self, serial, timeout):
+        """Wait for an event newer than serial, returns the current serial"""
+        if timeout <= 0:
+            return self._serial
+
+        with self._condition:
+            self._condition.wait_for(lambda: self._serial != serial, timeout=timeout)
+
+            return self._serial
+
+
+class IndiAllSkyExposureScheduler(object):
+
+    # signal handlers (shutdown, reload) only set flags, they are noticed within this time
+    max_wait = 1.0
+
+    # poll interval for clients that do not signal events
+    poll_interval = 0.05
+
+
+    def __init__(self, events, event_callbacks=True):
+        self.events = events
+        self.event_callbacks = event_callbacks
+
+        self._serial = events.serial
+
+        self._start_delay_count = 0
+        self._start_delay_total = 0.0
+        self._start_delay_max = 0.0
+
+        self._gap_count = 0
+        self._gap_total = 0.0
+        self._gap_max = 0.0
+
+
+    def wait(self, camera_ready, next_frame_time, loop_end, expected_end):
+        """Sleep until something can happen
+
+        camera_ready: the camera is idle, wake for the next frame
+        expected_end: expected end of the current exposure, used for clients without callbacks
+        """
+        now = time.time()
+
+        if camera_ready:
+            deadline = min(next_frame_time, loop_end)
+        elif self.event_callbacks:
+            deadline = loop_end
+        elif now < expected_end:
+            deadline = min(expected_end, loop_end)
+        else:
+            deadline = now + self.poll_interval
+
+
+        timeout = min(deadline - now, self.max_wait)
+
+        self._serial = self.events.wait(self._serial, timeout)
+
+
+    def exposure_started(self, now, scheduled_time):
+        """Log the delay between the scheduled and actual exposure start"""
+        start_delay = now - scheduled_time
+
+        self._start_delay_count += 1
+        self._start_delay_total += start_delay
+        self._start_delay_max = max(self._start_delay_max, start_delay)
+
+        logger.info(
+            'Exposure started %0.1fms after schedule (avg %0.1fms, max %0.1fms)',
+            start_delay * 1000,
+            (self._start_delay_total / self._start_delay_count) * 1000,
+            self._start_delay_max * 1000,
+        )
+
+
+    def exposure_gap(self, gap):
+        """Log the dead time between the end of the previous exposure and the start of the next"""
+        self._gap_count += 1
+        self._gap_total += gap
+        self._gap_max = max(self._gap_max, gap)
+
+        logger.info(
+            'Exposure gap %0.1fms (avg %0.1fms, max %0.1fms)',
+            gap * 1000,
+            (self._gap_total / self._gap_count) * 1000,
+            self._gap_max * 1000,
+        )
@@ -28,6 +28,7 @@ logger = logging.getLogger('indi_allsky')
 class requests_syncapi_v1(GenericFileTransfer):
 
     time_skew = 300  # number of seconds the client is allowed to deviate from server
+    chunk_retries = 3
 
 
     def __init__(self, *args, **kwargs):
@@ -36,6 +37,7 @@ class requests_syncapi_v1(GenericFileTransfer):
         self.client = None
         self._port = 443
         self.url = None
+        self.upload_url = None
         self.apikey = None
 
 
@@ -57,6 +59,7 @@ class requests_syncapi_v1(GenericFileTransfer):
 
 
         self.url = endpoint_url
+        self.upload_url = kwargs.get('upload_url')
 
 
         self.client = requests
@@ -77,6 +80,7 @@ class requests_syncapi_v1(GenericFileTransfer):
         metadata = kwargs['metadata']
         local_file = kwargs['local_file']
         empty_file = kwargs['empty_file']
+        chunk_size = int(kwargs.get('chunk_size', 0))
 
 
         #logger.info('requests URL: %s', self.url)
@@ -94,7 +98,13 @@ class requests_syncapi_v1(GenericFileTransfer):
             if not empty_file:
                 local_file_size = local_file_p.stat().st_size
                 metadata['file_size'] = local_file_size  # needed to validate
-                f_media = io.open(str(local_file_p), 'rb')
+
+                if chunk_size and self.upload_url and local_file_size > chunk_size:
+                    # media is staged on the server, only the metadata is sent with the entry
+                    metadata['upload_sha256'] = self._chunked_upload(local_file_p, local_file_size, chunk_size)
+                    f_media = io.BytesIO(b'')
+                else:
+                    f_media = io.open(str(local_file_p), 'rb')
             else:
                 local_file_size = 1024  # fake
                 f_media = io.BytesIO(b'')  # no data
@@ -121,7 +131,51 @@ class requests_syncapi_v1(GenericFileTransfer):
 
         mp_enc = MultipartEncoder(fields=fields)
 
+        headers = self._headers(json_metadata, mp_enc.content_type)
+
+
+        start = time.time()
 
+        try:
+            # put allows overwrites
+            r = self.client.put(
+                self.url,
+                data=mp_enc,
+                headers=headers,
+                verify=self.verify,
+                timeout=(self.connect_timeout, self.timeout)
+            )
+        except socket.gaierror as e:
+            raise ConnectionFailure(str(e)) from e
+        except socket.timeout as e:
+            raise ConnectionFailure(str(e)) from e
+        except requests.exceptions.ConnectTimeout as e:
+            raise ConnectionFailure(str(e)) from e
+        except requests.exceptions.ConnectionError as e:
+            raise ConnectionFailure(str(e)) from e
+        except requests.exceptions.ReadTimeout as e:
+            raise ConnectionFailure(str(e)) from e
+        except ssl.SSLCertVerificationError as e:
+            raise CertificateValidationFailure(str(e)) from e
+        except requests.exceptions.SSLError as e:
+            raise CertificateValidationFailure(str(e)) from e
+        finally:
+            f_metadata.close()
+            f_media.close()
+
+
+        if r.status_code >= 400:
+            raise TransferFailure('Sync error: {0:d}'.format(r.status_code))
+
+
+        upload_elapsed_s = time.time() - start
+        logger.info('File transferred in %0.4f s (%0.2f kB/s)', upload_elapsed_s, local_file_size / upload_elapsed_s / 1024)
+
+
+        return json.loads(r.text)
+
+
+    def _headers(self, json_metadata, content_type):
         time_floor = math.floor(time.time() / self.time_skew)
 
         # data is received as bytes
@@ -137,16 +191,119 @@ class requests_syncapi_v1(GenericFileTransfer):
         headers = {
             'Authorization' : 'Bearer {0:s}:{1:s}'.format(self.username, message_hmac),
             'Connection'    : 'close',  # no need for keep alives
-            'Content-Type'  : mp_enc.content_type,
+            'Content-Type'  : content_type,
+        }
+
+        return headers
+
+
+    def _chunked_upload(self, local_file_p, local_file_size, chunk_size):
+        file_sha256 = self._file_sha256(local_file_p)
+
+        upload_metadata = {
+            'sha256'    : file_sha256,
+            'file_size' : local_file_size,
         }
 
 
+        # the server reports how much of the content it already has
+        status = self._upload_request('GET', upload_metadata)
+
+        if status['complete']:
+            logger.info('Server already has content %s, skipping transfer', file_sha256)
+            return file_sha256
+
+        if status['offset']:
+            logger.info('Resuming upload of %s at %d/%d bytes', local_file_p.name, status['offset'], local_file_size)
+
+
         start = time.time()
+        sent_bytes = 0
+
+        with io.open(str(local_file_p), 'rb') as f_local:
+            retries = 0
+            resync = False
+
+            while not status['complete']:
+                if resync:
+                    # get the current offset from the server
+                    try:
+                        status = self._upload_request('GET', upload_metadata)
+                    except ConnectionFailure as e:
+                        retries += 1
+                        if retries > self.chunk_retries:
+                            raise
+
+                        logger.warning('Upload status request failed, retrying: %s', str(e))
+                        time.sleep(retries * 2)
+                        continue
+
+                    resync = False
+                    continue
+
+
+                offset = status['offset']
+
+                f_local.seek(offset)
+                chunk = f_local.read(chunk_size)
+
+                upload_metadata['offset'] = offset
+
+                try:
+                    status = self._upload_request('PUT', upload_metadata, data=chunk)
+                except ConnectionFailure as e:
+                    retries += 1
+                    if retries > self.chunk_retries:
+                        raise
+
+                    logger.warning('Chunk upload failed, retrying: %s', str(e))
+                    time.sleep(retries * 2)
+
+                    resync = True
+                    continue
+
+
+                retries = 0
+
+                if status['offset'] == offset:
+                    # no progress, do not loop forever
+                    raise TransferFailure('Chunk upload did not advance at offset {0:d}'.format(offset))
+
+                sent_bytes += max(status['offset'] - offset, 0)
+
+
+        upload_elapsed_s = time.time() - start
+        logger.info('Chunks transferred in %0.4f s (%0.2f kB/s)', upload_elapsed_s, sent_bytes / upload_elapsed_s / 1024)
+
+        return file_sha256
+
+
+    def _upload_request(self, method, upload_metadata, data=b''):
+        json_metadata = json.dumps(upload_metadata)
+        f_metadata = io.StringIO(json_metadata)
+
+        fields = {
+            'metadata' : (
+                'metadata.json',
+                f_metadata,
+                'application/json',
+            ),
+            'media' : (
+                'chunk.bin',
+                io.BytesIO(data),
+                'application/octet-stream',
+            ),
+        }
+
+        mp_enc = MultipartEncoder(fields=fields)
+
+        headers = self._headers(json_metadata, mp_enc.content_type)
+
 
         try:
-            # put allows overwrites
-            r = self.client.put(
-                self.url,
+            r = self.client.request(
+                method,
+                self.upload_url,
                 data=mp_enc,
                 headers=headers,
                 verify=self.verify,
@@ -168,16 +325,29 @@ class requests_syncapi_v1(GenericFileTransfer):
             raise CertificateValidationFailure(str(e)) from e
         finally:
             f_metadata.close()
-            f_media.close()
 
 
+        if r.status_code == 409:
+            # offset mismatch, server returns the offset it expects
+            return json.loads(r.text)
+
         if r.status_code >= 400:
-            raise TransferFailure('Sync error: {0:d}'.format(r.status_code))
+            raise TransferFailure('Sync upload error: {0:d}'.format(r.status_code))
 
 
-        upload_elapsed_s = time.time() - start
-        logger.info('File transferred in %0.4f s (%0.2f kB/s)', upload_elapsed_s, local_file_size / upload_elapsed_s / 1024)
+        return json.loads(r.text)
 
 
-        return json.loads(r.text)
+    def _file_sha256(self, local_file_p):
+        file_hash = hashlib.sha256()
+
+        with io.open(str(local_file_p), 'rb') as f_local:
+            while True:
+                data = f_local.read(1048576)
+                if not data:
+                    break
+
+                file_hash.update(data)
+
+        return file_hash.hexdigest()
 
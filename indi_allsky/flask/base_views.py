@@ -957,28 +957,8 @@ class BaseView(View):
         mask_processor.image = mask_data
 
 
-        if self.indi_allsky_config.get('IMAGE_ROTATE'):
-            mask_processor.rotate_90()
-
-
-        # rotation
-        if self.indi_allsky_config.get('IMAGE_ROTATE_ANGLE'):
-            mask_processor.rotate_angle()
-
-
-        # verticle flip
-        if self.indi_allsky_config.get('IMAGE_FLIP_V'):
-            mask_processor.flip_v()
-
-
-        # horizontal flip
-        if self.indi_allsky_config.get('IMAGE_FLIP_H'):
-            mask_processor.flip_h()
-
-
-        # crop
-        if self.indi_allsky_config.get('IMAGE_CROP_ROI'):
-            mask_processor.crop_image()
+        # rotation, flip and crop
+        mask_processor.transform()
 
 
         # scale
@@ -69,19 +69,17 @@ def _capture(output_path, quality=90, width=None, height=None,
     try:
         client = Picamera2Client()
         exposure = shutter / 1e6 if shutter else None
-        result = client.capture_still(exposure=exposure, gain=gain, timeout=30)
-        client.close()
-        if not result.get('ok'):
-            return False, result.get('error', 'Capture failed')
-
-        # Load the numpy frame and save as JPEG
-        import numpy as np
         try:
             import cv2
         except ImportError:
+            client.close()
             return False, "OpenCV not available"
 
-        frame = np.load(result['frame_path'])
+        frame, result = client.capture_still_array(exposure=exposure, gain=gain, timeout=30)
+        client.close()
+        if frame is None:
+            return False, result.get('error', 'Capture failed')
+
         bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
         cv2.imwrite(output_path, bgr, [cv2.IMWRITE_JPEG_QUALITY, quality])
         return True, ""
@@ -133,14 +131,17 @@ class MJPEGStreamManager:
     """Reads JPEG frames from the picamera2 daemon's shared memory.
 
     No subprocess — the daemon owns the camera and both capture and
-    streaming read from the same shared frame buffer.
+    streaming read from the same shared frame buffer.  A single reader
+    thread blocks on the daemon's new-frame notifications and fans frames
+    out to every connected client through a :class:`FrameBroadcast`.
     """
 
     def __init__(self):
+        from ..camera.frame_broadcast import FrameBroadcast
         self._lock = threading.Lock()
         self._client = None
         self._frame = None
-        self._frame_event = threading.Event()
+        self._broadcast = FrameBroadcast()
         self._client_count = 0
         self._settings = {}
         self._running = False
@@ -165,18 +166,20 @@ class MJPEGStreamManager:
             if settings is None:
                 settings = {}
             self._settings = settings
+            if self._running:
+                return True, ""
             self._running = True
             self._frame_count = 0
+            self._last_seq = -1
             self._start_time = time.monotonic()
+            self._broadcast.reset()
             self._client = Picamera2Client()
             self._reader_thread = threading.Thread(
                 target=self._read_frames, daemon=True)
             self._reader_thread.start()
         # Wait for first frame (up to 5s)
-        for _ in range(50):
-            if self._frame is not None:
-                return True, ""
-            time.sleep(0.1)
+        if self._broadcast.wait_latest(timeout=5.0) is not None:
+            return True, ""
         if self._running:
             return True, ""  # daemon running but slow
         return False, "No frames from picamera2 daemon"
@@ -184,6 +187,13 @@ class MJPEGStreamManager:
     def stop(self):
         with self._lock:
             self._running = False
+            self._broadcast.close()
+            reader_thread = self._reader_thread
+            self._reader_thread = None
+        if reader_thread is not None and reader_thread is not threading.current_thread():
+            # the reader wakes at least once per second
+            reader_thread.join(timeout=2.0)
+        with self._lock:
             if self._client:
                 self._client.close()
                 self._client = None
@@ -210,45 +220,81 @@ class MJPEGStreamManager:
         return True, ""
 
     def _read_frames(self):
-        """Poll shared memory for new JPEG frames from the daemon.
+        """Single reader: wait for the daemon's new-frame signal, publish once.
 
         Only updates when a genuinely new frame arrives (seq changes).
         Metadata is fetched once per new frame, not continuously.
         """
+        client = self._client
         while self._running:
             try:
-                result = self._client.get_stream_jpeg()
-                if result is not None:
-                    jpeg, seq = result
-                    if seq != self._last_seq:
-                        self._last_seq = seq
-                        self._frame = jpeg
-                        self._frame_count += 1
-                        self._frame_event.set()
-                        self._frame_event.clear()
-                        # Fetch metadata only when we have a new frame
-                        try:
-                            meta_resp = self._client.get_metadata()
-                            if meta_resp.get('ok'):
-                                self._metadata = meta_resp.get('metadata', {})
-                        except Exception:
-                            pass
+                seq = client.wait_frame(self._last_seq, timeout=1.0)
+                if seq is None:
+                    continue
+                part = self._read_part(client)
+                if part is None:
+                    continue
+                part, jpeg, seq = part
+                if seq == self._last_seq:
+                    continue
+                self._last_seq = seq
+                self._frame = jpeg
+                self._frame_count += 1
+                # every client sends this same object, no per-client copies
+                self._broadcast.publish(part, seq)
+                # Fetch metadata only when we have a new frame
+                try:
+                    meta_resp = client.get_metadata()
+                    if meta_resp.get('ok'):
+                        self._metadata = meta_resp.get('metadata', {})
+                except Exception:
+                    pass
             except Exception:
-                pass
-            time.sleep(0.1)  # poll rate — no need to be faster than frame rate
+                # daemon restarting — reconnect on the next pass
+                try:
+                    client.close()
+                except Exception:
+                    pass
+                time.sleep(1.0)
+
+    def _read_part(self, client):
+        """Build the multipart chunk straight from the shm ring slot.
+
+        The JPEG is copied exactly once, from the zero-copy slot view into
+        the MJPEG part.  Returns (part, jpeg_view, seq) or None if the
+        slot was overwritten while copying.
+        """
+        view = client.get_stream_view()
+        if view is None:
+            return None
+        with view:
+            head = (b'--frame\r\n'
+                    b'Content-Type: image/jpeg\r\n'
+                    b'Content-Length: ' + str(len(view.data)).encode() + b'\r\n'
+                    b'\r\n')
+            part = b''.join((head, view.data, b'\r\n'))
+            if not view.valid():
+                return None
+            seq = view.seq
+        jpeg = memoryview(part)[len(head):-2]
+        return part, jpeg, seq
 
     def get_frame(self, timeout=5.0):
-        if self._frame is not None:
-            return self._frame
-        self._frame_event.wait(timeout=timeout)
+        if self._broadcast.wait_latest(timeout=timeout) is None:
+            return None
         return self._frame
 
     def wait_new_frame(self, last_count, timeout=5.0):
         deadline = time.monotonic() + timeout
-        while self._running and time.monotonic() < deadline:
-            if self._frame_count > last_count and self._frame is not None:
-                return self._frame, self._frame_count
-            time.sleep(0.02)
+        with self._broadcast.subscribe(include_latest=self._frame_count > last_count) as sub:
+            while self._running:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if sub.get(timeout=remaining) is not None:
+                    return self._frame, self._frame_count
+                if sub.closed:
+                    break
         return None, last_count
 
     def generate(self):
@@ -259,21 +305,18 @@ class MJPEGStreamManager:
         latest is sent — intermediates are dropped.
         """
         self._client_count += 1
+        sub = self._broadcast.subscribe()
         try:
             while self._running:
-                # Always grab whatever is latest RIGHT NOW
-                frame = self._frame
-                seq = self._last_seq
-                if frame is not None:
-                    yield (b'--frame\r\n'
-                           b'Content-Type: image/jpeg\r\n'
-                           b'Content-Length: ' + str(len(frame)).encode() + b'\r\n'
-                           b'\r\n' + frame + b'\r\n')
-                # Wait for a NEW frame (seq must change)
-                wait_for = seq
-                while self._running and self._last_seq == wait_for:
-                    self._frame_event.wait(timeout=1)
+                result = sub.get(timeout=1.0)
+                if result is None:
+                    if sub.closed:
+                        break  # stream stopped
+                    continue
+                part, seq = result
+                yield part
         finally:
+            sub.close()
             self._client_count -= 1
 
     def get_settings(self):
@@ -574,10 +617,7 @@ class StreamMJPEGMethodView(View):
         """MJPEG multipart stream - connect <img src> directly to this."""
         _ensure_stream()
         # Wait up to 5s for first frame
-        for _ in range(50):
-            if _stream.running and _stream._frame is not None:
-                break
-            time.sleep(0.1)
+        _stream.get_frame(timeout=5.0)
         if not _stream.running:
             return jsonify({"error": "Stream failed to start."}), 500
         return Response(
@@ -857,9 +897,20 @@ def register_websocket(app):
 
         try:
             while True:
+                # Block until the daemon signals a new frame (the first
+                # frame is sent immediately on connect)
+                if sent_initial:
+                    try:
+                        if client.wait_frame(last_seq, timeout=1.0) is None:
+                            continue
+                    except (ConnectionError, OSError):
+                        client.close()
+                        time.sleep(1.0)
+                        continue
+
                 # Always grab the most recent frame from shm
-                result = client.get_stream_jpeg()
-                if result is None:
+                view = client.get_stream_view()
+                if view is None:
                     time.sleep(0.1)
                     try:
                         ws.send(b"")
@@ -867,7 +918,8 @@ def register_websocket(app):
                         break
                     continue
 
-                jpeg, seq = result
+                jpeg = view.data
+                seq = view.seq
 
                 # Always send the first frame immediately on connect,
                 # even if it's the same seq (stale from a long exposure)
@@ -876,7 +928,7 @@ def register_websocket(app):
                     last_seq = seq
                     frame_count += 1
                 elif seq == last_seq:
-                    time.sleep(0.1)
+                    view.release()
                     continue
                 else:
                     last_seq = seq
@@ -922,7 +974,12 @@ def register_websocket(app):
                 try:
                     meta_bytes = json.dumps(meta, separators=(",", ":"), default=str).encode("utf-8")
                     header = struct.pack(">I", len(meta_bytes))
-                    ws.send(header + meta_bytes + jpeg)
+                    with view:
+                        # single copy out of the ring slot
+                        message = b"".join((header, meta_bytes, jpeg))
+                        if not view.valid():
+                            continue  # slot overwritten while copying
+                    ws.send(message)
                 except Exception:
                     break
         finally:
@@ -1325,6 +1325,17 @@ def IMAGE_QUEUE_BACKOFF_validator(form, field):
         raise ValidationError('Backoff multiplier must be greater than 0')
 
 
+def IMAGE_WORKERS_validator(form, field):
+    if not isinstance(field.data, int):
+        raise ValidationError('Please enter valid number')
+
+    if field.data < 1:
+        raise ValidationError('Worker count must be 1 or greater')
+
+    if field.data > 8:
+        raise ValidationError('Worker count must be less than 9')
+
+
 def IMAGE_FILE_TYPE_validator(form, field):
     if field.data not in list(zip(*form.IMAGE_FILE_TYPE_choices))[0]:
         raise ValidationError('Please select a valid file type')
@@ -2308,6 +2319,17 @@ def SYNCAPI__TIMEOUT_validator(form, field):
         raise ValidationError('Timeout must be 1200 or less')
 
 
+def SYNCAPI__CHUNK_SIZE_validator(form, field):
+    if not isinstance(field.data, int):
+        raise ValidationError('Please enter valid number')
+
+    if field.data < 0:
+        raise ValidationError('Chunk size must be 0 or greater')
+
+    if field.data > 1024:
+        raise ValidationError('Chunk size must be 1024 or less')
+
+
 def FILETRANSFER__PRIVATE_KEY_validator(form, field):
     if not field.data:
         return
@@ -4344,6 +4366,7 @@ class IndiAllskyConfigForm(FlaskForm):
     CCD_BIT_DEPTH                    = SelectField('Camera Bit Depth', choices=CCD_BIT_DEPTH_choices, validators=[CCD_BIT_DEPTH_validator])
     EXPOSURE_PERIOD                  = FloatField('Exposure Period (Night)', validators=[DataRequired(), EXPOSURE_PERIOD_validator])
     EXPOSURE_PERIOD_DAY              = FloatField('Exposure Period (Day)', validators=[DataRequired(), EXPOSURE_PERIOD_DAY_validator])
+    CONTINUOUS_CAPTURE               = BooleanField('Continuous Capture')
     CAMERA_SQM__ENABLE               = BooleanField('Enable Camera SQM')
     CAMERA_SQM__ENABLE_DAY           = BooleanField('Enable Daytime SQM')
     CAMERA_SQM__EXPOSURE             = FloatField('Camera SQM Exposure', validators=[DataRequired(), CAMERA_SQM__EXPOSURE_validator])
@@ -4493,6 +4516,7 @@ class IndiAllskyConfigForm(FlaskForm):
     STARTRAILS__IMAGE_CIRCLE_MASK_OPACITY   = IntegerField('Mask Opacity %', validators=[IMAGE_CIRCLE_MASK__OPACITY_validator])
     IMAGE_CALIBRATE_DARK             = BooleanField('Apply Dark Calibration Frames')
     IMAGE_CALIBRATE_BPM              = BooleanField('Apply Bad Pixel Map Frames')
+    IMAGE_CALIBRATE_BPM_MEDIAN       = BooleanField('Replace Bad Pixels')
     IMAGE_CALIBRATE_FIX_HOLES        = BooleanField('Fix Calibration Pin Holes')
     IMAGE_CALIBRATE_HOLE_THOLD       = IntegerField('Hole ADU Threshold %', validators=[IMAGE_CALIBRATE_HOLE_THOLD_validator])
     IMAGE_CALIBRATE_MANUAL_OFFSET    = IntegerField('Manual Offset', validators=[IMAGE_CALIBRATE_MANUAL_OFFSET_validator])
@@ -4514,6 +4538,9 @@ class IndiAllskyConfigForm(FlaskForm):
     IMAGE_FLIP_V                     = BooleanField('Flip Image Vertically')
     IMAGE_FLIP_H                     = BooleanField('Flip Image Horizontally')
     IMAGE_SCALE                      = IntegerField('Image Scaling', validators=[DataRequired(), IMAGE_SCALE_validator])
+    IMAGE_SCALE_EARLY                = BooleanField('Early Scaling')
+    IMAGE_SOFTWARE_BIN               = BooleanField('Software Binning 2x2')
+    IMAGE_PROCESSING_BUDGET          = BooleanField('Processing Budget')
     IMAGE_CIRCLE_MASK__ENABLE        = BooleanField('Enable Image Circle Mask')
     IMAGE_CIRCLE_MASK__DIAMETER      = IntegerField('Mask Diameter', validators=[DataRequired(), IMAGE_CIRCLE_MASK__DIAMETER_validator])
     IMAGE_CIRCLE_MASK__OFFSET_X      = IntegerField('Mask X Offset', validators=[IMAGE_CIRCLE_MASK__OFFSET_X_validator], render_kw={'readonly' : True, 'disabled' : 'disabled'})
@@ -4530,6 +4557,7 @@ class IndiAllskyConfigForm(FlaskForm):
     IMAGE_QUEUE_MAX                  = IntegerField('Image Queue Maximum', validators=[IMAGE_QUEUE_MAX_validator])
     IMAGE_QUEUE_MIN                  = IntegerField('Image Queue Minimum', validators=[IMAGE_QUEUE_MIN_validator])
     IMAGE_QUEUE_BACKOFF              = FloatField('Image Queue Backoff Multiplier', validators=[IMAGE_QUEUE_BACKOFF_validator])
+    IMAGE_WORKERS                    = IntegerField('Image Workers', validators=[DataRequired(), IMAGE_WORKERS_validator])
     IMAGE_SAVE_HOOK_PRE              = StringField('Image Pre-Save Hook', validators=[SCRIPT_validator])
     IMAGE_SAVE_HOOK_POST             = StringField('Image Post-Save Hook', validators=[SCRIPT_validator])
     IMAGE_SAVE_HOOK_TIMEOUT          = IntegerField('Image Save Hook Timeout', validators=[DataRequired(), HOOK_TIMEOUT_validator])
@@ -4764,6 +4792,7 @@ class IndiAllskyConfigForm(FlaskForm):
     SYNCAPI__UPLOAD_VIDEO            = BooleanField('Transfer videos', render_kw={'disabled' : 'disabled'})
     SYNCAPI__CONNECT_TIMEOUT         = FloatField('Connect Timeout', validators=[DataRequired(), SYNCAPI__TIMEOUT_validator])
     SYNCAPI__TIMEOUT                 = FloatField('Read Timeout', validators=[DataRequired(), SYNCAPI__TIMEOUT_validator])
+    SYNCAPI__CHUNK_SIZE              = IntegerField('Chunk Size (MB)', validators=[SYNCAPI__CHUNK_SIZE_validator])
     YOUTUBE__ENABLE                  = BooleanField('Enable')
     YOUTUBE__SECRETS_FILE            = StringField('Client Secrets File', validators=[YOUTUBE__SECRETS_FILE_validator])
     YOUTUBE__PRIVACY_STATUS          = SelectField('Privacy Status', choices=YOUTUBE__PRIVACY_STATUS_choices, validators=[DataRequired(), YOUTUBE__PRIVACY_STATUS_validator])
@@ -9021,6 +9050,7 @@ class IndiAllskyImageProcessingForm(FlaskForm):
     LENS_AZIMUTH                     = FloatField('Azimuth', validators=[LENS_AZIMUTH_validator])
     IMAGE_CALIBRATE_DARK             = BooleanField('Dark Frame Calibration')
     IMAGE_CALIBRATE_BPM              = BooleanField('Bad Pixel Map Calibration')
+    IMAGE_CALIBRATE_BPM_MEDIAN       = BooleanField('Replace Bad Pixels')
     IMAGE_CALIBRATE_MANUAL_OFFSET    = IntegerField('Manual Offset', validators=[IMAGE_CALIBRATE_MANUAL_OFFSET_validator])
     IMAGE_CALIBRATE_FIX_HOLES        = BooleanField('Fix Calibration Holes')
     IMAGE_CALIBRATE_HOLE_THOLD       = IntegerField('Hole ADU Threshold %', validators=[IMAGE_CALIBRATE_HOLE_THOLD_validator])
@@ -2,7 +2,6 @@ from datetime import datetime
 from datetime import timedelta
 from pathlib import Path
 import uuid
-import io
 import logging
 #from pprint import pformat
 
@@ -37,7 +36,8 @@ from sqlalchemy import or_
 from sqlalchemy.orm.exc import NoResultFound
 
 from .. import constants
-#from ..exceptions import BadImage
+from ..exceptions import BadImage
+from ..thumbnail import IndiAllSkyThumbnail
 
 logger = logging.getLogger('indi_allsky')
 
@@ -53,6 +53,8 @@ class miscDb(object):
             self.image_dir = Path(__file__).parent.parent.joinpath('html', 'images').absolute()
 
 
+        self._thumbnail = IndiAllSkyThumbnail(self.config)
+
 
     def addCamera(self, metadata):
         now = datetime.now()
@@ -1190,113 +1192,30 @@ class miscDb(object):
             # process numpy data
             img = numpy_data
 
-        elif image_entry:
-            # use alternate image entry
-            filename_p = Path(image_entry.getFilesystemPath())
-
-            if not filename_p.exists():
-                logger.error('Cannot create thumbnail - File not found: %s', filename_p)
-                return
-
-
-            if filename_p.suffix in ('.jpg', '.jpeg'):
-                import simplejpeg
-
-                try:
-                    with io.open(str(filename_p), 'rb') as f_img:
-                        img = simplejpeg.decode_jpeg(f_img.read(), colorspace='BGR')
-                except ValueError as e:
-                    logger.error('Cannot create thumbnail - Bad Image - %s: %s', str(e), filename_p)
-                    return
-            elif filename_p.suffix in ('.png',):
-                # opencv is faster than Pillow with PNG
-                img = cv2.imread(str(filename_p), cv2.IMREAD_COLOR)
-
-                if isinstance(img, type(None)):
-                    logger.error('Cannot create thumbnail - Bad Image: %s', filename_p)
-                    return
+        else:
+            if image_entry:
+                # use alternate image entry
+                filename_p = Path(image_entry.getFilesystemPath())
             else:
-                # Pillow supports remaining image types
-                import numpy
-                import PIL
-                from PIL import Image
-
-                try:
-                    with Image.open(str(filename_p)) as img_pil:
-                        img = cv2.cvtColor(numpy.array(img_pil), cv2.COLOR_RGB2BGR)
-                except PIL.UnidentifiedImageError:
-                    logger.error('Cannot create thumbnail - Bad Image: %s', filename_p)
-                    return
+                # use entry file on filesystem
+                filename_p = Path(entry.getFilesystemPath())
 
-        else:
-            # use entry file on filesystem
-            filename_p = Path(entry.getFilesystemPath())
 
             if not filename_p.exists():
                 logger.error('Cannot create thumbnail - File not found: %s', filename_p)
                 return
 
 
-            if filename_p.suffix in ('.jpg', '.jpeg'):
-                import simplejpeg
-
-                try:
-                    with io.open(str(filename_p), 'rb') as f_img:
-                        img = simplejpeg.decode_jpeg(f_img.read(), colorspace='BGR')
-                except ValueError as e:
-                    logger.error('Cannot create thumbnail - Bad Image - %s: %s', str(e), filename_p)
-                    return
-
-            elif filename_p.suffix in ('.png',):
-                # opencv is faster than Pillow with PNG
-                img = cv2.imread(str(filename_p), cv2.IMREAD_COLOR)
-
-                if isinstance(img, type(None)):
-                    logger.error('Cannot create thumbnail - Bad Image: %s', filename_p)
-                    return
-
-            else:
-                # Pillow supports remaining image types
-                import numpy
-                import PIL
-                from PIL import Image
-
-                try:
-                    with Image.open(str(filename_p)) as img_pil:
-                        img = cv2.cvtColor(numpy.array(img_pil), cv2.COLOR_RGB2BGR)
-                except PIL.UnidentifiedImageError:
-                    logger.error('Cannot create thumbnail - Bad Image: %s', filename_p)
-                    return
-
-
-        img_height, img_width = img.shape[:2]
-
-        if img_width >= img_height:
-            scale = new_width / img_width
-            thumb_width = int(new_width)
-            thumb_height = int(img_height * scale)
-        else:
-            # scale based on height
-            scale = opt_height / img_height
-            thumb_width = int(img_width * scale)
-            thumb_height = int(opt_height)
-
-
-        thumbnail_data = cv2.resize(img, (thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
-
-
-        mod_height = thumb_height % 2
-        mod_width = thumb_width % 2
+            try:
+                # decoded at reduced resolution
+                img = self._thumbnail.load(filename_p, new_width, opt_height)
+            except BadImage as e:
+                logger.error('Cannot create thumbnail - %s: %s', str(e), filename_p)
+                return
 
-        if mod_height or mod_width:
-            # width and height needs to be divisible by 2
-            thumb_height -= mod_height
-            thumb_width -= mod_width
 
-            thumbnail_data = thumbnail_data[
-                0:thumb_height,
-                0:thumb_width,
-            ]
+        thumbnail_data = self._thumbnail.resize(img, new_width, opt_height)
+        thumb_height, thumb_width = thumbnail_data.shape[:2]
 
 
         # insert new metadata
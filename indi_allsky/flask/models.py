@@ -410,6 +410,19 @@ class IndiAllSkyDbBadPixelMapTable(IndiAllSkyDbFileBase):
         return '<BadPixelMap {0:s}>'.format(self.filename)
 
 
+    def deleteFile(self):
+        super(IndiAllSkyDbBadPixelMapTable, self).deleteFile()
+
+        # sparse bad pixel map
+        sparse_p = self.getFilesystemPath().with_suffix('.npz')
+
+        try:
+            sparse_p.unlink()
+        except FileNotFoundError:
+            pass
+        # do not catch OSError here
+
+
     @property
     def remote_url(self):
         # virtual property
@@ -1,3 +1,5 @@
+import io
+import os
 import time
 import math
 from datetime import datetime
@@ -6,6 +8,7 @@ from pathlib import Path
 import hashlib
 import hmac
 import json
+import re
 import tempfile
 import shutil
 
@@ -69,6 +72,11 @@ class SyncApiBaseView(BaseView):
             self.image_dir = Path(__file__).parent.parent.parent.joinpath('html', 'images').absolute()
 
 
+        # chunked uploads are staged outside of the web accessible image folder
+        varlib_folder = self.indi_allsky_config.get('VARLIB_FOLDER', '/var/lib/indi-allsky')
+        self.staging_dir = Path(varlib_folder).joinpath('sync_staging')
+
+
     def dispatch_request(self):
         try:
             #time.sleep(10)  # testing
@@ -99,7 +107,16 @@ class SyncApiBaseView(BaseView):
     def post(self, overwrite=False):
         metadata = self.saveMetadata(request.files['metadata'])
 
-        tmp_media_file_p = self.saveMedia(request.files['media'])
+        staged_file_p = None
+        if metadata.get('upload_sha256'):
+            # media was previously transferred with the chunked upload endpoint
+            try:
+                staged_file_p, tmp_media_file_p = self.claimStagedMedia(metadata, request.files['media'])
+            except EntryMissing as e:
+                app.logger.error('Transfer failed: %s', str(e))
+                return jsonify({'error' : 'upload_missing'}), 400
+        else:
+            tmp_media_file_p = self.saveMedia(request.files['media'])
 
 
         media_file_size = tmp_media_file_p.stat().st_size
@@ -122,6 +139,14 @@ class SyncApiBaseView(BaseView):
             return jsonify({'error' : 'file_exists'}), 400
 
 
+        if staged_file_p:
+            # only remove the staged upload once the entry is committed
+            try:
+                staged_file_p.unlink()
+            except FileNotFoundError:
+                pass
+
+
         return jsonify({
             'id'   : file_entry.id,
             'url'  : str(file_entry.getUrl(local=True)),
@@ -328,6 +353,45 @@ class SyncApiBaseView(BaseView):
         return tmp_media_p
 
 
+    def getStagedPaths(self, sha256):
+        if not re.search(r'^[0-9a-f]{64}$', str(sha256)):
+            raise EntryError('Invalid upload hash')
+
+        part_file_p = self.staging_dir.joinpath('{0:s}.part'.format(sha256))
+        complete_file_p = self.staging_dir.joinpath('{0:s}.upload'.format(sha256))
+
+        return part_file_p, complete_file_p
+
+
+    def claimStagedMedia(self, metadata, media_file):
+        try:
+            part_file_p, complete_file_p = self.getStagedPaths(metadata['upload_sha256'])
+        except EntryError as e:
+            raise EntryMissing(str(e)) from e
+
+
+        if not complete_file_p.exists():
+            raise EntryMissing('Staged upload missing: {0:s}'.format(metadata['upload_sha256']))
+
+
+        media_file_p = Path(media_file.filename)  # need this for the extension
+
+        f_tmp_media = tempfile.NamedTemporaryFile(mode='wb', dir=str(self.staging_dir), delete=False, suffix=media_file_p.suffix)
+        f_tmp_media.close()
+
+        tmp_media_p = Path(f_tmp_media.name)
+        tmp_media_p.unlink()
+
+        # hard link keeps the staged upload available if processing fails
+        try:
+            os.link(str(complete_file_p), str(tmp_media_p))
+        except OSError:
+            shutil.copy2(str(complete_file_p), str(tmp_media_p))
+
+
+        return complete_file_p, tmp_media_p
+
+
     #def put(self):
     #    #media_file = request.files.get('media')
     #    pass
@@ -475,6 +539,166 @@ class SyncApiCameraView(SyncApiBaseView):
         return jsonify({'error' : 'not_implemented'}), 400
 
 
+class SyncApiUploadView(SyncApiBaseView):
+    decorators = []
+
+    staging_expire = 259200  # seconds before abandoned uploads are removed
+
+
+    def get(self):
+        metadata = self.saveMetadata(request.files['metadata'])
+        # no media
+
+        try:
+            status = self.getUploadStatus(metadata)
+        except EntryError as e:
+            app.logger.error('Upload status failed: %s', str(e))
+            return jsonify({'error' : 'invalid_upload'}), 400
+
+
+        if status['offset'] == 0:
+            # good time to cleanup
+            self.expireStaging()
+
+
+        return jsonify(status)
+
+
+    def post(self, overwrite=False):
+        metadata = self.saveMetadata(request.files['metadata'])
+
+        try:
+            status = self.getUploadStatus(metadata)
+            offset = int(metadata['offset'])
+        except (EntryError, KeyError, ValueError) as e:
+            app.logger.error('Upload failed: %s', str(e))
+            return jsonify({'error' : 'invalid_upload'}), 400
+
+
+        if status['complete']:
+            # content already exists, nothing to transfer
+            return jsonify(status)
+
+
+        part_file_p, complete_file_p = self.getStagedPaths(status['sha256'])
+
+        if offset != status['offset']:
+            # client needs to seek to the offset the server has
+            status['error'] = 'offset_mismatch'
+            return jsonify(status), 409
+
+
+        with io.open(str(part_file_p), 'ab') as f_part:
+            shutil.copyfileobj(request.files['media'].stream, f_part)
+
+
+        part_size = part_file_p.stat().st_size
+        if part_size > status['file_size']:
+            app.logger.error('Upload exceeded expected size: %s', part_file_p.name)
+            part_file_p.unlink()
+            return jsonify({'error' : 'size_mismatch'}), 400
+
+
+        if part_size == status['file_size']:
+            if self.fileSha256(part_file_p) != status['sha256']:
+                app.logger.error('Upload hash mismatch: %s', part_file_p.name)
+                part_file_p.unlink()
+                return jsonify({'error' : 'hash_mismatch'}), 400
+
+            part_file_p.rename(complete_file_p)
+            app.logger.info('Upload complete: %s (%d bytes)', status['sha256'], part_size)
+
+
+        return jsonify(self.getUploadStatus(metadata))
+
+
+    def put(self, overwrite=True):
+        return self.post(overwrite=overwrite)
+
+
+    def delete(self):
+        metadata = self.saveMetadata(request.files['metadata'])
+
+        try:
+            part_file_p, complete_file_p = self.getStagedPaths(metadata.get('sha256'))
+        except EntryError as e:
+            app.logger.error('Upload delete failed: %s', str(e))
+            return jsonify({'error' : 'invalid_upload'}), 400
+
+        for staged_file_p in (part_file_p, complete_file_p):
+            try:
+                staged_file_p.unlink()
+            except FileNotFoundError:
+                pass
+
+        return jsonify({})
+
+
+    def getUploadStatus(self, metadata):
+        try:
+            sha256 = str(metadata['sha256'])
+            file_size = int(metadata['file_size'])
+        except (KeyError, ValueError) as e:
+            raise EntryError('Invalid upload metadata') from e
+
+
+        part_file_p, complete_file_p = self.getStagedPaths(sha256)
+
+        if not self.staging_dir.exists():
+            self.staging_dir.mkdir(mode=0o755, parents=True)
+
+
+        if complete_file_p.exists():
+            offset = complete_file_p.stat().st_size
+        elif part_file_p.exists():
+            offset = part_file_p.stat().st_size
+        else:
+            offset = 0
+
+
+        if offset > file_size:
+            raise EntryError('Staged upload larger than file size')
+
+
+        return {
+            'sha256'    : sha256,
+            'file_size' : file_size,
+            'offset'    : offset,
+            'ranges'    : [[0, offset]] if offset else [],  # chunks are always appended
+            'complete'  : complete_file_p.exists(),
+        }
+
+
+    def fileSha256(self, file_p):
+        file_hash = hashlib.sha256()
+
+        with io.open(str(file_p), 'rb') as f_file:
+            while True:
+                data = f_file.read(1048576)
+                if not data:
+                    break
+
+                file_hash.update(data)
+
+        return file_hash.hexdigest()
+
+
+    def expireStaging(self):
+        expire_time = time.time() - self.staging_expire
+
+        for staged_file_p in self.staging_dir.iterdir():
+            if not staged_file_p.is_file():
+                continue
+
+            try:
+                if staged_file_p.stat().st_mtime < expire_time:
+                    app.logger.warning('Removing expired upload: %s', staged_file_p.name)
+                    staged_file_p.unlink()
+            except FileNotFoundError:
+                # removed by another request
+                pass
+
+
 class SyncApiBaseImageView(SyncApiBaseView):
     decorators = []
 
@@ -824,5 +1048,6 @@ bp_syncapi_allsky.add_url_rule('/sync/v1/rawimage', view_func=SyncApiRawImageVie
 bp_syncapi_allsky.add_url_rule('/sync/v1/fitsimage', view_func=SyncApiFitsImageView.as_view('syncapi_v1_fitsimage_view'), methods=['GET', 'POST', 'PUT', 'DELETE'])
 bp_syncapi_allsky.add_url_rule('/sync/v1/panoramaimage', view_func=SyncApiPanoramaImageView.as_view('syncapi_v1_panoramaimage_view'), methods=['GET', 'POST', 'PUT', 'DELETE'])
 bp_syncapi_allsky.add_url_rule('/sync/v1/panoramavideo', view_func=SyncApiPanoramaVideoView.as_view('syncapi_v1_panorama_video_view'), methods=['GET', 'POST', 'PUT', 'DELETE'])
+bp_syncapi_allsky.add_url_rule('/sync/v1/upload', view_func=SyncApiUploadView.as_view('syncapi_v1_upload_view'), methods=['GET', 'POST', 'PUT', 'DELETE'])
 bp_syncapi_allsky.add_url_rule('/sync/v1/thumbnail', view_func=SyncApiThumbnailView.as_view('syncapi_v1_thumbnail_view'), methods=['GET', 'POST', 'PUT', 'DELETE'])
 
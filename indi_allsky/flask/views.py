@@ -2260,6 +2260,7 @@ class ConfigView(FormView):
             'CCD_BIT_DEPTH'                  : str(self.indi_allsky_config.get('CCD_BIT_DEPTH', 0)),  # string in form, int in config
             'EXPOSURE_PERIOD'                : self.indi_allsky_config.get('EXPOSURE_PERIOD', 15.0),
             'EXPOSURE_PERIOD_DAY'            : self.indi_allsky_config.get('EXPOSURE_PERIOD_DAY', 15.0),
+            'CONTINUOUS_CAPTURE'             : self.indi_allsky_config.get('CONTINUOUS_CAPTURE', False),
             'CAMERA_SQM__ENABLE'             : self.indi_allsky_config.get('CAMERA_SQM', {}).get('ENABLE', False),
             'CAMERA_SQM__ENABLE_DAY'         : self.indi_allsky_config.get('CAMERA_SQM', {}).get('ENABLE_DAY', False),
             'CAMERA_SQM__EXPOSURE'           : '{0:.6f}'.format(self.indi_allsky_config.get('CAMERA_SQM', {}).get('EXPOSURE', 10.0)),  # force 6 digits of precision
@@ -2401,6 +2402,7 @@ class ConfigView(FormView):
             'STARTRAILS__IMAGE_CIRCLE_MASK_OPACITY' : self.indi_allsky_config.get('STARTRAILS', {}).get('IMAGE_CIRCLE_MASK_OPACITY', 100),
             'IMAGE_CALIBRATE_DARK'           : self.indi_allsky_config.get('IMAGE_CALIBRATE_DARK', True),
             'IMAGE_CALIBRATE_BPM'            : self.indi_allsky_config.get('IMAGE_CALIBRATE_BPM', False),
+            'IMAGE_CALIBRATE_BPM_MEDIAN'     : self.indi_allsky_config.get('IMAGE_CALIBRATE_BPM_MEDIAN', False),
             'IMAGE_CALIBRATE_FIX_HOLES'      : self.indi_allsky_config.get('IMAGE_CALIBRATE_FIX_HOLES', False),
             'IMAGE_CALIBRATE_HOLE_THOLD'     : self.indi_allsky_config.get('IMAGE_CALIBRATE_HOLE_THOLD', 30),
             'IMAGE_CALIBRATE_MANUAL_OFFSET'  : self.indi_allsky_config.get('IMAGE_CALIBRATE_MANUAL_OFFSET', 0),
@@ -2422,6 +2424,9 @@ class ConfigView(FormView):
             'IMAGE_FLIP_V'                   : self.indi_allsky_config.get('IMAGE_FLIP_V', True),
             'IMAGE_FLIP_H'                   : self.indi_allsky_config.get('IMAGE_FLIP_H', True),
             'IMAGE_SCALE'                    : self.indi_allsky_config.get('IMAGE_SCALE', 100),
+            'IMAGE_SCALE_EARLY'              : self.indi_allsky_config.get('IMAGE_SCALE_EARLY', False),
+            'IMAGE_SOFTWARE_BIN'             : self.indi_allsky_config.get('IMAGE_SOFTWARE_BIN', False),
+            'IMAGE_PROCESSING_BUDGET'        : self.indi_allsky_config.get('IMAGE_PROCESSING_BUDGET', True),
             'IMAGE_COLORMAP'                 : self.indi_allsky_config.get('IMAGE_COLORMAP', ''),
             'IMAGE_CIRCLE_MASK__ENABLE'      : self.indi_allsky_config.get('IMAGE_CIRCLE_MASK', {}).get('ENABLE', False),
             'IMAGE_CIRCLE_MASK__DIAMETER'    : self.indi_allsky_config.get('IMAGE_CIRCLE_MASK', {}).get('DIAMETER', 3000),
@@ -2493,6 +2498,7 @@ class ConfigView(FormView):
             'IMAGE_QUEUE_MAX'                : self.indi_allsky_config.get('IMAGE_QUEUE_MAX', 3),
             'IMAGE_QUEUE_MIN'                : self.indi_allsky_config.get('IMAGE_QUEUE_MIN', 1),
             'IMAGE_QUEUE_BACKOFF'            : self.indi_allsky_config.get('IMAGE_QUEUE_BACKOFF', 0.5),
+            'IMAGE_WORKERS'                  : self.indi_allsky_config.get('IMAGE_WORKERS', 1),
             'IMAGE_SAVE_HOOK_PRE'            : self.indi_allsky_config.get('IMAGE_SAVE_HOOK_PRE', ''),
             'IMAGE_SAVE_HOOK_POST'           : self.indi_allsky_config.get('IMAGE_SAVE_HOOK_POST', ''),
             'IMAGE_SAVE_HOOK_TIMEOUT'        : self.indi_allsky_config.get('IMAGE_SAVE_HOOK_TIMEOUT', 5),
@@ -2653,6 +2659,7 @@ class ConfigView(FormView):
             'SYNCAPI__UPLOAD_VIDEO'          : True,  # cannot be changed
             'SYNCAPI__CONNECT_TIMEOUT'       : self.indi_allsky_config.get('SYNCAPI', {}).get('CONNECT_TIMEOUT', 10.0),
             'SYNCAPI__TIMEOUT'               : self.indi_allsky_config.get('SYNCAPI', {}).get('TIMEOUT', 60.0),
+            'SYNCAPI__CHUNK_SIZE'            : self.indi_allsky_config.get('SYNCAPI', {}).get('CHUNK_SIZE', 8),
             'YOUTUBE__ENABLE'                : self.indi_allsky_config.get('YOUTUBE', {}).get('ENABLE', False),
             'YOUTUBE__SECRETS_FILE'          : self.indi_allsky_config.get('YOUTUBE', {}).get('SECRETS_FILE', ''),
             'YOUTUBE__PRIVACY_STATUS'        : self.indi_allsky_config.get('YOUTUBE', {}).get('PRIVACY_STATUS', 'private'),
@@ -3281,6 +3288,7 @@ class AjaxConfigView(BaseView):
         self.indi_allsky_config['CCD_BIT_DEPTH']                        = int(request.json['CCD_BIT_DEPTH'])
         self.indi_allsky_config['EXPOSURE_PERIOD']                      = float(request.json['EXPOSURE_PERIOD'])
         self.indi_allsky_config['EXPOSURE_PERIOD_DAY']                  = float(request.json['EXPOSURE_PERIOD_DAY'])
+        self.indi_allsky_config['CONTINUOUS_CAPTURE']                   = bool(request.json['CONTINUOUS_CAPTURE'])
         self.indi_allsky_config['CAMERA_SQM']['ENABLE']                 = bool(request.json['CAMERA_SQM__ENABLE'])
         self.indi_allsky_config['CAMERA_SQM']['ENABLE_DAY']             = bool(request.json['CAMERA_SQM__ENABLE_DAY'])
         self.indi_allsky_config['CAMERA_SQM']['EXPOSURE']               = float(round(float(request.json['CAMERA_SQM__EXPOSURE']), 6))
@@ -3422,6 +3430,7 @@ class AjaxConfigView(BaseView):
         self.indi_allsky_config['STARTRAILS']['IMAGE_CIRCLE_MASK_OPACITY']  = int(request.json['STARTRAILS__IMAGE_CIRCLE_MASK_OPACITY'])
         self.indi_allsky_config['IMAGE_CALIBRATE_DARK']                 = bool(request.json['IMAGE_CALIBRATE_DARK'])
         self.indi_allsky_config['IMAGE_CALIBRATE_BPM']                  = bool(request.json['IMAGE_CALIBRATE_BPM'])
+        self.indi_allsky_config['IMAGE_CALIBRATE_BPM_MEDIAN']           = bool(request.json['IMAGE_CALIBRATE_BPM_MEDIAN'])
         self.indi_allsky_config['IMAGE_CALIBRATE_FIX_HOLES']            = bool(request.json['IMAGE_CALIBRATE_FIX_HOLES'])
         self.indi_allsky_config['IMAGE_CALIBRATE_HOLE_THOLD']           = int(request.json['IMAGE_CALIBRATE_HOLE_THOLD'])
         self.indi_allsky_config['IMAGE_CALIBRATE_MANUAL_OFFSET']        = int(request.json['IMAGE_CALIBRATE_MANUAL_OFFSET'])
@@ -3445,6 +3454,9 @@ class AjaxConfigView(BaseView):
         self.indi_allsky_config['IMAGE_FLIP_V']                         = bool(request.json['IMAGE_FLIP_V'])
         self.indi_allsky_config['IMAGE_FLIP_H']                         = bool(request.json['IMAGE_FLIP_H'])
         self.indi_allsky_config['IMAGE_SCALE']                          = int(request.json['IMAGE_SCALE'])
+        self.indi_allsky_config['IMAGE_SCALE_EARLY']                    = bool(request.json['IMAGE_SCALE_EARLY'])
+        self.indi_allsky_config['IMAGE_SOFTWARE_BIN']                   = bool(request.json['IMAGE_SOFTWARE_BIN'])
+        self.indi_allsky_config['IMAGE_PROCESSING_BUDGET']              = bool(request.json['IMAGE_PROCESSING_BUDGET'])
         self.indi_allsky_config['IMAGE_COLORMAP']                       = str(request.json['IMAGE_COLORMAP'])
         self.indi_allsky_config['IMAGE_CIRCLE_MASK']['ENABLE']          = bool(request.json['IMAGE_CIRCLE_MASK__ENABLE'])
         self.indi_allsky_config['IMAGE_CIRCLE_MASK']['DIAMETER']        = int(request.json['IMAGE_CIRCLE_MASK__DIAMETER'])
@@ -3516,6 +3528,7 @@ class AjaxConfigView(BaseView):
         self.indi_allsky_config['IMAGE_QUEUE_MAX']                      = int(request.json['IMAGE_QUEUE_MAX'])
         self.indi_allsky_config['IMAGE_QUEUE_MIN']                      = int(request.json['IMAGE_QUEUE_MIN'])
         self.indi_allsky_config['IMAGE_QUEUE_BACKOFF']                  = float(request.json['IMAGE_QUEUE_BACKOFF'])
+        self.indi_allsky_config['IMAGE_WORKERS']                        = int(request.json['IMAGE_WORKERS'])
         self.indi_allsky_config['IMAGE_SAVE_HOOK_PRE']                  = str(request.json['IMAGE_SAVE_HOOK_PRE'])
         self.indi_allsky_config['IMAGE_SAVE_HOOK_POST']                 = str(request.json['IMAGE_SAVE_HOOK_POST'])
         self.indi_allsky_config['IMAGE_SAVE_HOOK_TIMEOUT']              = int(request.json['IMAGE_SAVE_HOOK_TIMEOUT'])
@@ -3676,6 +3689,7 @@ class AjaxConfigView(BaseView):
         #self.indi_allsky_config['SYNCAPI']['UPLOAD_VIDEO']              = bool(request.json['SYNCAPI__UPLOAD_VIDEO'])  # cannot be changed
         self.indi_allsky_config['SYNCAPI']['CONNECT_TIMEOUT']           = float(request.json['SYNCAPI__CONNECT_TIMEOUT'])
         self.indi_allsky_config['SYNCAPI']['TIMEOUT']                   = float(request.json['SYNCAPI__TIMEOUT'])
+        self.indi_allsky_config['SYNCAPI']['CHUNK_SIZE']                = int(request.json['SYNCAPI__CHUNK_SIZE'])
         self.indi_allsky_config['YOUTUBE']['ENABLE']                    = bool(request.json['YOUTUBE__ENABLE'])
         self.indi_allsky_config['YOUTUBE']['SECRETS_FILE']              = str(request.json['YOUTUBE__SECRETS_FILE'])
         self.indi_allsky_config['YOUTUBE']['PRIVACY_STATUS']            = str(request.json['YOUTUBE__PRIVACY_STATUS'])
@@ -7234,17 +7248,17 @@ class JsonFocusView(JsonView):
     def dispatch_request(self):
         import cv2
         from ..stars import IndiAllSkyStars
+        from ..maskManager import IndiAllSkyMaskManager
 
         zoom = int(request.args.get('zoom', 2))
         x_offset = int(request.args.get('x_offset', 0))
         y_offset = int(request.args.get('y_offset', 0))
 
 
-        sqm_mask = {
-            1 : None,  # assume bin 1
-        }
+        # detection mask is not used for focus
+        mask_manager = IndiAllSkyMaskManager(self.indi_allsky_config, detect_mask='')
 
-        stars_detect_o = IndiAllSkyStars(self.indi_allsky_config, mask=sqm_mask)
+        stars_detect_o = IndiAllSkyStars(self.indi_allsky_config, mask_manager=mask_manager)
 
 
         json_data = dict()
@@ -7671,6 +7685,7 @@ class ImageProcessingView(TemplateView):
             'PROCESSING_SPLIT_SCREEN'        : False,
             'IMAGE_CALIBRATE_DARK'           : False,  # darks are almost always already applied
             'IMAGE_CALIBRATE_BPM'            : False,
+            'IMAGE_CALIBRATE_BPM_MEDIAN'     : self.indi_allsky_config.get('IMAGE_CALIBRATE_BPM_MEDIAN', False),
             'IMAGE_CALIBRATE_FIX_HOLES'      : self.indi_allsky_config.get('IMAGE_CALIBRATE_FIX_HOLES', False),
             'IMAGE_CALIBRATE_HOLE_THOLD'     : self.indi_allsky_config.get('IMAGE_CALIBRATE_HOLE_THOLD', 30),
             'IMAGE_CALIBRATE_MANUAL_OFFSET'  : self.indi_allsky_config.get('IMAGE_CALIBRATE_MANUAL_OFFSET', 0),
@@ -7880,6 +7895,7 @@ class JsonImageProcessingView(JsonView):
         p_config['CCD_BIT_DEPTH']                        = int(request.json['CCD_BIT_DEPTH'])
         p_config['IMAGE_CALIBRATE_DARK']                 = bool(request.json['IMAGE_CALIBRATE_DARK'])
         p_config['IMAGE_CALIBRATE_BPM']                  = bool(request.json['IMAGE_CALIBRATE_BPM'])
+        p_config['IMAGE_CALIBRATE_BPM_MEDIAN']           = bool(request.json['IMAGE_CALIBRATE_BPM_MEDIAN'])
         p_config['IMAGE_CALIBRATE_FIX_HOLES']            = bool(request.json['IMAGE_CALIBRATE_FIX_HOLES'])
         p_config['IMAGE_CALIBRATE_HOLE_THOLD']           = int(request.json['IMAGE_CALIBRATE_HOLE_THOLD'])
         p_config['IMAGE_CALIBRATE_MANUAL_OFFSET']        = int(request.json['IMAGE_CALIBRATE_MANUAL_OFFSET'])
@@ -8211,25 +8227,8 @@ class JsonImageProcessingView(JsonView):
             image_processor.convert_16bit_to_8bit()
 
 
-            if p_config.get('IMAGE_ROTATE'):
-                image_processor.rotate_90()
-
-
-            # rotation
-            if p_config.get('IMAGE_ROTATE_ANGLE'):
-                image_processor.rotate_angle()
-
-
-            # verticle flip
-            if p_config.get('IMAGE_FLIP_V'):
-                image_processor.flip_v()
-
-            # horizontal flip
-            if p_config.get('IMAGE_FLIP_H'):
-                image_processor.flip_h()
-
-            # crop
-            image_processor.crop_image()
+            # rotation, flip and crop
+            image_processor.transform_geometry()
 
             # green removal
             image_processor.scnr()
@@ -8266,7 +8265,7 @@ class JsonImageProcessingView(JsonView):
             image_processor.colormap()
 
 
-            image_processor.apply_image_circle_mask(i_ref.binning)
+            image_processor.apply_image_circle_mask(i_ref.processing_binning)
 
 
             if not p_config.get('FISH2PANO', {}).get('ENABLE'):
@@ -8283,7 +8282,7 @@ class JsonImageProcessingView(JsonView):
 
             else:
                 # no labels if converting to panorama
-                pano_data = image_processor.fish2pano(i_ref.binning)
+                pano_data = image_processor.fish2pano(i_ref.processing_binning)
 
 
                 if p_config.get('FISH2PANO', {}).get('FLIP_H'):
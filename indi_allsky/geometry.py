@@ -0,0 +1,295 @@
+### Plans the rotate/flip/crop chain as a single operation
+### Without an arbitrary rotation angle the chain is built from numpy views and copied once.  With an
+### angle, every step is composed into one affine matrix and warped directly into the cropped size.
+### Plans are cached per image shape, binning and config.
+
+import numpy
+import cv2
+import logging
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkyGeometry(object):
+
+    plan_cache_size = 8
+
+    # cv2.rotate() enums as counter-clockwise quarter turns for numpy.rot90()
+    _rotate_90_turns = {
+        'ROTATE_90_COUNTERCLOCKWISE' : 1,
+        'ROTATE_180'                 : 2,
+        'ROTATE_90_CLOCKWISE'        : 3,
+    }
+
+
+    def __init__(self, config):
+        self.config = config
+
+        self._plan_dict = dict()
+
+
+    @property
+    def enabled(self):
+        if self.config.get('IMAGE_ROTATE'):
+            return True
+
+        if self.config.get('IMAGE_ROTATE_ANGLE'):
+            return True
+
+        if self.config.get('IMAGE_FLIP_V') or self.config.get('IMAGE_FLIP_H'):
+            return True
+
+        if self.config.get('IMAGE_CROP_IMAGE_CIRCLE'):
+            return True
+
+        if self.config.get('IMAGE_CROP_ROI'):
+            return True
+
+        return False
+
+
+    @staticmethod
+    def early_scale_factor(config):
+        """Integer downscale factor applied right after debayer, 1 when disabled"""
+        if not config.get('IMAGE_SCALE_EARLY'):
+            return 1
+
+        if config.get('FOCUS_MODE', False):
+            return 1
+
+
+        scale = config.get('IMAGE_SCALE', 100)
+
+        if scale >= 100 or 100 % scale:
+            # early scaling is only done with whole factors
+            return 1
+
+        return 100 // scale
+
+
+    def _config_key(self):
+        crop_roi = self.config.get('IMAGE_CROP_ROI')
+
+        return (
+            self.config.get('IMAGE_ROTATE'),
+            self.config.get('IMAGE_ROTATE_ANGLE'),
+            bool(self.config.get('IMAGE_ROTATE_KEEP_SIZE')),
+            bool(self.config.get('IMAGE_FLIP_V')),
+            bool(self.config.get('IMAGE_FLIP_H')),
+            bool(self.config.get('IMAGE_CROP_IMAGE_CIRCLE')),
+            self.config.get('LENS_OFFSET_X', 0),
+            self.config.get('LENS_OFFSET_Y', 0),
+            self.config.get('LENS_IMAGE_CIRCLE', 3000),
+            tuple(crop_roi) if crop_roi else None,
+        )
+
+
+    def plan(self, shape, binning):
+        """Return the (cached) transform plan for an image shape"""
+        plan_key = (tuple(shape[:2]), int(binning), self._config_key())
+
+        try:
+            return self._plan_dict[plan_key]
+        except KeyError:
+            pass
+
+
+        plan = self._build_plan(shape[0], shape[1], binning)
+
+        if len(self._plan_dict) >= self.plan_cache_size:
+            self._plan_dict.clear()
+
+        self._plan_dict[plan_key] = plan
+
+        return plan
+
+
+    def apply(self, image, binning):
+        """Rotate, flip and crop an image in a single pass"""
+        plan = self.plan(image.shape, binning)
+
+        method, data, dsize = plan
+
+        if method == 'view':
+            view = image
+            for op, arg in data:
+                if op == 'rot90':
+                    view = numpy.rot90(view, arg)
+                elif op == 'flip':
+                    view = numpy.flip(view, arg)
+                elif op == 'crop':
+                    y1, y2, x1, x2 = arg
+                    view = view[y1:y2, x1:x2]
+
+            if view is image:
+                return image
+
+            # only the final pixels are copied, a rows only crop is contiguous and must not alias the source
+            return view.copy(order='C')
+
+
+        # pixels that would be cropped are never computed
+        return cv2.warpAffine(image, data, dsize)
+
+
+    def _build_plan(self, height, width, binning):
+        view_list = list()
+        matrix = numpy.eye(3, dtype=numpy.float64)  # maps source to destination coordinates
+        warp = False
+
+
+        rotate_90 = self.config.get('IMAGE_ROTATE')
+        if rotate_90:
+            turns = self._rotate_90_turns.get(rotate_90)
+
+            if isinstance(turns, type(None)):
+                logger.error('Unknown rotation option: %s', rotate_90)
+            else:
+                view_list.append(('rot90', turns))
+                matrix = numpy.dot(self._rot90_matrix(turns, width, height), matrix)
+
+                if turns % 2:
+                    width, height = height, width
+
+
+        angle = self.config.get('IMAGE_ROTATE_ANGLE')
+        if angle:
+            warp = True
+
+            center_x = int(width / 2)
+            center_y = int(height / 2)
+
+            rot = cv2.getRotationMatrix2D((center_x, center_y), int(angle), 1.0)
+
+            if self.config.get('IMAGE_ROTATE_KEEP_SIZE'):
+                bound_w = width
+                bound_h = height
+            else:
+                # rotating will change the size of the resulting image
+                abs_cos = abs(rot[0, 0])
+                abs_sin = abs(rot[0, 1])
+
+                bound_w = int(height * abs_sin + width * abs_cos)
+                bound_h = int(height * abs_cos + width * abs_sin)
+
+            rot[0, 2] += (bound_w / 2) - center_x
+            rot[1, 2] += (bound_h / 2) - center_y
+
+            matrix = numpy.dot(numpy.vstack((rot, [0.0, 0.0, 1.0])), matrix)
+
+            # width and height needs to be divisible by 2 for timelapse
+            width = bound_w - (bound_w % 2)
+            height = bound_h - (bound_h % 2)
+
+
+        if self.config.get('IMAGE_FLIP_V'):
+            view_list.append(('flip', 0))
+            matrix = numpy.dot(numpy.array([
+                [1.0, 0.0, 0.0],
+                [0.0, -1.0, height - 1],
+                [0.0, 0.0, 1.0],
+            ]), matrix)
+
+
+        if self.config.get('IMAGE_FLIP_H'):
+            view_list.append(('flip', 1))
+            matrix = numpy.dot(numpy.array([
+                [-1.0, 0.0, width - 1],
+                [0.0, 1.0, 0.0],
+                [0.0, 0.0, 1.0],
+            ]), matrix)
+
+
+        crop = self._crop_region(height, width, binning)
+        if crop:
+            y1, y2, x1, x2 = crop
+            view_list.append(('crop', crop))
+            matrix = numpy.dot(numpy.array([
+                [1.0, 0.0, -x1],
+                [0.0, 1.0, -y1],
+                [0.0, 0.0, 1.0],
+            ]), matrix)
+
+            width = x2 - x1
+            height = y2 - y1
+
+            logger.info('New cropped size: %d x %d', width, height)
+
+
+        if warp:
+            return 'warp', matrix[:2], (width, height)
+
+        return 'view', view_list, (width, height)
+
+
+    def _rot90_matrix(self, turns, width, height):
+        # matches cv2.rotate() for integer pixel coordinates
+        if turns == 1:
+            # counter-clockwise
+            return numpy.array([
+                [0.0, 1.0, 0.0],
+                [-1.0, 0.0, width - 1],
+                [0.0, 0.0, 1.0],
+            ])
+        elif turns == 2:
+            return numpy.array([
+                [-1.0, 0.0, width - 1],
+                [0.0, -1.0, height - 1],
+                [0.0, 0.0, 1.0],
+            ])
+
+        # clockwise
+        return numpy.array([
+            [0.0, -1.0, height - 1],
+            [1.0, 0.0, 0.0],
+            [0.0, 0.0, 1.0],
+        ])
+
+
+    def _crop_region(self, image_height, image_width, binning):
+        """binning is the processing binning, camera binning * software binning * early scale"""
+        if self.config.get('IMAGE_CROP_IMAGE_CIRCLE'):
+            logger.info('Cropping to image circle')
+
+            # the lens settings are full resolution, divide by binning value
+            lens_offset_x = int(self.config.get('LENS_OFFSET_X', 0) / binning)
+            lens_offset_y = int(self.config.get('LENS_OFFSET_Y', 0) / binning)
+            image_center_x = int(image_width / 2)
+            image_center_y = int(image_height / 2)
+            radius = int(self.config.get('LENS_IMAGE_CIRCLE', 3000) / 2 / binning)
+
+            # need to maintain same offset of image circle
+            # offsets have to be doubled since they are added to the radius
+            if lens_offset_x >= 0:
+                x1 = max(0, (image_center_x - radius))
+                x2 = min(image_width, (image_center_x + radius) + (lens_offset_x * 2))
+            else:
+                x1 = max(0, (image_center_x - radius) + (lens_offset_x * 2))  # offset is negative
+                x2 = min(image_width, (image_center_x + radius))
+
+            if lens_offset_y >= 0:
+                y1 = max(0, (image_center_y - radius) - (lens_offset_y * 2))
+                y2 = min(image_height, (image_center_y + radius))
+            else:
+                y1 = max(0, (image_center_y - radius))
+                y2 = min(image_height, (image_center_y + radius) - (lens_offset_y * 2))  # offset is negative
+
+        elif self.config.get('IMAGE_CROP_ROI'):
+            # divide the coordinates by binning value
+            x1 = int(self.config['IMAGE_CROP_ROI'][0] / binning)
+            y1 = int(self.config['IMAGE_CROP_ROI'][1] / binning)
+            x2 = int(self.config['IMAGE_CROP_ROI'][2] / binning)
+            y2 = int(self.config['IMAGE_CROP_ROI'][3] / binning)
+
+        else:
+            return None
+
+
+        # same bounds as numpy slicing
+        x1 = min(max(x1, 0), image_width)
+        x2 = min(max(x2, x1), image_width)
+        y1 = min(max(y1, 0), image_height)
+        y2 = min(max(y2, y1), image_height)
+
+        return y1, y2, x1, x2
@@ -31,10 +31,12 @@ from PIL import Image
 from fractions import Fraction
 
 from . import constants
+from . import tiled
 
 from .processing import ImageProcessor
 from .miscUpload import miscUpload
 from .adsb import AdsbAircraftHttpWorker
+from .configReload import IndiAllSkyConfigReload
 
 from .flask import create_app
 from .flask import db
@@ -71,10 +73,12 @@ class ImageWorker(Process):
     def __init__(
         self,
         idx,
+        slot,
         config,
         error_q,
         image_q,
         upload_q,
+        image_commit,
         position_av,
         exposure_av,
         gain_av,
@@ -87,6 +91,7 @@ class ImageWorker(Process):
         super(ImageWorker, self).__init__()
 
         self.name = 'Image-{0:d}'.format(idx)
+        self.slot = slot  # position in the worker pool
 
         self.config = config
 
@@ -94,6 +99,9 @@ class ImageWorker(Process):
         self.image_q = image_q
         self.upload_q = upload_q
 
+        # shared by all image workers
+        self.image_commit = image_commit
+
         self.position_av = position_av
         self.exposure_av = exposure_av
         self.gain_av = gain_av
@@ -111,17 +119,14 @@ class ImageWorker(Process):
         self.adsb_aircraft_q = None
         self.adsb_aircraft_list = []
 
-        self.generate_mask_base = True
-
-        self.target_adu_found = False
-        self.current_adu_target = 0
-        self.hist_adu = []
-
         self.sqm_value = 0
 
         self.image_count = 0
         self.metadata_count = 0
 
+        self._keogram_line = None  # last realtime keogram line in this worker, None until the stored data is loaded
+        self._keogram_request_line = 0
+
         self.image_processor = ImageProcessor(
             self.config,
             self.position_av,
@@ -131,6 +136,7 @@ class ImageWorker(Process):
             self.sensors_user_av,
             self.night_av,
             self.astro_av,
+            workers=self.image_commit.workers,
         )
 
         self._miscDb = miscDb(self.config)
@@ -185,6 +191,43 @@ class ImageWorker(Process):
         return self._gain_step
 
 
+    ### auto exposure state is shared with the other image workers
+    @property
+    def target_adu_found(self):
+        return self.image_commit.target_adu_found
+
+    @target_adu_found.setter
+    def target_adu_found(self, new_target_adu_found):
+        self.image_commit.target_adu_found = new_target_adu_found
+
+
+    @property
+    def current_adu_target(self):
+        return self.image_commit.current_adu_target
+
+    @current_adu_target.setter
+    def current_adu_target(self, new_current_adu_target):
+        self.image_commit.current_adu_target = new_current_adu_target
+
+
+    @property
+    def hist_adu(self):
+        return self.image_commit.hist_adu
+
+    @hist_adu.setter
+    def hist_adu(self, new_hist_adu):
+        self.image_commit.hist_adu = new_hist_adu
+
+
+    @property
+    def generate_mask_base(self):
+        return self.image_commit.generate_mask_base
+
+    @generate_mask_base.setter
+    def generate_mask_base(self, new_generate_mask_base):
+        self.image_commit.generate_mask_base = new_generate_mask_base
+
+
     def sighup_handler_worker(self, signum, frame):
         logger.warning('Caught HUP signal')
 
@@ -232,31 +275,54 @@ class ImageWorker(Process):
     def saferun(self):
         #raise Exception('Test exception handling in worker')
 
+        # the stripe threads of all image workers share the cores
+        tiled.set_process_count(self.image_commit.workers)
+
         while True:
             try:
-                i_dict = self.image_q.get(timeout=23)  # prime number
+                ticket, i_dict = self.image_commit.get(self.image_q, 23)  # prime number
             except queue.Empty:
                 continue
 
 
-            if i_dict.get('stop'):
-                self._shutdown = True
+            try:
+                if i_dict.get('stop'):
+                    self._shutdown = True
+
+                elif i_dict.get('config'):
+                    self._updateConfig(i_dict['config'])
+                    continue
+
+
+                if self._shutdown:
+                    # lines from the earlier frames are received in the commit stage
+                    self.image_commit.enter(self.image_commit.STAGE_COMMIT, ticket)
+                    self.store_realtime_keogram()
 
+                    logger.warning('Goodbye')
 
-            if self._shutdown:
-                self.image_processor.realtimeKeogramDataSave()
+                    return
 
-                logger.warning('Goodbye')
 
-                return
+                # new context for every task, reduces the effects of caching
+                with app.app_context():
+                    self.processImage(i_dict, ticket)
+            finally:
+                self.image_commit.release(ticket)
 
 
-            # new context for every task, reduces the effects of caching
-            with app.app_context():
-                self.processImage(i_dict)
+    def _updateConfig(self, new_config):
+        logger.warning('Applying new config')
 
+        # helper objects reference the same dict
+        IndiAllSkyConfigReload.update(self.config, new_config)
 
-    def processImage(self, i_dict):
+        self.next_save_fits_offset = self.config.get('IMAGE_SAVE_FITS_PERIOD', 7200)
+
+        self.image_processor.reloadConfig()
+
+
+    def processImage(self, i_dict, ticket):
         import piexif
 
         ### Not using DB task queue for image processing to reduce database I/O
@@ -376,6 +442,8 @@ class ImageWorker(Process):
 
         processing_start = time.time()
 
+        self.image_processor.budget.start_frame()
+
 
         ### simulate performance degradation
         #time.sleep(30)
@@ -456,6 +524,8 @@ class ImageWorker(Process):
 
         self.image_processor.debayer()  # populates self.opencv_data
 
+        self.image_processor.scale_image_early()
+
 
         self.image_processor.stack()  # populates self.image
 
@@ -603,6 +673,9 @@ class ImageWorker(Process):
         #logger.info('Wrote Numpy data: /tmp/indi_allsky_numpy.npy')
 
 
+        # exposure is calculated from the ADU history in exposure order
+        self.image_commit.enter(self.image_commit.STAGE_EXPOSURE, ticket)
+
         # adu calculate (before processing)
         adu, adu_average = self.calculate_exposure(adu, exposure, gain)
 
@@ -613,6 +686,8 @@ class ImageWorker(Process):
             self.generate_mask_base = False
             self.write_mask_base_img(self.image_processor.image)
 
+        self.image_commit.leave(self.image_commit.STAGE_EXPOSURE, ticket)
+
 
         # line detection
         if self.night_av[constants.NIGHT_NIGHT] and self.config.get('DETECT_METEORS'):
@@ -629,20 +704,8 @@ class ImageWorker(Process):
             self.image_processor.drawDetections()
 
 
-        # rotation
-        self.image_processor.rotate_90()
-        self.image_processor.rotate_angle()
-
-
-        # verticle flip
-        self.image_processor.flip_v()
-
-        # horizontal flip
-        self.image_processor.flip_h()
-
-
-        # crop
-        self.image_processor.crop_image()
+        # rotation, flip and crop
+        self.image_processor.transform_geometry()
 
 
         # green removal
@@ -683,37 +746,40 @@ class ImageWorker(Process):
         ##################################################
 
 
-        longterm_keogram_pixels = self.save_longterm_keogram_data(exp_date, camera_id)
+        longterm_keogram_pixels = self.get_longterm_keogram_pixels()
 
 
         self.image_processor.colormap()
 
 
-        self.image_processor.apply_image_circle_mask(i_ref.binning)
+        self.image_processor.apply_image_circle_mask(i_ref.processing_binning)
 
 
-        self.image_processor.realtimeKeogramUpdate()
+        # appended to the realtime keogram in exposure order
+        keogram_line = self.image_processor.realtimeKeogramLine()
 
 
+        pano_data = None
         if self.config.get('FISH2PANO', {}).get('ENABLE'):
-            if not self.image_count % self.config.get('FISH2PANO', {}).get('MODULUS', 2):
-                pano_data = self.image_processor.fish2pano(i_ref.binning)
+            # frame numbers are shared by all image workers
+            if not (ticket + 1) % self.config.get('FISH2PANO', {}).get('MODULUS', 2):
+                # losing a panorama is better than falling behind the camera
+                if self.image_processor.budget.allow('fish2pano'):
+                    with self.image_processor.budget.stage('fish2pano'):
+                        pano_data = self.image_processor.fish2pano(i_ref.processing_binning)
 
 
-                if self.config.get('FISH2PANO', {}).get('ENABLE_CARDINAL_DIRS'):
-                    pano_data = self.image_processor.fish2pano_cardinal_dirs_label(pano_data)
-
-
-                self.write_panorama_img(pano_data, i_ref, camera, jpeg_exif=jpeg_exif)
+                        if self.config.get('FISH2PANO', {}).get('ENABLE_CARDINAL_DIRS'):
+                            pano_data = self.image_processor.fish2pano_cardinal_dirs_label(pano_data)
 
 
+        circular_display_image = None
         if self.config.get('CIRCULAR_DISPLAY', {}).get('ENABLE'):
             if not self.config.get('FOCUS_MODE', False):
-                circular_display_image = self.image_processor.circular_display(i_ref.binning)
-                self.write_circular_display_img(circular_display_image, jpeg_exif=jpeg_exif)
+                circular_display_image = self.image_processor.circular_display(i_ref.processing_binning)
 
 
-        self.image_processor.apply_logo_overlay(i_ref.binning)
+        self.image_processor.apply_logo_overlay(i_ref.processing_binning)
 
 
         self.image_processor.scale_image()
@@ -756,13 +822,36 @@ class ImageWorker(Process):
         processing_elapsed_s = time.time() - processing_start
         logger.info('Image processed in %0.4f s', processing_elapsed_s)
 
+        self.image_processor.budget.finish_frame()
+
 
         # need this after resizing and scaling
         final_height, final_width = self.image_processor.image.shape[:2]
 
 
+        ### everything below depends on the previous frame or is visible to users, run in exposure order
+        self.image_commit.enter(self.image_commit.STAGE_COMMIT, ticket)
+
+        self.restore_counters()
+
+
         #task.setSuccess('Image processed')
 
+        self.save_longterm_keogram_data(exp_date, camera_id, longterm_keogram_pixels)
+
+
+        if not isinstance(pano_data, type(None)):
+            self.write_panorama_img(pano_data, i_ref, camera, jpeg_exif=jpeg_exif)
+
+
+        if not isinstance(circular_display_image, type(None)):
+            self.write_circular_display_img(circular_display_image, jpeg_exif=jpeg_exif)
+
+
+        if not isinstance(keogram_line, type(None)):
+            self.update_realtime_keogram(keogram_line)
+
+
         self.write_status_json(i_ref, adu, adu_average)  # write json status file
 
 
@@ -820,6 +909,7 @@ class ImageWorker(Process):
                 'aurora_n_hemi_gw'  : i_ref.aurora_n_hemi_gw,
                 'aurora_s_hemi_gw'  : i_ref.aurora_s_hemi_gw,
                 'camera_sqm_raw_mag' : self.image_processor.camera_sqm_raw_mag,
+                'budget_skipped'    : self.image_processor.budget.skipped,
             }
 
 
@@ -1059,6 +1149,21 @@ class ImageWorker(Process):
             self.upload_metadata(i_ref, adu, adu_average)
 
 
+        self.store_counters()
+
+
+    def restore_counters(self):
+        """Upload counters are shared with the other image workers"""
+        counters = self.image_commit.counters
+
+        self.metadata_count = counters[0]
+        self._miscUpload.counters = counters[1:]
+
+
+    def store_counters(self):
+        self.image_commit.counters = [self.metadata_count] + self._miscUpload.counters
+
+
     def decdeg2dms(self, dd):
         is_positive = dd >= 0
         dd = abs(dd)
@@ -1392,7 +1497,7 @@ class ImageWorker(Process):
         tmpfile_name = Path(f_tmpfile.name)
 
 
-        data = i_ref.opencv_data
+        data = i_ref.opencv_data_full
 
         image_height, image_width = data.shape[:2]
         max_bit_depth = self.image_processor.max_bit_depth
@@ -2046,16 +2151,83 @@ class ImageWorker(Process):
         tmpfile_name.unlink()
 
 
-    def write_realtime_keogram(self, data, camera):
-        if isinstance(data, type(None)):
-            logger.warning('Realtime keogram data empty')
+    def update_realtime_keogram(self, keogram_line):
+        """Runs in the commit stage, the lines of the earlier frames from the other workers are appended first"""
+        self.receive_realtime_keogram_lines()
+
+        timestamp = int(time.time())
+        line = self.image_commit.keogram_send(self.slot, keogram_line, timestamp)
+
+        if isinstance(self._keogram_line, type(None)):
+            # the line is in the stored data when it is loaded
             return
 
+        self.image_processor.realtimeKeogramUpdate(keogram_line, timestamp=timestamp)
+        self._keogram_line = line
+
 
         save_interval = self.config.get('REALTIME_KEOGRAM', {}).get('SAVE_INTERVAL', 25)
-        if self.image_count % save_interval == 0:
+        if self.image_commit.keogram_store_due(save_interval):
             # store keogram data every X images
-            self.image_processor.realtimeKeogramDataSave()
+            self.store_realtime_keogram()
+
+
+    def receive_realtime_keogram_lines(self):
+        if isinstance(self._keogram_line, type(None)):
+            if not self.image_commit.keogram_loadable(self.slot):
+                # the lines received by the previous worker in this slot are lost
+                if not self._keogram_request_line:
+                    self._keogram_request_line = self.image_commit.keogram_line
+                    self.image_commit.keogram_request_store()
+                    return
+
+                if self.image_commit.keogram_line - self._keogram_request_line <= self.image_commit.workers * 2:
+                    # wait for another worker to store the data
+                    return
+
+                logger.warning('Realtime keogram data was not stored by another image worker, lines are missing')
+                self.image_commit.keogram_discard(self.slot)
+                self._keogram_line = self.image_commit.keogram_line
+            else:
+                self._keogram_line = self.image_commit.keogram_stored_line
+
+            self._keogram_request_line = 0
+
+
+            # loaded on the next update
+            self.image_processor.realtime_keogram_data = None
+            self.image_processor.realtime_keogram_timestamps = list()
+
+
+        try:
+            line_list = self.image_commit.keogram_receive(self.slot, self._keogram_line)
+        except queue.Empty:
+            logger.error('Timeout receiving realtime keogram lines from the other image workers')
+            self._keogram_line = None
+            return
+
+
+        for keogram_line, timestamp in line_list:
+            self.image_processor.realtimeKeogramUpdate(keogram_line, timestamp=timestamp)
+
+        self._keogram_line = self.image_commit.keogram_line
+
+
+    def store_realtime_keogram(self):
+        """Runs in the commit stage"""
+        self.receive_realtime_keogram_lines()
+
+        if isinstance(self._keogram_line, type(None)):
+            return
+
+        self.image_processor.realtimeKeogramDataSave()
+        self.image_commit.keogram_stored(self._keogram_line)
+
+
+    def write_realtime_keogram(self, data, camera):
+        if isinstance(data, type(None)):
+            logger.warning('Realtime keogram data empty')
+            return
 
 
         keogram_height, keogram_width = data.shape[:2]
@@ -2177,8 +2349,9 @@ class ImageWorker(Process):
             return adu, 0.0
 
 
-        self.hist_adu.append(adu)
-        self.hist_adu = self.hist_adu[(history_max_vals * -1):]  # remove oldest values, up to history_max_vals
+        hist_adu = self.hist_adu
+        hist_adu.append(adu)
+        self.hist_adu = hist_adu[(history_max_vals * -1):]  # remove oldest values, up to history_max_vals
 
         adu_average = functools.reduce(lambda a, b: a + b, self.hist_adu) / len(self.hist_adu)
 
@@ -2379,7 +2552,7 @@ class ImageWorker(Process):
             self.binning_av[constants.BINNING_NEXT] = int(next_binning)
 
 
-    def save_longterm_keogram_data(self, exp_date, camera_id):
+    def get_longterm_keogram_pixels(self):
         if self.image_processor.focus_mode:
             # disable processing in focus mode
             return
@@ -2404,6 +2577,14 @@ class ImageWorker(Process):
             rgb_pixel_list.append([int(pixel[2]), int(pixel[1]), int(pixel[0])])  # bgr
 
 
+        return rgb_pixel_list
+
+
+    def save_longterm_keogram_data(self, exp_date, camera_id, rgb_pixel_list):
+        if not rgb_pixel_list:
+            return
+
+
         self._miscDb.add_long_term_keogram_data(
             exp_date,
             camera_id,
@@ -2411,9 +2592,6 @@ class ImageWorker(Process):
         )
 
 
-        return rgb_pixel_list
-
-
     def start_image_save_pre_hook(self, exposure, gain, binning):
         if self.image_processor.focus_mode:
             return
@@ -0,0 +1,283 @@
+### Frame ordering for the image worker pool
+### Frames are numbered when they are taken from the image queue, the capture worker queues frames in
+### exposure order.  Workers process frames concurrently, the stages that depend on the previous frame
+### (exposure calculation, realtime keogram, database inserts and uploads) are entered in frame order.
+### Every worker keeps a copy of the realtime keogram, the line of each frame is sent to the other workers
+### in the commit stage and the stored data is only written at the save interval.
+
+import time
+import queue
+import logging
+
+from multiprocessing import Array
+from multiprocessing import Condition
+from multiprocessing import Lock
+from multiprocessing import Queue
+from multiprocessing import Value
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkyImageCommit(object):
+
+    STAGE_EXPOSURE = 0
+    STAGE_COMMIT = 1
+
+    # a worker that dies while holding a frame must not block the pool forever
+    stage_timeout = 120.0
+
+    adu_history_max = 6
+
+    keogram_timeout = 10.0
+
+
+    def __init__(self, workers=1):
+        self._workers = Value('i', int(workers))
+
+        self._get_lock = Lock()
+        self._next_ticket = Value('L', 0, lock=False)  # protected by _get_lock
+
+        self._condition = Condition()
+        self._stage_av = Array('L', [0, 0], lock=False)  # protected by _condition
+
+
+        # auto exposure state is shared by all workers, only updated in the exposure stage
+        self._adu_av = Array('f', [
+            0.0,  # target adu found
+            0.0,  # current adu target
+            1.0,  # generate mask base
+            0.0,  # adu history count
+        ])
+        self._hist_adu_av = Array('f', [0.0 for _ in range(self.adu_history_max)])
+
+
+        # realtime keogram line numbers, only updated in the commit stage
+        self._keogram_av = Array('L', [
+            0,  # last line sent
+            0,  # last line in the stored data
+            0,  # store requested
+        ])
+        self._keogram_q_list = list()  # one per worker slot
+        self._keogram_slot_av = Array('L', [0], lock=False)  # last line in the data of each worker slot
+
+        # upload counters, only updated in the commit stage
+        self._counter_av = Array('L', [0 for _ in range(8)])
+
+
+    @property
+    def workers(self):
+        return self._workers.value
+
+    @workers.setter
+    def workers(self, new_workers):
+        self._workers.value = int(new_workers)
+
+
+    @property
+    def target_adu_found(self):
+        return bool(self._adu_av[0])
+
+    @target_adu_found.setter
+    def target_adu_found(self, new_target_adu_found):
+        self._adu_av[0] = float(bool(new_target_adu_found))
+
+
+    @property
+    def current_adu_target(self):
+        return self._adu_av[1]
+
+    @current_adu_target.setter
+    def current_adu_target(self, new_current_adu_target):
+        self._adu_av[1] = float(new_current_adu_target)
+
+
+    @property
+    def generate_mask_base(self):
+        return bool(self._adu_av[2])
+
+    @generate_mask_base.setter
+    def generate_mask_base(self, new_generate_mask_base):
+        self._adu_av[2] = float(bool(new_generate_mask_base))
+
+
+    @property
+    def hist_adu(self):
+        return list(self._hist_adu_av[:int(self._adu_av[3])])
+
+    @hist_adu.setter
+    def hist_adu(self, new_hist_adu):
+        hist_adu = list(new_hist_adu)[(self.adu_history_max * -1):]
+
+        for i, v in enumerate(hist_adu):
+            self._hist_adu_av[i] = float(v)
+
+        self._adu_av[3] = float(len(hist_adu))
+
+
+    @property
+    def keogram_line(self):
+        return self._keogram_av[0]
+
+
+    @property
+    def keogram_stored_line(self):
+        return self._keogram_av[1]
+
+
+    def keogram_loadable(self, slot):
+        """The stored data and the lines queued for the worker slot are complete"""
+        return self._keogram_av[1] >= self._keogram_slot_av[slot]
+
+
+    def keogram_request_store(self):
+        self._keogram_av[2] = 1
+
+
+    def keogram_store_due(self, save_interval):
+        if self._keogram_av[2]:
+            return True
+
+        return self._keogram_av[0] - self._keogram_av[1] >= save_interval
+
+
+    def keogram_stored(self, line):
+        self._keogram_av[1] = line
+        self._keogram_av[2] = 0
+
+
+    def keogram_send(self, slot, keogram_line, timestamp):
+        """Send a realtime keogram line to the other workers, returns the line number"""
+        self._keogram_av[0] += 1
+        line = self._keogram_av[0]
+
+        for i, keogram_q in enumerate(self._keogram_q_list):
+            if i == slot:
+                continue
+
+            keogram_q.put((line, keogram_line, timestamp))
+
+        self._keogram_slot_av[slot] = line
+
+        return line
+
+
+    def keogram_receive(self, slot, line):
+        """Returns the lines sent by the other workers after line in order, raises queue.Empty"""
+        line_dict = dict()
+
+        while line + len(line_dict) < self._keogram_av[0]:
+            try:
+                # each sender has a feeder thread, lines may arrive out of order
+                q_line, keogram_line, timestamp = self._keogram_q_list[slot].get(timeout=self.keogram_timeout)
+            except queue.Empty:
+                # the worker data is only complete again after the next store
+                self._keogram_slot_av[slot] = self._keogram_av[0]
+                raise
+
+            if q_line <= line:
+                # already in the stored data
+                continue
+
+            line_dict[q_line] = (keogram_line, timestamp)
+
+
+        self._keogram_slot_av[slot] = self._keogram_av[0]
+
+        return [line_dict[x] for x in sorted(line_dict.keys())]
+
+
+    @property
+    def counters(self):
+        return list(self._counter_av)
+
+    @counters.setter
+    def counters(self, new_counters):
+        for i, v in enumerate(new_counters):
+            self._counter_av[i] = int(v)
+
+
+    def keogram_discard(self, slot):
+        """Drop the lines queued for the worker slot, the stored data is loaded without them"""
+        if self._keogram_q_list:
+            while True:
+                try:
+                    self._keogram_q_list[slot].get_nowait()
+                except queue.Empty:
+                    break
+
+        self._keogram_slot_av[slot] = self._keogram_av[0]
+
+
+    def reset(self, workers):
+        """Only call when no workers are running"""
+        self._workers.value = int(workers)
+
+        self._next_ticket.value = 0
+
+        with self._condition:
+            for i in range(len(self._stage_av)):
+                self._stage_av[i] = 0
+
+
+        # the stored keogram data is complete when the pool starts
+        for i in range(len(self._keogram_av)):
+            self._keogram_av[i] = 0
+
+        if self.workers > 1:
+            self._keogram_q_list = [Queue() for _ in range(self.workers)]
+        else:
+            self._keogram_q_list = list()
+
+        self._keogram_slot_av = Array('L', [0 for _ in range(self.workers)], lock=False)
+
+
+    def get(self, image_q, timeout):
+        """Dequeue the next frame and number it, raises queue.Empty"""
+        if not self._get_lock.acquire(timeout=timeout):
+            raise queue.Empty
+
+        try:
+            item = image_q.get(timeout=timeout)
+
+            ticket = self._next_ticket.value
+            self._next_ticket.value += 1
+        finally:
+            self._get_lock.release()
+
+
+        return ticket, item
+
+
+    def enter(self, stage, ticket):
+        """Wait until all earlier frames have left the stage"""
+        wait_start = time.time()
+
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._stage_av[stage] >= ticket, timeout=self.stage_timeout):
+                logger.error('Timeout waiting for frame %d to leave stage %d, skipping', self._stage_av[stage], stage)
+                self._stage_av[stage] = ticket
+
+
+        wait_elapsed_s = time.time() - wait_start
+        if wait_elapsed_s > 1.0:
+            logger.info('Frame %d waited %0.3f s for stage %d', ticket, wait_elapsed_s, stage)
+
+
+    def leave(self, stage, ticket):
+        with self._condition:
+            if self._stage_av[stage] == ticket:
+                self._stage_av[stage] = ticket + 1
+
+            self._condition.notify_all()
+
+
+    def release(self, ticket):
+        """Pass all remaining stages, frames that were skipped or failed must not block later frames"""
+        for stage in range(len(self._stage_av)):
+            with self._condition:
+                if self._stage_av[stage] > ticket:
+                    continue
+
+            self.enter(stage, ticket)
+            self.leave(stage, ticket)
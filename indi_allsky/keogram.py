@@ -179,8 +179,14 @@ class KeogramGenerator(object):
 
         image_processing_start = time.time()
 
-        self.timestamps.append(timestamp)
+        rotated_center_line = self.centerLine(image)
+        self.appendLine(rotated_center_line, timestamp)
+
+        self.image_processing_elapsed_s += time.time() - image_processing_start
 
+
+    def centerLine(self, image):
+        """Returns the center line of the rotated image, this does not depend on previous images"""
         image_height, image_width = image.shape[:2]
         #logger.info('Original: %d x %d', image_width, image_height)
 
@@ -214,6 +220,18 @@ class KeogramGenerator(object):
         rotated_center_line = rotated_image[:, [int(rot_width / 2)]]
 
 
+        # set every image for reasons
+        self.original_height = recenter_height
+        self.original_width = recenter_width
+
+
+        return rotated_center_line
+
+
+    def appendLine(self, rotated_center_line, timestamp):
+        self.timestamps.append(timestamp)
+
+
         if isinstance(self.keogram_data, type(None)):
             # this only happens on the first image
 
@@ -238,14 +256,6 @@ class KeogramGenerator(object):
             raise KeogramMismatchException from e
 
 
-        # set every image for reasons
-        self.original_height = recenter_height
-        self.original_width = recenter_width
-
-
-        self.image_processing_elapsed_s += time.time() - image_processing_start
-
-
     def finalize(self, outfile, camera):
         import piexif
 
@@ -0,0 +1,150 @@
+### Renders Pillow text labels directly onto BGR numpy images
+### Each line is rasterized into small coverage masks limited to its bounding box.  Masks are
+### reused while the line text and position do not change, only changed lines are rendered again.
+
+from PIL import Image
+from PIL import ImageFont
+from PIL import ImageDraw
+import numpy
+import logging
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkyLabelRenderer(object):
+
+    _font_dict = dict()  # shared by all instances, index is (file, size)
+
+
+    def __init__(self):
+        self._line_dict = dict()  # rasterized lines from the last frame
+        self._next_line_dict = dict()
+
+
+    @classmethod
+    def getFont(cls, font_file, font_size):
+        """Load a TrueType font once per (file, size)"""
+        font_key = (str(font_file), int(font_size))
+
+        try:
+            return cls._font_dict[font_key]
+        except KeyError:
+            pass
+
+
+        font = ImageFont.truetype(font_key[0], font_key[1])
+        cls._font_dict[font_key] = font
+
+        return font
+
+
+    def start(self):
+        """Start a new frame"""
+        self._next_line_dict = dict()
+
+
+    def finish(self):
+        """Drop lines that were not drawn in this frame"""
+        self._line_dict = self._next_line_dict
+        self._next_line_dict = dict()
+
+
+    def drawText(self, image, text, font_file, font_size, pt, color_rgb, anchor='la', stroke_width=0, stroke_rgb=(0, 0, 0)):
+        """Draw text onto a BGR (or mono) numpy image in place"""
+        line_key = (text, str(font_file), int(font_size), int(pt[0]), int(pt[1]), anchor, stroke_width)
+
+        line = self._line_dict.get(line_key)
+        if isinstance(line, type(None)):
+            line = self._next_line_dict.get(line_key)
+
+        if isinstance(line, type(None)):
+            line = self._rasterize(text, font_file, font_size, pt, anchor, stroke_width)
+
+        self._next_line_dict[line_key] = line
+
+
+        x, y, stroke_mask, fill_mask = line
+        if isinstance(fill_mask, type(None)):
+            # nothing to draw
+            return
+
+
+        if stroke_width:
+            self._composite(image, x, y, stroke_mask, stroke_rgb)
+
+        self._composite(image, x, y, fill_mask, color_rgb)
+
+
+    def _rasterize(self, text, font_file, font_size, pt, anchor, stroke_width):
+        font = self.getFont(font_file, font_size)
+
+        left, top, right, bottom = font.getbbox(text, anchor=anchor, stroke_width=stroke_width)
+        width = right - left
+        height = bottom - top
+
+        if width <= 0 or height <= 0:
+            return int(pt[0]), int(pt[1]), None, None
+
+
+        # text origin inside the layer
+        origin = (-left, -top)
+
+
+        # Pillow draws the stroke (which includes the glyph) first, then the fill on top
+        stroke_mask = None
+        if stroke_width:
+            stroke_img = Image.new('L', (width, height), 0)
+            ImageDraw.Draw(stroke_img).text(
+                origin,
+                text,
+                fill=255,
+                font=font,
+                stroke_width=stroke_width,
+                stroke_fill=255,
+                anchor=anchor,
+            )
+            stroke_mask = numpy.asarray(stroke_img)
+
+
+        fill_img = Image.new('L', (width, height), 0)
+        ImageDraw.Draw(fill_img).text(
+            origin,
+            text,
+            fill=255,
+            font=font,
+            anchor=anchor,
+        )
+        fill_mask = numpy.asarray(fill_img)
+
+
+        return int(pt[0]) + left, int(pt[1]) + top, stroke_mask, fill_mask
+
+
+    def _composite(self, image, x, y, mask, color_rgb):
+        image_height, image_width = image.shape[:2]
+        mask_height, mask_width = mask.shape[:2]
+
+        # clip the layer to the image
+        x1 = max(x, 0)
+        y1 = max(y, 0)
+        x2 = min(x + mask_width, image_width)
+        y2 = min(y + mask_height, image_height)
+
+        if x1 >= x2 or y1 >= y2:
+            return
+
+
+        alpha = mask[y1 - y:y2 - y, x1 - x:x2 - x].astype(numpy.uint16)
+
+        region = image[y1:y2, x1:x2]
+
+        if len(image.shape) == 2:
+            # mono, use luminance of the color
+            color = numpy.array([int(0.299 * color_rgb[0] + 0.587 * color_rgb[1] + 0.114 * color_rgb[2])], dtype=numpy.uint16)
+        else:
+            color = numpy.array([color_rgb[2], color_rgb[1], color_rgb[0]], dtype=numpy.uint16)  # BGR
+            alpha = alpha[:, :, numpy.newaxis]
+
+
+        region[:] = (color * alpha + region.astype(numpy.uint16) * (255 - alpha) + 127) // 255
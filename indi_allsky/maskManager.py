@@ -0,0 +1,466 @@
+### Shared cache for the masks used by the processing stages
+### Masks are keyed by name, binning, image shape and the config values used to build them.
+### Binary masks are stored bit-packed in VARLIB_FOLDER so they survive restarts.
+### With processed=True the detection mask is rotated/flipped/cropped/scaled to match post-processed images.
+
+import os
+import io
+import time
+import json
+import hashlib
+from pathlib import Path
+import tempfile
+import cv2
+import numpy
+import logging
+
+from .maskProcessing import MaskProcessor
+from .geometry import IndiAllSkyGeometry
+from .bayer import IndiAllSkyBayer
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkyMaskManager(object):
+
+    cache_version = 1
+    cache_expire_s = 86400 * 30
+
+
+    def __init__(self, config, detect_mask=None, processed=False):
+        self.config = config
+        self.processed = processed
+
+        if isinstance(detect_mask, type(None)):
+            self.detect_mask = self.config.get('DETECT_MASK', '')
+        else:
+            # empty string disables the detection mask
+            self.detect_mask = detect_mask
+
+
+        self._mask_dict = dict()
+        self._key_dict = dict()  # id(mask) -> key for derived masks
+        self._detection_dict = dict()  # index for every bin mode
+
+        varlib_folder = self.config.get('VARLIB_FOLDER', '/var/lib/indi-allsky')
+        self.cache_dir = Path(varlib_folder).joinpath('mask_cache')
+
+
+    def get(self, name, binning, shape, params, builder, persist=True):
+        """Return the cached mask or build it with builder().  The array is read-only."""
+
+        if self.processed:
+            # keep separate cache files from the image processing masks
+            name = 'processed_{0:s}'.format(name)
+
+        key_data = {
+            'version' : self.cache_version,
+            'name'    : name,
+            'binning' : int(binning),
+            'shape'   : list(shape) if shape else None,
+            'params'  : params,
+        }
+        key = hashlib.sha1(json.dumps(key_data, sort_keys=True).encode()).hexdigest()[:16]
+
+        try:
+            return self._mask_dict[key]
+        except KeyError:
+            pass
+
+
+        cache_file_p = self.cache_dir.joinpath('{0:s}_bin{1:d}_{2:s}.npz'.format(name, int(binning), key))
+
+        mask = None
+        if persist:
+            mask = self._load(cache_file_p)
+
+        if isinstance(mask, type(None)):
+            mask = builder()
+
+            if isinstance(mask, type(None)):
+                # cache the miss too
+                self._mask_dict[key] = None
+                return None
+
+            if persist:
+                self._save(cache_file_p, mask)
+
+
+        mask.setflags(write=False)
+        self._mask_dict[key] = mask
+        self._key_dict[id(mask)] = key
+
+        return mask
+
+
+    def clear(self):
+        self._mask_dict.clear()
+        self._key_dict.clear()
+        self._detection_dict.clear()
+
+
+    def _load(self, cache_file_p):
+        try:
+            with io.open(str(cache_file_p), 'rb') as f_cache:
+                npz = numpy.load(f_cache)
+
+                shape = tuple(npz['shape'])
+                if bool(npz['packed']):
+                    mask = numpy.unpackbits(npz['data'], count=int(numpy.prod(shape)))
+                    mask = (mask.reshape(shape) * 255).astype(numpy.uint8)
+                else:
+                    mask = npz['data'].reshape(shape)
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning('Unable to load cached mask %s: %s', cache_file_p, str(e))
+            return None
+
+        #logger.info('Loaded cached mask %s', cache_file_p.name)
+
+        try:
+            # mtime is used to expire unused masks
+            os.utime(str(cache_file_p))
+        except OSError:
+            pass
+
+        return mask
+
+
+    def _save(self, cache_file_p, mask):
+        if mask.dtype == numpy.uint8 and not numpy.any((mask != 0) & (mask != 255)):
+            packed = True
+            data = numpy.packbits(mask > 0)
+        else:
+            packed = False
+            data = mask
+
+
+        try:
+            self.cache_dir.mkdir(mode=0o755, parents=True, exist_ok=True)
+
+            f_tmp = tempfile.NamedTemporaryFile(dir=str(self.cache_dir), suffix='.tmp', delete=False)
+            with f_tmp:
+                numpy.savez_compressed(f_tmp, data=data, shape=numpy.array(mask.shape), packed=packed)
+
+            Path(f_tmp.name).replace(cache_file_p)
+        except OSError as e:
+            logger.warning('Unable to cache mask %s: %s', cache_file_p, str(e))
+            return
+
+
+        # remove masks built from old settings that have not been used recently
+        expire_time = time.time() - self.cache_expire_s
+        for old_cache_p in self.cache_dir.glob('*.npz'):
+            try:
+                if old_cache_p.stat().st_mtime < expire_time:
+                    old_cache_p.unlink()
+            except OSError:
+                pass
+
+
+    def detection_mask(self, binning):
+        """User supplied detection mask scaled to binning, or None"""
+        try:
+            return self._detection_dict[binning]
+        except KeyError:
+            pass
+
+        self._detection_dict[binning] = self._getDetectionMask(binning)
+
+        return self._detection_dict[binning]
+
+
+    def _getDetectionMask(self, binning):
+        if not self.detect_mask:
+            logger.warning('No detection mask defined')
+            return None
+
+        detect_mask_p = Path(self.detect_mask)
+
+        try:
+            if not detect_mask_p.exists():
+                logger.error('%s does not exist', detect_mask_p)
+                return None
+
+
+            if not detect_mask_p.is_file():
+                logger.error('%s is not a file', detect_mask_p)
+                return None
+
+            detect_mask_stat = detect_mask_p.stat()
+        except PermissionError as e:
+            logger.error(str(e))
+            return None
+
+
+        params = {
+            'file'  : str(detect_mask_p.absolute()),
+            'mtime' : detect_mask_stat.st_mtime,
+            'size'  : detect_mask_stat.st_size,
+        }
+
+        if not self.processed:
+            return self.get('detection', binning, None, params, lambda: self._buildDetectionMask(detect_mask_p, binning))
+
+
+        params['processing'] = {k: self.config.get(k) for k in (
+            'IMAGE_ROTATE',
+            'IMAGE_ROTATE_ANGLE',
+            'IMAGE_ROTATE_KEEP_SIZE',
+            'IMAGE_FLIP_V',
+            'IMAGE_FLIP_H',
+            'IMAGE_CROP_ROI',
+            'IMAGE_CROP_IMAGE_CIRCLE',
+            'LENS_OFFSET_X',
+            'LENS_OFFSET_Y',
+            'LENS_IMAGE_CIRCLE',
+            'IMAGE_SCALE',
+            'IMAGE_SCALE_EARLY',
+            'IMAGE_SOFTWARE_BIN',
+        )}
+
+        return self.get('detection', binning, None, params, lambda: self._buildProcessedDetectionMask(detect_mask_p, binning))
+
+
+    def _buildDetectionMask(self, detect_mask_p, binning):
+        mask_data = cv2.imread(str(detect_mask_p), cv2.IMREAD_GRAYSCALE)  # mono
+        if isinstance(mask_data, type(None)):
+            logger.error('%s is not a valid image', detect_mask_p)
+            return None
+
+
+        logger.warning('Loaded detection mask: %s', detect_mask_p)
+
+        if binning > 1:
+            mask_height, mask_width = mask_data.shape[:2]
+
+            new_mask_height = int(mask_height / binning)
+            new_mask_width = int(mask_width / binning)
+
+            mask_data = cv2.resize(mask_data, (new_mask_width, new_mask_height), interpolation=cv2.INTER_AREA)
+
+
+        ### any intermediate values will be set to 255
+        mask_data[mask_data > 0] = 255
+
+        return mask_data
+
+
+    def _buildProcessedDetectionMask(self, detect_mask_p, binning):
+        # software binning and early scaling are applied the same as additional binning
+        early_scale = IndiAllSkyGeometry.early_scale_factor(self.config)
+        mask_binning = binning * IndiAllSkyBayer.bin_factor(self.config) * early_scale
+
+        mask_data = self._buildDetectionMask(detect_mask_p, mask_binning)
+        if isinstance(mask_data, type(None)):
+            return None
+
+
+        mask_processor = MaskProcessor(
+            self.config,
+            mask_binning,
+        )
+
+        # masks need to be rotated, flipped, cropped for post-processed images
+        mask_processor.image = mask_data
+
+
+        # rotation, flip and crop
+        mask_processor.transform()
+
+
+        # scale
+        if early_scale == 1 and self.config.get('IMAGE_SCALE') and self.config['IMAGE_SCALE'] != 100:
+            mask_processor.scale_image()
+
+
+        return mask_processor.image
+
+
+    def roi_mask(self, binning, shape, roi_key='SQM_ROI', fov_div_key='SQM_FOV_DIV'):
+        """Rectangular region of interest, falls back to a central ROI"""
+        image_height, image_width = shape[:2]
+
+        params = {
+            'roi'     : self.config.get(roi_key, []),
+            'fov_div' : self.config.get(fov_div_key, 4),
+        }
+
+        return self.get(
+            roi_key.lower(),
+            binning,
+            (image_height, image_width),
+            params,
+            lambda: self._buildRoiMask(binning, image_height, image_width, params['roi'], params['fov_div']),
+        )
+
+
+    def _buildRoiMask(self, binning, image_height, image_width, roi, fov_div):
+        logger.info('Generating mask based on ROI')
+
+        # create a black background
+        mask = numpy.zeros((image_height, image_width), dtype=numpy.uint8)
+
+        try:
+            x1 = int(roi[0] / binning)
+            y1 = int(roi[1] / binning)
+            x2 = int(roi[2] / binning)
+            y2 = int(roi[3] / binning)
+        except IndexError:
+            logger.warning('Using central ROI for mask')
+            x1 = int((image_width / 2) - (image_width / fov_div))
+            y1 = int((image_height / 2) - (image_height / fov_div))
+            x2 = int((image_width / 2) + (image_width / fov_div))
+            y2 = int((image_height / 2) + (image_height / fov_div))
+
+        # The white area is what we keep
+        cv2.rectangle(
+            img=mask,
+            pt1=(x1, y1),
+            pt2=(x2, y2),
+            color=255,  # mono
+            thickness=cv2.FILLED,
+        )
+
+        return mask
+
+
+    def star_mask(self, binning, shape):
+        """Detection mask if defined, otherwise SQM_ROI"""
+        detection_mask = self.detection_mask(binning)
+        if not isinstance(detection_mask, type(None)):
+            return detection_mask
+
+        return self.roi_mask(binning, shape)
+
+
+    def sqm_mask(self, binning, shape):
+        """SQM_ROI combined with the detection mask"""
+        roi_mask = self.roi_mask(binning, shape)
+
+        detection_mask = self.detection_mask(binning)
+        if isinstance(detection_mask, type(None)):
+            return roi_mask
+
+
+        def builder():
+            # combine masks in case there is overlapping regions
+            logger.info('Merging SQM mask with central ROI')
+            return cv2.bitwise_and(roi_mask, detection_mask)
+
+        return self.get('sqm', binning, shape[:2], self._dependsOn(roi_mask, detection_mask), builder, persist=False)
+
+
+    def adu_mask(self, binning, shape):
+        """Detection mask if defined, otherwise ADU_ROI"""
+        detection_mask = self.detection_mask(binning)
+        if not isinstance(detection_mask, type(None)):
+            return detection_mask
+
+        return self.roi_mask(binning, shape, roi_key='ADU_ROI', fov_div_key='ADU_FOV_DIV')
+
+
+    def numpy_mask(self, binning, shape):
+        """Boolean mask for numpy masked arrays, True values are masked"""
+        star_mask = self.star_mask(binning, shape)
+
+        return self.get('numpy', binning, shape[:2], self._dependsOn(star_mask), lambda: star_mask == 0, persist=False)
+
+
+    def gradient_mask(self, binning, shape, blur_kernel_size, split_line=False):
+        """Blurred star mask (uint8) used to suppress mask edges during line detection"""
+        star_mask = self.star_mask(binning, shape)
+
+        params = {
+            'star_mask'  : self._dependsOn(star_mask),
+            'blur'       : blur_kernel_size,
+            'split_line' : bool(split_line),
+        }
+
+
+        def builder():
+            line_mask = star_mask.copy()
+
+            if split_line:
+                # mask center line split between panes
+                image_height, image_width = line_mask.shape[:2]
+                half_width = int(image_width / 2)
+                cv2.line(
+                    img=line_mask,
+                    pt1=(half_width, 0),
+                    pt2=(half_width, image_height),
+                    color=0,  # mono
+                    thickness=71,
+                )
+
+            return cv2.blur(line_mask, (blur_kernel_size, blur_kernel_size), cv2.BORDER_DEFAULT)
+
+        return self.get('gradient', binning, shape[:2], params, builder)
+
+
+    def image_circle_mask(self, binning, shape, diameter, opacity, blur, offset_x=0, offset_y=0, name='image_circle'):
+        """Single channel image circle mask (uint8)"""
+        image_height, image_width = shape[:2]
+
+        params = {
+            'diameter' : diameter,
+            'opacity'  : opacity,
+            'blur'     : blur,
+            'offset_x' : offset_x,
+            'offset_y' : offset_y,
+        }
+
+
+        def builder():
+            background = int(255 * (100 - opacity) / 100)
+            #logger.info('Image circle backgound: %d', background)
+
+            channel_mask = numpy.full([image_height, image_width], background, dtype=numpy.uint8)
+
+            center_x = int(image_width / 2) + offset_x
+            center_y = int(image_height / 2) - offset_y  # minus
+            radius = int(diameter / 2)
+
+
+            # draw a white circle
+            cv2.circle(
+                img=channel_mask,
+                center=(center_x, center_y),
+                radius=radius,
+                color=255,  # mono
+                thickness=cv2.FILLED,
+            )
+
+
+            if blur:
+                # blur circle
+                channel_mask = cv2.blur(
+                    src=channel_mask,
+                    ksize=(blur, blur),
+                    borderType=cv2.BORDER_DEFAULT,
+                )
+
+            return channel_mask
+
+        return self.get(name, binning, (image_height, image_width), params, builder)
+
+
+    def image_circle_alpha(self, binning, shape, diameter, opacity, blur, offset_x=0, offset_y=0, name='image_circle'):
+        """Float32 alpha (height, width, 1) that broadcasts across color channels"""
+        channel_mask = self.image_circle_mask(binning, shape, diameter, opacity, blur, offset_x=offset_x, offset_y=offset_y, name=name)
+
+        return self.get(
+            '{0:s}_alpha'.format(name),
+            binning,
+            shape[:2],
+            self._dependsOn(channel_mask),
+            lambda: (channel_mask / 255).astype(numpy.float32)[:, :, numpy.newaxis],
+            persist=False,
+        )
+
+
+    def _dependsOn(self, *mask_list):
+        # derived masks are keyed on the keys of their source masks
+        return [self._key_dict[id(m)] for m in mask_list]
@@ -5,6 +5,8 @@
 import cv2
 import logging
 
+from .geometry import IndiAllSkyGeometry
+
 
 logger = logging.getLogger('indi_allsky')
 
@@ -21,6 +23,8 @@ class MaskProcessor(object):
 
         self._image = None
 
+        self._geometry = IndiAllSkyGeometry(self.config)
+
 
     @property
     def image(self):
@@ -31,6 +35,11 @@ class MaskProcessor(object):
         self._image = new_image
 
 
+    def transform(self):
+        """Rotate, flip and crop in a single pass, same as the image processor"""
+        self.image = self._geometry.apply(self.image, self.binning)
+
+
     def rotate_90(self):
         try:
             rotate_enum = getattr(cv2, self.config['IMAGE_ROTATE'])
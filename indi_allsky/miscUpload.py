@@ -44,6 +44,25 @@ class miscUpload(object):
         self._realtime_keogram_count = 0
 
 
+    @property
+    def counters(self):
+        return [
+            self._image_count,
+            self._image_syncapi_count,
+            self._panorama_count,
+            self._panorama_syncapi_count,
+            self._realtime_keogram_count,
+        ]
+
+    @counters.setter
+    def counters(self, new_counters):
+        self._image_count = int(new_counters[0])
+        self._image_syncapi_count = int(new_counters[1])
+        self._panorama_count = int(new_counters[2])
+        self._panorama_syncapi_count = int(new_counters[3])
+        self._realtime_keogram_count = int(new_counters[4])
+
+
     def upload_image(self, image_entry):
         if not self.config.get('FILETRANSFER', {}).get('UPLOAD_IMAGE'):
             #logger.warning('Image uploading disabled')
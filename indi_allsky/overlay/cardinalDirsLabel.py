@@ -3,10 +3,11 @@ from pathlib import Path
 import numpy
 import cv2
 from PIL import Image
-from PIL import ImageFont
 from PIL import ImageDraw
 import logging
 
+from ..labelRenderer import IndiAllSkyLabelRenderer
+
 logger = logging.getLogger('indi_allsky')
 
 
@@ -302,7 +303,7 @@ class IndiAllskyCardinalDirsLabel(object):
 
         pillow_font_size = self.config.get('CARDINAL_DIRS', {}).get('PIL_FONT_SIZE', 30)
 
-        font = ImageFont.truetype(str(pillow_font_file_p), pillow_font_size)
+        font = IndiAllSkyLabelRenderer.getFont(pillow_font_file_p, pillow_font_size)
         draw = ImageDraw.Draw(img_rgb)
 
         color_rgb = list(self.config['CARDINAL_DIRS']['FONT_COLOR'])  # RGB for pillow
@@ -521,7 +522,7 @@ class IndiAllskyCardinalDirsLabel(object):
 
         pillow_font_size = self.config.get('FISH2PANO', {}).get('PIL_FONT_SIZE', 30)
 
-        font = ImageFont.truetype(str(pillow_font_file_p), pillow_font_size)
+        font = IndiAllSkyLabelRenderer.getFont(pillow_font_file_p, pillow_font_size)
         draw = ImageDraw.Draw(img_rgb)
 
         color_rgb = list(self.config['CARDINAL_DIRS']['FONT_COLOR'])  # RGB for pillow
@@ -1,17 +1,15 @@
-import math
 from datetime import datetime
 from datetime import timedelta
 from pathlib import Path
 import time
-import ephem
 import numpy
 import cv2
 from PIL import Image
-from PIL import ImageFont
 from PIL import ImageDraw
 import logging
 
-from .. import constants
+from ..labelRenderer import IndiAllSkyLabelRenderer
+from ..ephemeris import IndiAllSkyEphemeris
 
 logger = logging.getLogger('indi_allsky')
 
@@ -219,15 +217,8 @@ class IndiAllSkyLightgraphOverlay(object):
         noon_utc = noon - utc_offset
 
 
-        obs = ephem.Observer()
-        obs.lat = math.radians(self.position_av[constants.POSITION_LATITUDE])
-        obs.lon = math.radians(self.position_av[constants.POSITION_LONGITUDE])
-
-        # disable atmospheric refraction calcs
-        obs.pressure = 0
-
-        sun = ephem.Sun()
-        moon = ephem.Moon()
+        # positions are interpolated from the shared per-minute table
+        ephemeris = IndiAllSkyEphemeris.from_position_av(self.position_av)
 
 
         day_color_bgr = list(self.config.get('LIGHTGRAPH_OVERLAY', {}).get('DAY_COLOR', (150, 150, 150)))
@@ -242,12 +233,10 @@ class IndiAllSkyLightgraphOverlay(object):
 
         lightgraph_list = list()
         for x in range(1440):
-            obs.date = noon_utc + timedelta(minutes=x)
-            sun.compute(obs)
-            moon.compute(obs)
+            minute_utc = noon_utc + timedelta(minutes=x)
 
-            sun_alt_deg = math.degrees(sun.alt)
-            moon_alt_deg = math.degrees(moon.alt)
+            sun_alt_deg = ephemeris.alt_az('sun', minute_utc)[0]
+            moon_alt_deg = ephemeris.alt_az('moon', minute_utc)[0]
 
 
             if moon_alt_deg < -6:
@@ -396,7 +385,7 @@ class IndiAllSkyLightgraphOverlay(object):
 
         pillow_font_size = self.config.get('LIGHTGRAPH_OVERLAY', {}).get('PIL_FONT_SIZE', 20)
 
-        font = ImageFont.truetype(str(pillow_font_file_p), pillow_font_size)
+        font = IndiAllSkyLabelRenderer.getFont(pillow_font_file_p, pillow_font_size)
         draw = ImageDraw.Draw(lightgraph_rgb)
 
         color_rgb = list(self.config.get('LIGHTGRAPH_OVERLAY', {}).get('FONT_COLOR', (200, 200, 200)))  # RGB for pillow
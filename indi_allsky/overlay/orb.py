@@ -2,7 +2,7 @@ import cv2
 import math
 import logging
 
-import ephem
+from ..ephemeris import IndiAllSkyEphemeris
 
 logger = logging.getLogger('indi_allsky')
 
@@ -12,6 +12,18 @@ class IndiAllskyOrbGenerator(object):
 
     line_thickness = 2
 
+    # sun events drawn as ticks on the image edge
+    sun_event_list = (
+        ('rising', 0.0),  # Sunrise
+        ('rising', -6.0),  # Civil dawn
+        ('rising', -12.0),  # Nautical dawn
+        ('rising', -18.0),  # Astronomical dawn
+        ('setting', 0.0),  # Sunset
+        ('setting', -6.0),  # Civil twilight
+        ('setting', -12.0),  # Nautical twilight
+        ('setting', -18.0),  # Astronomical twilight
+    )
+
 
     def __init__(self, config):
         self.config = config
@@ -149,223 +161,46 @@ class IndiAllskyOrbGenerator(object):
         self.drawEdgeCircle_opencv(data_bytes, (moonOrbX, moonOrbY), self.moon_color_bgr)
 
 
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Sunrise
-        try:
-            obs.horizon = math.radians(0.0)
-            sun_rise_date = obs.next_rising(sun, use_center=True)
-
-            obs.date = sun_rise_date
-            sun.compute(obs)
-            sunRiseX, sunRiseY = self.getOrbHourAngleXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunRiseX, sunRiseY), (100, 100, 100))
-        except ephem.NeverUpError:
-            # northern hemisphere
-            pass
-        except ephem.AlwaysUpError:
-            # southern hemisphere
-            pass
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Civil dawn
-        try:
-            obs.horizon = math.radians(-6.0)
-            sun_civilDawn_date = obs.next_rising(sun, use_center=True)
+        # Sunrise, dawn, sunset, twilight and night/day boundaries
+        for event_data, color_bgr in self.getSunEvents(utcnow, obs):
+            eventX, eventY = self.mapHourAngleXY(event_data['ha'], (image_height, image_width))
 
-            obs.date = sun_civilDawn_date
-            sun.compute(obs)
-            sunCivilDawnX, sunCivilDawnY = self.getOrbHourAngleXY(sun, obs, (image_height, image_width))
+            self.drawEdgeLine_opencv(data_bytes, (eventX, eventY), color_bgr)
 
-            self.drawEdgeLine_opencv(data_bytes, (sunCivilDawnX, sunCivilDawnY), (100, 100, 100))
-        except ephem.NeverUpError:
-            # northern hemisphere
-            pass
-        except ephem.AlwaysUpError:
-            # southern hemisphere
-            pass
 
+    def getSunEvents(self, utcnow, obs):
+        """Sun events drawn on the image edge, the events are cached by the shared ephemeris"""
+        ephemeris = IndiAllSkyEphemeris.get(math.degrees(obs.lat), math.degrees(obs.lon), obs.elevation)
 
-        obs.date = utcnow  # reset
-        sun.compute(obs)
+        event_list = [(event, horizon, (100, 100, 100)) for event, horizon in self.sun_event_list]
 
-        # Nautical dawn
-        try:
-            obs.horizon = math.radians(-12.0)
-            sun_nauticalDawn_date = obs.next_rising(sun, use_center=True)
+        # Night/Day and Day/Night
+        event_list.append(('rising', self.sun_alt_deg, self.text_color_bgr))
+        event_list.append(('setting', self.sun_alt_deg, self.text_color_bgr))
 
-            obs.date = sun_nauticalDawn_date
-            sun.compute(obs)
-            sunNauticalDawnX, sunNauticalDawnY = self.getOrbHourAngleXY(sun, obs, (image_height, image_width))
 
-            self.drawEdgeLine_opencv(data_bytes, (sunNauticalDawnX, sunNauticalDawnY), (100, 100, 100))
-        except ephem.NeverUpError:
-            # northern hemisphere
-            pass
-        except ephem.AlwaysUpError:
-            # southern hemisphere
-            pass
+        sun_event_list = list()
+        for event, horizon, color_bgr in event_list:
+            event_data = ephemeris.next_event('sun', event, utcnow, horizon=horizon, use_center=True)
 
+            if isinstance(event_data, type(None)):
+                # never up or always up, depending on hemisphere
+                continue
 
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Astronomical dawn
-        try:
-            obs.horizon = math.radians(-18.0)
-            sun_astroDawn_date = obs.next_rising(sun, use_center=True)
+            sun_event_list.append((event_data, color_bgr))
 
-            obs.date = sun_astroDawn_date
-            sun.compute(obs)
-            sunAstroDawnX, sunAstroDawnY = self.getOrbHourAngleXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunAstroDawnX, sunAstroDawnY), (100, 100, 100))
-        except ephem.NeverUpError:
-            # northern hemisphere
-            pass
-        except ephem.AlwaysUpError:
-            # southern hemisphere
-            pass
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Sunset
-        try:
-            obs.horizon = math.radians(0.0)
-            sun_set_date = obs.next_setting(sun, use_center=True)
-
-            obs.date = sun_set_date
-            sun.compute(obs)
-            sunSunSetX, sunSunSetY = self.getOrbHourAngleXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunSunSetX, sunSunSetY), (100, 100, 100))
-        except ephem.AlwaysUpError:
-            # northern hemisphere
-            pass
-        except ephem.NeverUpError:
-            # southern hemisphere
-            pass
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Civil twilight
-        try:
-            obs.horizon = math.radians(-6.0)
-            sun_civilTwilight_date = obs.next_setting(sun, use_center=True)
-
-            obs.date = sun_civilTwilight_date
-            sun.compute(obs)
-            sunCivilTwilightX, sunCivilTwilightY = self.getOrbHourAngleXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunCivilTwilightX, sunCivilTwilightY), (100, 100, 100))
-        except ephem.AlwaysUpError:
-            # northern hemisphere
-            pass
-        except ephem.NeverUpError:
-            # southern hemisphere
-            pass
+        return sun_event_list
 
 
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Nautical twilight
-        try:
-            obs.horizon = math.radians(-12.0)
-            sun_nauticalTwilight_date = obs.next_setting(sun, use_center=True)
-
-            obs.date = sun_nauticalTwilight_date
-            sun.compute(obs)
-            sunNauticalTwilightX, sunNauticalTwilightY = self.getOrbHourAngleXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunNauticalTwilightX, sunNauticalTwilightY), (100, 100, 100))
-        except ephem.AlwaysUpError:
-            # northern hemisphere
-            pass
-        except ephem.NeverUpError:
-            # southern hemisphere
-            pass
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Astronomical twilight
-        try:
-            obs.horizon = math.radians(-18.0)
-            sun_astroTwilight_date = obs.next_setting(sun, use_center=True)
-
-            obs.date = sun_astroTwilight_date
-            sun.compute(obs)
-            sunAstroTwilightX, sunAstroTwilightY = self.getOrbHourAngleXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunAstroTwilightX, sunAstroTwilightY), (100, 100, 100))
-        except ephem.AlwaysUpError:
-            # northern hemisphere
-            pass
-        except ephem.NeverUpError:
-            # southern hemisphere
-            pass
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Night/Day boundary
-        try:
-            obs.horizon = math.radians(self.sun_alt_deg)
-            sun_nightDay_date = obs.next_rising(sun, use_center=True)
-
-            obs.date = sun_nightDay_date
-            sun.compute(obs)
-            sunNightDayX, sunNightDayY = self.getOrbHourAngleXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunNightDayX, sunNightDayY), self.text_color_bgr)
-        except ephem.AlwaysUpError:
-            # northern hemisphere
-            pass
-        except ephem.NeverUpError:
-            # southern hemisphere
-            pass
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Day/Night boundary
-        try:
-            obs.horizon = math.radians(self.sun_alt_deg)
-            sun_dayNight_date = obs.next_setting(sun, use_center=True)
-
-            obs.date = sun_dayNight_date
-            sun.compute(obs)
-            sunDayNightX, sunDayNightY = self.getOrbHourAngleXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunDayNightX, sunDayNightY), self.text_color_bgr)
-        except ephem.AlwaysUpError:
-            # northern hemisphere
-            pass
-        except ephem.NeverUpError:
-            # southern hemisphere
-            pass
+    def getOrbHourAngleXY(self, skyObj, obs, image_size):
+        ha_rad = obs.sidereal_time() - skyObj.ra
 
+        return self.mapHourAngleXY(math.degrees(ha_rad), image_size)
 
 
-    def getOrbHourAngleXY(self, skyObj, obs, image_size):
+    def mapHourAngleXY(self, ha_deg, image_size):
         image_height, image_width = image_size
 
-        ha_rad = obs.sidereal_time() - skyObj.ra
-        ha_deg = math.degrees(ha_rad)
-
 
         # add azimuth offset
         ha_deg += self.azimuth_offset
@@ -444,221 +279,20 @@ class IndiAllskyOrbGenerator(object):
         self.drawEdgeCircle_opencv(data_bytes, (moonOrbX, moonOrbY), self.moon_color_bgr)
 
 
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Sunrise
-        try:
-            obs.horizon = math.radians(0.0)
-            sun_rise_date = obs.next_rising(sun, use_center=True)
+        # Sunrise, dawn, sunset, twilight and night/day boundaries
+        for event_data, color_bgr in self.getSunEvents(utcnow, obs):
+            eventX, eventY = self.mapAzimuthXY(event_data['az'], (image_height, image_width))
 
-            obs.date = sun_rise_date
-            sun.compute(obs)
-            sunSunRiseX, sunSunRiseY = self.getOrbAzimuthXY(sun, obs, (image_height, image_width))
+            self.drawEdgeLine_opencv(data_bytes, (eventX, eventY), color_bgr)
 
-            self.drawEdgeLine_opencv(data_bytes, (sunSunRiseX, sunSunRiseY), (100, 100, 100))
-        except ephem.NeverUpError:
-            # northern hemisphere
-            pass
-        except ephem.AlwaysUpError:
-            # southern hemisphere
-            pass
 
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Civil dawn
-        try:
-            obs.horizon = math.radians(-6.0)
-            sun_civilDawn_date = obs.next_rising(sun, use_center=True)
-
-            obs.date = sun_civilDawn_date
-            sun.compute(obs)
-            sunCivilDawnX, sunCivilDawnY = self.getOrbAzimuthXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunCivilDawnX, sunCivilDawnY), (100, 100, 100))
-        except ephem.NeverUpError:
-            # northern hemisphere
-            pass
-        except ephem.AlwaysUpError:
-            # southern hemisphere
-            pass
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Nautical dawn
-        try:
-            obs.horizon = math.radians(-12.0)
-            sun_nauticalDawn_date = obs.next_rising(sun, use_center=True)
-
-            obs.date = sun_nauticalDawn_date
-            sun.compute(obs)
-            sunNauticalDawnX, sunNauticalDawnY = self.getOrbAzimuthXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunNauticalDawnX, sunNauticalDawnY), (100, 100, 100))
-        except ephem.NeverUpError:
-            # northern hemisphere
-            pass
-        except ephem.AlwaysUpError:
-            # southern hemisphere
-            pass
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Astronomical dawn
-        try:
-            obs.horizon = math.radians(-18.0)
-            sun_astroDawn_date = obs.next_rising(sun, use_center=True)
-
-            obs.date = sun_astroDawn_date
-            sun.compute(obs)
-            sunAstroDawnX, sunAstroDawnY = self.getOrbAzimuthXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunAstroDawnX, sunAstroDawnY), (100, 100, 100))
-        except ephem.NeverUpError:
-            # northern hemisphere
-            pass
-        except ephem.AlwaysUpError:
-            # southern hemisphere
-            pass
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Sunset
-        try:
-            obs.horizon = math.radians(0.0)
-            sun_set_date = obs.next_setting(sun, use_center=True)
-
-            obs.date = sun_set_date
-            sun.compute(obs)
-            sunSunSetX, sunSunSetY = self.getOrbAzimuthXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunSunSetX, sunSunSetY), (100, 100, 100))
-        except ephem.AlwaysUpError:
-            # northern hemisphere
-            pass
-        except ephem.NeverUpError:
-            # southern hemisphere
-            pass
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Civil twilight
-        try:
-            obs.horizon = math.radians(-6.0)
-            sun_civilTwilight_date = obs.next_setting(sun, use_center=True)
-
-            obs.date = sun_civilTwilight_date
-            sun.compute(obs)
-            sunCivilTwilightX, sunCivilTwilightY = self.getOrbAzimuthXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunCivilTwilightX, sunCivilTwilightY), (100, 100, 100))
-        except ephem.AlwaysUpError:
-            # northern hemisphere
-            pass
-        except ephem.NeverUpError:
-            # southern hemisphere
-            pass
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Nautical twilight
-        try:
-            obs.horizon = math.radians(-12.0)
-            sun_nauticalTwilight_date = obs.next_setting(sun, use_center=True)
-
-            obs.date = sun_nauticalTwilight_date
-            sun.compute(obs)
-            sunNauticalTwilightX, sunNauticalTwilightY = self.getOrbAzimuthXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunNauticalTwilightX, sunNauticalTwilightY), (100, 100, 100))
-        except ephem.AlwaysUpError:
-            # northern hemisphere
-            pass
-        except ephem.NeverUpError:
-            # southern hemisphere
-            pass
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Astronomical twilight
-        try:
-            obs.horizon = math.radians(-18.0)
-            sun_astroTwilight_date = obs.next_setting(sun, use_center=True)
-
-            obs.date = sun_astroTwilight_date
-            sun.compute(obs)
-            sunAstroTwilightX, sunAstroTwilightY = self.getOrbAzimuthXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunAstroTwilightX, sunAstroTwilightY), (100, 100, 100))
-        except ephem.AlwaysUpError:
-            # northern hemisphere
-            pass
-        except ephem.NeverUpError:
-            # southern hemisphere
-            pass
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Night/Day
-        try:
-            obs.horizon = math.radians(self.sun_alt_deg)
-            sun_nightDay_date = obs.next_rising(sun, use_center=True)
-
-            obs.date = sun_nightDay_date
-            sun.compute(obs)
-            sunNightDayX, sunNightDayY = self.getOrbAzimuthXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunNightDayX, sunNightDayY), self.text_color_bgr)
-        except ephem.NeverUpError:
-            # northern hemisphere
-            pass
-        except ephem.AlwaysUpError:
-            # southern hemisphere
-            pass
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        # Day/Night
-        try:
-            obs.horizon = math.radians(self.sun_alt_deg)
-            sun_dayNight_date = obs.next_setting(sun, use_center=True)
-
-            obs.date = sun_dayNight_date
-            sun.compute(obs)
-            sunDayNightX, sunDayNightY = self.getOrbAzimuthXY(sun, obs, (image_height, image_width))
-
-            self.drawEdgeLine_opencv(data_bytes, (sunDayNightX, sunDayNightY), self.text_color_bgr)
-        except ephem.NeverUpError:
-            # northern hemisphere
-            pass
-        except ephem.AlwaysUpError:
-            # southern hemisphere
-            pass
+    def getOrbAzimuthXY(self, skyObj, obs, image_size):
+        return self.mapAzimuthXY(math.degrees(skyObj.az), image_size)
 
 
-    def getOrbAzimuthXY(self, skyObj, obs, image_size):
+    def mapAzimuthXY(self, az_deg, image_size):
         image_height, image_width = image_size
 
-        az_deg = math.degrees(skyObj.az)
-
 
         # add azimuth offset
         az_deg += self.azimuth_offset
@@ -819,7 +453,10 @@ class IndiAllskyOrbGenerator(object):
         # do not offset azimuth
         # do not reverse motion
 
-        skyObj_transit_date = obs.next_transit(skyObj).datetime()
+        ephemeris = IndiAllSkyEphemeris.get(math.degrees(obs.lat), math.degrees(obs.lon), obs.elevation)
+
+        transit_data = ephemeris.next_event(skyObj.name.lower(), 'transit', utcnow)
+        skyObj_transit_date = transit_data['date'].datetime()
         skyObj_transit_delta = skyObj_transit_date - utcnow.replace(tzinfo=None)
         if skyObj_transit_delta.seconds < 43200:  # 12 hours
             # rising, put on right
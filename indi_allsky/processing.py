@@ -11,9 +11,6 @@ import signal
 import numpy
 import cv2
 import psutil
-from PIL import Image
-from PIL import ImageFont
-from PIL import ImageDraw
 from fractions import Fraction
 from pprint import pformat  # noqa: F401
 import logging
@@ -32,6 +29,16 @@ from .draw import IndiAllSkyDraw
 from .scnr import IndiAllskyScnr
 from .denoise import IndiAllskyDenoise
 from .stack import IndiAllskyStacker
+from .maskManager import IndiAllSkyMaskManager
+from .toneLut import IndiAllSkyToneLut
+from .labelRenderer import IndiAllSkyLabelRenderer
+from .geometry import IndiAllSkyGeometry
+from .bayer import IndiAllSkyBayer
+from .badPixelMap import IndiAllSkyBadPixelMap
+from .tiled import IndiAllSkyTiledExecutor
+from .budget import IndiAllSkyProcessingBudget
+from .ephemeris import IndiAllSkyEphemeris
+from .satellites import IndiAllSkySatelliteTracker
 from .overlay.cardinalDirsLabel import IndiAllskyCardinalDirsLabel
 from .utils import IndiAllSkyDateCalcs
 from .overlay.moonOverlay import IndiAllSkyMoonOverlay
@@ -111,6 +118,7 @@ class ImageProcessor(object):
         sensors_user_av,
         night_av,
         astro_av,
+        workers=1,
     ):
         self.config = config
 
@@ -131,17 +139,16 @@ class ImageProcessor(object):
 
         self._max_bit_depth = 8  # this will be scaled up (never down) as detected
 
-        self._image_circle_alpha_mask_dict = dict()  # index for every bin mode
-
         self._overlay_dict = dict()  # index for every bin mode
         self._alpha_mask_dict = dict()  # index for every bin mode
 
         self._gamma_lut = None
+        self._gamma_lut_value = None
 
-        self.focus_mode = self.config.get('FOCUS_MODE', False)
+        self._shift_lut_dict = dict()  # index for every shift factor
 
-        self.stack_method = self.config.get('IMAGE_STACK_METHOD', 'maximum')
-        self.stack_count = self.config.get('IMAGE_STACK_COUNT', 1)
+        # pointwise operations are composed and applied in one pass
+        self._tone_lut = IndiAllSkyToneLut()
 
         self._text_color_rgb = [0, 0, 0]
         self._text_xy = [0, 0]
@@ -149,6 +156,15 @@ class ImageProcessor(object):
         self._text_size_pillow = 0
         self._text_font_height = 0
 
+        self._label_renderer = IndiAllSkyLabelRenderer()
+
+        # operations on raw CFA data before debayer
+        self._bayer = IndiAllSkyBayer()
+
+        # the last sparse bad pixel map, the files are not modified after they are created
+        self._bpm_filename = None
+        self._bpm = None
+
         self._libcamera_raw = False
 
         # contains the current stacked image
@@ -161,22 +177,19 @@ class ImageProcessor(object):
 
 
         # These are setup in add() after binning_av is populated
-        self._detection_mask_dict = None
-        self._adu_mask_dict = None
+        self._mask_manager = None
         self._sqm = None
         self._stars_detect = None
         self._lineDetect = None
         self._draw = None
         self._stacker = None
         self._stretch_o = None
-        self._image_overlay_o = IndiAllSkyImageOverlay(self.config)
 
 
-        self._ia_scnr = IndiAllskyScnr(self.config, self.night_av)
-        self._ia_denoise = IndiAllskyDenoise(self.config, self.night_av)
-        self._cardinal_dirs_label = IndiAllskyCardinalDirsLabel(self.config)
-        self._moon_overlay = IndiAllSkyMoonOverlay(self.config)
-        self._lightgraph_overlay = IndiAllSkyLightgraphOverlay(self.config, self.position_av)
+        self._tiled = IndiAllSkyTiledExecutor()
+        # image workers in the pool, each frame has one exposure period per worker
+        self._budget = IndiAllSkyProcessingBudget(self.config, self.night_av, workers=workers)
+        self._satellite_tracker = IndiAllSkySatelliteTracker(self.config)
 
         self._camera_sqm_raw_mag = 0.0
 
@@ -185,12 +198,8 @@ class ImageProcessor(object):
         self._wbg_mtf_lut = None
         self._wbr_mtf_lut = None
 
-        self._orb = IndiAllskyOrbGenerator(self.config)
-        self._orb.sun_alt_deg = self.config['NIGHT_SUN_ALT_DEG']
-        self._orb.azimuth_offset = self.config['ORB_PROPERTIES'].get('AZ_OFFSET', 0.0)
-        self._orb.retrograde = self.config['ORB_PROPERTIES'].get('RETROGRADE', False)
-        self._orb.sun_color_rgb = self.config['ORB_PROPERTIES']['SUN_COLOR']
-        self._orb.moon_color_rgb = self.config['ORB_PROPERTIES']['MOON_COLOR']
+        # objects that cache config values
+        self._loadConfig()
 
 
         # Realtime keogram
@@ -225,16 +234,27 @@ class ImageProcessor(object):
 
     @property
     def image(self):
+        if self._tone_lut.pending:
+            # apply the composed lookup tables before the data is used
+            self._image = self._tone_lut.apply(self._image)
+
         return self._image
 
     @image.setter
     def image(self, new_image):
+        self._tone_lut.reset()  # pending lookup tables belong to the previous image
         self._image = new_image
 
 
+    @property
+    def budget(self):
+        return self._budget
+
+
     @property
     def shape(self):
-        return self.image.shape
+        # pointwise operations do not change the shape
+        return self._image.shape
 
     @shape.setter
     def shape(self, *args):
@@ -375,25 +395,78 @@ class ImageProcessor(object):
         return self._camera_sqm_raw_mag
 
 
+    def _loadConfig(self):
+        self.focus_mode = self.config.get('FOCUS_MODE', False)
+
+        self.stack_method = self.config.get('IMAGE_STACK_METHOD', 'maximum')
+        self.stack_count = self.config.get('IMAGE_STACK_COUNT', 1)
+
+        # rotate, flip and crop are planned as a single transform
+        self._geometry = IndiAllSkyGeometry(self.config)
+
+        self._image_overlay_o = IndiAllSkyImageOverlay(self.config)
+
+        self._ia_scnr = IndiAllskyScnr(self.config, self.night_av)
+        self._ia_denoise = IndiAllskyDenoise(self.config, self.night_av)
+        self._cardinal_dirs_label = IndiAllskyCardinalDirsLabel(self.config)
+        self._moon_overlay = IndiAllSkyMoonOverlay(self.config)
+        self._lightgraph_overlay = IndiAllSkyLightgraphOverlay(self.config, self.position_av)
+
+        self._orb = IndiAllskyOrbGenerator(self.config)
+        self._orb.sun_alt_deg = self.config['NIGHT_SUN_ALT_DEG']
+        self._orb.azimuth_offset = self.config['ORB_PROPERTIES'].get('AZ_OFFSET', 0.0)
+        self._orb.retrograde = self.config['ORB_PROPERTIES'].get('RETROGRADE', False)
+        self._orb.sun_color_rgb = self.config['ORB_PROPERTIES']['SUN_COLOR']
+        self._orb.moon_color_rgb = self.config['ORB_PROPERTIES']['MOON_COLOR']
+
+
+    def reloadConfig(self):
+        """Rebuild the objects that cache config values, the config dict has already been updated"""
+        self._loadConfig()
+
+        # masks, detection, stacking and stretch objects are recreated with the next image
+        # the stacked frames and the stacker rotation history are kept
+        self._mask_manager = None
+
+        # logo overlay and white balance LUTs
+        self._overlay_dict.clear()
+        self._alpha_mask_dict.clear()
+
+        self._wbb_mtf_lut = None
+        self._wbg_mtf_lut = None
+        self._wbr_mtf_lut = None
+
+
     def post_init(self):
         # binning_av needs to be populated before running this
 
-        self._detection_mask_dict = self._load_detection_mask()
-        self._adu_mask_dict = self._detection_mask_dict  # reuse detection mask for ADU mask (if defined)
+        # masks are shared by all of the processing stages
+        self._mask_manager = IndiAllSkyMaskManager(self.config)
+
+        if self.config.get('IMAGE_SCALE_EARLY') and self._geometry.early_scale_factor(self.config) == 1:
+            if self.config.get('IMAGE_SCALE', 100) != 100:
+                logger.warning('Early scaling requires a scale factor that divides 100 evenly, scaling after processing')
 
-        self._sqm = IndiAllskySqm(self.config, self.gain_av, mask=self._detection_mask_dict)
-        self._stars_detect = IndiAllSkyStars(self.config, mask=self._detection_mask_dict)
-        self._lineDetect = IndiAllskyDetectLines(self.config, mask=self._detection_mask_dict)
-        self._draw = IndiAllSkyDraw(self.config, mask=self._detection_mask_dict)
+        self._sqm = IndiAllskySqm(self.config, self.gain_av, mask_manager=self._mask_manager)
+        self._stars_detect = IndiAllSkyStars(self.config, mask_manager=self._mask_manager)
+        self._lineDetect = IndiAllskyDetectLines(self.config, mask_manager=self._mask_manager)
+        self._draw = IndiAllSkyDraw(self.config, mask_manager=self._mask_manager)
+
+        old_stacker = self._stacker
+
+        self._stacker = IndiAllskyStacker(self.config, mask_manager=self._mask_manager)
+
+        if not isinstance(old_stacker, type(None)):
+            # config reload
+            self._stacker.hist_rotation = old_stacker.hist_rotation
 
-        self._stacker = IndiAllskyStacker(self.config, mask=self._detection_mask_dict)
         self._stacker.detection_sigma = self.config.get('IMAGE_ALIGN_DETECTSIGMA', 5)
         self._stacker.max_control_points = self.config.get('IMAGE_ALIGN_POINTS', 50)
         self._stacker.min_area = self.config.get('IMAGE_ALIGN_SOURCEMINAREA', 10)
 
         if self.config['IMAGE_STRETCH'].get('CLASSNAME'):
             stretch_class = getattr(stretch_classes, self.config['IMAGE_STRETCH']['CLASSNAME'])
-            self._stretch_o = stretch_class(self.config, mask=self._detection_mask_dict)
+            self._stretch_o = stretch_class(self.config, mask_manager=self._mask_manager)
         else:
             self._stretch_o = None
 
@@ -420,7 +493,7 @@ class ImageProcessor(object):
 
 
     def add(self, filename, exposure, gain, binning, exp_date, exp_elapsed, camera):
-        if isinstance(self._detection_mask_dict, type(None)):
+        if isinstance(self._mask_manager, type(None)):
             # binning_av needs to be populated before running this
             self.post_init()
 
@@ -904,6 +977,18 @@ class ImageProcessor(object):
             image_bayerpat = i_ref.image_bayerpat
 
 
+        software_bin = self._bayer.bin_factor(self.config)
+        if software_bin > 1 and not self.focus_mode:
+            # same color pixels are binned, the CFA pattern is preserved
+            data = self._bayer.bin2(data, image_bayerpat)
+            i_ref.software_bin = software_bin
+
+
+        # single channel statistics are calculated from the CFA data
+        i_ref.cfa_data = data
+        i_ref.cfa_bayerpat = image_bayerpat
+
+
         if not image_bayerpat:
             # assume mono data
             logger.error('No bayer pattern detected')
@@ -921,6 +1006,42 @@ class ImageProcessor(object):
         return cv2.cvtColor(data, debayer_algorithm)
 
 
+    def scale_image_early(self):
+        """Downscale the latest image right after debayer, later stages run at the reduced size"""
+        factor = self._geometry.early_scale_factor(self.config)
+
+        if factor == 1:
+            return
+
+
+        i_ref = self.getLatestImage()
+
+        if self.config.get('IMAGE_EXPORT_RAW'):
+            # raw export uses the full resolution data
+            i_ref.opencv_data_full = i_ref.opencv_data
+
+
+        image_height, image_width = i_ref.opencv_data.shape[:2]
+
+        # whole factor, pixel coordinates divide the same as binning
+        new_height = image_height // factor
+        new_width = image_width // factor
+
+        i_ref.opencv_data = cv2.resize(i_ref.opencv_data, (new_width, new_height), interpolation=cv2.INTER_AREA)
+        i_ref.early_scale = factor
+
+
+        # only the latest image keeps full resolution data
+        for x in self.image_list[1:]:
+            if isinstance(x, type(None)):
+                continue
+
+            x.opencv_data_full = None
+
+
+        return True
+
+
     def getLatestImage(self):
         return self.image_list[0]
 
@@ -1085,8 +1206,7 @@ class ImageProcessor(object):
             p_bpm = Path(bpm_entry.getFilesystemPath())
             if p_bpm.exists():
                 logger.info('Matched bad pixel map: %s', p_bpm)
-                with fits.open(p_bpm) as bpm_f:
-                    bpm = bpm_f[0].data
+                bpm = self._load_bpm(p_bpm)
             else:
                 logger.error('Bad Pixel Map missing: %s', bpm_entry.filename)
                 bpm = None
@@ -1106,11 +1226,19 @@ class ImageProcessor(object):
             dark = dark_f[0].data
 
 
-        if not isinstance(bpm, type(None)):
-            # merge bad pixel map and dark
-            master_dark = numpy.maximum(bpm, dark)
-        else:
+        if not isinstance(bpm, type(None)) and bpm.shape != dark.shape:
+            logger.error('Bad pixel map dimensions mismatch - %s vs %s', str(bpm.shape), str(dark.shape))
+            bpm = None
+
+
+        if isinstance(bpm, type(None)):
+            master_dark = dark
+        elif self.config.get('IMAGE_CALIBRATE_BPM_MEDIAN'):
+            # bad pixels are replaced after the dark is subtracted
             master_dark = dark
+        else:
+            # merge bad pixel map and dark
+            master_dark = bpm.apply(dark)
 
 
         master_dark_height, master_dark_width = master_dark.shape[:2]
@@ -1195,9 +1323,33 @@ class ImageProcessor(object):
             raise CalibrationNotFound('Unknown image data type: {0:s}'.format(str(data.dtype.type)))
 
 
+        if not isinstance(bpm, type(None)) and self.config.get('IMAGE_CALIBRATE_BPM_MEDIAN'):
+            # median of the nearest same color pixels, only at the bad pixel coordinates
+            self._bayer.fix_pixels(data_calibrated, bpm.y, bpm.x)
+            logger.info('Replaced %d bad pixels', bpm.count)
+
+
         return data_calibrated
 
 
+    def _load_bpm(self, p_bpm):
+        if self._bpm_filename == str(p_bpm):
+            return self._bpm
+
+
+        try:
+            bpm = IndiAllSkyBadPixelMap.open(p_bpm)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error('Unable to load bad pixel map: %s', str(e))
+            return None
+
+
+        self._bpm_filename = str(p_bpm)
+        self._bpm = bpm
+
+        return bpm
+
+
     def fix_holes_early(self):
         if self.focus_mode:
             # disable processing in focus mode
@@ -1228,48 +1380,8 @@ class ImageProcessor(object):
 
         holes_start = time.time()
 
-
-        if len(data.shape) == 2:
-            # mono/bayered
-            ### using an offset of 2 because want the same color pixel for bayered data
-            for y, x in numpy.argwhere(i_ref.hole_mask):
-                try:
-                    alt_value_1 = data[y - 2][x]
-                except IndexError:
-                    alt_value_1 = data[y + 2][x]
-
-                try:
-                    alt_value_2 = data[y][x - 2]
-                except IndexError:
-                    alt_value_2 = data[y][x + 2]
-
-
-                data[y][x] = numpy.maximum(alt_value_1, alt_value_2)
-        else:
-            # RGB (fits)
-            for y, x in numpy.argwhere(i_ref.hole_mask):
-                try:
-                    r_alt_value_1 = data[0][y - 2][x]
-                    g_alt_value_1 = data[1][y - 2][x]
-                    b_alt_value_1 = data[2][y - 2][x]
-                except IndexError:
-                    r_alt_value_1 = data[0][y + 2][x]
-                    g_alt_value_1 = data[1][y + 2][x]
-                    b_alt_value_1 = data[2][y + 2][x]
-
-                try:
-                    r_alt_value_2 = data[0][y][x - 2]
-                    g_alt_value_2 = data[1][y][x - 2]
-                    b_alt_value_2 = data[2][y][x - 2]
-                except IndexError:
-                    r_alt_value_2 = data[0][y][x + 2]
-                    g_alt_value_2 = data[1][y][x + 2]
-                    b_alt_value_2 = data[2][y][x + 2]
-
-
-                data[0][y][x] = max(r_alt_value_1, r_alt_value_2)
-                data[1][y][x] = max(g_alt_value_1, g_alt_value_2)
-                data[2][y][x] = max(b_alt_value_1, b_alt_value_2)
+        # median of the nearest same color pixels
+        self._bayer.fix_holes(data, i_ref.hole_mask)
 
 
         holes_elapsed_s = time.time() - holes_start
@@ -1283,13 +1395,19 @@ class ImageProcessor(object):
 
 
     def _calculate_8bit_adu(self, i_ref):
-        if isinstance(self._adu_mask_dict[i_ref.binning], type(None)):
-            # This only needs to be done once if a mask is not provided
-            self._generateAduMask(self.image, i_ref.binning)
+        if self._image is i_ref.opencv_data and i_ref.early_scale == 1 and not isinstance(i_ref.cfa_data, type(None)):
+            # single image, use the single channel data from before debayer
+            adu_data = i_ref.cfa_data
+        else:
+            adu_data = self.image
+
+
+        # detection mask is used for the ADU mask (if defined)
+        adu_mask = self._mask_manager.adu_mask(i_ref.processing_binning, adu_data.shape)
 
 
-        mask_dimensions = self._adu_mask_dict[i_ref.binning].shape[:2]
-        image_dimensions = self.image.shape[:2]
+        mask_dimensions = adu_mask.shape[:2]
+        image_dimensions = adu_data.shape[:2]
 
         if mask_dimensions != image_dimensions:
             # This is a canary message.  The cv2.mean() call will fail below, as well as many other functions later.
@@ -1303,12 +1421,15 @@ class ImageProcessor(object):
             )
 
 
-        if len(self.image.shape) == 2:
+        if adu_data is i_ref.cfa_data:
+            # luminance weighted average of the CFA colors
+            adu = self._bayer.mean(adu_data, i_ref.cfa_bayerpat, mask=adu_mask)
+        elif len(adu_data.shape) == 2:
             # mono
-            adu = cv2.mean(src=self.image, mask=self._adu_mask_dict[i_ref.binning])[0]
+            adu = cv2.mean(src=adu_data, mask=adu_mask)[0]
         else:
-            data_mono = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
-            adu = cv2.mean(src=data_mono, mask=self._adu_mask_dict[i_ref.binning])[0]
+            data_mono = cv2.cvtColor(adu_data, cv2.COLOR_BGR2GRAY)
+            adu = cv2.mean(src=data_mono, mask=adu_mask)[0]
 
 
         if i_ref.image_bitpix == 8:
@@ -1397,18 +1518,23 @@ class ImageProcessor(object):
                 stack_i_ref_list = list(filter(lambda x: x.exposure > self.registration_exposure_thresh, stack_i_ref_list))
 
 
-                # if the registration takes longer than the exposure period, kill it
-                # 3 seconds is the assumed time it normally takes to process an image
-                signal.alarm(int(self.config['EXPOSURE_PERIOD'] - 3))
+                if self._budget.allow('registration'):
+                    # if the registration takes longer than the exposure period, kill it
+                    # 3 seconds is the assumed time it normally takes to process an image
+                    signal.alarm(int(self.config['EXPOSURE_PERIOD'] - 3))
 
-                try:
-                    stack_data_list = self._stacker.register(stack_i_ref_list, i_ref.binning, self.max_bit_depth)
-                except TimeOutException:
+                    try:
+                        with self._budget.stage('registration'):
+                            stack_data_list = self._stacker.register(stack_i_ref_list, i_ref.processing_binning, self.max_bit_depth)
+                    except TimeOutException:
+                        # stack unaligned images
+                        logger.error('Registration exceeded the exposure period, cancel alignment')
+                        stack_data_list = [x.opencv_data for x in stack_i_ref_list]
+
+                    signal.alarm(0)
+                else:
                     # stack unaligned images
-                    logger.error('Registration exceeded the exposure period, cancel alignment')
                     stack_data_list = [x.opencv_data for x in stack_i_ref_list]
-
-                signal.alarm(0)
             else:
                 logger.warning('Bypassing image registration due to low exposure')
                 # stack unaligned images
@@ -1496,19 +1622,32 @@ class ImageProcessor(object):
     def convert_16bit_to_8bit(self):
         i_ref = self.getLatestImage()
 
-        self.image = self._convert_16bit_to_8bit(i_ref)
-
-
-    def _convert_16bit_to_8bit(self, i_ref):
         if i_ref.image_bitpix == 8:
-            return self.image
+            return
 
-        #logger.info('Resampling image from %d to 8 bits', image_bitpix)
 
-        # shifting is 5x faster than division
+        # shifting is 5x faster than division, as a LUT it is composed with the stretch
         shift_factor = self.max_bit_depth - 8
 
-        return numpy.right_shift(self.image, shift_factor).astype(numpy.uint8)
+        shift_lut = self._shift_lut_dict.get(shift_factor)
+        if isinstance(shift_lut, type(None)):
+            shift_lut = IndiAllSkyToneLut.shift_lut(16, shift_factor)
+            self._shift_lut_dict[shift_factor] = shift_lut
+
+
+        self._tone_lut.add(shift_lut, key=('shift', shift_factor))
+
+
+    def transform_geometry(self):
+        """Apply rotate_90, rotate_angle, flip_v, flip_h and crop_image in a single pass"""
+        if not self._geometry.enabled:
+            return
+
+
+        i_ref = self.getLatestImage()
+
+        self.image = self._geometry.apply(self.image, i_ref.processing_binning)
+        return True
 
 
     def rotate_90(self):
@@ -1628,13 +1767,18 @@ class ImageProcessor(object):
             return
 
 
+        if not self._budget.allow('detectLines'):
+            return
+
+
         i_ref = self.getLatestImage()
 
-        i_ref.lines = self._detectLines(i_ref)
+        with self._budget.stage('detectLines'):
+            i_ref.lines = self._detectLines(i_ref)
 
 
     def _detectLines(self, i_ref):
-        return self._lineDetect.detectLines(self.image, i_ref.binning)
+        return self._lineDetect.detectLines(self.image, i_ref.processing_binning)
 
 
     def detectStars(self):
@@ -1645,11 +1789,18 @@ class ImageProcessor(object):
 
         i_ref = self.getLatestImage()
 
-        i_ref.stars = self._detectStars(i_ref)
+        if self._budget.allow('detectStars'):
+            decimate = 1
+        else:
+            decimate = 2
+
 
+        with self._budget.stage('detectStars', degraded=decimate > 1):
+            i_ref.stars = self._detectStars(i_ref, decimate=decimate)
 
-    def _detectStars(self, i_ref):
-        return self._stars_detect.detectObjects(self.image, i_ref.binning)
+
+    def _detectStars(self, i_ref, decimate=1):
+        return self._stars_detect.detectObjects(self.image, i_ref.processing_binning, decimate=decimate)
 
 
     def drawDetections(self):
@@ -1664,7 +1815,7 @@ class ImageProcessor(object):
 
 
     def _drawDetections(self, i_ref):
-        return self._draw.main(self.image, i_ref.binning)
+        return self._draw.main(self.image, i_ref.processing_binning)
 
 
     def crop_image(self):
@@ -1714,10 +1865,10 @@ class ImageProcessor(object):
 
         elif self.config.get('IMAGE_CROP_ROI'):
             # divide the coordinates by binning value
-            x1 = int(self.config['IMAGE_CROP_ROI'][0] / i_ref.binning)
-            y1 = int(self.config['IMAGE_CROP_ROI'][1] / i_ref.binning)
-            x2 = int(self.config['IMAGE_CROP_ROI'][2] / i_ref.binning)
-            y2 = int(self.config['IMAGE_CROP_ROI'][3] / i_ref.binning)
+            x1 = int(self.config['IMAGE_CROP_ROI'][0] / i_ref.processing_binning)
+            y1 = int(self.config['IMAGE_CROP_ROI'][1] / i_ref.processing_binning)
+            x2 = int(self.config['IMAGE_CROP_ROI'][2] / i_ref.processing_binning)
+            y2 = int(self.config['IMAGE_CROP_ROI'][3] / i_ref.processing_binning)
 
 
             cropped_image = self.image[
@@ -1762,7 +1913,12 @@ class ImageProcessor(object):
             return
 
 
-        self.image = self._denoise(denoise_function)
+        if not self._budget.allow('denoise'):
+            return
+
+
+        with self._budget.stage('denoise'):
+            self.image = self._denoise(denoise_function)
 
 
     def _denoise(self, denoise_function):
@@ -1798,9 +1954,13 @@ class ImageProcessor(object):
 
         try:
             scnr_function = getattr(self._ia_scnr, algo)
-            self.image = scnr_function(self.image)
         except AttributeError:
             logger.error('Unknown SCNR algorithm: %s', algo)
+            return
+
+
+        # per pixel operation, no overlap needed
+        self.image = self._tiled.run(scnr_function, self.image)
 
 
     def white_balance_manual_bgr(self):
@@ -1809,7 +1969,7 @@ class ImageProcessor(object):
             return
 
 
-        if len(self.image.shape) == 2:
+        if len(self.shape) == 2:
             # mono
             return
 
@@ -1841,26 +2001,16 @@ class ImageProcessor(object):
 
 
     def _white_balance_manual_bgr(self, WBB_FACTOR, WBG_FACTOR, WBR_FACTOR):
-        b, g, r = cv2.split(self.image)
-
         #logger.info('Applying manual color balance settings')
-        if WBB_FACTOR == 1.0:
-            wbb = b
-        else:
-            wbb = cv2.multiply(b, WBB_FACTOR)
-
-        if WBG_FACTOR == 1.0:
-            wbg = g
-        else:
-            wbg = cv2.multiply(g, WBG_FACTOR)
-
-        if WBR_FACTOR == 1.0:
-            wbr = r
-        else:
-            wbr = cv2.multiply(r, WBR_FACTOR)
 
+        # equivalent to cv2.multiply() per channel
+        wb_lut_list = [
+            IndiAllSkyToneLut.multiply_lut(WBB_FACTOR),
+            IndiAllSkyToneLut.multiply_lut(WBG_FACTOR),
+            IndiAllSkyToneLut.multiply_lut(WBR_FACTOR),
+        ]
 
-        self.image = cv2.merge([wbb, wbg, wbr])
+        self._tone_lut.add(wb_lut_list, key=('wb_manual', WBB_FACTOR, WBG_FACTOR, WBR_FACTOR))
 
 
     #def white_balance_bgr_2(self):
@@ -1907,7 +2057,7 @@ class ImageProcessor(object):
             # disable processing in focus mode
             return
 
-        if len(self.image.shape) == 2:
+        if len(self.shape) == 2:
             # mono
             return
 
@@ -1969,7 +2119,7 @@ class ImageProcessor(object):
             return
 
 
-        if len(self.image.shape) == 2:
+        if len(self.shape) == 2:
             # mono
             return
 
@@ -2018,15 +2168,13 @@ class ImageProcessor(object):
             self._wbr_mtf_lut = self._generate_white_balance_lut(WBR_MTF_MIDTONES)
 
 
-        b, g, r = cv2.split(self.image)
-
-
-        mtf_b = self._wbb_mtf_lut.take(b, mode='raise')
-        mtf_g = self._wbg_mtf_lut.take(g, mode='raise')
-        mtf_r = self._wbr_mtf_lut.take(r, mode='raise')
-
+        wb_lut_list = [
+            self._wbb_mtf_lut,
+            self._wbg_mtf_lut,
+            self._wbr_mtf_lut,
+        ]
 
-        self.image = cv2.merge((mtf_b, mtf_g, mtf_r))
+        self._tone_lut.add(wb_lut_list, key=('wb_mtf', WBB_MTF_MIDTONES, WBG_MTF_MIDTONES, WBR_MTF_MIDTONES))
 
 
     def _generate_white_balance_lut(self, midtones):
@@ -2061,7 +2209,7 @@ class ImageProcessor(object):
             return
 
 
-        if len(self.image.shape) == 2:
+        if len(self.shape) == 2:
             # mono
             return
 
@@ -2087,14 +2235,18 @@ class ImageProcessor(object):
 
 
     def _saturation_adjust(self, SATURATION_FACTOR):
-        image_hsv = cv2.cvtColor(self.image, cv2.COLOR_BGR2HSV)
+        def saturation_stripe(stripe):
+            image_hsv = cv2.cvtColor(stripe, cv2.COLOR_BGR2HSV)
 
-        sat = image_hsv[:, :, 1]
+            sat = image_hsv[:, :, 1]
 
-        #logger.info('Applying saturation settings')
-        image_hsv[:, :, 1] = cv2.multiply(sat, SATURATION_FACTOR)
+            image_hsv[:, :, 1] = cv2.multiply(sat, SATURATION_FACTOR)
+
+            return cv2.cvtColor(image_hsv, cv2.COLOR_HSV2BGR)
 
-        self.image = cv2.cvtColor(image_hsv, cv2.COLOR_HSV2BGR)
+
+        #logger.info('Applying saturation settings')
+        self.image = self._tiled.run(saturation_stripe, self.image)
 
 
     def contrast_clahe(self):
@@ -2154,13 +2306,22 @@ class ImageProcessor(object):
 
         max_value = (2 ** self.max_bit_depth) - 1
 
-        # float32 normalized values
-        norm_image = (self.image / max_value).astype(numpy.float32)
+
+        # the colorspace conversions are per pixel and run in parallel stripes
+        # CLAHE itself works on a tile grid of the whole frame and is not split
+        def bgr2lab_stripe(stripe):
+            # float32 normalized values
+            norm_image = (stripe / max_value).astype(numpy.float32)
+
+            # cvtColor() only accepts uint8 and normalized float32
+            return cv2.cvtColor(norm_image, cv2.COLOR_BGR2LAB)
+
+        def lab2bgr_stripe(stripe):
+            return (cv2.cvtColor(stripe, cv2.COLOR_LAB2BGR) * max_value).astype(numpy_dtype)
 
 
         # color, apply to luminance
-        # cvtColor() only accepts uint8 and normalized float32
-        lab = cv2.cvtColor(norm_image, cv2.COLOR_BGR2LAB)
+        lab = self._tiled.run(bgr2lab_stripe, self.image)
 
         # clahe only accepts uint8 and uint16
         # luminance is a float between 0-100, which needs to be remapped to a 16bit int
@@ -2173,7 +2334,7 @@ class ImageProcessor(object):
         #logger.info('L max: %0.4f', numpy.max(lab[:, :, 0]))
 
         # convert back to uint8 or uint16
-        self.image = (cv2.cvtColor(lab, cv2.COLOR_LAB2BGR) * max_value).astype(numpy_dtype)
+        self.image = self._tiled.run(lab2bgr_stripe, lab)
 
 
     def apply_gamma_correction(self):
@@ -2203,12 +2364,13 @@ class ImageProcessor(object):
 
 
     def _apply_gamma_correction(self, gamma):
-        if isinstance(self._gamma_lut, type(None)):
+        if isinstance(self._gamma_lut, type(None)) or self._gamma_lut_value != gamma:
             range_array = numpy.arange(0, 256, dtype=numpy.float32)
             self._gamma_lut = (((range_array / 255) ** (1.0 / gamma)) * 255).astype(numpy.uint8)
+            self._gamma_lut_value = gamma
 
 
-        self.image = self._gamma_lut.take(self.image, mode='raise')
+        self._tone_lut.add(self._gamma_lut, key=('gamma', gamma))
 
 
     def sharpen(self):
@@ -2242,8 +2404,15 @@ class ImageProcessor(object):
         # Unsharp mask: sharpened = original + amount * (original - blurred)
         # GaussianBlur with small kernel extracts low-frequency component;
         # subtracting it amplifies high-frequency detail (edges/stars).
-        blurred_image = cv2.GaussianBlur(self.image, (0, 0), sigmaX=2)
-        return cv2.addWeighted(self.image, 1.0 + amount, blurred_image, -amount, 0)
+        sigma = 2
+
+        def sharpen_stripe(stripe):
+            blurred_image = cv2.GaussianBlur(stripe, (0, 0), sigmaX=sigma)
+            return cv2.addWeighted(stripe, 1.0 + amount, blurred_image, -amount, 0)
+
+
+        # stripes overlap by the blur kernel radius
+        return self._tiled.run(sharpen_stripe, self.image, overlap=self._tiled.gaussian_radius(sigma))
 
 
     def colorize(self):
@@ -2274,13 +2443,29 @@ class ImageProcessor(object):
         if not self.config.get('IMAGE_CIRCLE_MASK', {}).get('ENABLE'):
             return
 
-        if isinstance(self._image_circle_alpha_mask_dict.get(binning), type(None)):
-            self._image_circle_alpha_mask_dict[binning] = self._generate_image_circle_mask(self.image, binning)
+        opacity = self.config['IMAGE_CIRCLE_MASK']['OPACITY']
+        if self.config['IMAGE_CIRCLE_MASK']['OUTLINE']:
+            # Opacity disabled for image circle outline
+            opacity = 0
+
+
+        image_circle_alpha = self._mask_manager.image_circle_alpha(
+            binning,
+            self.image.shape,
+            self.config['IMAGE_CIRCLE_MASK']['DIAMETER'] / binning,
+            opacity,
+            self.config['IMAGE_CIRCLE_MASK']['BLUR'],
+            offset_x=int(self.config.get('LENS_OFFSET_X', 0) / binning),
+            offset_y=int(self.config.get('LENS_OFFSET_Y', 0) / binning),
+        )
+
+        if len(self.image.shape) == 2:
+            image_circle_alpha = image_circle_alpha[:, :, 0]
 
 
         #alpha_start = time.time()
 
-        self.image = (self.image * self._image_circle_alpha_mask_dict[binning]).astype(numpy.uint8)
+        self.image = (self.image * image_circle_alpha).astype(numpy.uint8)
 
 
         if self.config.get('IMAGE_CIRCLE_MASK', {}).get('OUTLINE'):
@@ -2377,6 +2562,13 @@ class ImageProcessor(object):
             return
 
 
+        i_ref = self.getLatestImage()
+
+        if i_ref.early_scale > 1:
+            # already scaled after debayer
+            return
+
+
         self._scale_image(scale)
         return True
 
@@ -2485,96 +2677,30 @@ class ImageProcessor(object):
             self.astrometric_data['moon_up'] = 'No'
 
 
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        try:
-            sun_next_rise = obs.next_rising(sun)
-            self.astrometric_data['sun_next_rise'] = ephem.localtime(sun_next_rise).strftime('%H:%M')
-            self.astrometric_data['sun_next_rise_h'] = (sun_next_rise.datetime() - utcnow.replace(tzinfo=None)).total_seconds() / 3600
-        except ephem.NeverUpError:
-            self.astrometric_data['sun_next_rise'] = '--:--'
-            self.astrometric_data['sun_next_rise_h'] = 0.0
-        except ephem.AlwaysUpError:
-            self.astrometric_data['sun_next_rise'] = '--:--'
-            self.astrometric_data['sun_next_rise_h'] = 0.0
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
+        # rise and set times are cached until they pass
+        ephemeris = IndiAllSkyEphemeris.from_position_av(self.position_av)
 
-        try:
-            sun_next_set = obs.next_setting(sun)
-            self.astrometric_data['sun_next_set'] = ephem.localtime(sun_next_set).strftime('%H:%M')
-            self.astrometric_data['sun_next_set_h'] = (sun_next_set.datetime() - utcnow.replace(tzinfo=None)).total_seconds() / 3600
-        except ephem.NeverUpError:
-            self.astrometric_data['sun_next_set'] = '--:--'
-            self.astrometric_data['sun_next_set_h'] = 0.0
-        except ephem.AlwaysUpError:
-            self.astrometric_data['sun_next_set'] = '--:--'
-            self.astrometric_data['sun_next_set_h'] = 0.0
-
-
-        obs.horizon = math.radians(-18.0)
-        obs.date = utcnow  # reset
-        sun.compute(obs)
-
-        try:
-            sun_next_astro_twilight_rise = obs.next_rising(sun)
-            self.astrometric_data['sun_next_astro_twilight_rise'] = ephem.localtime(sun_next_astro_twilight_rise).strftime('%H:%M')
-            self.astrometric_data['sun_next_astro_twilight_rise_h'] = (sun_next_astro_twilight_rise.datetime() - utcnow.replace(tzinfo=None)).total_seconds() / 3600
-        except ephem.NeverUpError:
-            self.astrometric_data['sun_next_astro_twilight_rise'] = '--:--'
-            self.astrometric_data['sun_next_astro_twilight_rise_h'] = 0.0
-        except ephem.AlwaysUpError:
-            self.astrometric_data['sun_next_astro_twilight_rise'] = '--:--'
-            self.astrometric_data['sun_next_astro_twilight_rise_h'] = 0.0
-
-
-        obs.date = utcnow  # reset
-        sun.compute(obs)
+        event_list = (
+            # key, body, event, horizon
+            ('sun_next_rise', 'sun', 'rising', 0.0),
+            ('sun_next_set', 'sun', 'setting', 0.0),
+            ('sun_next_astro_twilight_rise', 'sun', 'rising', -18.0),
+            ('sun_next_astro_twilight_set', 'sun', 'setting', -18.0),
+            ('moon_next_rise', 'moon', 'rising', 0.0),
+            ('moon_next_set', 'moon', 'setting', 0.0),
+        )
 
-        try:
-            sun_next_astro_twilight_set = obs.next_setting(sun)
-            self.astrometric_data['sun_next_astro_twilight_set'] = ephem.localtime(sun_next_astro_twilight_set).strftime('%H:%M')
-            self.astrometric_data['sun_next_astro_twilight_set_h'] = (sun_next_astro_twilight_set.datetime() - utcnow.replace(tzinfo=None)).total_seconds() / 3600
-        except ephem.NeverUpError:
-            self.astrometric_data['sun_next_astro_twilight_set'] = '--:--'
-            self.astrometric_data['sun_next_astro_twilight_set_h'] = 0.0
-        except ephem.AlwaysUpError:
-            self.astrometric_data['sun_next_astro_twilight_set'] = '--:--'
-            self.astrometric_data['sun_next_astro_twilight_set_h'] = 0.0
-
-
-        obs.horizon = math.radians(0.0)  # reset horizon
-        obs.date = utcnow  # reset
-        moon.compute(obs)
+        for key, body_name, event, horizon in event_list:
+            event_data = ephemeris.next_event(body_name, event, utcnow, horizon=horizon)
 
-        try:
-            moon_next_rise = obs.next_rising(moon)
-            self.astrometric_data['moon_next_rise'] = ephem.localtime(moon_next_rise).strftime('%H:%M')
-            self.astrometric_data['moon_next_rise_h'] = (moon_next_rise.datetime() - utcnow.replace(tzinfo=None)).total_seconds() / 3600
-        except ephem.NeverUpError:
-            self.astrometric_data['moon_next_rise'] = '--:--'
-            self.astrometric_data['moon_next_rise_h'] = 0.0
-        except ephem.AlwaysUpError:
-            self.astrometric_data['moon_next_rise'] = '--:--'
-            self.astrometric_data['moon_next_rise_h'] = 0.0
+            if isinstance(event_data, type(None)):
+                # never up or always up
+                self.astrometric_data[key] = '--:--'
+                self.astrometric_data['{0:s}_h'.format(key)] = 0.0
+                continue
 
-
-        obs.date = utcnow  # reset
-        moon.compute(obs)
-
-        try:
-            moon_next_set = obs.next_setting(moon)
-            self.astrometric_data['moon_next_set'] = ephem.localtime(moon_next_set).strftime('%H:%M')
-            self.astrometric_data['moon_next_set_h'] = (moon_next_set.datetime() - utcnow.replace(tzinfo=None)).total_seconds() / 3600
-        except ephem.NeverUpError:
-            self.astrometric_data['moon_next_set'] = '--:--'
-            self.astrometric_data['moon_next_set_h'] = 0.0
-        except ephem.AlwaysUpError:
-            self.astrometric_data['moon_next_set'] = '--:--'
-            self.astrometric_data['moon_next_set_h'] = 0.0
+            self.astrometric_data[key] = ephem.localtime(event_data['date']).strftime('%H:%M')
+            self.astrometric_data['{0:s}_h'.format(key)] = (event_data['date'].datetime() - utcnow.replace(tzinfo=None)).total_seconds() / 3600
 
 
         obs.date = utcnow  # reset
@@ -3065,13 +3191,15 @@ class ImageProcessor(object):
         # Labels are enabled by default
         image_label_system = self.config.get('IMAGE_LABEL_SYSTEM', 'pillow')
 
-        if image_label_system == 'opencv':
-            self._label_image_opencv(i_ref, adsb_aircraft_list, custom_hook_data)
-        elif image_label_system == 'pillow':
-            self._label_image_pillow(i_ref, adsb_aircraft_list, custom_hook_data)
-        else:
-            logger.warning('Image labels disabled')
-            return
+        # labels are always drawn, only measured
+        with self._budget.stage('label'):
+            if image_label_system == 'opencv':
+                self._label_image_opencv(i_ref, adsb_aircraft_list, custom_hook_data)
+            elif image_label_system == 'pillow':
+                self._label_image_pillow(i_ref, adsb_aircraft_list, custom_hook_data)
+            else:
+                logger.warning('Image labels disabled')
+                return
 
 
     def cardinal_dirs_label(self):
@@ -3095,9 +3223,14 @@ class ImageProcessor(object):
             return
 
 
+        if not self._budget.allow('orb'):
+            return
+
+
         i_ref = self.getLatestImage()
 
-        self._image_orb_opencv(i_ref)
+        with self._budget.stage('orb'):
+            self._image_orb_opencv(i_ref)
 
 
     def _image_orb_opencv(self, i_ref):
@@ -3219,8 +3352,9 @@ class ImageProcessor(object):
 
 
     def _label_image_pillow(self, i_ref, adsb_aircraft_list, custom_hook_data):
-        img_rgb = Image.fromarray(cv2.cvtColor(self.image, cv2.COLOR_BGR2RGB))
-        image_width, image_height  = img_rgb.size  # backwards from opencv
+        # text is drawn directly onto the BGR image
+        draw = self.image
+        image_height, image_width = draw.shape[:2]
 
 
         if self.config['TEXT_PROPERTIES']['PIL_FONT_FILE'] == 'custom':
@@ -3229,7 +3363,7 @@ class ImageProcessor(object):
             pillow_font_file_p = self.font_path.joinpath(self.config['TEXT_PROPERTIES']['PIL_FONT_FILE'])
 
 
-        draw = ImageDraw.Draw(img_rgb)
+        self._label_renderer.start()
 
 
         # Disabled when focus mode is enabled
@@ -3258,8 +3392,7 @@ class ImageProcessor(object):
                 anchor=self.text_anchor_pillow,
             )
 
-            # convert back to numpy array
-            self.image = cv2.cvtColor(numpy.array(img_rgb), cv2.COLOR_RGB2BGR)
+            self._label_renderer.finish()
 
             return
 
@@ -3286,27 +3419,27 @@ class ImageProcessor(object):
             self._text_next_line()
 
 
-        # convert back to numpy array
-        self.image = cv2.cvtColor(numpy.array(img_rgb), cv2.COLOR_RGB2BGR)
+        # unchanged lines are reused on the next frame
+        self._label_renderer.finish()
 
 
-    def drawText_pillow(self, draw, text, font_file, font_size, pt, color_rgb, anchor='la'):
-        font = ImageFont.truetype(str(font_file), font_size)
-
+    def drawText_pillow(self, data, text, font_file, font_size, pt, color_rgb, anchor='la'):
         if self.config['TEXT_PROPERTIES']['FONT_OUTLINE']:
             # black outline
             stroke_width = 4
         else:
             stroke_width = 0
 
-        draw.text(
-            pt,
+        self._label_renderer.drawText(
+            data,
             text,
-            fill=color_rgb,
-            font=font,
-            stroke_width=stroke_width,
-            stroke_fill=(0, 0, 0),
+            font_file,
+            font_size,
+            pt,
+            color_rgb,
             anchor=anchor,
+            stroke_width=stroke_width,
+            stroke_rgb=(0, 0, 0),
         )
 
 
@@ -3418,25 +3551,6 @@ class ImageProcessor(object):
         utcnow = datetime.now(tz=timezone.utc)  # ephem expects UTC dates
         #utcnow = datetime.now(tz=timezone.utc) - timedelta(hours=13)  # testing
 
-        obs = ephem.Observer()
-        obs.lon = math.radians(self.position_av[constants.POSITION_LONGITUDE])
-        obs.lat = math.radians(self.position_av[constants.POSITION_LATITUDE])
-        obs.elevation = self.position_av[constants.POSITION_ELEVATION]
-
-
-        # disable atmospheric refraction calcs
-        obs.pressure = 0
-
-
-        obs.date = utcnow
-
-
-        # there may be multiple satellites of the same name, usually pieces of the same rocket
-        sat_entries = IndiAllSkyDbTleDataTable.query\
-            .filter(IndiAllSkyDbTleDataTable.group == constants.SATELLITE_VISUAL)\
-            .order_by(IndiAllSkyDbTleDataTable.id.desc())\
-            .limit(300)  # 300 is a sanity check
-
 
         satellite_lines = []
 
@@ -3449,47 +3563,9 @@ class ImageProcessor(object):
         satellite_tmpl = self.config.get('SATELLITE_TRACK', {}).get('SAT_LABEL_TEMPLATE', '')
 
 
-        sat_list = list()
-        for sat_entry in sat_entries:
-
-            try:
-                sat = ephem.readtle(sat_entry.title, sat_entry.line1, sat_entry.line2)
-            except ValueError as e:
-                logger.error('Satellite TLE data error: %s', str(e))
-                continue
-
-
-            sat.compute(obs)
-
-
-            if sat.eclipsed:
-                continue
-
-
-            sat_alt = math.degrees(sat.alt)
-
-            if sat_alt < alt_deg_min:
-                continue
-
-
-            sat_sublat = math.degrees(sat.sublat)
-            sat_sublong = math.degrees(sat.sublong)
-
-            sat_data = {
-                'title'     : sat_entry.title.rstrip(),
-                'alt'       : sat_alt,
-                'az'        : math.degrees(sat.az),
-                'elevation' : sat.elevation / 1000,
-                'mag'       : sat.mag,
-                'sublat'    : sat_sublat,
-                'latitude'  : sat_sublat,  # alias
-                'sublong'   : sat_sublong,
-                'longitude' : sat_sublong,  # alias
-                'range'     : sat.range / 1000,
-                'range_velocity' : sat.range_velocity / 1000,
-            }
-
+        sat_list = self._satellite_tracker.visible(utcnow, self.position_av, alt_deg_min)
 
+        for sat_data in sat_list:
             try:
                 sat_data['dir'] = self.cardinal_directions[round(sat_data['az'] / 22.5)]
             except IndexError:
@@ -3497,9 +3573,6 @@ class ImageProcessor(object):
                 sat_data['dir'] = 'Error'
 
 
-            sat_list.append(sat_data)
-
-
         #sat_track_elapsed_s = time.time() - sat_track_start
         #logger.info('Satellite tracking in %0.4f s', sat_track_elapsed_s)
 
@@ -3586,6 +3659,15 @@ class ImageProcessor(object):
         i_ref = self.getLatestImage()
 
 
+        if not self.config.get('IMAGE_STRETCH', {}).get('SPLIT'):
+            stretch_lut, stretch_key = self._stretch_o.lut(self.image, self.max_bit_depth, i_ref.processing_binning)
+
+            if not isinstance(stretch_lut, type(None)):
+                # composed with the 8-bit conversion and applied later
+                self._tone_lut.add(stretch_lut, key=stretch_key)
+                return
+
+
         stretched_image = self._stretch(i_ref)
 
 
@@ -3598,7 +3680,7 @@ class ImageProcessor(object):
 
 
     def _stretch(self, i_ref):
-        return self._stretch_o.stretch(self.image, self.max_bit_depth, i_ref.binning)
+        return self._stretch_o.stretch(self.image, self.max_bit_depth, i_ref.processing_binning)
 
 
     def fish2pano_warpPolar(self, binning):
@@ -3791,7 +3873,13 @@ class ImageProcessor(object):
         if not self.config.get('LIGHTGRAPH_OVERLAY', {}).get('ENABLE', True):
             return
 
-        self._lightgraph_overlay.apply(self.image)
+
+        if not self._budget.allow('lightgraph'):
+            return
+
+
+        with self._budget.stage('lightgraph'):
+            self._lightgraph_overlay.apply(self.image)
 
 
     def image_overlay(self):
@@ -3874,11 +3962,16 @@ class ImageProcessor(object):
         self.image = image_colormapped
 
 
-    def realtimeKeogramUpdate(self):
+    def realtimeKeogramLine(self):
         if self.focus_mode:
-            return
+            return None
+
+        return self._keogram_gen.centerLine(self.image)
 
-        image_height, image_width = self.image.shape[:2]
+
+    def realtimeKeogramUpdate(self, center_line, timestamp=None):
+        if isinstance(timestamp, type(None)):
+            timestamp = int(time.time())
 
 
         if isinstance(self.realtime_keogram_data, type(None)):
@@ -3912,7 +4005,7 @@ class ImageProcessor(object):
 
 
         try:
-            self._keogram_gen.processImage(self.image, int(time.time()))
+            self._keogram_gen.appendLine(center_line, timestamp)
         except KeogramMismatchException as e:
             logger.error('Error processing keogram image: %s', str(e))
             self.realtime_keogram_data = None
@@ -3978,65 +4071,6 @@ class ImageProcessor(object):
         return self._keogram_gen.applyLabels(data)
 
 
-    def _load_detection_mask(self):
-        mask_data_dict = dict()
-        for x in set(self.binning_av):
-            # populate initial values
-            mask_data_dict[x] = None
-
-
-        detect_mask = self.config.get('DETECT_MASK', '')
-
-        if not detect_mask:
-            logger.warning('No detection mask defined')
-            return mask_data_dict
-
-
-        detect_mask_p = Path(detect_mask)
-
-        try:
-            if not detect_mask_p.exists():
-                logger.error('%s does not exist', detect_mask_p)
-                return mask_data_dict
-
-
-            if not detect_mask_p.is_file():
-                logger.error('%s is not a file', detect_mask_p)
-                return mask_data_dict
-
-        except PermissionError as e:
-            logger.error(str(e))
-            return mask_data_dict
-
-        mask_data = cv2.imread(str(detect_mask_p), cv2.IMREAD_GRAYSCALE)  # mono
-        if isinstance(mask_data, type(None)):
-            logger.error('%s is not a valid image', detect_mask_p)
-            return mask_data_dict
-
-
-        logger.warning('Loaded detection mask: %s', detect_mask_p)
-
-
-        # create mask for each binning setting
-        for binning in mask_data_dict.keys():
-            if binning == 1:
-                ### any intermediate values will be set to 255
-                mask_data_dict[binning] = mask_data.copy()
-                mask_data_dict[binning][mask_data_dict[binning] > 0] = 255
-            else:
-                mask_height, mask_width = mask_data.shape[:2]
-
-                new_mask_height = int(mask_height / binning)
-                new_mask_width = int(mask_width / binning)
-
-                mask_data_dict[binning] = cv2.resize(mask_data, (new_mask_width, new_mask_height), interpolation=cv2.INTER_AREA)
-
-                mask_data_dict[binning][mask_data_dict[binning] > 0] = 255
-
-
-        return mask_data_dict
-
-
     def _load_logo_overlay(self, image, binning):
         logo_overlay = self.config.get('LOGO_OVERLAY', '')
 
@@ -4111,88 +4145,6 @@ class ImageProcessor(object):
         return overlay_bgr, alpha_mask
 
 
-    def _generateAduMask(self, img, binning):
-        logger.info('Generating mask based on ADU_ROI')
-
-        image_height, image_width = img.shape[:2]
-
-        # create a black background
-        mask = numpy.zeros((image_height, image_width), dtype=numpy.uint8)
-
-        adu_roi = self.config.get('ADU_ROI', [])
-
-        try:
-            x1 = int(adu_roi[0] / binning)
-            y1 = int(adu_roi[1] / binning)
-            x2 = int(adu_roi[2] / binning)
-            y2 = int(adu_roi[3] / binning)
-        except IndexError:
-            logger.warning('Using central ROI for ADU calculations')
-            adu_fov_div = self.config.get('ADU_FOV_DIV', 4)
-            x1 = int((image_width / 2) - (image_width / adu_fov_div))
-            y1 = int((image_height / 2) - (image_height / adu_fov_div))
-            x2 = int((image_width / 2) + (image_width / adu_fov_div))
-            y2 = int((image_height / 2) + (image_height / adu_fov_div))
-
-        # The white area is what we keep
-        cv2.rectangle(
-            img=mask,
-            pt1=(x1, y1),
-            pt2=(x2, y2),
-            color=255,  # mono
-            thickness=cv2.FILLED,
-        )
-
-        self._adu_mask_dict[binning] = mask
-
-
-    def _generate_image_circle_mask(self, image, binning):
-        image_height, image_width = image.shape[:2]
-
-
-        opacity = self.config['IMAGE_CIRCLE_MASK']['OPACITY']
-        if self.config['IMAGE_CIRCLE_MASK']['OUTLINE']:
-            logger.warning('Opacity disabled for image circle outline')
-            opacity = 0
-
-
-        background = int(255 * (100 - opacity) / 100)
-        #logger.info('Image circle backgound: %d', background)
-
-        channel_mask = numpy.full([image_height, image_width], background, dtype=numpy.uint8)
-
-        center_x = int(image_width / 2) + int(self.config.get('LENS_OFFSET_X', 0) / binning)
-        center_y = int(image_height / 2) - int(self.config.get('LENS_OFFSET_Y', 0) / binning)  # minus
-        radius = int((self.config['IMAGE_CIRCLE_MASK']['DIAMETER'] / 2) / binning)
-        blur = self.config['IMAGE_CIRCLE_MASK']['BLUR']
-
-
-        # draw a white circle
-        cv2.circle(
-            img=channel_mask,
-            center=(center_x, center_y),
-            radius=radius,
-            color=255,  # mono
-            thickness=cv2.FILLED,
-        )
-
-
-        if blur:
-            # blur circle
-            channel_mask = cv2.blur(
-                src=channel_mask,
-                ksize=(blur, blur),
-                borderType=cv2.BORDER_DEFAULT,
-            )
-
-
-        channel_alpha = (channel_mask / 255).astype(numpy.float32)
-
-        alpha_mask = numpy.dstack((channel_alpha, channel_alpha, channel_alpha))
-
-        return alpha_mask
-
-
 class ImageData(object):
 
     def __init__(
@@ -4238,6 +4190,11 @@ class ImageData(object):
         self._calibrated = False
         self._libcamera_black_level = None
         self._opencv_data = None
+        self._opencv_data_full = None
+        self._cfa_data = None
+        self._cfa_bayerpat = None
+        self._software_bin = 1
+        self._early_scale = 1
 
         self._kpindex = 0.0
         self._ovation_max = 0
@@ -4284,6 +4241,27 @@ class ImageData(object):
     def binning(self):
         return self._binning
 
+    @property
+    def software_bin(self):
+        return self._software_bin
+
+    @software_bin.setter
+    def software_bin(self, new_software_bin):
+        self._software_bin = int(new_software_bin)
+
+    @property
+    def early_scale(self):
+        return self._early_scale
+
+    @early_scale.setter
+    def early_scale(self, new_early_scale):
+        self._early_scale = int(new_early_scale)
+
+    @property
+    def processing_binning(self):
+        # pixel coordinates for the processed image are divided by this value
+        return self._binning * self._software_bin * self._early_scale
+
     @property
     def exp_date(self):
         return self._exp_date
@@ -4370,6 +4348,35 @@ class ImageData(object):
     def opencv_data(self, new_opencv_data):
         self._opencv_data = new_opencv_data
 
+    @property
+    def cfa_data(self):
+        # raw data used for debayering
+        return self._cfa_data
+
+    @cfa_data.setter
+    def cfa_data(self, new_cfa_data):
+        self._cfa_data = new_cfa_data
+
+    @property
+    def cfa_bayerpat(self):
+        return self._cfa_bayerpat
+
+    @cfa_bayerpat.setter
+    def cfa_bayerpat(self, new_cfa_bayerpat):
+        self._cfa_bayerpat = new_cfa_bayerpat
+
+    @property
+    def opencv_data_full(self):
+        # full resolution data when early scaling is used
+        if isinstance(self._opencv_data_full, type(None)):
+            return self._opencv_data
+
+        return self._opencv_data_full
+
+    @opencv_data_full.setter
+    def opencv_data_full(self, new_opencv_data_full):
+        self._opencv_data_full = new_opencv_data_full
+
 
     @property
     def uptime(self):
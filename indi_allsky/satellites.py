@@ -0,0 +1,338 @@
+### Satellite tracker for the satellite label
+### The TLE set is parsed once per download and every satellite is propagated as a single SGP4 array batch.
+### Pass windows (above the minimum altitude) are precomputed for the coming hours and kept in an interval
+### index.  Each frame only computes exact positions for the satellites inside a window.
+
+import math
+import time
+import logging
+
+import ephem
+import numpy
+
+from . import constants
+
+from .flask import db
+from .flask.models import IndiAllSkyDbTleDataTable
+
+
+try:
+    from sgp4.api import Satrec  # installed with skyfield
+    from sgp4.api import SatrecArray
+except ImportError:
+    Satrec = None
+    SatrecArray = None
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkySatelliteTracker(object):
+
+    # WGS84
+    earth_radius_km = 6378.137
+    earth_e2 = 6.69437999014e-3
+
+    window_hours = 12
+    window_step = 30  # seconds
+
+    # passes are screened below the label altitude so sampling cannot miss the edges of a pass
+    screen_alt_margin = 10.0
+
+    # satellites are propagated in chunks to bound memory
+    chunk_size = 500
+
+    # check the database for a new TLE download
+    tle_check_seconds = 300
+
+
+    def __init__(self, config, group=constants.SATELLITE_VISUAL):
+        self.config = config
+        self.group = group
+
+        self._tle_version = None
+        self._tle_check_time = 0
+
+        self._title_list = list()
+        self._body_list = list()  # ephem bodies, only used for exact positions
+        self._satrec_chunk_list = None  # SatrecArray per chunk
+
+        self._window_key = None
+        self._window_expire = 0
+        self._pass_start = numpy.empty(0, dtype=numpy.float64)
+        self._pass_end = numpy.empty(0, dtype=numpy.float64)
+        self._pass_sat = numpy.empty(0, dtype=numpy.int32)
+        self._pass_max_duration = 0.0
+
+
+    @property
+    def count(self):
+        return len(self._body_list)
+
+
+    def visible(self, utcnow, position_av, alt_deg_min):
+        """Return a list of sat_data dicts for the sunlit satellites above alt_deg_min"""
+        self._check_tle()
+
+        if not self._body_list:
+            return list()
+
+
+        now_ts = utcnow.timestamp()
+
+        window_key = (
+            round(position_av[constants.POSITION_LATITUDE], 4),
+            round(position_av[constants.POSITION_LONGITUDE], 4),
+            int(position_av[constants.POSITION_ELEVATION]),
+            float(alt_deg_min),
+            self._tle_version,
+        )
+
+        if window_key != self._window_key or now_ts >= self._window_expire:
+            self._build_windows(now_ts, position_av, alt_deg_min)
+            self._window_key = window_key
+
+
+        obs = ephem.Observer()
+        obs.lon = math.radians(position_av[constants.POSITION_LONGITUDE])
+        obs.lat = math.radians(position_av[constants.POSITION_LATITUDE])
+        obs.elevation = position_av[constants.POSITION_ELEVATION]
+
+        # disable atmospheric refraction calcs
+        obs.pressure = 0
+
+        obs.date = utcnow
+
+
+        sat_list = list()
+        for sat_idx in self.candidates(now_ts):
+            sat = self._body_list[sat_idx]
+            sat.compute(obs)
+
+
+            if sat.eclipsed:
+                continue
+
+
+            sat_alt = math.degrees(sat.alt)
+
+            if sat_alt < alt_deg_min:
+                continue
+
+
+            sat_sublat = math.degrees(sat.sublat)
+            sat_sublong = math.degrees(sat.sublong)
+
+            sat_data = {
+                'title'     : self._title_list[sat_idx],
+                'alt'       : sat_alt,
+                'az'        : math.degrees(sat.az),
+                'elevation' : sat.elevation / 1000,
+                'mag'       : sat.mag,
+                'sublat'    : sat_sublat,
+                'latitude'  : sat_sublat,  # alias
+                'sublong'   : sat_sublong,
+                'longitude' : sat_sublong,  # alias
+                'range'     : sat.range / 1000,
+                'range_velocity' : sat.range_velocity / 1000,
+            }
+
+            sat_list.append(sat_data)
+
+
+        return sat_list
+
+
+    def candidates(self, now_ts):
+        """Indexes of satellites with a pass window containing now_ts"""
+        if isinstance(self._satrec_chunk_list, type(None)):
+            # sgp4 not available, every satellite is a candidate
+            return range(len(self._body_list))
+
+
+        # windows are sorted by start, only windows that started within the longest pass can contain now
+        end_idx = numpy.searchsorted(self._pass_start, now_ts, side='right')
+        start_idx = numpy.searchsorted(self._pass_start, now_ts - self._pass_max_duration, side='left')
+
+        in_window = self._pass_end[start_idx:end_idx] >= now_ts
+
+        return numpy.unique(self._pass_sat[start_idx:end_idx][in_window]).tolist()
+
+
+    def _check_tle(self):
+        now = time.time()
+        if now - self._tle_check_time < self.tle_check_seconds:
+            return
+
+        self._tle_check_time = now
+
+
+        # the download replaces the whole group, new rows always have a larger id
+        tle_version = db.session.query(
+            db.func.max(IndiAllSkyDbTleDataTable.id),
+            db.func.count(IndiAllSkyDbTleDataTable.id),
+        )\
+            .filter(IndiAllSkyDbTleDataTable.group == self.group)\
+            .one()
+
+        if tle_version == self._tle_version:
+            return
+
+
+        self._load_tle()
+        self._tle_version = tle_version
+
+
+    def _load_tle(self):
+        load_start = time.time()
+
+        sat_entries = IndiAllSkyDbTleDataTable.query\
+            .filter(IndiAllSkyDbTleDataTable.group == self.group)\
+            .order_by(IndiAllSkyDbTleDataTable.id.desc())
+
+
+        title_list = list()
+        body_list = list()
+        satrec_list = list()
+
+        for sat_entry in sat_entries:
+            try:
+                sat = ephem.readtle(sat_entry.title, sat_entry.line1, sat_entry.line2)
+            except ValueError as e:
+                logger.error('Satellite TLE data error: %s', str(e))
+                continue
+
+
+            if Satrec:
+                # indexes must match the body list
+                try:
+                    satrec_list.append(Satrec.twoline2rv(sat_entry.line1, sat_entry.line2))
+                except ValueError as e:
+                    logger.error('Satellite TLE data error (%s): %s', sat_entry.title.rstrip(), str(e))
+                    continue
+
+            title_list.append(sat_entry.title.rstrip())
+            body_list.append(sat)
+
+
+        self._title_list = title_list
+        self._body_list = body_list
+
+        if satrec_list:
+            self._satrec_chunk_list = [SatrecArray(satrec_list[c:c + self.chunk_size]) for c in range(0, len(satrec_list), self.chunk_size)]
+        else:
+            self._satrec_chunk_list = None
+
+
+        # force new windows
+        self._window_key = None
+
+        load_elapsed_s = time.time() - load_start
+        logger.info('Loaded %d satellites in %0.4f s', len(body_list), load_elapsed_s)
+
+
+    def _build_windows(self, now_ts, position_av, alt_deg_min):
+        if isinstance(self._satrec_chunk_list, type(None)):
+            self._window_expire = now_ts + (self.window_hours * 3600)
+            return
+
+
+        build_start = time.time()
+
+        window_count = int(self.window_hours * 3600 / self.window_step) + 1
+        ts_array = now_ts + (numpy.arange(window_count, dtype=numpy.float64) * self.window_step)
+
+        alt_array = self._altitudes(ts_array, position_av)  # (satellites, times)
+
+        visible = alt_array >= (alt_deg_min - self.screen_alt_margin)
+
+
+        # rising and falling edges of each run of visible samples
+        padded = numpy.zeros((visible.shape[0], visible.shape[1] + 2), dtype=numpy.int8)
+        padded[:, 1:-1] = visible
+        edges = numpy.diff(padded, axis=1)
+
+        rise_sat, rise_idx = numpy.nonzero(edges == 1)
+        _, set_idx = numpy.nonzero(edges == -1)  # same row order as the rising edges
+
+
+        # pad by a step on each side, the edges are somewhere between samples
+        pass_start = ts_array[0] + ((rise_idx - 1) * self.window_step)
+        pass_end = ts_array[0] + (set_idx * self.window_step)
+
+        order = numpy.argsort(pass_start, kind='stable')
+
+        self._pass_start = pass_start[order]
+        self._pass_end = pass_end[order]
+        self._pass_sat = rise_sat[order].astype(numpy.int32)
+
+        if self._pass_start.size:
+            self._pass_max_duration = float(numpy.max(self._pass_end - self._pass_start))
+        else:
+            self._pass_max_duration = 0.0
+
+
+        # rebuild before the end so passes in progress are not cut off
+        self._window_expire = now_ts + (self.window_hours * 3600 / 2)
+
+        build_elapsed_s = time.time() - build_start
+        logger.info(
+            'Satellite pass windows: %d satellites, %d passes, %0.4f s',
+            len(self._body_list),
+            self._pass_start.size,
+            build_elapsed_s,
+        )
+
+
+    def _altitudes(self, ts_array, position_av):
+        """Topocentric altitude in degrees of every satellite at each time"""
+        jd_array = (ts_array / 86400.0) + 2440587.5
+        jd = numpy.floor(jd_array)
+        fr = jd_array - jd
+
+
+        # TEME to earth fixed, polar motion and UT1 are ignored (well below the sampling error)
+        gmst = numpy.radians((280.46061837 + 360.98564736629 * (jd_array - 2451545.0)) % 360)
+        cos_g = numpy.cos(gmst)
+        sin_g = numpy.sin(gmst)
+
+
+        lat = math.radians(position_av[constants.POSITION_LATITUDE])
+        lon = math.radians(position_av[constants.POSITION_LONGITUDE])
+        elev_km = position_av[constants.POSITION_ELEVATION] / 1000
+
+        n = self.earth_radius_km / math.sqrt(1 - self.earth_e2 * math.sin(lat) ** 2)
+        obs_xyz = numpy.array((
+            (n + elev_km) * math.cos(lat) * math.cos(lon),
+            (n + elev_km) * math.cos(lat) * math.sin(lon),
+            (n * (1 - self.earth_e2) + elev_km) * math.sin(lat),
+        ))
+
+        up = numpy.array((
+            math.cos(lat) * math.cos(lon),
+            math.cos(lat) * math.sin(lon),
+            math.sin(lat),
+        ))
+
+
+        alt_chunk_list = list()
+        for satrec_chunk in self._satrec_chunk_list:
+            e, r, _ = satrec_chunk.sgp4(jd, fr)  # r is (satellites, times, 3) in km
+
+            x = (cos_g * r[..., 0]) + (sin_g * r[..., 1]) - obs_xyz[0]
+            y = (-sin_g * r[..., 0]) + (cos_g * r[..., 1]) - obs_xyz[1]
+            z = r[..., 2] - obs_xyz[2]
+
+            dist = numpy.sqrt((x * x) + (y * y) + (z * z))
+
+            with numpy.errstate(invalid='ignore', divide='ignore'):
+                alt = numpy.degrees(numpy.arcsin(((x * up[0]) + (y * up[1]) + (z * up[2])) / dist))
+
+            # propagation errors (decayed orbits) are never visible
+            alt[e != 0] = -90.0
+            alt[~numpy.isfinite(alt)] = -90.0
+
+            alt_chunk_list.append(alt)
+
+
+        return numpy.concatenate(alt_chunk_list, axis=0)
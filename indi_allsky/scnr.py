@@ -118,12 +118,15 @@ class IndiAllskyScnr(object):
         #mtf_start = time.time()
 
 
+        # local reference, stripes of the same frame may run in parallel threads
+        lut = self._mtf_lut
+
         if self.night != self.night_av[constants.NIGHT_NIGHT]:
             self.night = self.night_av[constants.NIGHT_NIGHT]
-            self._mtf_lut = None  # recalculate LUT
+            lut = None  # recalculate LUT
 
 
-        if isinstance(self._mtf_lut, type(None)):
+        if isinstance(lut, type(None)):
             if self.config.get('USE_NIGHT_COLOR', True):
                 midtones = self.config.get('SCNR_MTF_MIDTONES', 0.55)
             else:
@@ -163,7 +166,7 @@ class IndiAllskyScnr(object):
         b, g, r = cv2.split(scidata)
 
 
-        mtf_g = self._mtf_lut.take(g, mode='raise')
+        mtf_g = lut.take(g, mode='raise')
 
 
         #stretch_elapsed_s = time.time() - mtf_start
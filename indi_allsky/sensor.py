@@ -15,6 +15,9 @@ from .devices import generic as indi_allsky_gpios
 from .devices import dew_heaters
 from .devices import fans
 from .devices import sensors as indi_allsky_sensors
+
+from .configReload import IndiAllSkyConfigReload
+
 from .devices.exceptions import SensorException
 from .devices.exceptions import SensorReadException
 from .devices.exceptions import DeviceControlException
@@ -158,6 +161,10 @@ class SensorWorker(Process):
 
                 if s_dict.get('stop'):
                     self._shutdown = True
+                elif s_dict.get('config'):
+                    # sensor and device settings are not changed, the worker is restarted for those
+                    logger.warning('Applying new config')
+                    IndiAllSkyConfigReload.update(self.config, s_dict['config'])
                 else:
                     logger.error('Unknown action: %s', str(s_dict))
 
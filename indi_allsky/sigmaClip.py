@@ -0,0 +1,116 @@
+### Sigma clipped average combine of a stack of frames
+### Frames are expected to be memory mapped, rows are read in strips sized to a memory budget so the
+### full stack is never in memory.  Each pixel is clipped iteratively around the median using the
+### median absolute deviation.  Mono (height, width) and RGB (channel, height, width) data are supported.
+
+import time
+import warnings
+import logging
+
+import numpy
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkySigmaClipCombine(object):
+
+    # scales the median absolute deviation to the standard deviation of a normal distribution
+    mad_std_scale = 1.482602218505602
+
+    # float32 stack plus temporaries (deviation, masks, sorting) per pixel per frame
+    bytes_per_value = 16
+
+
+    def __init__(self, sigma_low=5.0, sigma_high=5.0, iterations=3, mem_limit=350000000):
+        self.sigma_low = float(sigma_low)
+        self.sigma_high = float(sigma_high)
+        self.iterations = int(iterations)
+        self.mem_limit = int(mem_limit)
+
+        self.rejected = 0
+
+
+    def strip_rows(self, frame_count, shape):
+        """Number of rows processed at once within the memory budget"""
+        height = shape[-2]
+        row_values = frame_count * int(numpy.prod(shape)) // height
+
+        return max(1, min(height, self.mem_limit // (row_values * self.bytes_per_value)))
+
+
+    def combine(self, frame_list, dtype):
+        """Combine a list of arrays with the same shape, the result is cast to dtype"""
+        frame_count = len(frame_list)
+        shape = frame_list[0].shape
+        height = shape[-2]
+
+        rows = self.strip_rows(frame_count, shape)
+        logger.info('Sigma clip combine: %d frames, %d rows per strip', frame_count, rows)
+
+
+        if numpy.issubdtype(dtype, numpy.integer):
+            dtype_info = numpy.iinfo(dtype)
+        else:
+            dtype_info = None
+
+
+        start = time.time()
+
+        self.rejected = 0
+        combined = numpy.empty(shape, dtype=dtype)
+
+        for y1 in range(0, height, rows):
+            y2 = min(y1 + rows, height)
+
+            # the ellipsis handles the optional channel axis
+            strip = numpy.stack([f[..., y1:y2, :] for f in frame_list], axis=0).astype(numpy.float32)
+
+            with warnings.catch_warnings():
+                # all NaN slices are handled
+                warnings.simplefilter('ignore', category=RuntimeWarning)
+                strip_mean = self._clip_mean(strip)
+
+            if dtype_info:
+                numpy.rint(strip_mean, out=strip_mean)
+                numpy.clip(strip_mean, dtype_info.min, dtype_info.max, out=strip_mean)
+
+            combined[..., y1:y2, :] = strip_mean
+
+
+        elapsed_s = time.time() - start
+        logger.info('Sigma clip combined in %0.4f s, %d values rejected', elapsed_s, self.rejected)
+
+        return combined
+
+
+    def _clip_mean(self, strip):
+        # first pass does not contain NaN, the faster median is fine
+        median = numpy.median(strip, axis=0)
+        fallback = median
+
+        for i in range(self.iterations):
+            if i > 0:
+                median = numpy.nanmedian(strip, axis=0)
+
+            diff = strip - median
+            std = numpy.nanmedian(numpy.abs(diff), axis=0) * self.mad_std_scale
+
+            # NaN compares False, rejected values are not counted again
+            reject = (diff < (std * -self.sigma_low)) | (diff > (std * self.sigma_high))
+
+            reject_count = int(numpy.count_nonzero(reject))
+            if not reject_count:
+                break
+
+            self.rejected += reject_count
+            strip[reject] = numpy.nan
+
+
+        strip_mean = numpy.nanmean(strip, axis=0)
+
+        # every value of a pixel rejected
+        all_rejected = numpy.isnan(strip_mean)
+        strip_mean[all_rejected] = fallback[all_rejected]
+
+        return strip_mean
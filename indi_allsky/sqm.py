@@ -1,8 +1,9 @@
 import math
 import cv2
-import numpy
 import logging
 
+from .maskManager import IndiAllSkyMaskManager
+
 from . import constants
 
 
@@ -15,20 +16,18 @@ class IndiAllskySqm(object):
         self,
         config,
         gain_av,
-        mask=None,
+        mask_manager=None,
     ):
         self.config = config
         self.gain_av = gain_av
 
         self._magnitude_offset = self.config.get('CAMERA_SQM', {}).get('MAGNITUDE_OFFSET', 25.0)
 
-        # both masks will be combined
-        self._external_mask_dict = mask
-
+        if isinstance(mask_manager, type(None)):
+            mask_manager = IndiAllSkyMaskManager(self.config)
 
-        self._sqm_mask_dict = dict()
-        for x in self._external_mask_dict.keys():
-            self._sqm_mask_dict[x] = None
+        # SQM_ROI and detection mask are combined
+        self._mask_manager = mask_manager
 
 
     def averageAdu(self, i_ref):
@@ -45,12 +44,9 @@ class IndiAllskySqm(object):
             sqm_img = fits_data[1]  # green channel
 
 
-        if isinstance(self._sqm_mask_dict[i_ref.binning], type(None)):
-            # This only needs to be done once if a mask is not provided
-            self._generateSqmMask(sqm_img, i_ref.binning)
-
+        sqm_mask = self._mask_manager.sqm_mask(i_ref.binning, sqm_img.shape)
 
-        return cv2.mean(src=sqm_img, mask=self._sqm_mask_dict[i_ref.binning])[0]
+        return cv2.mean(src=sqm_img, mask=sqm_mask)[0]
 
 
     def jSqm(self, i_ref):
@@ -77,49 +73,3 @@ class IndiAllskySqm(object):
         mag_sqm = self._magnitude_offset + raw_mag  # raw_mag is negative
 
         return mag_sqm, raw_mag, sqm_avg
-
-
-    def _generateSqmMask(self, img, binning):
-        logger.info('Generating mask based on SQM_ROI')
-
-        image_height, image_width = img.shape[:2]
-
-        # create a black background
-        mask = numpy.zeros((image_height, image_width), dtype=numpy.uint8)
-
-
-        sqm_roi = self.config.get('SQM_ROI', [])
-
-        try:
-            x1 = int(sqm_roi[0] / binning)
-            y1 = int(sqm_roi[1] / binning)
-            x2 = int(sqm_roi[2] / binning)
-            y2 = int(sqm_roi[3] / binning)
-        except IndexError:
-            logger.warning('Using central ROI for SQM calculations')
-            sqm_fov_div = self.config.get('SQM_FOV_DIV', 4)
-            x1 = int((image_width / 2) - (image_width / sqm_fov_div))
-            y1 = int((image_height / 2) - (image_height / sqm_fov_div))
-            x2 = int((image_width / 2) + (image_width / sqm_fov_div))
-            y2 = int((image_height / 2) + (image_height / sqm_fov_div))
-
-        # The white area is what we keep
-        cv2.rectangle(
-            img=mask,
-            pt1=(x1, y1),
-            pt2=(x2, y2),
-            color=255,  # mono
-            thickness=cv2.FILLED,
-        )
-
-
-        # combine masks in case there is overlapping regions
-        if not isinstance(self._external_mask_dict[binning], type(None)):
-            # combine existing mask with a central ROI
-            logger.info('Merging SQM mask with central ROI')
-            self._sqm_mask_dict[binning] = cv2.bitwise_and(mask, self._external_mask_dict[binning])
-            return
-
-
-        self._sqm_mask_dict[binning] = mask
-
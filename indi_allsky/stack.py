@@ -4,19 +4,21 @@ import cv2
 import astroalign
 import logging
 
+from .maskManager import IndiAllSkyMaskManager
+
 logger = logging.getLogger('indi_allsky')
 
 
 class IndiAllskyStacker(object):
 
-    def __init__(self, config, mask=None):
+    def __init__(self, config, mask_manager=None):
         self.config = config
 
-        self._sqm_mask_dict = mask  # sqm mask is not used
+        if isinstance(mask_manager, type(None)):
+            mask_manager = IndiAllSkyMaskManager(self.config)
 
-        self._stack_mask_dict = dict()
-        for binning in self._sqm_mask_dict.keys():
-            self._stack_mask_dict[binning] = None
+        # detection mask is not used, integrating it causes registration to fail
+        self._mask_manager = mask_manager
 
 
         self._detection_sigma = 5
@@ -124,15 +126,13 @@ class IndiAllskyStacker(object):
         reference_i_ref = stack_i_ref_list[0]
 
 
-        if isinstance(self._stack_mask_dict[binning], type(None)):
-            # This only needs to be done once if a mask is not provided
-            self._generateStackMask(reference_i_ref.opencv_data, binning)
+        stack_mask = self._mask_manager.roi_mask(binning, reference_i_ref.opencv_data.shape)
 
 
         reg_data_list = [reference_i_ref.opencv_data]  # add target to final list
 
         #reference_masked = self._crop(reference_i_ref.opencv_data)
-        reference_masked = cv2.bitwise_and(reference_i_ref.opencv_data, reference_i_ref.opencv_data, mask=self._stack_mask_dict[binning])
+        reference_masked = cv2.bitwise_and(reference_i_ref.opencv_data, reference_i_ref.opencv_data, mask=stack_mask)
 
 
         ### Debugging
@@ -155,7 +155,7 @@ class IndiAllskyStacker(object):
 
         for i_ref in stack_i_ref_list[1:]:
             #i_masked = self._crop(i_ref.opencv_data)
-            i_masked = cv2.bitwise_and(i_ref.opencv_data, i_ref.opencv_data, mask=self._stack_mask_dict[binning])
+            i_masked = cv2.bitwise_and(i_ref.opencv_data, i_ref.opencv_data, mask=stack_mask)
 
             # detection_sigma default = 5
             # max_control_points default = 50
@@ -258,49 +258,3 @@ class IndiAllskyStacker(object):
             x1:x2,
         ]
 
-
-    def _generateStackMask(self, img, binning):
-        logger.info('Generating new stacking mask')
-
-        image_height, image_width = img.shape[:2]
-
-        # create a black background
-        stack_mask = numpy.zeros((image_height, image_width), dtype=numpy.uint8)
-
-
-        sqm_roi = self.config.get('SQM_ROI', [])
-
-        try:
-            x1 = int(sqm_roi[0] / binning)
-            y1 = int(sqm_roi[1] / binning)
-            x2 = int(sqm_roi[2] / binning)
-            y2 = int(sqm_roi[3] / binning)
-        except IndexError:
-            logger.warning('Using central ROI for registration')
-            sqm_fov_div = self.config.get('SQM_FOV_DIV', 4)
-            x1 = int((image_width / 2) - (image_width / sqm_fov_div))
-            y1 = int((image_height / 2) - (image_height / sqm_fov_div))
-            x2 = int((image_width / 2) + (image_width / sqm_fov_div))
-            y2 = int((image_height / 2) + (image_height / sqm_fov_div))
-
-
-        # The white area is what we keep
-        cv2.rectangle(
-            img=stack_mask,
-            pt1=(x1, y1),
-            pt2=(x2, y2),
-            color=255,  # mono
-            thickness=cv2.FILLED,
-        )
-
-
-        ### Integrating the detection mask appears to cause registration to fail
-        #if not isinstance(self._sqm_mask_dict[binning], type(None)):
-        #    # combine existing mask with a central ROI
-        #    logger.info('Merging SQM mask with central ROI')
-        #    self._sqm_mask_dict[binning] = cv2.bitwise_and(stack_mask, self._sqm_mask_dict[binning])
-        #    return
-
-
-        self._stack_mask_dict[binning] = stack_mask
-
@@ -1,7 +1,6 @@
 import os
 import cv2
 from fractions import Fraction
-import math
 import numpy
 from datetime import datetime
 from datetime import timezone
@@ -10,10 +9,11 @@ from PIL import Image
 import time
 from pathlib import Path
 import tempfile
-import ephem
 import logging
 
 from .stars import IndiAllSkyStars
+from .maskManager import IndiAllSkyMaskManager
+from .ephemeris import IndiAllSkyEphemeris
 
 
 logger = logging.getLogger('indi_allsky')
@@ -22,11 +22,14 @@ logger = logging.getLogger('indi_allsky')
 
 class StarTrailGenerator(object):
 
-    def __init__(self, config, skip_frames=0, mask=None):
+    def __init__(self, config, skip_frames=0, mask_manager=None):
         self.config = config
         self.skip_frames = skip_frames
 
-        self._star_mask_dict = mask
+        if isinstance(mask_manager, type(None)):
+            mask_manager = IndiAllSkyMaskManager(self.config)
+
+        self._mask_manager = mask_manager
 
         self.process_count = 0
 
@@ -63,13 +66,7 @@ class StarTrailGenerator(object):
             'pixels'    : 0,
         }
 
-        self.obs = ephem.Observer()
-        self.sun = ephem.Sun()
-        self.moon = ephem.Moon()
-
-
-        # disable atmospheric refraction calcs
-        self.obs.pressure = 0
+        self._ephemeris = None  # depends on the location
 
 
         self.image_processing_elapsed_s = 0
@@ -82,8 +79,6 @@ class StarTrailGenerator(object):
         self._timelapse_frame_count = 0
         self._timelapse_frame_list = list()
 
-        self._image_circle_alpha_mask = None
-
 
         if self.config['IMAGE_FOLDER']:
             self.image_dir = Path(self.config['IMAGE_FOLDER']).absolute()
@@ -166,7 +161,7 @@ class StarTrailGenerator(object):
     @latitude.setter
     def latitude(self, new_latitude):
         self._latitude = float(new_latitude)
-        self.obs.lat = math.radians(self._latitude)
+        self._ephemeris = None
 
     @property
     def longitude(self):
@@ -175,7 +170,7 @@ class StarTrailGenerator(object):
     @longitude.setter
     def longitude(self, new_longitude):
         self._longitude = float(new_longitude)
-        self.obs.lon = math.radians(self._longitude)
+        self._ephemeris = None
 
     @property
     def sun_alt_threshold(self):
@@ -258,11 +253,10 @@ class StarTrailGenerator(object):
             return
 
 
-        if isinstance(self._star_mask_dict[binning], type(None)):
-            self._generateStarMask(image, binning)
+        star_mask = self._mask_manager.star_mask(binning, image.shape)
 
         if isinstance(self._stars_detect, type(None)):
-            self._stars_detect = IndiAllSkyStars(self.config, mask=self._star_mask_dict)
+            self._stars_detect = IndiAllSkyStars(self.config, mask_manager=self._mask_manager)
 
 
         # need grayscale image for mask generation
@@ -273,7 +267,7 @@ class StarTrailGenerator(object):
 
 
         if isinstance(adu, type(None)):
-            m_avg = cv2.mean(image_gray, mask=self._star_mask_dict[binning])[0]
+            m_avg = cv2.mean(image_gray, mask=star_mask)[0]
         else:
             m_avg = adu
 
@@ -285,10 +279,11 @@ class StarTrailGenerator(object):
 
 
         mtime_datetime_utc = datetime.fromtimestamp(file_p.stat().st_mtime).astimezone(tz=timezone.utc)
-        self.obs.date = mtime_datetime_utc
 
-        self.sun.compute(self.obs)
-        sun_alt = math.degrees(self.sun.alt)
+        if isinstance(self._ephemeris, type(None)):
+            self._ephemeris = IndiAllSkyEphemeris.get(self.latitude, self.longitude)
+
+        sun_alt = self._ephemeris.alt_az('sun', mtime_datetime_utc)[0]
 
         if sun_alt > self.sun_alt_threshold:
             #logger.warning(' Excluding image due to sun altitude: %0.1f', sun_alt)
@@ -296,9 +291,8 @@ class StarTrailGenerator(object):
             return
 
 
-        self.moon.compute(self.obs)
-        moon_alt = math.degrees(self.moon.alt)
-        moon_phase = self.moon.moon_phase * 100.0
+        moon_alt = self._ephemeris.alt_az('moon', mtime_datetime_utc)[0]
+        moon_phase = self._ephemeris.moon_phase(mtime_datetime_utc)
 
 
         if moon_alt > self.moonmode_alt and moon_phase > self.moonmode_phase:
@@ -341,11 +335,21 @@ class StarTrailGenerator(object):
 
         ### This can be used to mask out the text around the image circle
         if self.config.get('STARTRAILS', {}).get('IMAGE_CIRCLE_MASK_ENABLE'):
-            if isinstance(self._image_circle_alpha_mask, type(None)):
-                self._image_circle_alpha_mask = self._generate_image_circle_mask(image)
+            image_circle_alpha = self._mask_manager.image_circle_alpha(
+                binning,
+                image.shape,
+                self.config.get('STARTRAILS', {}).get('IMAGE_CIRCLE_MASK_DIAMETER', 3000),
+                self.config.get('STARTRAILS', {}).get('IMAGE_CIRCLE_MASK_OPACITY', 100),
+                self.config.get('STARTRAILS', {}).get('IMAGE_CIRCLE_MASK_BLUR', 35),
+                offset_x=self.config.get('LENS_OFFSET_X', 0),
+                offset_y=self.config.get('LENS_OFFSET_Y', 0),
+                name='startrails_circle',
+            )
 
+            if len(image.shape) == 2:
+                image_circle_alpha = image_circle_alpha[:, :, 0]
 
-            image = (image * self._image_circle_alpha_mask).astype(numpy.uint8)
+            image = (image * image_circle_alpha).astype(numpy.uint8)
 
 
         ### Here is the magic
@@ -522,81 +526,3 @@ class StarTrailGenerator(object):
         degrees = degrees if is_positive else -degrees
         return degrees, minutes, seconds
 
-
-    def _generateStarMask(self, img, binning):
-        logger.info('Generating mask based on SQM_ROI')
-
-        image_height, image_width = img.shape[:2]
-
-        # create a black background
-        mask = numpy.zeros((image_height, image_width), dtype=numpy.uint8)
-
-        ### Not going to use the user defined SQM_ROI for now
-        sqm_roi = self.config.get('SQM_ROI', [])
-
-        try:
-            x1 = int(sqm_roi[0] / binning)
-            y1 = int(sqm_roi[1] / binning)
-            x2 = int(sqm_roi[2] / binning)
-            y2 = int(sqm_roi[3] / binning)
-        except IndexError:
-            logger.warning('Using central ROI for ADU mask')
-            sqm_fov_div = self.config.get('SQM_FOV_DIV', 4)
-            x1 = int((image_width / 2) - (image_width / sqm_fov_div))
-            y1 = int((image_height / 2) - (image_height / sqm_fov_div))
-            x2 = int((image_width / 2) + (image_width / sqm_fov_div))
-            y2 = int((image_height / 2) + (image_height / sqm_fov_div))
-
-        # The white area is what we keep
-        cv2.rectangle(
-            img=mask,
-            pt1=(x1, y1),
-            pt2=(x2, y2),
-            color=255,  # mono
-            thickness=cv2.FILLED,
-        )
-
-        self._star_mask_dict[binning] = mask
-
-
-    def _generate_image_circle_mask(self, image):
-        image_height, image_width = image.shape[:2]
-
-
-        opacity = self.config.get('STARTRAILS', {}).get('IMAGE_CIRCLE_MASK_OPACITY', 100)
-        background = int(255 * (100 - opacity) / 100)
-        #logger.info('Image circle backgound: %d', background)
-
-        channel_mask = numpy.full([image_height, image_width], background, dtype=numpy.uint8)
-
-        center_x = int(image_width / 2) + self.config.get('LENS_OFFSET_X', 0)
-        center_y = int(image_height / 2) - self.config.get('LENS_OFFSET_Y', 0)  # minus
-        radius = int(self.config.get('STARTRAILS', {}).get('IMAGE_CIRCLE_MASK_DIAMETER', 3000) / 2)
-        blur = self.config.get('STARTRAILS', {}).get('IMAGE_CIRCLE_MASK_BLUR', 35)
-
-
-        # draw a white circle
-        cv2.circle(
-            img=channel_mask,
-            center=(center_x, center_y),
-            radius=radius,
-            color=255,  # mono
-            thickness=cv2.FILLED,
-        )
-
-
-        if blur:
-            # blur circle
-            channel_mask = cv2.blur(
-                src=channel_mask,
-                ksize=(blur, blur),
-                borderType=cv2.BORDER_DEFAULT,
-            )
-
-
-        channel_alpha = (channel_mask / 255).astype(numpy.float32)
-
-        alpha_mask = numpy.dstack((channel_alpha, channel_alpha, channel_alpha))
-
-        return alpha_mask
-
@@ -4,6 +4,8 @@ import cv2
 import numpy
 import logging
 
+from .maskManager import IndiAllSkyMaskManager
+
 
 logger = logging.getLogger('indi_allsky')
 
@@ -13,14 +15,13 @@ class IndiAllSkyStars(object):
     _distanceThreshold = 10
 
 
-    def __init__(self, config, mask=None):
+    def __init__(self, config, mask_manager=None):
         self.config = config
 
-        self._sqm_mask_dict = mask
+        if isinstance(mask_manager, type(None)):
+            mask_manager = IndiAllSkyMaskManager(self.config)
 
-        self._star_mask_dict = dict()
-        for binning in self._sqm_mask_dict.keys():
-            self._star_mask_dict[binning] = None
+        self._mask_manager = mask_manager
 
 
         self._detectionThreshold = self.config.get('DETECT_STARS_THOLD', 0.6)
@@ -51,13 +52,29 @@ class IndiAllSkyStars(object):
 
         self.star_template_w, self.star_template_h = self.star_template.shape[::-1]
 
+        self._decimated_template_dict = dict()
+
+
+    def detectObjects(self, original_data, binning, decimate=1):
+        """Detect stars, with decimate the detection runs on a reduced image and coordinates are scaled back"""
+        if decimate > 1:
+            detect_data = cv2.resize(
+                original_data,
+                (original_data.shape[1] // decimate, original_data.shape[0] // decimate),
+                interpolation=cv2.INTER_AREA,
+            )
+
+            star_template = self._decimatedTemplate(decimate)
+            distance_threshold = self._distanceThreshold / decimate
+        else:
+            detect_data = original_data
+            star_template = self.star_template
+            distance_threshold = self._distanceThreshold
+
 
-    def detectObjects(self, original_data, binning):
-        if isinstance(self._star_mask_dict[binning], type(None)):
-            # This only needs to be done once if a mask is not provided
-            self._generateStarMask(original_data, binning)
+        star_mask = self._mask_manager.star_mask(binning * decimate, detect_data.shape)
 
-        masked_img = cv2.bitwise_and(original_data, original_data, mask=self._star_mask_dict[binning])
+        masked_img = cv2.bitwise_and(detect_data, detect_data, mask=star_mask)
 
         if len(original_data.shape) == 2:
             # gray scale or bayered
@@ -70,13 +87,13 @@ class IndiAllSkyStars(object):
         sep_start = time.time()
 
 
-        result = cv2.matchTemplate(grey_img, self.star_template, cv2.TM_CCOEFF_NORMED)
+        result = cv2.matchTemplate(grey_img, star_template, cv2.TM_CCOEFF_NORMED)
         result_filter = numpy.where(result >= self._detectionThreshold)
 
         blobs = list()
         for pt in zip(*result_filter[::-1]):
             for blob in blobs:
-                if (abs(pt[0] - blob[0]) < self._distanceThreshold) and (abs(pt[1] - blob[1]) < self._distanceThreshold):
+                if (abs(pt[0] - blob[0]) < distance_threshold) and (abs(pt[1] - blob[1]) < distance_threshold):
                     break
 
             else:
@@ -84,53 +101,37 @@ class IndiAllSkyStars(object):
                 blobs.append(pt)
 
 
+        if decimate > 1:
+            # back to full size coordinates
+            blobs = [(int(x * decimate), int(y * decimate)) for x, y in blobs]
+
+
         sep_elapsed_s = time.time() - sep_start
-        logger.info('Detected %d stars in %0.4f s', len(blobs), sep_elapsed_s)
+        logger.info('Detected %d stars in %0.4f s (decimate %d)', len(blobs), sep_elapsed_s, decimate)
 
         self._drawCircles(original_data, blobs)
 
         return blobs
 
 
-    def _generateStarMask(self, img, binning):
-        logger.info('Generating mask based on SQM_ROI')
-
-
-        if not isinstance(self._sqm_mask_dict[binning], type(None)):
-            self._star_mask_dict[binning] = self._sqm_mask_dict[binning]
-            return
-
-
-        image_height, image_width = img.shape[:2]
+    def _decimatedTemplate(self, decimate):
+        try:
+            return self._decimated_template_dict[decimate]
+        except KeyError:
+            pass
 
-        # create a black background
-        mask = numpy.zeros((image_height, image_width), dtype=numpy.uint8)
 
-        sqm_roi = self.config.get('SQM_ROI', [])
+        template_size = max(3, self.star_template_w // decimate)
 
-        try:
-            x1 = int(sqm_roi[0] / binning)
-            y1 = int(sqm_roi[1] / binning)
-            x2 = int(sqm_roi[2] / binning)
-            y2 = int(sqm_roi[3] / binning)
-        except IndexError:
-            logger.warning('Using central ROI for star detection')
-            sqm_fov_div = self.config.get('SQM_FOV_DIV', 4)
-            x1 = int((image_width / 2) - (image_width / sqm_fov_div))
-            y1 = int((image_height / 2) - (image_height / sqm_fov_div))
-            x2 = int((image_width / 2) + (image_width / sqm_fov_div))
-            y2 = int((image_height / 2) + (image_height / sqm_fov_div))
-
-        # The white area is what we keep
-        cv2.rectangle(
-            img=mask,
-            pt1=(x1, y1),
-            pt2=(x2, y2),
-            color=255,  # mono
-            thickness=cv2.FILLED,
+        star_template = cv2.resize(
+            self.star_template,
+            (template_size, template_size),
+            interpolation=cv2.INTER_AREA,
         )
 
-        self._star_mask_dict[binning] = mask
+        self._decimated_template_dict[decimate] = star_template
+
+        return star_template
 
 
     def _drawCircles(self, sep_data, blob_list):
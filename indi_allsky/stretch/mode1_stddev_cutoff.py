@@ -14,12 +14,7 @@ class IndiAllSky_Mode1_Stretch(IndiAllSky_Stretch_Base):
 
     def __init__(self, *args, **kwargs):
         super(IndiAllSky_Mode1_Stretch, self).__init__(*args, **kwargs)
-        self._sqm_mask_dict = kwargs['mask']
-
-
-        self._numpy_mask_dict = dict()
-        for x in self._sqm_mask_dict.keys():
-            self._numpy_mask_dict[x] = None
+        self._mask_manager = kwargs['mask_manager']
 
 
         self.gamma = self.config.get('IMAGE_STRETCH', {}).get('MODE1_GAMMA', 3.0)
@@ -27,11 +22,6 @@ class IndiAllSky_Mode1_Stretch(IndiAllSky_Stretch_Base):
 
 
     def stretch(self, data, image_bit_depth, binning):
-        if isinstance(self._numpy_mask_dict[binning], type(None)):
-            # This only needs to be done once
-            self._generateNumpyMask(data, binning)
-
-
         stretch_start = time.time()
 
 
@@ -121,20 +111,23 @@ class IndiAllSky_Mode1_Stretch(IndiAllSky_Stretch_Base):
     def _get_image_stddev(self, data, binning):
         #mean_std_start = time.time()
 
+        # True values will be masked
+        numpy_mask = self._mask_manager.numpy_mask(binning, data.shape)
+
 
         # mask arrays allow using the detection mask to perform calculations on
         # arbitrary boundaries in the image
         if len(data.shape) == 2:
-            ma = numpy.ma.masked_array(data, mask=self._numpy_mask_dict[binning])
+            ma = numpy.ma.masked_array(data, mask=numpy_mask)
 
             # mono
             mean = numpy.ma.mean(ma)
             stddev = numpy.ma.std(ma)
         else:
             # color
-            b_ma = numpy.ma.masked_array(data[:, :, 0], mask=self._numpy_mask_dict[binning])
-            g_ma = numpy.ma.masked_array(data[:, :, 1], mask=self._numpy_mask_dict[binning])
-            r_ma = numpy.ma.masked_array(data[:, :, 2], mask=self._numpy_mask_dict[binning])
+            b_ma = numpy.ma.masked_array(data[:, :, 0], mask=numpy_mask)
+            g_ma = numpy.ma.masked_array(data[:, :, 1], mask=numpy_mask)
+            r_ma = numpy.ma.masked_array(data[:, :, 2], mask=numpy_mask)
 
             b_mean = numpy.ma.mean(b_ma)
             g_mean = numpy.ma.mean(g_ma)
@@ -153,38 +146,3 @@ class IndiAllSky_Mode1_Stretch(IndiAllSky_Stretch_Base):
 
         return mean, stddev
 
-
-    def _generateNumpyMask(self, img, binning):
-        if isinstance(self._sqm_mask_dict[binning], type(None)):
-            logger.info('Generating mask based on SQM_ROI')
-
-            image_height, image_width = img.shape[:2]
-
-            mask = numpy.full((image_height, image_width), True, dtype=numpy.bool_)
-
-            sqm_roi = self.config.get('SQM_ROI', [])
-
-            try:
-                x1 = int(sqm_roi[0] / binning)
-                y1 = int(sqm_roi[1] / binning)
-                x2 = int(sqm_roi[2] / binning)
-                y2 = int(sqm_roi[3] / binning)
-            except IndexError:
-                logger.warning('Using central ROI for blob calculations')
-                sqm_fov_div = self.config.get('SQM_FOV_DIV', 4)
-                x1 = int((image_width / 2) - (image_width / sqm_fov_div))
-                y1 = int((image_height / 2) - (image_height / sqm_fov_div))
-                x2 = int((image_width / 2) + (image_width / sqm_fov_div))
-                y2 = int((image_height / 2) + (image_height / sqm_fov_div))
-
-
-            # True values will be masked
-            mask[y1:y2, x1:x2] = False
-
-        else:
-            # True values will be masked
-            mask = self._sqm_mask_dict[binning] == 0
-
-
-        self._numpy_mask_dict[binning] = mask
-
@@ -25,6 +25,7 @@ class IndiAllSky_Mode2_MTF_Stretch(IndiAllSky_Stretch_Base):
         self.highlights = self.config.get('IMAGE_STRETCH', {}).get('MODE2_HIGHLIGHTS', 1.0)
 
         self._mtf_lut = None
+        self._mtf_lut_bit_depth = None
 
 
     def stretch(self, data, image_bit_depth, binning):
@@ -33,8 +34,20 @@ class IndiAllSky_Mode2_MTF_Stretch(IndiAllSky_Stretch_Base):
         stretch_start = time.time()
 
 
-        if isinstance(self._mtf_lut, type(None)):
-            # only need to generate the lookup table once
+        stretch_lut, stretch_key = self.lut(data, image_bit_depth, binning)
+
+        stretched_image = stretch_lut.take(data, mode='raise')
+
+
+        stretch_elapsed_s = time.time() - stretch_start
+        logger.info('Stretch in %0.4f s', stretch_elapsed_s)
+
+        return stretched_image
+
+
+    def lut(self, data, image_bit_depth, binning):
+        if isinstance(self._mtf_lut, type(None)) or self._mtf_lut_bit_depth != image_bit_depth:
+            # only need to generate the lookup table once per bit depth
             if image_bit_depth == 8:
                 numpy_dtype = numpy.uint8
             else:
@@ -63,18 +76,18 @@ class IndiAllSky_Mode2_MTF_Stretch(IndiAllSky_Stretch_Base):
 
             #logger.info('Min: %d, Max: %d', numpy.min(lut), numpy.max(lut))
 
-            self._mtf_lut = lut
-
+            # repeated operations are composed into the table
+            stretch_lut = lut
+            for x in range(self.operation_count - 1):
+                stretch_lut = lut.take(stretch_lut, mode='raise')
 
-        stretched_image = data
-        for x in range(self.operation_count):
-            stretched_image = self._mtf_lut.take(stretched_image, mode='raise')
+            self._mtf_lut = stretch_lut
+            self._mtf_lut_bit_depth = image_bit_depth
 
 
-        stretch_elapsed_s = time.time() - stretch_start
-        logger.info('Stretch in %0.4f s', stretch_elapsed_s)
+        stretch_key = ('mode2_mtf', self.shadows, self.midtones, self.highlights, image_bit_depth, self.operation_count)
 
-        return stretched_image
+        return self._mtf_lut, stretch_key
 
 
 
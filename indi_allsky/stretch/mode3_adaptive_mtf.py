@@ -31,6 +31,18 @@ class IndiAllSky_Mode3_Adaptive_MTF_Stretch(IndiAllSky_Stretch_Base):
 
         stretch_start = time.time()
 
+        stretched_lut, stretch_key = self.lut(data, image_bit_depth, binning)
+
+        stretched_image = stretched_lut.take(data, mode='raise')
+
+        stretch_elapsed_s = time.time() - stretch_start
+        logger.info('Stretch in %0.4f s', stretch_elapsed_s)
+
+        return stretched_image
+
+
+    def lut(self, data, image_bit_depth, binning):
+        # LUT adapts to every frame
         if image_bit_depth == 8:
             numpy_dtype = numpy.uint8
         else:
@@ -61,12 +73,7 @@ class IndiAllSky_Mode3_Adaptive_MTF_Stretch(IndiAllSky_Stretch_Base):
         stretched_lut = numpy.clip(stretched_lut, 0, data_max)
         stretched_lut = stretched_lut.astype(numpy_dtype)
 
-        stretched_image = stretched_lut.take(data, mode='raise')
-
-        stretch_elapsed_s = time.time() - stretch_start
-        logger.info('Stretch in %0.4f s', stretch_elapsed_s)
-
-        return stretched_image
+        return stretched_lut, None
 
 
     def _mdev(self, data, axis=None):
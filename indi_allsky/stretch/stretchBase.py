@@ -7,3 +7,9 @@ class IndiAllSky_Stretch_Base(object):
     def __init__(self, *args, **kwargs):
         self.config = args[0]
 
+
+    def lut(self, data, image_bit_depth, binning):
+        # Pointwise stretches return (lut, key) so the LUT can be fused with
+        # the following operations.  key is None if the LUT changes per frame.
+        return None, None
+
@@ -0,0 +1,129 @@
+### Thumbnail generation with reduced resolution decoding
+### JPEG files are decoded with libjpeg DCT scaling (1/2, 1/4, 1/8) to the smallest size that still
+### covers the thumbnail.  PNG and other formats cannot be reduced while decoding, they are decoded at
+### full resolution and only scaled by the final resize.
+
+from pathlib import Path
+import io
+import logging
+
+import cv2
+
+from .exceptions import BadImage
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkyThumbnail(object):
+
+    def __init__(self, config):
+        self.config = config
+
+
+    @staticmethod
+    def thumbnail_size(img_width, img_height, new_width, opt_height):
+        if img_width >= img_height:
+            scale = new_width / img_width
+            thumb_width = int(new_width)
+            thumb_height = int(img_height * scale)
+        else:
+            # scale based on height
+            scale = opt_height / img_height
+            thumb_width = int(img_width * scale)
+            thumb_height = int(opt_height)
+
+        return thumb_width, thumb_height
+
+
+    def load(self, filename, new_width, opt_height):
+        """Decode an image file, JPEG files are decoded at the smallest resolution that still covers the thumbnail"""
+        filename_p = Path(filename)
+
+        if filename_p.suffix in ('.jpg', '.jpeg'):
+            return self._load_jpeg(filename_p, new_width, opt_height)
+        elif filename_p.suffix in ('.png',):
+            return self._load_png(filename_p)
+
+        return self._load_pillow(filename_p)
+
+
+    def _load_jpeg(self, filename_p, new_width, opt_height):
+        import simplejpeg
+
+        with io.open(str(filename_p), 'rb') as f_img:
+            jpeg_data = f_img.read()
+
+
+        try:
+            img_height, img_width = simplejpeg.decode_jpeg_header(jpeg_data)[:2]
+
+            thumb_width, thumb_height = self.thumbnail_size(img_width, img_height, new_width, opt_height)
+
+            # libjpeg picks the smallest DCT scale factor that satisfies the minimum size
+            img = simplejpeg.decode_jpeg(
+                jpeg_data,
+                colorspace='BGR',
+                fastdct=True,
+                fastupsample=True,
+                min_width=thumb_width,
+                min_height=thumb_height,
+            )
+        except ValueError as e:
+            raise BadImage('Bad jpeg image - {0:s}'.format(str(e))) from e
+
+
+        return img
+
+
+    def _load_png(self, filename_p):
+        # opencv is faster than Pillow with PNG
+        img = cv2.imread(str(filename_p), cv2.IMREAD_COLOR)
+
+        if isinstance(img, type(None)):
+            raise BadImage('Bad png image')
+
+
+        return img
+
+
+    def _load_pillow(self, filename_p):
+        # Pillow supports remaining image types
+        import numpy
+        import PIL
+        from PIL import Image
+
+        try:
+            with Image.open(str(filename_p)) as img_pil:
+                img = cv2.cvtColor(numpy.array(img_pil), cv2.COLOR_RGB2BGR)
+        except PIL.UnidentifiedImageError as e:
+            raise BadImage('Bad image') from e
+
+
+        return img
+
+
+    def resize(self, img, new_width, opt_height):
+        """Scale image data to thumbnail size, width and height are divisible by 2"""
+        img_height, img_width = img.shape[:2]
+
+        thumb_width, thumb_height = self.thumbnail_size(img_width, img_height, new_width, opt_height)
+
+        thumbnail_data = cv2.resize(img, (thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+
+
+        mod_height = thumb_height % 2
+        mod_width = thumb_width % 2
+
+        if mod_height or mod_width:
+            # width and height needs to be divisible by 2
+            thumb_height -= mod_height
+            thumb_width -= mod_width
+
+            thumbnail_data = thumbnail_data[
+                0:thumb_height,
+                0:thumb_width,
+            ]
+
+
+        return thumbnail_data
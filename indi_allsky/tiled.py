@@ -0,0 +1,141 @@
+### Runs per-pixel filters on horizontal stripes of a frame in parallel
+### Each stripe is extended by an overlap (the kernel radius) above and below.  Only the interior rows of
+### each result are copied into the output, so neighborhood filters stitch without seams.  OpenCV and
+### numpy release the GIL, so a thread pool scales across cores.
+
+import os
+import math
+import concurrent.futures
+import logging
+
+import numpy
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+# image worker processes sharing the cores
+_process_count = 1
+
+# shared by all instances, stripe functions must not submit work to this pool themselves
+_thread_pool = None  # created on first use
+
+
+def set_process_count(processes):
+    """Call before the first frame is processed, the cores are divided between the processes"""
+    global _process_count
+    _process_count = max(1, int(processes))
+
+
+def _thread_count():
+    return max(1, (os.cpu_count() or 1) // _process_count)
+
+
+def _get_thread_pool():
+    global _thread_pool
+
+    if isinstance(_thread_pool, type(None)):
+        _thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=_thread_count())
+
+    return _thread_pool
+
+
+class IndiAllSkyTiledExecutor(object):
+
+    # stripes smaller than this are not worth the thread overhead
+    min_stripe_rows = 128
+
+
+    def __init__(self, workers=None):
+        self._workers = workers
+
+
+    @property
+    def workers(self):
+        if not self._workers:
+            return _thread_count()
+
+        return self._workers
+
+
+    @staticmethod
+    def gaussian_radius(sigma):
+        """Kernel radius used by cv2.GaussianBlur() when ksize is derived from sigma"""
+        # OpenCV uses 3 sigma for 8-bit data and 4 sigma for everything else
+        return int(math.ceil(sigma * 4)) + 1
+
+
+    def stripes(self, height, overlap=0, align=1):
+        """Return a list of (y1, y2, sy1, sy2) tuples
+
+        y1:y2 are the rows owned by the stripe and sy1:sy2 are the rows to process including the overlap.
+        With align, every row boundary is a multiple of align (except the image edges).
+        """
+        overlap = int(math.ceil(overlap / align)) * align
+
+        count = min(self.workers, height // max(self.min_stripe_rows, overlap * 2, 1))
+        if count <= 1:
+            return [(0, height, 0, height)]
+
+
+        rows = int(math.ceil(height / count / align)) * align
+
+        stripe_list = list()
+        for y1 in range(0, height, rows):
+            y2 = min(y1 + rows, height)
+
+            sy1 = max(y1 - overlap, 0)
+            sy2 = min(y2 + overlap, height)
+
+            stripe_list.append((y1, y2, sy1, sy2))
+
+        return stripe_list
+
+
+    def map(self, func, image, overlap=0, align=1):
+        """Run func(stripe) on each stripe, returns a list of (stripe tuple, result)"""
+        stripe_list = self.stripes(image.shape[0], overlap=overlap, align=align)
+
+        if len(stripe_list) == 1:
+            return [(stripe_list[0], func(image))]
+
+
+        result_list = self.starmap(func, [(image[sy1:sy2],) for _, _, sy1, sy2 in stripe_list])
+
+        return list(zip(stripe_list, result_list))
+
+
+    def starmap(self, func, arg_list):
+        """Run func(*args) for each entry of arg_list in the thread pool, results are returned in order"""
+        if len(arg_list) == 1:
+            # no threads for a single task
+            return [func(*arg_list[0])]
+
+
+        thread_pool = _get_thread_pool()
+
+        futures = [thread_pool.submit(func, *args) for args in arg_list]
+
+        return [f.result() for f in futures]
+
+
+    def stitch(self, result_list):
+        """Combine the interior rows of each stripe result into a single image"""
+        if len(result_list) == 1:
+            return result_list[0][1]
+
+
+        height = result_list[-1][0][1]
+        first_result = result_list[0][1]
+
+        output = numpy.empty((height,) + first_result.shape[1:], dtype=first_result.dtype)
+
+        for (y1, y2, sy1, _), result in result_list:
+            output[y1:y2] = result[y1 - sy1:y2 - sy1]
+
+        return output
+
+
+    def run(self, func, image, overlap=0, align=1):
+        """Apply func to the image in parallel stripes, the result must have the same number of rows as the stripe"""
+        return self.stitch(self.map(func, image, overlap=overlap, align=align))
@@ -0,0 +1,118 @@
+### Compiles consecutive pointwise operations into a single lookup table per channel
+### Stages add their LUT instead of transforming the image, the composed table is
+### applied in one pass when the image data is next needed.
+
+import numpy
+import logging
+
+
+logger = logging.getLogger('indi_allsky')
+
+
+class IndiAllSkyToneLut(object):
+
+    compiled_cache_size = 16
+
+
+    def __init__(self):
+        self._lut_list = None  # composed LUT for each channel (or a single LUT for all)
+        self._stage_keys = list()
+
+        self._compiled_dict = dict()  # stage keys -> composed LUTs
+
+
+    @property
+    def pending(self):
+        return not isinstance(self._lut_list, type(None))
+
+
+    @property
+    def stage_count(self):
+        return len(self._stage_keys)
+
+
+    def add(self, lut, key=None):
+        """Compose a LUT (or list of per-channel LUTs) onto the pending chain.
+
+        The composed result is cached by the stage keys, a stage without a key
+        disables the cache for the chain.
+        """
+        if isinstance(lut, (list, tuple)):
+            lut_list = list(lut)
+        else:
+            lut_list = [lut]
+
+
+        self._stage_keys.append(key)
+
+
+        if not self.pending:
+            self._lut_list = lut_list
+            return
+
+
+        cache_key = None
+        if None not in self._stage_keys:
+            cache_key = tuple(self._stage_keys)
+
+            try:
+                self._lut_list = self._compiled_dict[cache_key]
+                return
+            except KeyError:
+                pass
+
+
+        if len(self._lut_list) == 1 and len(lut_list) > 1:
+            # expand single LUT for per-channel composition
+            self._lut_list = self._lut_list * len(lut_list)
+        elif len(self._lut_list) > 1 and len(lut_list) == 1:
+            lut_list = lut_list * len(self._lut_list)
+
+
+        self._lut_list = [next_lut.take(lut, mode='clip') for lut, next_lut in zip(self._lut_list, lut_list)]
+
+
+        if not isinstance(cache_key, type(None)):
+            if len(self._compiled_dict) >= self.compiled_cache_size:
+                self._compiled_dict.clear()
+
+            self._compiled_dict[cache_key] = self._lut_list
+
+
+    def apply(self, image):
+        """Apply the pending chain to image in a single pass and reset"""
+        lut_list = self._lut_list
+        self.reset()
+
+        if isinstance(lut_list, type(None)):
+            return image
+
+
+        if len(image.shape) == 2 or len(lut_list) == 1:
+            return lut_list[0].take(image, mode='clip')
+
+
+        out_image = numpy.empty(image.shape, dtype=lut_list[0].dtype)
+        for c, lut in enumerate(lut_list):
+            numpy.take(lut, image[:, :, c], out=out_image[:, :, c], mode='clip')
+
+        return out_image
+
+
+    def reset(self):
+        self._lut_list = None
+        self._stage_keys = list()
+
+
+    @staticmethod
+    def shift_lut(input_bits, shift_factor):
+        # matches numpy.right_shift(data, shift_factor).astype(numpy.uint8)
+        range_array = numpy.arange(2 ** input_bits, dtype=numpy.uint32)
+        return numpy.right_shift(range_array, shift_factor).astype(numpy.uint8)
+
+
+    @staticmethod
+    def multiply_lut(factor):
+        # matches cv2.multiply() on uint8 data, round half to even and saturate
+        range_array = numpy.arange(256, dtype=numpy.float64)
+        return numpy.clip(numpy.rint(range_array * factor), 0, 255).astype(numpy.uint8)
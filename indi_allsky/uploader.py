@@ -372,6 +372,7 @@ class FileUploader(Thread):
 
             connect_kwargs = {
                 'hostname'     : '{0:s}/{1:s}'.format(self.config['SYNCAPI']['BASEURL'], ENDPOINT_URI),
+                'upload_url'   : '{0:s}/{1:s}'.format(self.config['SYNCAPI']['BASEURL'], constants.ENDPOINT_V1_UPLOAD),
                 'username'     : self.config['SYNCAPI']['USERNAME'],
                 'apikey'       : self.config['SYNCAPI']['APIKEY'],
                 'cert_bypass'  : self.config['SYNCAPI']['CERT_BYPASS'],
@@ -381,6 +382,7 @@ class FileUploader(Thread):
                 'metadata'      : metadata,
                 'local_file'    : local_file_p,
                 'empty_file'    : self.config.get('SYNCAPI', {}).get('EMPTY_FILE'),
+                'chunk_size'    : int(self.config.get('SYNCAPI', {}).get('CHUNK_SIZE', 8)) * 1024 * 1024,
             }
 
             try:
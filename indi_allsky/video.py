@@ -26,8 +26,10 @@ from .miscUpload import miscUpload
 from .aurora import IndiAllskyAuroraUpdate
 from .smoke import IndiAllskySmokeUpdate
 from .satellite_download import IndiAllskyUpdateSatelliteData
-from .maskProcessing import MaskProcessor
+from .maskManager import IndiAllSkyMaskManager
 from .backup import IndiAllskyDatabaseBackup
+from .dbValidate import IndiAllSkyDbValidate
+from .configReload import IndiAllSkyConfigReload
 
 from .flask import create_app
 from .flask import db
@@ -54,6 +56,7 @@ from sqlalchemy import func
 from sqlalchemy import or_
 from sqlalchemy import and_
 from sqlalchemy.sql.expression import false as sa_false
+from sqlalchemy.sql.expression import null as sa_null
 from sqlalchemy.orm.exc import NoResultFound
 
 from multiprocessing import Process
@@ -81,6 +84,8 @@ class VideoWorker(Process):
     thumbnail_mini_timelapse_width = 300
     thumbnail_mini_timelapse_height_opt = 200
 
+    thumbnail_batch_size = 200  # thumbnails generated per task for imported images
+
 
     def __init__(
         self,
@@ -183,6 +188,11 @@ class VideoWorker(Process):
                 logger.warning('Goodbye')
                 return
 
+            if v_dict.get('config'):
+                logger.warning('Applying new config')
+                IndiAllSkyConfigReload.update(self.config, v_dict['config'])
+                continue
+
             if self._shutdown:
                 logger.warning('Goodbye')
                 return
@@ -1081,7 +1091,8 @@ class VideoWorker(Process):
             .one()
 
 
-        detection_mask_dict = self._load_detection_mask()
+        # startrails are generated from post-processed images
+        mask_manager = IndiAllSkyMaskManager(self.config, processed=True)
 
 
         task.setRunning()
@@ -1416,7 +1427,7 @@ class VideoWorker(Process):
         stg = StarTrailGenerator(
             self.config,
             skip_frames=timelapse_skip_frames,
-            mask=detection_mask_dict,
+            mask_manager=mask_manager,
         )
         stg.max_adu = self.config['STARTRAILS_MAX_ADU']
         stg.mask_threshold = self.config['STARTRAILS_MASK_THOLD']
@@ -1549,6 +1560,7 @@ class VideoWorker(Process):
             keogram_thumbnail_metadata,
             new_width=self.thumbnail_keogram_width,
             opt_height=self.thumbnail_keogram_height_opt,
+            numpy_data=kg.keogram_final,  # avoid decoding the file again
         )
 
 
@@ -1602,6 +1614,7 @@ class VideoWorker(Process):
                 startrail_thumbnail_metadata,
                 new_width=self.thumbnail_startrail_width,
                 opt_height=self.thumbnail_startrail_height_opt,
+                numpy_data=stg.trail_image,  # avoid decoding the file again
             )
 
 
@@ -1839,6 +1852,112 @@ class VideoWorker(Process):
         task.setSuccess('Uploaded EndOfNight data')
 
 
+    def addMissingThumbnails(self, task, **kwargs):
+        camera_id = kwargs['camera_id']
+        origin = kwargs.get('origin', constants.IMAGE)
+        last_id = kwargs.get('last_id', 0)
+
+
+        camera = IndiAllSkyDbCameraTable.query\
+            .filter(IndiAllSkyDbCameraTable.id == camera_id)\
+            .one()
+
+
+        task.setRunning()
+
+
+        if origin == constants.PANORAMA_IMAGE:
+            table = IndiAllSkyDbPanoramaImageTable
+        else:
+            table = IndiAllSkyDbImageTable
+
+
+        # newest first, the id is the position for the next task
+        entry_query = table.query\
+            .filter(table.camera_id == camera.id)\
+            .filter(table.thumbnail_uuid == sa_null())
+
+        if last_id:
+            entry_query = entry_query.filter(table.id < last_id)
+
+        entry_list = entry_query\
+            .order_by(table.id.desc())\
+            .limit(self.thumbnail_batch_size)\
+            .all()
+
+
+        thumbnail_count = 0
+        for entry in entry_list:
+            thumbnail_metadata = {
+                'type'       : constants.THUMBNAIL,
+                'origin'     : origin,
+                'createDate' : entry.createDate,
+                'dayDate'    : entry.dayDate,
+                'night'      : entry.night,
+                'camera_uuid': camera.uuid,
+            }
+
+            thumbnail_entry = self._miscDb.addThumbnail(
+                entry,
+                {},
+                camera.id,
+                thumbnail_metadata,
+            )
+
+            if thumbnail_entry:
+                thumbnail_count += 1
+
+
+        logger.info('Generated %d thumbnails', thumbnail_count)
+
+
+        if len(entry_list) == self.thumbnail_batch_size:
+            next_kwargs = {
+                'camera_id' : camera.id,
+                'origin'    : origin,
+                'last_id'   : entry_list[-1].id,
+            }
+        elif origin == constants.IMAGE:
+            next_kwargs = {
+                'camera_id' : camera.id,
+                'origin'    : constants.PANORAMA_IMAGE,
+            }
+        else:
+            next_kwargs = None
+
+
+        state_key = 'THUMBNAIL_RESUME_CAMERA_{0:d}'.format(camera.id)
+
+        if next_kwargs:
+            # resumed from here when indi-allsky is restarted
+            self._miscDb.setState(state_key, json.dumps(next_kwargs))
+
+
+            # queued behind other tasks, thumbnails are generated while the worker is idle
+            jobdata = {
+                'action' : 'addMissingThumbnails',
+                'kwargs' : next_kwargs,
+            }
+
+            next_task = IndiAllSkyDbTaskQueueTable(
+                queue=TaskQueueQueue.VIDEO,
+                state=TaskQueueState.QUEUED,
+                data=jobdata,
+            )
+            db.session.add(next_task)
+            db.session.commit()
+
+            self.video_q.put({'task_id' : next_task.id})
+        else:
+            try:
+                self._miscDb.removeState(state_key)
+            except NoResultFound:
+                pass
+
+
+        task.setSuccess('Generated {0:d} thumbnails'.format(thumbnail_count))
+
+
     def systemHealthCheck(self, task, **kwargs):
         task.setRunning()
 
@@ -1978,6 +2097,33 @@ class VideoWorker(Process):
         self._miscUpload.upload_db_backup(backup_file)
 
 
+    def validateDbEntries(self, task, **kwargs):
+        # the full folder walk is left to misc/validate_db_entries.py
+        orphans = bool(kwargs.get('orphans', False))
+
+
+        task.setRunning()
+
+
+        # report only, entries are removed with misc/validate_db_entries.py which keeps separate marks
+        validate = IndiAllSkyDbValidate(self.config, orphans=orphans, state_prefix='VALIDATE_DB_REPORT_ID')
+        validate.main()
+
+        validate.saveMarks()
+
+
+        if validate.missing_total or validate.orphan_count:
+            self._miscDb.addNotification(
+                NotificationCategory.MEDIA,
+                'db_validate',
+                'Database validation found {0:d} entries with missing files and {1:d} files not in the database'.format(validate.missing_total, validate.orphan_count),
+                expire=timedelta(hours=24),
+            )
+
+
+        task.setSuccess('Validated {0:d} entries, {1:d} missing files, {2:d} files not in the database'.format(validate.checked_total, validate.missing_total, validate.orphan_count))
+
+
     def expireData(self, task, **kwargs):
         camera_id = kwargs['camera_id']
 
@@ -2172,104 +2318,3 @@ class VideoWorker(Process):
             if item.is_dir():
                 dir_list.append(item)
                 self._getFolderFolders(item, dir_list)  # recursion
-
-
-    def _load_detection_mask(self):
-        # populate initial dict
-        mask_dict = dict()
-        for x in set(self.binning_av):
-            mask_dict[x] = None
-
-
-        detect_mask = self.config.get('DETECT_MASK', '')
-
-        if not detect_mask:
-            logger.warning('No detection mask defined')
-            return mask_dict
-
-
-        detect_mask_p = Path(detect_mask)
-
-        try:
-            if not detect_mask_p.exists():
-                logger.error('%s does not exist', detect_mask_p)
-                return mask_dict
-
-
-            if not detect_mask_p.is_file():
-                logger.error('%s is not a file', detect_mask_p)
-                return mask_dict
-
-        except PermissionError as e:
-            logger.error(str(e))
-            return mask_dict
-
-
-        mask_data = cv2.imread(str(detect_mask_p), cv2.IMREAD_GRAYSCALE)  # mono
-        if isinstance(mask_data, type(None)):
-            logger.error('%s is not a valid image', detect_mask_p)
-            return mask_dict
-
-
-        logger.warning('Loaded detection mask: %s', detect_mask_p)
-
-
-        mask_height, mask_width = mask_data.shape[:2]
-
-
-        ### any intermediate values will be set to 255
-        mask_data[mask_data > 0] = 255
-
-
-        for binning in mask_dict.keys():
-            mask_processor = MaskProcessor(
-                self.config,
-                binning,
-            )
-
-
-            # masks need to be rotated, flipped, cropped for post-processed images
-            if binning == 1:
-                mask_processor.image = mask_data
-            else:
-                new_mask_height = int(mask_height / binning)
-                new_mask_width = int(mask_width / binning)
-
-                mask_processor.image = cv2.resize(mask_data, (new_mask_width, new_mask_height), interpolation=cv2.INTER_AREA)
-
-
-            if self.config.get('IMAGE_ROTATE'):
-                mask_processor.rotate_90()
-
-
-            # rotation
-            if self.config.get('IMAGE_ROTATE_ANGLE'):
-                mask_processor.rotate_angle()
-
-
-            # verticle flip
-            if self.config.get('IMAGE_FLIP_V'):
-                mask_processor.flip_v()
-
-
-            # horizontal flip
-            if self.config.get('IMAGE_FLIP_H'):
-                mask_processor.flip_h()
-
-
-            # crop
-            if self.config.get('IMAGE_CROP_ROI'):
-                mask_processor.crop_image()
-
-
-            # scale
-            if self.config['IMAGE_SCALE'] and self.config['IMAGE_SCALE'] != 100:
-                mask_processor.scale_image()
-
-
-            mask_dict[x] = mask_processor.image
-
-
-        return mask_dict
-
-
@@ -145,6 +145,16 @@ class UploadSync(object):
         self._syncapi = bool(new_syncapi)
 
 
+    @property
+    def chunk_size(self):
+        return self.config.get('SYNCAPI', {}).get('CHUNK_SIZE', 8)
+
+    @chunk_size.setter
+    def chunk_size(self, new_chunk_size):
+        # passed to the upload workers with the config
+        self.config['SYNCAPI']['CHUNK_SIZE'] = int(new_chunk_size)
+
+
     @property
     def syncapi_images(self):
         return self._syncapi_images
@@ -1292,6 +1302,13 @@ if __name__ == "__main__":
         type=int,
         default=30
     )
+    argparser.add_argument(
+        '--chunk-size',
+        '-c',
+        help='syncapi resumable upload chunk size in MB (0 disables chunking)',
+        type=int,
+        default=None
+    )
 
 
     upload_images_group = argparser.add_mutually_exclusive_group(required=False)
@@ -1348,6 +1365,9 @@ if __name__ == "__main__":
     us.syncapi = args.syncapi
     us.syncapi_images = args.syncapi_images
 
+    if args.chunk_size is not None:
+        us.chunk_size = args.chunk_size
+
     action_func = getattr(us, args.action)
     action_func()
 
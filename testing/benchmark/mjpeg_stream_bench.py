@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+###
+### Measures MJPEG stream fan-out latency and CPU usage for the capture API.
+### Compares the old polling reader (sleep loops, shared Event) with the
+### FrameBroadcast channel used by MJPEGStreamManager.  No camera needed,
+### frames are published by a simulated daemon thread.
+###
+
+import sys
+import time
+import threading
+import argparse
+import statistics
+from pathlib import Path
+import logging
+
+sys.path.append(str(Path(__file__).parent.absolute().parent.parent))
+
+from indi_allsky.camera.frame_broadcast import FrameBroadcast
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging
+
+
+class PollingStream(object):
+    """Emulates the previous stream manager: 100ms reader poll, Event set/clear."""
+
+    def __init__(self):
+        self.frame = None
+        self.seq = -1
+        self.publish_time = 0.0
+        self.event = threading.Event()
+
+        self._shm_frame = None
+        self._shm_seq = -1
+        self._shm_time = 0.0
+
+
+    def publish(self, frame, seq):
+        # daemon writes shared memory
+        self._shm_frame = frame
+        self._shm_seq = seq
+        self._shm_time = time.monotonic()
+
+
+    def reader(self, running):
+        while running.is_set():
+            if self._shm_seq != self.seq:
+                self.frame = self._shm_frame
+                self.publish_time = self._shm_time
+                self.seq = self._shm_seq
+                self.event.set()
+                self.event.clear()
+
+            time.sleep(0.1)
+
+
+    def client(self, running, latencies):
+        last_seq = -1
+        while running.is_set():
+            while running.is_set() and self.seq == last_seq:
+                self.event.wait(timeout=1)
+
+            if not running.is_set():
+                break
+
+            last_seq = self.seq
+            latencies.append(time.monotonic() - self.publish_time)
+
+
+class BroadcastStream(object):
+    def __init__(self):
+        self.broadcast = FrameBroadcast()
+
+
+    def publish(self, frame, seq):
+        # single reader is woken by the daemon notification and publishes immediately
+        self.broadcast.publish(frame, seq)
+
+
+    def reader(self, running):
+        pass
+
+
+    def client(self, running, latencies):
+        with self.broadcast.subscribe(include_latest=False) as sub:
+            while running.is_set():
+                result = sub.get_timed(timeout=1.0)
+                if result is None:
+                    continue
+
+                latencies.append(time.monotonic() - result[2])
+
+
+class StreamBench(object):
+
+    def __init__(self, fps, duration, frame_size):
+        self.fps = fps
+        self.duration = duration
+        self.frame = b'\xff' * frame_size
+
+
+    def main(self, client_counts):
+        for mode in ('poll', 'broadcast'):
+            for count in client_counts:
+                self.run(mode, count)
+
+
+    def run(self, mode, client_count):
+        if mode == 'poll':
+            stream = PollingStream()
+        else:
+            stream = BroadcastStream()
+
+
+        running = threading.Event()
+        running.set()
+
+        latency_list = [list() for _ in range(client_count)]
+
+        thread_list = [threading.Thread(target=stream.reader, args=(running,), daemon=True)]
+        for latencies in latency_list:
+            thread_list.append(threading.Thread(target=stream.client, args=(running, latencies), daemon=True))
+
+        for t in thread_list:
+            t.start()
+
+
+        cpu_start = time.process_time()
+        wall_start = time.monotonic()
+
+        seq = 0
+        period = 1.0 / self.fps
+        next_frame = wall_start
+        while time.monotonic() - wall_start < self.duration:
+            seq += 1
+            stream.publish(self.frame, seq)
+
+            next_frame += period
+            time.sleep(max(next_frame - time.monotonic(), 0))
+
+
+        cpu_elapsed = time.process_time() - cpu_start
+        wall_elapsed = time.monotonic() - wall_start
+
+        running.clear()
+        if mode == 'broadcast':
+            stream.broadcast.close()
+
+        for t in thread_list:
+            t.join(timeout=2.0)
+
+
+        all_latencies = [x for latencies in latency_list for x in latencies]
+        if not all_latencies:
+            logger.error('%s %d clients: no frames received', mode, client_count)
+            return
+
+        all_latencies.sort()
+        p95 = all_latencies[int(len(all_latencies) * 0.95) - 1]
+        delivered = len(all_latencies) / (seq * client_count) * 100
+
+        logger.info(
+            '%-9s %3d clients: latency mean %6.2fms p95 %6.2fms, delivered %5.1f%%, CPU %5.1f%%',
+            mode,
+            client_count,
+            statistics.mean(all_latencies) * 1000,
+            p95 * 1000,
+            delivered,
+            cpu_elapsed / wall_elapsed * 100,
+        )
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument(
+        '--fps',
+        help='simulated stream frame rate',
+        type=float,
+        default=10.0,
+    )
+    argparser.add_argument(
+        '--duration',
+        help='seconds per run',
+        type=float,
+        default=10.0,
+    )
+    argparser.add_argument(
+        '--size',
+        help='JPEG size in bytes',
+        type=int,
+        default=200000,
+    )
+    argparser.add_argument(
+        '--clients',
+        help='client counts',
+        type=int,
+        nargs='+',
+        default=[1, 10, 50],
+    )
+
+    args = argparser.parse_args()
+
+    sb = StreamBench(args.fps, args.duration, args.size)
+    sb.main(args.clients)
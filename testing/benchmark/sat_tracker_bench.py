@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+###
+### Compares per-satellite pyephem computation with the vectorized SGP4 pass window screen
+### TLE data: curl -o /tmp/visual.txt 'https://celestrak.org/NORAD/elements/gp.php?GROUP=visual&FORMAT=tle'
+###
+
+import sys
+import io
+import math
+import time
+from datetime import datetime
+from datetime import timezone
+import argparse
+from pathlib import Path
+import logging
+
+import ephem
+from sgp4.api import Satrec
+from sgp4.api import SatrecArray
+
+sys.path.append(str(Path(__file__).parent.absolute().parent.parent))
+
+from indi_allsky.satellites import IndiAllSkySatelliteTracker
+from indi_allsky import constants
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging
+
+
+LATITUDE = 33.0
+LONGITUDE = -84.0
+
+
+class SatTrackerBench(object):
+
+    def __init__(self, tle_file, rounds):
+        self.rounds = rounds
+
+        with io.open(tle_file, 'r') as f_tle:
+            tle_lines = [x.rstrip() for x in f_tle.readlines() if x.strip()]
+
+        self.tle_list = [tle_lines[i:i + 3] for i in range(0, len(tle_lines) - 2, 3)]
+
+        self.position_av = [0.0 for _ in range(10)]
+        self.position_av[constants.POSITION_LATITUDE] = LATITUDE
+        self.position_av[constants.POSITION_LONGITUDE] = LONGITUDE
+        self.position_av[constants.POSITION_ELEVATION] = 300
+
+
+    def main(self):
+        utcnow = datetime.now(tz=timezone.utc)
+
+        logger.info('Satellites: %d', len(self.tle_list))
+
+
+        ### pyephem, every frame
+        obs = ephem.Observer()
+        obs.lat = math.radians(LATITUDE)
+        obs.lon = math.radians(LONGITUDE)
+        obs.pressure = 0
+
+        ephem_start = time.time()
+        for _ in range(self.rounds):
+            obs.date = utcnow
+
+            for title, line1, line2 in self.tle_list:
+                sat = ephem.readtle(title, line1, line2)
+                sat.compute(obs)
+
+        ephem_elapsed_s = (time.time() - ephem_start) / self.rounds
+        logger.info('PyEphem per frame: %0.1f ms', ephem_elapsed_s * 1000)
+
+
+        ### vectorized windows, once per TLE download
+        tracker = IndiAllSkySatelliteTracker({})
+        tracker._body_list = [ephem.readtle(*x) for x in self.tle_list]
+        tracker._title_list = [x[0] for x in self.tle_list]
+
+        satrec_list = [Satrec.twoline2rv(x[1], x[2]) for x in self.tle_list]
+        tracker._satrec_chunk_list = [SatrecArray(satrec_list[c:c + tracker.chunk_size]) for c in range(0, len(satrec_list), tracker.chunk_size)]
+
+        window_start = time.time()
+        tracker._build_windows(utcnow.timestamp(), self.position_av, 20)
+        window_elapsed_s = time.time() - window_start
+        logger.info('Pass windows (%d h): %0.1f ms', tracker.window_hours, window_elapsed_s * 1000)
+
+
+        ### candidate lookup, every frame
+        lookup_start = time.time()
+        for _ in range(self.rounds):
+            candidates = tracker.candidates(utcnow.timestamp())
+
+        lookup_elapsed_s = (time.time() - lookup_start) / self.rounds
+        logger.info('Candidate lookup per frame: %0.3f ms, %d candidates', lookup_elapsed_s * 1000, len(candidates))
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument(
+        'tle_file',
+        help='TLE file',
+        type=str,
+    )
+    argparser.add_argument(
+        '--rounds',
+        help='rounds',
+        type=int,
+        default=20,
+    )
+
+    args = argparser.parse_args()
+
+    stb = SatTrackerBench(args.tle_file, args.rounds)
+    stb.main()
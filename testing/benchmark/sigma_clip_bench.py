@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+###
+### Compares ccdproc.combine() sigma clipping with the native strip based combiner on synthetic dark frames
+###
+
+import sys
+import time
+import tempfile
+import argparse
+from pathlib import Path
+import logging
+
+import numpy
+from astropy.io import fits
+from astropy.stats import mad_std
+import ccdproc
+
+sys.path.append(str(Path(__file__).parent.absolute().parent.parent))
+
+from indi_allsky.sigmaClip import IndiAllSkySigmaClipCombine
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging
+
+
+class SigmaClipBench(object):
+
+    def __init__(self, count, width, height, mem_limit):
+        self.count = count
+        self.width = width
+        self.height = height
+        self.mem_limit = mem_limit
+
+
+    def main(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        tmp_dir_p = Path(tmp_dir.name)
+
+        rng = numpy.random.default_rng(1)
+
+        hot_pixels = rng.integers(self.width * self.height, size=500)
+
+        fits_file_list = list()
+        npy_file_list = list()
+        for i in range(self.count):
+            data = rng.normal(1000, 25, size=(self.height, self.width))
+
+            data.flat[hot_pixels] = 40000
+
+            # cosmic rays
+            data.flat[rng.integers(self.width * self.height, size=200)] = 65535
+
+            data = data.astype(numpy.uint16)
+
+
+            fits_p = tmp_dir_p.joinpath('{0:04d}.fit'.format(i))
+            hdu = fits.PrimaryHDU(data)
+            hdu.header['BUNIT'] = 'ADU'
+            hdu.writeto(fits_p)
+            fits_file_list.append(str(fits_p))
+
+            npy_p = tmp_dir_p.joinpath('{0:04d}.npy'.format(i))
+            numpy.save(str(npy_p), data)
+            npy_file_list.append(str(npy_p))
+
+
+        logger.info('Frames: %d x %dx%d', self.count, self.width, self.height)
+
+
+        ccdproc_start = time.time()
+        ccdproc_dark = ccdproc.combine(
+            fits_file_list,
+            method='average',
+            sigma_clip=True,
+            sigma_clip_low_thresh=5,
+            sigma_clip_high_thresh=5,
+            sigma_clip_func=numpy.ma.median,
+            signma_clip_dev_func=mad_std,
+            dtype=numpy.uint16,
+            mem_limit=self.mem_limit,
+        )
+        ccdproc_elapsed_s = time.time() - ccdproc_start
+        logger.info('ccdproc: %0.2f s', ccdproc_elapsed_s)
+
+
+        combiner = IndiAllSkySigmaClipCombine(sigma_low=5, sigma_high=5, mem_limit=self.mem_limit)
+
+        native_start = time.time()
+        frame_list = [numpy.load(x, mmap_mode='r') for x in npy_file_list]
+        native_dark = combiner.combine(frame_list, numpy.uint16)
+        native_elapsed_s = time.time() - native_start
+        logger.info('Native: %0.2f s (%0.1fx)', native_elapsed_s, ccdproc_elapsed_s / native_elapsed_s)
+
+
+        diff = numpy.abs(ccdproc_dark.data.astype(numpy.int32) - native_dark.astype(numpy.int32))
+        logger.info('Difference: max %d, mean %0.3f', numpy.max(diff), numpy.mean(diff))
+
+        del frame_list
+        tmp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument(
+        '--count',
+        help='frame count',
+        type=int,
+        default=20,
+    )
+    argparser.add_argument(
+        '--width',
+        help='width',
+        type=int,
+        default=3008,
+    )
+    argparser.add_argument(
+        '--height',
+        help='height',
+        type=int,
+        default=3008,
+    )
+    argparser.add_argument(
+        '--mem_limit',
+        help='memory limit (bytes)',
+        type=int,
+        default=350000000,
+    )
+
+    args = argparser.parse_args()
+
+    scb = SigmaClipBench(args.count, args.width, args.height, args.mem_limit)
+    scb.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+###
+### Compares full resolution decoding with reduced resolution decoding
+### when generating 150px thumbnails from 4K images
+###
+
+import sys
+import io
+import time
+import random
+import argparse
+import cv2
+import numpy
+from pathlib import Path
+import logging
+
+sys.path.append(str(Path(__file__).parent.absolute().parent.parent))
+
+from indi_allsky.thumbnail import IndiAllSkyThumbnail
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging
+
+
+class ThumbnailBench(object):
+    new_width = 150
+    opt_height = 100
+
+    ### 4k
+    width  = 3840
+    height = 2160
+
+
+    def __init__(self, rounds):
+        self.rounds = rounds
+
+        self._thumbnail = IndiAllSkyThumbnail({})
+
+        ### draw a bunch of random circles
+        self.image_bgr = numpy.zeros([self.height, self.width, 3], dtype=numpy.uint8)
+        for _ in range(500):
+            cv2.circle(
+                self.image_bgr,
+                center=(random.randrange(self.width), random.randrange(self.height)),
+                radius=random.randrange(5, 100),
+                color=(random.randrange(255), random.randrange(255), random.randrange(255)),
+                thickness=cv2.FILLED,
+            )
+
+
+    def main(self):
+        for suffix in ('.jpg', '.png', '.webp'):
+            tmp_p = Path('/dev/shm/thumbnail_bench{0:s}'.format(suffix))
+
+            if suffix == '.webp':
+                from PIL import Image
+                Image.fromarray(cv2.cvtColor(self.image_bgr, cv2.COLOR_BGR2RGB)).save(str(tmp_p), quality=90)
+            else:
+                cv2.imwrite(str(tmp_p), self.image_bgr)
+
+
+            full_elapsed_s = self.run(self.full_decode, tmp_p)
+            reduced_elapsed_s = self.run(self.reduced_decode, tmp_p)
+
+            logger.info(
+                '%-5s full: %0.1f ms, reduced: %0.1f ms (%0.1fx)',
+                suffix,
+                full_elapsed_s * 1000,
+                reduced_elapsed_s * 1000,
+                full_elapsed_s / reduced_elapsed_s,
+            )
+
+            tmp_p.unlink()
+
+
+    def run(self, func, tmp_p):
+        start = time.time()
+        for _ in range(self.rounds):
+            func(tmp_p)
+
+        return (time.time() - start) / self.rounds
+
+
+    def full_decode(self, tmp_p):
+        if tmp_p.suffix == '.jpg':
+            import simplejpeg
+            with io.open(str(tmp_p), 'rb') as f_img:
+                img = simplejpeg.decode_jpeg(f_img.read(), colorspace='BGR')
+        elif tmp_p.suffix == '.png':
+            img = cv2.imread(str(tmp_p), cv2.IMREAD_COLOR)
+        else:
+            from PIL import Image
+            with Image.open(str(tmp_p)) as img_pil:
+                img = cv2.cvtColor(numpy.array(img_pil), cv2.COLOR_RGB2BGR)
+
+        return self._thumbnail.resize(img, self.new_width, self.opt_height)
+
+
+    def reduced_decode(self, tmp_p):
+        img = self._thumbnail.load(tmp_p, self.new_width, self.opt_height)
+        return self._thumbnail.resize(img, self.new_width, self.opt_height)
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument(
+        '--rounds',
+        help='rounds per format',
+        type=int,
+        default=20,
+    )
+
+    args = argparser.parse_args()
+
+    tb = ThumbnailBench(args.rounds)
+    tb.main()
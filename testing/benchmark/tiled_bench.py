@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+###
+### Compares single threaded and tiled (striped) execution of the denoise filters
+### and verifies the stitched result matches the full frame
+###
+
+import sys
+import time
+import argparse
+import numpy
+from pathlib import Path
+import logging
+
+sys.path.append(str(Path(__file__).parent.absolute().parent.parent))
+
+from indi_allsky.denoise import IndiAllskyDenoise
+from indi_allsky.tiled import IndiAllSkyTiledExecutor
+from indi_allsky import constants
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging
+
+
+class TiledBench(object):
+    ### 4k
+    width  = 3840
+    height = 2160
+
+
+    def __init__(self, rounds):
+        self.rounds = rounds
+
+        config = {
+            'IMAGE_DENOISE_STRENGTH' : 3,
+            'DENOISE_PROTECT_STARS' : False,
+            'ADAPTIVE_BLEND' : False,
+        }
+
+        night_av = [0 for _ in range(20)]
+        night_av[constants.NIGHT_NIGHT] = 1
+
+        self.denoise = IndiAllskyDenoise(config, night_av)
+
+        self.image = numpy.random.randint(65535, size=(self.height, self.width, 3), dtype=numpy.uint16)
+
+
+    def main(self):
+        for algo in ('median_blur', 'gaussian_blur', 'bilateral', 'wavelet'):
+            func = getattr(self.denoise, algo)
+
+            self.denoise._tiled = IndiAllSkyTiledExecutor(workers=1)
+            single_elapsed_s, single_result = self.run(func)
+
+            self.denoise._tiled = IndiAllSkyTiledExecutor()
+            tiled_elapsed_s, tiled_result = self.run(func)
+
+            max_diff = numpy.max(numpy.abs(single_result.astype(numpy.int32) - tiled_result.astype(numpy.int32)))
+
+            logger.info(
+                '%-13s single: %0.1f ms, tiled (%d): %0.1f ms (%0.1fx), max diff: %d',
+                algo,
+                single_elapsed_s * 1000,
+                self.denoise._tiled.workers,
+                tiled_elapsed_s * 1000,
+                single_elapsed_s / tiled_elapsed_s,
+                max_diff,
+            )
+
+
+    def run(self, func):
+        start = time.time()
+        for _ in range(self.rounds):
+            result = func(self.image)
+
+        return (time.time() - start) / self.rounds, result
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument(
+        '--rounds',
+        help='rounds per filter',
+        type=int,
+        default=5,
+    )
+
+    args = argparser.parse_args()
+
+    tb = TiledBench(args.rounds)
+    tb.main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+###
+### Checks the sort order assumptions of the orphaned file search in IndiAllSkyDbValidate
+### The directory walk and the database filenames are merged, both must be sorted by code point.
+### Names around '/' ('a-b.jpg' < 'a/x.jpg' < 'a.jpg') are the case a per folder sort gets wrong.
+###
+
+import sys
+import time
+import tempfile
+import sqlite3
+from pathlib import Path
+import logging
+
+sys.path.append(str(Path(__file__).parent.absolute().parent))
+
+from indi_allsky.dbValidate import IndiAllSkyDbValidate
+
+
+logger = logging.getLogger('indi_allsky')
+logger.setLevel(logging.INFO)
+
+LOG_FORMATTER_STREAM = logging.Formatter('%(asctime)s [%(levelname)s] %(funcName)s() [%(lineno)d]: %(message)s')
+LOG_HANDLER_STREAM = logging.StreamHandler()
+LOG_HANDLER_STREAM.setFormatter(LOG_FORMATTER_STREAM)
+logger.addHandler(LOG_HANDLER_STREAM)
+
+
+class DbValidateOrderTest(object):
+
+    file_list = (
+        'a-b.jpg',
+        'a/x.jpg',
+        'a/b/y.jpg',
+        'a.jpg',
+        'a0.jpg',
+        'A.jpg',
+        'b.fit',
+        'b.txt',  # not an asset
+    )
+
+    # entries in the database, the rest are orphans
+    db_list = (
+        'a-b.jpg',
+        'a/b/y.jpg',
+        'a0.jpg',
+    )
+
+    day_folder = 'ccd_test/exposures/20240101'
+
+
+    def main(self):
+        failed = False
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image_dir = Path(tmp_dir)
+            day_dir = image_dir.joinpath(self.day_folder)
+
+            for name in self.file_list:
+                f = day_dir.joinpath(name)
+                f.parent.mkdir(parents=True, exist_ok=True)
+                f.touch()
+
+
+            validate = IndiAllSkyDbValidate({'IMAGE_FOLDER': str(image_dir)}, max_rate=0)
+
+            asset_list = ['{0:s}/{1:s}'.format(self.day_folder, x) for x in self.file_list if not x.endswith('.txt')]
+
+
+            walk_list = [x[0] for x in validate._walkFiles(str(image_dir), '', 0)]
+            if walk_list != sorted(asset_list):
+                logger.error('Walk order: %s', walk_list)
+                logger.error('Expected:   %s', sorted(asset_list))
+                failed = True
+            else:
+                logger.info('Walk order matches sorted()')
+
+
+            db_filename_list = sorted(['{0:s}/{1:s}'.format(self.day_folder, x) for x in self.db_list])
+            if self.sqliteOrder(asset_list) != sorted(asset_list):
+                logger.error('SQLite order does not match sorted()')
+                failed = True
+            else:
+                logger.info('SQLite order matches sorted()')
+
+
+            # database filenames without a database
+            def dbFilenames(table, prefix):
+                if table is validate.asset_tables[0][1] and not prefix:
+                    yield from db_filename_list
+
+            validate._dbFilenames = dbFilenames
+
+            validate._ops_start = time.time()
+            validate._findOrphans(time.time() + 60)  # all files are old enough
+
+            expected_orphan_list = sorted(set(asset_list) - set(db_filename_list))
+            if validate.orphan_list != expected_orphan_list:
+                logger.error('Orphans:  %s', validate.orphan_list)
+                logger.error('Expected: %s', expected_orphan_list)
+                failed = True
+            else:
+                logger.info('Orphans: %s', ', '.join(validate.orphan_list))
+
+
+        if failed:
+            sys.exit(1)
+
+        logger.info('All checks passed')
+
+
+    def sqliteOrder(self, filename_list):
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE t (filename VARCHAR(255))')
+        conn.executemany('INSERT INTO t VALUES (?)', [(x,) for x in filename_list])
+
+        order_list = [x[0] for x in conn.execute('SELECT filename FROM t ORDER BY filename ASC')]
+
+        conn.close()
+
+        return order_list
+
+
+if __name__ == "__main__":
+    DbValidateOrderTest().main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+
+###
+### Runs the event driven exposure scheduler against the fake INDI client
+### Exposures complete on a timer thread that signals the exposure events like the INDI callbacks.
+### Reports the start delay of each frame and how often the loop woke up.
+###
+
+import sys
+import time
+import threading
+import argparse
+from pathlib import Path
+import logging
+
+sys.path.append(str(Path(__file__).parent.absolute().parent.parent))
+
+from indi_allsky.camera.fake_indi import FakeIndiClient
+from indi_allsky.exposureEvents import IndiAllSkyExposureScheduler
+
+
+logger = logging.getLogger('indi_allsky')
+logger.setLevel(logging.INFO)
+
+LOG_FORMATTER_STREAM = logging.Formatter('%(asctime)s [%(levelname)s] %(funcName)s() [%(lineno)d]: %(message)s')
+LOG_HANDLER_STREAM = logging.StreamHandler()
+LOG_HANDLER_STREAM.setFormatter(LOG_FORMATTER_STREAM)
+logger.addHandler(LOG_HANDLER_STREAM)
+
+
+class TimerIndiClient(FakeIndiClient):
+
+    def __init__(self, *args, **kwargs):
+        super(TimerIndiClient, self).__init__(*args, **kwargs)
+
+        self._camera_ready = True
+
+
+    def setCcdExposure(self, exposure, sync=False, timeout=None):
+        self.exposureStartTime = time.time()
+        self._camera_ready = False
+        self.exposure_events.notify('exposure_state')  # BUSY
+
+        t = threading.Timer(exposure, self._exposureComplete)
+        t.start()
+
+
+    def _exposureComplete(self):
+        self._camera_ready = True
+        self.exposure_events.notify('blob')
+
+
+    def getCcdExposureStatus(self):
+        if self._camera_ready:
+            return True, 'OK'
+
+        return False, 'BUSY'
+
+
+class ExposureEventsTest(object):
+
+    def __init__(self, frames, exposure, period):
+        self.frames = frames
+        self.exposure = exposure
+        self.period = period
+
+        self.indiclient = TimerIndiClient({}, None, None, None, None, None, None, None, None)
+
+
+    def main(self):
+        scheduler = IndiAllSkyExposureScheduler(self.indiclient.exposure_events, event_callbacks=True)
+
+        next_frame_time = time.time() + 0.5
+        frame_start_time = time.time()
+        camera_ready = True
+        frame_count = 0
+        wakeups = 0
+        delay_list = list()
+
+        test_start = time.time()
+
+        while frame_count < self.frames:
+            scheduler.wait(camera_ready, next_frame_time, time.time() + 11, frame_start_time + self.exposure)
+            wakeups += 1
+
+            now_time = time.time()
+
+            camera_ready, exposure_state = self.indiclient.getCcdExposureStatus()
+            if not camera_ready:
+                continue
+
+            if now_time < next_frame_time:
+                continue
+
+
+            delay_list.append(now_time - next_frame_time)
+            scheduler.exposure_started(now_time, next_frame_time)
+
+            frame_start_time = now_time
+            self.indiclient.setCcdExposure(self.exposure)
+            camera_ready = False
+
+            next_frame_time = frame_start_time + self.period
+            frame_count += 1
+
+
+        elapsed_s = time.time() - test_start
+
+        logger.warning('Frames: %d, wakeups: %d (%0.1f/s)', frame_count, wakeups, wakeups / elapsed_s)
+        logger.warning('Start delay avg: %0.2fms, max: %0.2fms', 1000 * sum(delay_list) / len(delay_list), 1000 * max(delay_list))
+
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument(
+        '--frames',
+        help='frame count',
+        type=int,
+        default=10,
+    )
+    argparser.add_argument(
+        '--exposure',
+        help='exposure',
+        type=float,
+        default=0.5,
+    )
+    argparser.add_argument(
+        '--period',
+        help='exposure period',
+        type=float,
+        default=1.0,
+    )
+
+    args = argparser.parse_args()
+
+    eet = ExposureEventsTest(args.frames, args.exposure, args.period)
+    eet.main()